@@ -0,0 +1,339 @@
+package bidding
+
+import (
+	"context"
+	"crypto/rand"
+	"encoding/hex"
+	"errors"
+	"fmt"
+	"log"
+	"rtb-backend/internal/database"
+	"rtb-backend/internal/envconf"
+	"rtb-backend/internal/models"
+	"strconv"
+	"time"
+
+	"github.com/redis/go-redis/v9"
+	"gorm.io/gorm"
+	"gorm.io/gorm/clause"
+)
+
+// Archiver 活動結束後的封存工作：
+// 等結果凍結後，把最終排行榜與出價詳情分批寫入 ranking_archives，
+// 完成後對 Redis 的 config / rank / bids 設定 TTL (或直接 UNLINK)。
+// 進度記錄在 archive_jobs，程式重啟後會從上次的 Cursor 繼續。
+type Archiver struct {
+	rdb redis.UniversalClient
+	db  *gorm.DB
+
+	interval      time.Duration // 掃描待封存商品的週期
+	freezeDelay   time.Duration // 活動結束後等待多久才開始封存
+	batchSize     int           // 每批寫入的名次數
+	rowsPerSecond int           // 寫入速率上限，避免與進行中的活動搶資源
+	keyTTL        time.Duration // 封存後 Redis Key 的存活時間，0 代表立即刪除
+	lockTTL       time.Duration // 多實例部署時的商品鎖
+}
+
+func NewArchiver(rdb redis.UniversalClient, db *gorm.DB) *Archiver {
+	return &Archiver{
+		rdb:           rdb,
+		db:            db,
+		interval:      envconf.Duration("ARCHIVE_INTERVAL", time.Minute),
+		freezeDelay:   envconf.Duration("ARCHIVE_FREEZE_DELAY", 5*time.Minute),
+		batchSize:     envconf.Int("ARCHIVE_BATCH_SIZE", 500),
+		rowsPerSecond: envconf.Int("ARCHIVE_ROWS_PER_SECOND", 2000),
+		keyTTL:        envconf.Duration("ARCHIVE_KEY_TTL", time.Hour),
+		lockTTL:       10 * time.Minute,
+	}
+}
+
+// Run 週期性掃描已結束的商品並封存，ctx 取消時結束
+func (a *Archiver) Run(ctx context.Context) {
+	ticker := time.NewTicker(a.interval)
+	defer ticker.Stop()
+
+	for {
+		a.RunOnce(ctx)
+
+		select {
+		case <-ctx.Done():
+			return
+		case <-ticker.C:
+		}
+	}
+}
+
+// RunOnce 封存目前所有符合條件的商品
+func (a *Archiver) RunOnce(ctx context.Context) {
+	productIDs, err := a.pendingProducts()
+	if err != nil {
+		log.Printf("查詢待封存商品失敗: %v", err)
+		return
+	}
+
+	for _, productID := range productIDs {
+		if ctx.Err() != nil {
+			return
+		}
+		if err := a.ArchiveProduct(ctx, productID); err != nil {
+			log.Printf("封存商品失敗: productID=%s, err=%v", productID, err)
+		}
+	}
+}
+
+// pendingProducts 找出已結束超過 freezeDelay、且尚未封存完成的商品
+func (a *Archiver) pendingProducts() ([]string, error) {
+	cutoff := time.Now().Add(-a.freezeDelay).UnixMilli()
+
+	var ids []string
+	err := a.db.Model(&models.Product{}).
+		Joins("LEFT JOIN archive_jobs ON archive_jobs.product_id = products.id").
+		Where("products.end_time < ?", cutoff).
+		Where("archive_jobs.product_id IS NULL OR archive_jobs.status <> ?", database.ArchiveJobDone).
+		Order("products.end_time").
+		Limit(50).
+		Pluck("products.id", &ids).Error
+	return ids, err
+}
+
+// releaseLockScript 值仍為自己的 token 時才刪除鎖
+var releaseLockScript = redis.NewScript(`
+if redis.call("GET", KEYS[1]) == ARGV[1] then
+	return redis.call("DEL", KEYS[1])
+end
+return 0
+`)
+
+func lockToken() (string, error) {
+	b := make([]byte, 16)
+	if _, err := rand.Read(b); err != nil {
+		return "", err
+	}
+	return hex.EncodeToString(b), nil
+}
+
+// ArchiveProduct 封存單一商品，可重複呼叫 (已寫入的名次會被覆蓋，不會重複)
+func (a *Archiver) ArchiveProduct(ctx context.Context, productID string) error {
+	configKey := database.ConfigKey(productID)
+	rankKey := database.RankKey(productID)
+	bidsKey := database.BidsKey(productID)
+	lockKey := database.ArchiveLockKey(productID)
+
+	// 多個後端實例只讓一個處理同一商品；鎖的值為隨機 token，釋放時只刪除自己持有的鎖
+	// (封存超過 lockTTL 時鎖可能已被其他實例取得)
+	token, err := lockToken()
+	if err != nil {
+		return err
+	}
+	locked, err := a.rdb.SetNX(ctx, lockKey, token, a.lockTTL).Result()
+	if err != nil {
+		return err
+	}
+	if !locked {
+		return nil
+	}
+	defer releaseLockScript.Run(context.Background(), a.rdb, []string{lockKey}, token)
+
+	job, err := a.loadJob(ctx, rankKey, productID)
+	if err != nil {
+		return err
+	}
+
+	for job.Cursor < job.Total {
+		if ctx.Err() != nil {
+			return ctx.Err()
+		}
+
+		start := time.Now()
+		n, err := a.archiveBatch(ctx, job, rankKey, bidsKey)
+		if err != nil {
+			return err
+		}
+		if n == 0 {
+			break
+		}
+
+		// 限速：每批至少花 n / rowsPerSecond 秒
+		if a.rowsPerSecond > 0 {
+			minDuration := time.Duration(n) * time.Second / time.Duration(a.rowsPerSecond)
+			if wait := minDuration - time.Since(start); wait > 0 {
+				select {
+				case <-ctx.Done():
+					return ctx.Err()
+				case <-time.After(wait):
+				}
+			}
+		}
+	}
+
+	// 保存最終最高價，Redis Key 清除後商品列表仍能顯示
+	// (redis.Nil 代表上次已清除 Key、只差標記完成，最終價已在當時寫入)
+	finalPrice, err := a.rdb.HGet(ctx, configKey, "currentHighestPrice").Float64()
+	if err != nil && !errors.Is(err, redis.Nil) {
+		return err
+	}
+	if err == nil {
+		if err := a.db.Model(&models.Product{}).Where("id = ?", productID).
+			Update("final_highest_price", finalPrice).Error; err != nil {
+			return fmt.Errorf("保存最終最高價失敗: %v", err)
+		}
+	}
+
+	// 先清除 Redis Key 再標記完成，清除失敗時下一輪會重試
+	// 使用 UNLINK 避免大型 ZSET/Hash 刪除時阻塞 Redis
+	keys := []string{configKey, rankKey, bidsKey}
+	pipe := a.rdb.Pipeline()
+	for _, key := range keys {
+		if a.keyTTL > 0 {
+			pipe.Expire(ctx, key, a.keyTTL)
+		} else {
+			pipe.Unlink(ctx, key)
+		}
+	}
+	if _, err := pipe.Exec(ctx); err != nil {
+		return fmt.Errorf("清除 Redis Key 失敗: %v", err)
+	}
+
+	job.Status = database.ArchiveJobDone
+	if err := a.db.Save(job).Error; err != nil {
+		return err
+	}
+
+	log.Printf("商品封存完成: productID=%s, rows=%d", productID, job.Total)
+	return nil
+}
+
+// loadJob 讀取或建立封存進度
+func (a *Archiver) loadJob(ctx context.Context, rankKey, productID string) (*database.ArchiveJob, error) {
+	var job database.ArchiveJob
+	err := a.db.Where("product_id = ?", productID).First(&job).Error
+	if err == nil {
+		return &job, nil
+	}
+	if !errors.Is(err, gorm.ErrRecordNotFound) {
+		return nil, err
+	}
+
+	// 活動結束後排行榜不再變動，總數以開始封存時為準
+	total, err := a.rdb.ZCard(ctx, rankKey).Result()
+	if err != nil {
+		return nil, err
+	}
+	job = database.ArchiveJob{
+		ProductID: productID,
+		Status:    database.ArchiveJobRunning,
+		Total:     total,
+		StartedAt: time.Now(),
+	}
+	if err := a.db.Create(&job).Error; err != nil {
+		return nil, err
+	}
+	return &job, nil
+}
+
+// archiveBatch 寫入一批名次並推進 Cursor (同一個 transaction)，回傳寫入筆數
+func (a *Archiver) archiveBatch(ctx context.Context, job *database.ArchiveJob, rankKey, bidsKey string) (int, error) {
+	stop := job.Cursor + int64(a.batchSize) - 1
+	zlist, err := a.rdb.ZRevRangeWithScores(ctx, rankKey, job.Cursor, stop).Result()
+	if err != nil {
+		return 0, err
+	}
+	if len(zlist) == 0 {
+		return 0, nil
+	}
+
+	userIDs := make([]string, len(zlist))
+	for i, z := range zlist {
+		userIDs[i] = z.Member.(string)
+	}
+	details, err := a.rdb.HMGet(ctx, bidsKey, userIDs...).Result()
+	if err != nil {
+		return 0, err
+	}
+
+	now := time.Now()
+	rows := make([]database.RankingArchive, len(zlist))
+	for i, z := range zlist {
+		detailsStr, _ := details[i].(string)
+		price, reactionTime, weight := decodeBidDetails(detailsStr)
+		rows[i] = database.RankingArchive{
+			ProductID:    job.ProductID,
+			UserID:       userIDs[i],
+			Rank:         int(job.Cursor) + i + 1,
+			Score:        z.Score,
+			Price:        price,
+			ReactionTime: reactionTime,
+			Weight:       weight,
+			Reason:       database.ArchiveReasonFinal,
+			ArchivedAt:   now,
+		}
+	}
+
+	err = a.db.Transaction(func(tx *gorm.DB) error {
+		err := tx.Clauses(clause.OnConflict{
+			Columns:   []clause.Column{{Name: "product_id"}, {Name: "user_id"}},
+			UpdateAll: true,
+		}).Create(&rows).Error
+		if err != nil {
+			return err
+		}
+		return tx.Model(job).Update("cursor", job.Cursor+int64(len(rows))).Error
+	})
+	if err != nil {
+		return 0, err
+	}
+	job.Cursor += int64(len(rows))
+	return len(rows), nil
+}
+
+// archivedRankings 從 ranking_archives 讀取已封存的最終排行榜 (Redis Key 已被清除時使用)
+func (s *Service) archivedRankings(productID string) (*RankingResponse, bool) {
+	var product models.Product
+	if err := s.db.Where("id = ?", productID).First(&product).Error; err != nil {
+		return nil, false
+	}
+
+	var rows []database.RankingArchive
+	err := s.db.Where("product_id = ? AND reason = ?", productID, database.ArchiveReasonFinal).
+		Order("rank").Limit(product.K).Find(&rows).Error
+	if err != nil || len(rows) == 0 {
+		return nil, false
+	}
+
+	// 一次查出所有使用者名稱
+	ids := make([]uint, 0, len(rows))
+	for _, row := range rows {
+		if id, err := strconv.ParseUint(row.UserID, 10, 32); err == nil {
+			ids = append(ids, uint(id))
+		}
+	}
+	var users []models.User
+	s.db.Select("id", "username").Where("id IN ?", ids).Find(&users)
+	names := make(map[string]string, len(users))
+	for _, u := range users {
+		names[strconv.FormatUint(uint64(u.ID), 10)] = u.Username
+	}
+
+	items := make([]RankingItem, len(rows))
+	for i, row := range rows {
+		display, ok := names[row.UserID]
+		if !ok {
+			display = "User_" + row.UserID
+		}
+		items[i] = RankingItem{
+			Rank:         row.Rank,
+			UserID:       row.UserID,
+			DisplayName:  display,
+			Price:        row.Price,
+			ReactionTime: row.ReactionTime,
+			Weight:       row.Weight,
+			Score:        row.Score,
+		}
+	}
+
+	return &RankingResponse{
+		Rankings:            items,
+		ThresholdScore:      items[len(items)-1].Score,
+		CurrentHighestPrice: product.FinalHighestPrice,
+	}, true
+}
@@ -0,0 +1,263 @@
+package bidding
+
+import (
+	"context"
+	"encoding/json"
+	"fmt"
+	"os"
+	"strconv"
+	"testing"
+	"time"
+
+	"rtb-backend/internal/database"
+	"rtb-backend/internal/envconf"
+	"rtb-backend/internal/models"
+	"rtb-backend/internal/websocket"
+
+	"github.com/redis/go-redis/v9"
+	"gorm.io/driver/postgres"
+	"gorm.io/gorm"
+	"gorm.io/gorm/logger"
+)
+
+// 出價與排行榜熱路徑的 benchmark
+//
+//	cd backend && go test -run '^$' -bench . -benchmem ./internal/...
+//
+// 需要 Redis 的 benchmark 連到 BENCH_REDIS_ADDR (未設定時為 REDIS_ADDR，預設 localhost:6379) 的
+// BENCH_REDIS_DB (預設 15，開始前會清空該 DB)，執行的是 scripts/place_bid.lua 本身；連不上時略過。
+// Postgres 預設以 gorm DryRun 只產生 SQL 不連線；設定 BENCH_DATABASE_DSN 則連到本機 Postgres。
+// 比較不同 commit 的結果請用 scripts/bench_compare.py。
+
+const benchProductID = "bench"
+
+var (
+	benchBidders = []int{1_000, 10_000, 100_000}
+	benchK       = []int{5, 50, 500}
+)
+
+type benchEnv struct {
+	svc *Service
+	rdb *redis.Client
+}
+
+func newBenchEnv(b *testing.B, rankCapFactor int) *benchEnv {
+	b.Helper()
+
+	addr := os.Getenv("BENCH_REDIS_ADDR")
+	if addr == "" {
+		addr = os.Getenv("REDIS_ADDR")
+	}
+	if addr == "" {
+		addr = "localhost:6379"
+	}
+	rdb := redis.NewClient(&redis.Options{Addr: addr, DB: envconf.Int("BENCH_REDIS_DB", 15), DisableIdentity: true})
+	b.Cleanup(func() { rdb.Close() })
+	ctx := context.Background()
+	pingCtx, cancel := context.WithTimeout(ctx, time.Second)
+	defer cancel()
+	if err := rdb.Ping(pingCtx).Err(); err != nil {
+		b.Skipf("無法連線 Redis %s，略過: %v", addr, err)
+	}
+	if err := rdb.FlushDB(ctx).Err(); err != nil {
+		b.Fatalf("flush redis: %v", err)
+	}
+
+	content, err := os.ReadFile("../../scripts/place_bid.lua")
+	if err != nil {
+		b.Fatalf("讀取 Lua 腳本: %v", err)
+	}
+	script := redis.NewScript(string(content))
+	if err := script.Load(ctx, rdb).Err(); err != nil {
+		b.Fatalf("載入 Lua 腳本: %v", err)
+	}
+
+	db := openBenchDB(b)
+	// broadcast 留空：出價後的廣播 goroutine (延遲 100ms 再讀排行榜) 不在量測範圍內，
+	// 累積在計時迴圈中會灌水 ns/op 與 allocs/op
+	return &benchEnv{
+		svc: &Service{
+			rdb:           rdb,
+			reads:         database.NewReadRouter(rdb),
+			db:            db,
+			writes:        db,
+			bidScript:     script,
+			hub:           websocket.NewHub(),
+			rankCapFactor: rankCapFactor,
+		},
+		rdb: rdb,
+	}
+}
+
+func openBenchDB(b *testing.B) *gorm.DB {
+	b.Helper()
+	cfg := &gorm.Config{Logger: logger.Default.LogMode(logger.Silent)}
+
+	dsn := os.Getenv("BENCH_DATABASE_DSN")
+	if dsn == "" {
+		// 不連線，只量測 ORM 組 SQL 的成本
+		cfg.DryRun = true
+		cfg.DisableAutomaticPing = true
+		dsn = "host=localhost user=bench dbname=bench sslmode=disable"
+	}
+	db, err := gorm.Open(postgres.New(postgres.Config{DSN: dsn}), cfg)
+	if err != nil {
+		b.Fatalf("開啟資料庫: %v", err)
+	}
+	if !cfg.DryRun {
+		if err := db.AutoMigrate(&models.User{}); err != nil {
+			b.Fatalf("AutoMigrate: %v", err)
+		}
+		if err := database.MigrateBidLogs(db); err != nil {
+			b.Fatalf("MigrateBidLogs: %v", err)
+		}
+	}
+	return db
+}
+
+// seed 建立商品設定並預先放入 bidders 名出價者，回傳目前最高價
+func (e *benchEnv) seed(b *testing.B, bidders, k int) float64 {
+	b.Helper()
+	ctx := context.Background()
+	now := time.Now().UnixMilli()
+	highest := float64(bidders)
+
+	err := e.rdb.HSet(ctx, database.ConfigKey(benchProductID), map[string]interface{}{
+		"startTime":           now - 1000,
+		"endTime":             now + int64(time.Hour/time.Millisecond),
+		"alpha":               1.0,
+		"beta":                0.5,
+		"gamma":               0.3,
+		"k":                   k,
+		"currentHighestPrice": highest,
+	}).Err()
+	if err != nil {
+		b.Fatalf("seed config: %v", err)
+	}
+
+	const batch = 1000
+	for start := 0; start < bidders; start += batch {
+		pipe := e.rdb.Pipeline()
+		for i := start; i < start+batch && i < bidders; i++ {
+			userID := strconv.Itoa(i + 1)
+			price := float64(i + 1)
+			pipe.ZAdd(ctx, database.RankKey(benchProductID), redis.Z{Score: price, Member: userID})
+			pipe.HSet(ctx, database.BidsKey(benchProductID), userID, encodeBidDetails(price, int64(i), 1.0))
+		}
+		if _, err := pipe.Exec(ctx); err != nil {
+			b.Fatalf("seed rankings: %v", err)
+		}
+	}
+	return highest
+}
+
+// drain 等待 PlaceBid 背景的 DB 寫入與封存完成，避免影響下一組 benchmark
+func drain(b *testing.B) {
+	b.StopTimer()
+	time.Sleep(200 * time.Millisecond)
+}
+
+func BenchmarkCalculateScore(b *testing.B) {
+	s := &Service{}
+	startTime := time.Now().UnixMilli()
+	b.ReportAllocs()
+	var sink float64
+	for i := 0; i < b.N; i++ {
+		sink += s.CalculateScore(float64(1000+i), startTime, 1.0, 1.0, 0.5, 0.3)
+	}
+	_ = sink
+}
+
+func BenchmarkPlaceBid(b *testing.B) {
+	for _, bidders := range benchBidders {
+		for _, factor := range []int{0, 10} {
+			name := fmt.Sprintf("bidders=%d/cap=%d", bidders, factor)
+			b.Run(name, func(b *testing.B) {
+				env := newBenchEnv(b, factor)
+				price := env.seed(b, bidders, 50)
+				ctx := context.Background()
+
+				b.ReportAllocs()
+				b.ResetTimer()
+				for i := 0; i < b.N; i++ {
+					// 出價必須高於目前最高價，每次遞增
+					price++
+					userID := strconv.Itoa(i%bidders + 1)
+					if _, err := env.svc.PlaceBid(ctx, benchProductID, userID, price, 1.0); err != nil {
+						b.Fatalf("PlaceBid: %v", err)
+					}
+				}
+				drain(b)
+			})
+		}
+	}
+}
+
+func BenchmarkGetRawRankings(b *testing.B) {
+	for _, bidders := range benchBidders {
+		for _, k := range benchK {
+			b.Run(fmt.Sprintf("bidders=%d/k=%d", bidders, k), func(b *testing.B) {
+				env := newBenchEnv(b, 0)
+				env.seed(b, bidders, k)
+				ctx := context.Background()
+
+				b.ReportAllocs()
+				b.ResetTimer()
+				for i := 0; i < b.N; i++ {
+					items, err := env.svc.getRawRankings(ctx, env.rdb, benchProductID, k)
+					if err != nil {
+						b.Fatalf("getRawRankings: %v", err)
+					}
+					if len(items) != min(k, bidders) {
+						b.Fatalf("got %d items, want %d", len(items), min(k, bidders))
+					}
+				}
+			})
+		}
+	}
+}
+
+// BenchmarkRankingsMessage 量測 rankings_update 廣播訊息的 JSON 組裝
+func BenchmarkRankingsMessage(b *testing.B) {
+	for _, k := range benchK {
+		b.Run(fmt.Sprintf("k=%d", k), func(b *testing.B) {
+			items := make([]RankingItem, k)
+			for i := range items {
+				items[i] = RankingItem{
+					Rank:         i + 1,
+					UserID:       strconv.Itoa(i + 1),
+					DisplayName:  fmt.Sprintf("user_%d", i+1),
+					Price:        float64(10000 - i),
+					ReactionTime: int64(1000 + i),
+					Weight:       1.0,
+					Score:        float64(10000-i) + 0.1234,
+				}
+			}
+
+			b.ReportAllocs()
+			b.ResetTimer()
+			for i := 0; i < b.N; i++ {
+				message := websocket.Message{
+					Type:      "rankings_update",
+					ProductID: benchProductID,
+					Data: map[string]interface{}{
+						"rankings":            items,
+						"thresholdScore":      items[k-1].Score,
+						"currentHighestPrice": items[0].Price,
+					},
+				}
+				if _, err := json.Marshal(message); err != nil {
+					b.Fatal(err)
+				}
+			}
+		})
+	}
+}
+
+func BenchmarkBidDetailsCodec(b *testing.B) {
+	b.ReportAllocs()
+	for i := 0; i < b.N; i++ {
+		details := encodeBidDetails(float64(1000+i), int64(i), 1.25)
+		decodeBidDetails(details)
+	}
+}
@@ -0,0 +1,67 @@
+package bidding
+
+import (
+	"encoding/binary"
+	"math"
+	"strconv"
+	"strings"
+)
+
+// auction:{id}:bids 的出價詳情採固定長度二進位編碼：
+//
+//	[0]      版本號 (bidDetailsVersion)
+//	[1:9]    price        float64 (little endian)
+//	[9:13]   reactionTime uint32  毫秒 (超過約 49 天會被截斷)
+//	[13:17]  weight       uint32  定點數 (×1e6)
+//
+// 17 bytes 的 value 在 Redis 內落在 24 bytes 的 allocator bin，
+// 舊的 "%f,%d,%f" 字串通常要 32~48 bytes。
+const (
+	bidDetailsVersion = 1
+	bidDetailsSize    = 17
+
+	weightScale = 1e6
+)
+
+// encodeBidDetails 將出價詳情編碼成固定長度的二進位字串
+func encodeBidDetails(price float64, reactionTime int64, weight float64) string {
+	if reactionTime < 0 {
+		reactionTime = 0
+	}
+	if reactionTime > math.MaxUint32 {
+		reactionTime = math.MaxUint32
+	}
+	if weight < 0 {
+		weight = 0
+	}
+	if weight > math.MaxUint32/weightScale {
+		weight = math.MaxUint32 / weightScale
+	}
+
+	var buf [bidDetailsSize]byte
+	buf[0] = bidDetailsVersion
+	binary.LittleEndian.PutUint64(buf[1:9], math.Float64bits(price))
+	binary.LittleEndian.PutUint32(buf[9:13], uint32(reactionTime))
+	binary.LittleEndian.PutUint32(buf[13:17], uint32(math.Round(weight*weightScale)))
+	return string(buf[:])
+}
+
+// decodeBidDetails 解碼出價詳情，同時相容舊版逗號分隔的字串格式
+func decodeBidDetails(s string) (price float64, reactionTime int64, weight float64) {
+	if len(s) == bidDetailsSize && s[0] == bidDetailsVersion {
+		b := []byte(s)
+		price = math.Float64frombits(binary.LittleEndian.Uint64(b[1:9]))
+		reactionTime = int64(binary.LittleEndian.Uint32(b[9:13]))
+		weight = float64(binary.LittleEndian.Uint32(b[13:17])) / weightScale
+		return
+	}
+
+	// 舊格式："price,reactionTime,weight"
+	parts := strings.Split(s, ",")
+	if len(parts) >= 3 {
+		price, _ = strconv.ParseFloat(parts[0], 64)
+		reactionTime, _ = strconv.ParseInt(parts[1], 10, 64)
+		weight, _ = strconv.ParseFloat(parts[2], 64)
+	}
+	return
+}
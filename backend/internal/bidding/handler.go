@@ -5,6 +5,8 @@ import (
 	"net/http"
 	"time"
 
+	"rtb-backend/internal/timing"
+
 	"github.com/gin-gonic/gin"
 )
 
@@ -49,7 +51,7 @@ func (h *Handler) PlaceBid(c *gin.Context) {
 	now := time.Now().UnixMilli()
 	bidID := fmt.Sprintf("bid_%d_%s", now, userID)
 
-	c.JSON(http.StatusOK, gin.H{
+	timing.JSON(c, http.StatusOK, gin.H{
 		"message": "出價成功",
 		"bid": BidResponse{
 			ID:        bidID,
@@ -71,7 +73,7 @@ func (h *Handler) GetRankings(c *gin.Context) {
 		return
 	}
 
-	c.JSON(http.StatusOK, resp)
+	timing.JSON(c, http.StatusOK, resp)
 }
 
 func (h *Handler) GetResults(c *gin.Context) {
@@ -2,10 +2,13 @@ package bidding
 
 import (
 	"context"
-	"fmt"
+	"rtb-backend/internal/database"
 	"rtb-backend/internal/models"
+	"rtb-backend/internal/timing"
 	"strconv"
-	"strings"
+	"time"
+
+	"github.com/redis/go-redis/v9"
 )
 
 // 輔助函式：從 Map 讀取 float64
@@ -38,13 +41,15 @@ func getInt(m map[string]string, key string, defaultVal int) int {
 	return defaultVal
 }
 
-// 輔助函式：只負責去 Redis 撈資料並組裝成 RankingItem
-func (s *Service) getRawRankings(ctx context.Context, productID string, k int) ([]RankingItem, error) {
-	rankKey := fmt.Sprintf("auction:%s:rank", productID)
-	bidsKey := fmt.Sprintf("auction:%s:bids", productID)
+// 輔助函式：只負責去 Redis 撈資料並組裝成 RankingItem (rdb 為 primary 或 replica)
+func (s *Service) getRawRankings(ctx context.Context, rdb redis.UniversalClient, productID string, k int) ([]RankingItem, error) {
+	rankKey := database.RankKey(productID)
+	bidsKey := database.BidsKey(productID)
 
 	// 撈取前 K 名
-	zlist, err := s.rdb.ZRevRangeWithScores(ctx, rankKey, 0, int64(k-1)).Result()
+	redisStart := time.Now()
+	zlist, err := rdb.ZRevRangeWithScores(ctx, rankKey, 0, int64(k-1)).Result()
+	timing.Since(ctx, "redis", redisStart)
 	if err != nil {
 		return nil, err
 	}
@@ -55,24 +60,20 @@ func (s *Service) getRawRankings(ctx context.Context, productID string, k int) (
 		score := z.Score
 
 		// 讀取詳細資訊
-		detailsStr, _ := s.rdb.HGet(ctx, bidsKey, userID).Result()
-		var price, weight float64
-		var rTime int64
-		
-		parts := strings.Split(detailsStr, ",")
-		if len(parts) >= 3 {
-			price, _ = strconv.ParseFloat(parts[0], 64)
-			rTime, _ = strconv.ParseInt(parts[1], 10, 64)
-			weight, _ = strconv.ParseFloat(parts[2], 64)
-		}
+		redisStart := time.Now()
+		detailsStr, _ := rdb.HGet(ctx, bidsKey, userID).Result()
+		timing.Since(ctx, "redis", redisStart)
+		price, rTime, weight := decodeBidDetails(detailsStr)
 
 		// 從資料庫查詢使用者名稱
 		var user models.User
 		display := "User_" + userID // 預設值
 		if userIDInt, err := strconv.ParseUint(userID, 10, 32); err == nil {
+			dbStart := time.Now()
 			if err := s.db.First(&user, uint(userIDInt)).Error; err == nil {
 				display = user.Username
 			}
+			timing.Since(ctx, "db", dbStart)
 		}
 
 		items = append(items, RankingItem{
@@ -86,4 +87,4 @@ func (s *Service) getRawRankings(ctx context.Context, productID string, k int) (
 		})
 	}
 	return items, nil
-}
\ No newline at end of file
+}
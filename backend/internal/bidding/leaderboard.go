@@ -0,0 +1,66 @@
+package bidding
+
+import (
+	"log"
+	"rtb-backend/internal/database"
+	"rtb-backend/internal/envconf"
+	"strconv"
+	"time"
+
+	"gorm.io/gorm/clause"
+)
+
+// rankCapFactorFromEnv 讀取 RANK_CAP_FACTOR
+// 排行榜最多保留 K × factor 名，超出的低分成員會被移出 Redis 並封存到 Postgres；
+// 未設定或 <= 0 代表不限制 (保留全部出價者)
+func rankCapFactorFromEnv() int {
+	if factor := envconf.Int("RANK_CAP_FACTOR", 0); factor > 0 {
+		return factor
+	}
+	return 0
+}
+
+// rankCap 回傳該商品排行榜的成員上限，0 代表不限制
+func (s *Service) rankCap(k int) int {
+	if s.rankCapFactor <= 0 || k <= 0 {
+		return 0
+	}
+	return k * s.rankCapFactor
+}
+
+// archiveTrimmed 將 Lua 腳本移出排行榜的成員寫入 ranking_archives
+// trimmed 格式為 [userID, score, details, userID, score, details, ...]
+func (s *Service) archiveTrimmed(productID string, trimmed []interface{}) {
+	now := time.Now()
+	rows := make([]database.RankingArchive, 0, len(trimmed)/3)
+	for i := 0; i+2 < len(trimmed); i += 3 {
+		userID, _ := trimmed[i].(string)
+		scoreStr, _ := trimmed[i+1].(string)
+		details, _ := trimmed[i+2].(string)
+
+		score, _ := strconv.ParseFloat(scoreStr, 64)
+		price, reactionTime, weight := decodeBidDetails(details)
+		rows = append(rows, database.RankingArchive{
+			ProductID:    productID,
+			UserID:       userID,
+			Score:        score,
+			Price:        price,
+			ReactionTime: reactionTime,
+			Weight:       weight,
+			Reason:       database.ArchiveReasonTrimmed,
+			ArchivedAt:   now,
+		})
+	}
+	if len(rows) == 0 {
+		return
+	}
+
+	// 同一使用者可能再次出價後又被移出，以最新一筆覆蓋
+	err := s.writes.Clauses(clause.OnConflict{
+		Columns:   []clause.Column{{Name: "product_id"}, {Name: "user_id"}},
+		UpdateAll: true,
+	}).Create(&rows).Error
+	if err != nil {
+		log.Printf("封存排行榜成員失敗: productID=%s, count=%d, err=%v", productID, len(rows), err)
+	}
+}
@@ -0,0 +1,79 @@
+package bidding
+
+import (
+	"context"
+	"errors"
+	"log"
+	"log/slog"
+	"sync/atomic"
+	"time"
+
+	"rtb-backend/internal/database"
+	"rtb-backend/internal/envconf"
+	"rtb-backend/internal/metrics"
+	"rtb-backend/internal/timing"
+)
+
+// 出價流程各階段多在微秒等級，bucket 從 10µs 開始
+var stageBuckets = []float64{0.00001, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1}
+
+var (
+	bidStageDuration = metrics.NewHistogramVec("bid_stage_duration_seconds",
+		"出價流程各階段耗時", stageBuckets, "stage")
+	stageConfigRead = bidStageDuration.WithLabelValues("config_read")
+	stageScore      = bidStageDuration.WithLabelValues("score")
+	stageLuaEval    = bidStageDuration.WithLabelValues("lua_eval")
+	stageDBEnqueue  = bidStageDuration.WithLabelValues("db_enqueue")
+	stageDBWrite    = bidStageDuration.WithLabelValues("db_write")
+	stageBroadcast  = bidStageDuration.WithLabelValues("broadcast")
+
+	bidsTotal = metrics.NewCounterVec("bids_total", "出價結果", "result")
+
+	// 出價已被 Redis 接受，但 bid_logs 寫入失敗 (連線池逾時、連線錯誤…)
+	bidLogWriteErrors = metrics.NewCounterVec("bid_log_write_errors_total", "bid_logs 寫入失敗次數", "reason")
+
+	// route 為 rankings 或 broadcast_rankings
+	rankingAssemblyDuration = metrics.NewHistogramVec("ranking_assembly_duration_seconds",
+		"排行榜組裝耗時 (Redis 讀取 + 使用者名稱查詢)", stageBuckets, "route")
+)
+
+// observeStage 記錄階段耗時到直方圖，並寫入請求的 Server-Timing
+func observeStage(ctx context.Context, h *metrics.Histogram, stage string, start time.Time) {
+	d := time.Since(start)
+	h.Observe(d.Seconds())
+	timing.FromContext(ctx).Add(stage, d)
+}
+
+// 出價日誌抽樣：每 BID_LOG_SAMPLE_EVERY 筆成功出價記錄一筆，0 代表關閉
+var (
+	bidLogSampleEvery = uint64(envconf.Int("BID_LOG_SAMPLE_EVERY", 1000))
+	bidLogCounter     atomic.Uint64
+)
+
+func logBidSampled(productID, userID string, price, score float64, elapsed time.Duration) {
+	if bidLogSampleEvery == 0 || bidLogCounter.Add(1)%bidLogSampleEvery != 0 {
+		return
+	}
+	slog.Info("bid",
+		"product_id", productID,
+		"user_id", userID,
+		"price", price,
+		"score", score,
+		"elapsed_ms", float64(elapsed.Microseconds())/1000,
+		"sample_every", bidLogSampleEvery,
+	)
+}
+
+// logBidLogError 記錄 bid_logs 寫入失敗；尖峰時可能大量發生，只輸出第 1 筆與之後每 100 筆
+var bidLogErrorCount atomic.Uint64
+
+func logBidLogError(productID, userID string, err error) {
+	reason := "error"
+	if errors.Is(err, database.ErrPoolTimeout) {
+		reason = "pool_timeout"
+	}
+	bidLogWriteErrors.WithLabelValues(reason).Inc()
+	if n := bidLogErrorCount.Add(1); n == 1 || n%100 == 0 {
+		log.Printf("寫入 bid_logs 失敗 (累計 %d 筆，最近一筆 product=%s user=%s): %v", n, productID, userID, err)
+	}
+}
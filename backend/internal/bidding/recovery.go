@@ -0,0 +1,216 @@
+package bidding
+
+import (
+	"context"
+	"fmt"
+	"log"
+	"rtb-backend/internal/database"
+	"rtb-backend/internal/envconf"
+	"rtb-backend/internal/models"
+	"time"
+
+	"github.com/redis/go-redis/v9"
+	"gorm.io/gorm"
+)
+
+// Rebuilder 從 Postgres 重建 Redis 的競標狀態 (config / rank / bids)
+// 用於 Redis 被清空或主從切換後遺失資料的情況：
+// 以 products 重建 config，以 latest_bids (每位使用者最新的一筆出價) 重建 rank 與 bids。
+type Rebuilder struct {
+	rdb       redis.UniversalClient
+	db        *gorm.DB
+	batchSize int // 每個 pipeline 寫入的出價筆數
+}
+
+// RebuildStats 重建結果
+type RebuildStats struct {
+	Products int
+	Rows     int64
+	Elapsed  time.Duration
+}
+
+// RowsPerSecond 重建速率
+func (st RebuildStats) RowsPerSecond() float64 {
+	if st.Elapsed <= 0 {
+		return 0
+	}
+	return float64(st.Rows) / st.Elapsed.Seconds()
+}
+
+func (st RebuildStats) String() string {
+	return fmt.Sprintf("products=%d, rows=%d, elapsed=%s, rate=%.0f rows/s",
+		st.Products, st.Rows, st.Elapsed.Round(time.Millisecond), st.RowsPerSecond())
+}
+
+func NewRebuilder(rdb redis.UniversalClient, db *gorm.DB) *Rebuilder {
+	return &Rebuilder{rdb: rdb, db: db, batchSize: envconf.Int("REBUILD_BATCH_SIZE", 5000)}
+}
+
+// RebuildMissing 只重建 Redis config 已不存在的商品 (啟動時自動執行)
+func (r *Rebuilder) RebuildMissing(ctx context.Context) (RebuildStats, error) {
+	products, err := r.candidateProducts(nil)
+	if err != nil {
+		return RebuildStats{}, err
+	}
+
+	pipe := r.rdb.Pipeline()
+	exists := make([]*redis.IntCmd, len(products))
+	for i, p := range products {
+		exists[i] = pipe.Exists(ctx, database.ConfigKey(p.ID))
+	}
+	if _, err := pipe.Exec(ctx); err != nil {
+		return RebuildStats{}, err
+	}
+
+	missing := []models.Product{}
+	for i, p := range products {
+		if exists[i].Val() == 0 {
+			missing = append(missing, p)
+		}
+	}
+	return r.rebuild(ctx, missing)
+}
+
+// Rebuild 強制重建指定商品，productIDs 為空時重建所有尚未封存的商品
+func (r *Rebuilder) Rebuild(ctx context.Context, productIDs []string) (RebuildStats, error) {
+	products, err := r.candidateProducts(productIDs)
+	if err != nil {
+		return RebuildStats{}, err
+	}
+	return r.rebuild(ctx, products)
+}
+
+// candidateProducts 尚未封存完成的商品 (進行中、未開始、已結束但還沒封存)
+func (r *Rebuilder) candidateProducts(productIDs []string) ([]models.Product, error) {
+	var products []models.Product
+	q := r.db.Model(&models.Product{}).
+		Joins("LEFT JOIN archive_jobs ON archive_jobs.product_id = products.id").
+		Where("archive_jobs.status IS DISTINCT FROM ?", database.ArchiveJobDone)
+	if len(productIDs) > 0 {
+		q = q.Where("products.id IN ?", productIDs)
+	}
+	err := q.Select("products.*").Find(&products).Error
+	return products, err
+}
+
+func (r *Rebuilder) rebuild(ctx context.Context, products []models.Product) (RebuildStats, error) {
+	start := time.Now()
+	stats := RebuildStats{Products: len(products)}
+	if len(products) == 0 {
+		return stats, nil
+	}
+
+	byID := make(map[string]*models.Product, len(products))
+	ids := make([]string, len(products))
+	for i := range products {
+		byID[products[i].ID] = &products[i]
+		ids[i] = products[i].ID
+	}
+
+	// 1. 清除舊的 rank / bids，寫入 config
+	pipe := r.rdb.Pipeline()
+	for _, p := range products {
+		pipe.Unlink(ctx, database.RankKey(p.ID), database.BidsKey(p.ID))
+		config := p.AuctionConfig()
+		config["currentHighestPrice"] = p.BasePrice
+		pipe.HSet(ctx, database.ConfigKey(p.ID), config)
+	}
+	if _, err := pipe.Exec(ctx); err != nil {
+		return stats, fmt.Errorf("寫入商品設定失敗: %v", err)
+	}
+
+	// 2. 串流讀取每位使用者最新的一筆出價 (依商品排序，方便合併成多成員的 ZADD / HSET)
+	rows, err := r.db.Raw(`
+		SELECT lb.product_id, lb.user_id, lb.price, lb.score, lb.created_at, COALESCE(u.weight, 1.0)
+		FROM latest_bids lb
+		LEFT JOIN users u ON u.id = lb.user_id
+		WHERE lb.product_id IN ?
+		ORDER BY lb.product_id`, ids).Rows()
+	if err != nil {
+		return stats, fmt.Errorf("讀取出價紀錄失敗: %v", err)
+	}
+	defer rows.Close()
+
+	highest := make(map[string]float64, len(products))
+	batch := newRebuildBatch()
+	flush := func() error {
+		if batch.size == 0 {
+			return nil
+		}
+		pipe := r.rdb.Pipeline()
+		for productID, members := range batch.rank {
+			pipe.ZAdd(ctx, database.RankKey(productID), members...)
+			pipe.HSet(ctx, database.BidsKey(productID), batch.bids[productID])
+		}
+		_, err := pipe.Exec(ctx)
+		batch = newRebuildBatch()
+		return err
+	}
+
+	for rows.Next() {
+		var productID, userID string
+		var price, score, weight float64
+		var createdAt time.Time
+		if err := rows.Scan(&productID, &userID, &price, &score, &createdAt, &weight); err != nil {
+			return stats, err
+		}
+
+		p := byID[productID]
+		reactionTime := createdAt.UnixMilli() - p.StartTime
+		batch.add(productID, userID, score, encodeBidDetails(price, reactionTime, weight))
+		if price > highest[productID] {
+			highest[productID] = price
+		}
+		stats.Rows++
+
+		if batch.size >= r.batchSize {
+			if err := flush(); err != nil {
+				return stats, fmt.Errorf("寫入排行榜失敗: %v", err)
+			}
+		}
+	}
+	if err := rows.Err(); err != nil {
+		return stats, err
+	}
+	if err := flush(); err != nil {
+		return stats, fmt.Errorf("寫入排行榜失敗: %v", err)
+	}
+
+	// 3. 還原最高價
+	pipe = r.rdb.Pipeline()
+	for productID, price := range highest {
+		if price > byID[productID].BasePrice {
+			pipe.HSet(ctx, database.ConfigKey(productID), "currentHighestPrice", price)
+		}
+	}
+	if _, err := pipe.Exec(ctx); err != nil {
+		return stats, err
+	}
+
+	stats.Elapsed = time.Since(start)
+	log.Printf("Redis 競標狀態重建完成: %s", stats)
+	return stats, nil
+}
+
+// rebuildBatch 暫存一個 pipeline 的出價，依商品分組
+type rebuildBatch struct {
+	rank map[string][]redis.Z
+	bids map[string]map[string]interface{}
+	size int
+}
+
+func newRebuildBatch() *rebuildBatch {
+	return &rebuildBatch{
+		rank: make(map[string][]redis.Z),
+		bids: make(map[string]map[string]interface{}),
+	}
+}
+
+func (b *rebuildBatch) add(productID, userID string, score float64, details string) {
+	b.rank[productID] = append(b.rank[productID], redis.Z{Score: score, Member: userID})
+	if b.bids[productID] == nil {
+		b.bids[productID] = make(map[string]interface{})
+	}
+	b.bids[productID][userID] = details
+	b.size++
+}
@@ -8,6 +8,7 @@ import (
 	"os"
 	"rtb-backend/internal/database"
 	"rtb-backend/internal/models"
+	"rtb-backend/internal/timing"
 	"rtb-backend/internal/websocket"
 	"strconv"
 	"time"
@@ -17,23 +18,30 @@ import (
 )
 
 type Service struct {
-	rdb       *redis.Client
-	db        *gorm.DB
-	bidScript string
-	hub       *websocket.Hub
+	rdb           redis.UniversalClient
+	reads         *database.ReadRouter // 排行榜、最高價等讀取 (可導向 replica)
+	db            *gorm.DB             // 一般查詢 (使用者名稱、商品、封存結果)
+	writes        *gorm.DB             // 高頻寫入 (bid_logs、排行榜封存)，與查詢分開的連線池
+	bidScript     *redis.Script
+	hub           *websocket.Hub
+	rankCapFactor int
+	broadcast     func(productID, userID string, price, score float64) // 出價成功後的廣播，nil 時不廣播 (benchmark 使用)
 }
 
-func NewService(rdb *redis.Client, db *gorm.DB, hub *websocket.Hub) *Service {
+func NewService(rdb redis.UniversalClient, reads *database.ReadRouter, db, writeDB *gorm.DB, hub *websocket.Hub) *Service {
 	// 讀取 Lua 腳本
 	content, err := os.ReadFile("scripts/place_bid.lua")
 	if err != nil {
 		panic("無法讀取 Lua 腳本: " + err.Error())
 	}
-	sha, err := rdb.ScriptLoad(context.Background(), string(content)).Result()
-	if err != nil {
+	// Cluster 模式下預先載入到每個 master；之後遇到 NOSCRIPT (例如主從切換) 會自動改用 EVAL 補載
+	script := redis.NewScript(string(content))
+	if err := database.LoadScript(context.Background(), rdb, script); err != nil {
 		panic("Lua 腳本載入失敗: " + err.Error())
 	}
-	return &Service{rdb: rdb, db: db, bidScript: sha, hub: hub}
+	s := &Service{rdb: rdb, reads: reads, db: db, writes: writeDB, bidScript: script, hub: hub, rankCapFactor: rankCapFactorFromEnv()}
+	s.broadcast = s.broadcastBid
+	return s
 }
 
 // 修改 CalculateScore 讓它接收動態參數
@@ -51,13 +59,20 @@ func (s *Service) CalculateScore(price float64, startTime int64, weight, alpha,
 
 // PlaceBid
 func (s *Service) PlaceBid(ctx context.Context, productID string, userID string, price float64, userWeight float64) (float64, error) {
+	// 出價與出價前的設定檢查一律走 primary
+	ctx = database.WithRoute(ctx, "bid")
+	bidStart := time.Now()
+
 	// 1. 從 Redis 讀取商品設定 (Config)
-	configKey := fmt.Sprintf("auction:%s:config", productID)
+	configKey := database.ConfigKey(productID)
 	config, err := s.rdb.HGetAll(ctx, configKey).Result()
+	observeStage(ctx, stageConfigRead, "config_read", bidStart)
 	if err != nil {
+		bidsTotal.WithLabelValues("error").Inc()
 		return 0, fmt.Errorf("讀取商品設定失敗: %v", err)
 	}
 	if len(config) == 0 {
+		bidsTotal.WithLabelValues("not_found").Inc()
 		return 0, fmt.Errorf("商品不存在或未設定")
 	}
 
@@ -68,77 +83,131 @@ func (s *Service) PlaceBid(ctx context.Context, productID string, userID string,
 	beta := getFloat(config, "beta", 0.5)
 	gamma := getFloat(config, "gamma", 0.3)
 	currentHighestPrice := getFloat(config, "currentHighestPrice", 0)
+	k := getInt(config, "k", 5)
 
 	now := time.Now().UnixMilli()
 	
 	// 檢查基本時間 (雖然 Lua 也會檢查，但這裡可以先擋掉不必要的運算)
 	if now < startTime {
+		bidsTotal.WithLabelValues("not_started").Inc()
 		return 0, fmt.Errorf("活動尚未開始")
 	}
 
 	// 檢查出價必須大於當前最高價
 	if price <= currentHighestPrice {
+		bidsTotal.WithLabelValues("too_low").Inc()
 		return 0, fmt.Errorf("出價必須高於目前最高出價 %.2f", currentHighestPrice)
 	}
 
 	// 3. 計算分數 (帶入 Redis 讀到的參數)
+	scoreStart := time.Now()
 	score := s.CalculateScore(price, startTime, userWeight, alpha, beta, gamma)
 	reactionTime := now - startTime
+	observeStage(ctx, stageScore, "score", scoreStart)
 
 	// Redis Keys
-	rankKey := fmt.Sprintf("auction:%s:rank", productID)
-	bidsKey := fmt.Sprintf("auction:%s:bids", productID)
+	rankKey := database.RankKey(productID)
+	bidsKey := database.BidsKey(productID)
 
-	// 組合詳細資訊字串
-	details := fmt.Sprintf("%f,%d,%f", price, reactionTime, userWeight)
+	// 組合詳細資訊 (固定長度二進位編碼)
+	details := encodeBidDetails(price, reactionTime, userWeight)
 
 	// 4. 執行 Lua
-	fmt.Printf("[Debug] 正在寫入 Redis Key: %s, User: %s, Score: %f\n", rankKey, userID, score)
-	res, err := s.rdb.EvalSha(ctx, s.bidScript, 
-        []string{rankKey, bidsKey, configKey}, // KEYS[1], [2], [3]
-        userID, score, now, endTime, details, price, // ARGV[1] ~ [6]
-    ).Int()
+	luaStart := time.Now()
+	res, err := s.bidScript.Run(ctx, s.rdb,
+        []string{rankKey, bidsKey, configKey}, // KEYS[1], [2], [3] (同一個 hash slot)
+        userID, score, now, endTime, details, price, s.rankCap(k), // ARGV[1] ~ [7]
+    ).Slice()
+	observeStage(ctx, stageLuaEval, "lua_eval", luaStart)
 	if err != nil {
+		bidsTotal.WithLabelValues("error").Inc()
 		return 0, fmt.Errorf("Redis 執行錯誤: %v", err)
 	}
-	if res == -1 {
+	if status, _ := res[0].(int64); status == -1 {
+		bidsTotal.WithLabelValues("ended").Inc()
 		return 0, fmt.Errorf("活動已結束")
 	}
 
-	// 5. 異步寫入 DB
-	go func() {
-		s.db.Create(&database.BidLog{
-			UserID: userID, ProductID: productID, Price: price, Score: score, CreatedAt: time.Now(),
-		})
-	}()
+	// 被移出排行榜的低分成員，異步封存到 DB
+	if len(res) > 1 {
+		go s.archiveTrimmed(productID, res[1:])
+	}
 
-	// 6. 广播出价通知和排行榜更新
+	// 5. 異步寫入 DB (寫入連線池滿載時最多等待 DB_POOL_WAIT_TIMEOUT)
+	enqueueStart := time.Now()
 	go func() {
-		s.broadcastBidNotification(productID, userID, price, score)
-		// 延迟一点再更新排行榜，确保 Redis 数据已更新
-		time.Sleep(100 * time.Millisecond)
-		s.BroadcastRankingsUpdate(context.Background(), productID)
-		
-		// 广播商品更新（更新最高价），让商品列表页面也能实时更新
-		configKey := fmt.Sprintf("auction:%s:config", productID)
-		currentHighestPrice, _ := s.rdb.HGet(context.Background(), configKey, "currentHighestPrice").Float64()
-		if currentHighestPrice > 0 {
-			s.BroadcastProductUpdate(productID, "", currentHighestPrice)
+		uid, err := strconv.ParseUint(userID, 10, 64)
+		if err != nil {
+			logBidLogError(productID, userID, err)
+			return
+		}
+		writeStart := time.Now()
+		err = s.writes.Create(&database.BidLog{
+			UserID: uid, ProductID: productID, Price: price, Score: score, CreatedAt: time.Now(),
+		}).Error
+		stageDBWrite.ObserveSince(writeStart)
+		if err != nil {
+			logBidLogError(productID, userID, err)
 		}
 	}()
+	observeStage(ctx, stageDBEnqueue, "db_enqueue", enqueueStart)
+
+	bidsTotal.WithLabelValues("ok").Inc()
+	logBidSampled(productID, userID, price, score, time.Since(bidStart))
+
+	// 6. 广播出价通知和排行榜更新
+	if s.broadcast != nil {
+		go s.broadcast(productID, userID, price, score)
+	}
 
 	return score, nil
 }
 
-// GetRankings: 根據 K 動態回傳
+// broadcastBid 广播出价通知、排行榜与商品最高价 (PlaceBid 成功后异步执行)
+func (s *Service) broadcastBid(productID, userID string, price, score float64) {
+	broadcastStart := time.Now()
+	s.broadcastBidNotification(productID, userID, price, score)
+	stageBroadcast.ObserveSince(broadcastStart)
+	// 延迟一点再更新排行榜，确保 Redis 数据已更新
+	time.Sleep(100 * time.Millisecond)
+	s.BroadcastRankingsUpdate(context.Background(), productID)
+
+	// 广播商品更新（更新最高价），让商品列表页面也能实时更新
+	configKey := database.ConfigKey(productID)
+	readCtx := database.WithRoute(context.Background(), "broadcast_product")
+	currentHighestPrice, _ := s.reads.Reader().HGet(readCtx, configKey, "currentHighestPrice").Float64()
+	if currentHighestPrice > 0 {
+		s.BroadcastProductUpdate(productID, "", currentHighestPrice)
+	}
+}
+
+// GetRankings: 根據 K 動態回傳 (讀取可導向 replica，資料最多落後 REDIS_REPLICA_MAX_LAG)
 func (s *Service) GetRankings(ctx context.Context, productID string) (*RankingResponse, error) {
+	if database.Route(ctx) == "" {
+		ctx = database.WithRoute(ctx, "rankings")
+	}
+	defer rankingAssemblyDuration.WithLabelValues(database.Route(ctx)).ObserveSince(time.Now())
+	rdb := s.reads.Reader()
+
 	// 1. 讀取 Config (K, HighestPrice)
-	configKey := fmt.Sprintf("auction:%s:config", productID)
-	vals, err := s.rdb.HMGet(ctx, configKey, "k", "currentHighestPrice").Result()
+	configKey := database.ConfigKey(productID)
+	redisStart := time.Now()
+	vals, err := rdb.HMGet(ctx, configKey, "k", "currentHighestPrice").Result()
+	timing.Since(ctx, "redis", redisStart)
 	if err != nil {
 		return nil, err
 	}
 
+	// Config 不存在：可能已被封存工作清除，改從 Postgres 讀取最終排行榜
+	if vals[0] == nil {
+		dbStart := time.Now()
+		resp, ok := s.archivedRankings(productID)
+		timing.Since(ctx, "db", dbStart)
+		if ok {
+			return resp, nil
+		}
+	}
+
 	k := 5
 	if len(vals) > 0 && vals[0] != nil {
 		if valStr, ok := vals[0].(string); ok {
@@ -156,7 +225,7 @@ func (s *Service) GetRankings(ctx context.Context, productID string) (*RankingRe
 	}
 
 	// 2. 呼叫共用邏輯
-	items, err := s.getRawRankings(ctx, productID, k)
+	items, err := s.getRawRankings(ctx, rdb, productID, k)
 	if err != nil {
 		return nil, err
 	}
@@ -179,12 +248,19 @@ func (s *Service) GetRankings(ctx context.Context, productID string) (*RankingRe
 // GetResults: 取得最終結果
 func (s *Service) GetResults(ctx context.Context, productID string) ([]ResultItem, error) {
 	// 1. 檢查狀態（先從 Redis 讀取 endTime 來判斷是否應該結束）
-	configKey := fmt.Sprintf("auction:%s:config", productID)
+	configKey := database.ConfigKey(productID)
 	vals, err := s.rdb.HMGet(ctx, configKey, "status", "k", "endTime").Result()
 	if err != nil {
 		return nil, err
 	}
 
+	// Config 不存在：可能已被封存工作清除，改從 Postgres 讀取最終結果
+	if vals[2] == nil {
+		if resp, ok := s.archivedRankings(productID); ok {
+			return toResultItems(resp.Rankings), nil
+		}
+	}
+
 	status := "not_started"
 	if len(vals) > 0 && vals[0] != nil {
 		status = vals[0].(string)
@@ -225,13 +301,18 @@ func (s *Service) GetResults(ctx context.Context, productID string) ([]ResultIte
 		}
 	}
 
-	// 2. 呼叫共用邏輯
-	rankingItems, err := s.getRawRankings(ctx, productID, k)
+	// 2. 呼叫共用邏輯 (最終結果讀 primary)
+	rankingItems, err := s.getRawRankings(ctx, s.rdb, productID, k)
 	if err != nil {
 		return nil, err
 	}
 
 	// 3. 轉換型別 (RankingItem -> ResultItem)
+	return toResultItems(rankingItems), nil
+}
+
+// toResultItems 將排行榜項目轉為最終結果
+func toResultItems(rankingItems []RankingItem) []ResultItem {
 	results := []ResultItem{}
 	for _, item := range rankingItems {
 		results = append(results, ResultItem{
@@ -243,8 +324,7 @@ func (s *Service) GetResults(ctx context.Context, productID string) ([]ResultIte
 			IsWinner:    true,       // 這裡的邏輯是前 K 名就是贏家
 		})
 	}
-
-	return results, nil
+	return results
 }
 
 // broadcastBidNotification 广播出价通知
@@ -265,14 +345,15 @@ func (s *Service) broadcastBidNotification(productID, userID string, price, scor
 
 // BroadcastRankingsUpdate 广播排行榜更新
 func (s *Service) BroadcastRankingsUpdate(ctx context.Context, productID string) {
+	ctx = database.WithRoute(ctx, "broadcast_rankings")
 	rankings, err := s.GetRankings(ctx, productID)
 	if err != nil {
 		return
 	}
 
 	// 获取当前最高价
-	configKey := fmt.Sprintf("auction:%s:config", productID)
-	currentHighestPrice, _ := s.rdb.HGet(ctx, configKey, "currentHighestPrice").Float64()
+	configKey := database.ConfigKey(productID)
+	currentHighestPrice, _ := s.reads.Reader().HGet(ctx, configKey, "currentHighestPrice").Float64()
 
 	message := websocket.Message{
 		Type:      "rankings_update",
@@ -0,0 +1,201 @@
+package database
+
+import (
+	"fmt"
+	"log"
+	"time"
+
+	"rtb-backend/internal/envconf"
+
+	"gorm.io/gorm"
+)
+
+// BidLog 對應資料庫中的 bid_logs 資料表 (依 product_id hash 分區，schema 由 MigrateBidLogs 建立)
+type BidLog struct {
+	ID        uint64 `gorm:"primaryKey"`
+	UserID    uint64 // 對應 users.id
+	ProductID string
+	Price     float64
+	Score     float64
+	CreatedAt time.Time
+}
+
+// 多個後端實例同時啟動時，只讓一個執行 bid_logs 遷移
+const bidLogMigrationLock = 0x6269645f6c6f67 // "bid_log"
+
+// MigrateBidLogs 建立 (或從舊版單表遷移成) 分區的 bid_logs 與 latest_bids
+//
+//	bid_logs     依 product_id hash 分成 BID_LOG_PARTITIONS 個分區 (預設 16)：
+//	             查詢都帶 product_id，只會掃一個分區；各分區的索引較小，高寫入量時較不易被擠出快取
+//	             索引 (product_id, score DESC) 供活動結束後的排名查詢，(user_id) 供使用者出價紀錄
+//	latest_bids  每位使用者在每個商品最新的一筆出價，由 bid_logs 的 AFTER INSERT trigger 維護，
+//	             與 Redis 排行榜同樣以 (product_id, user_id) 為單位，重建與排名查詢不必再掃全部出價
+//
+// 舊版的 bid_logs (user_id 為字串、未分區) 會改名為 bid_logs_legacy，資料轉入新表後保留，確認後可自行 DROP
+func MigrateBidLogs(db *gorm.DB) error {
+	return db.Transaction(func(tx *gorm.DB) error {
+		if err := tx.Exec("SELECT pg_advisory_xact_lock(?)", bidLogMigrationLock).Error; err != nil {
+			return err
+		}
+
+		var kind string
+		if err := tx.Raw("SELECT COALESCE((SELECT relkind::text FROM pg_class WHERE oid = to_regclass('bid_logs')), '')").
+			Scan(&kind).Error; err != nil {
+			return err
+		}
+		switch kind {
+		case "p": // 已是分區表
+		case "r":
+			if err := migrateLegacyBidLogs(tx); err != nil {
+				return fmt.Errorf("遷移舊版 bid_logs: %w", err)
+			}
+		case "":
+			if err := createBidLogs(tx); err != nil {
+				return err
+			}
+		default:
+			return fmt.Errorf("bid_logs 的 relkind %q 無法遷移", kind)
+		}
+
+		return ensureLatestBids(tx)
+	})
+}
+
+func createBidLogs(tx *gorm.DB) error {
+	partitions := envconf.Int("BID_LOG_PARTITIONS", 16)
+	if partitions < 1 {
+		partitions = 1
+	}
+
+	stmts := []string{`
+		CREATE TABLE bid_logs (
+			id         bigserial,
+			user_id    bigint NOT NULL,
+			product_id varchar(64) NOT NULL,
+			price      double precision NOT NULL,
+			score      double precision NOT NULL,
+			created_at timestamptz NOT NULL DEFAULT now(),
+			PRIMARY KEY (product_id, id)
+		) PARTITION BY HASH (product_id)`,
+	}
+	for i := 0; i < partitions; i++ {
+		stmts = append(stmts, fmt.Sprintf(
+			"CREATE TABLE bid_logs_p%02d PARTITION OF bid_logs FOR VALUES WITH (MODULUS %d, REMAINDER %d)", i, partitions, i))
+	}
+	stmts = append(stmts,
+		"CREATE INDEX idx_bid_logs_product_score ON bid_logs (product_id, score DESC)",
+		"CREATE INDEX idx_bid_logs_user ON bid_logs (user_id)",
+	)
+	if err := execAll(tx, stmts); err != nil {
+		return err
+	}
+	log.Printf("已建立分區 bid_logs (%d 個 hash 分區)", partitions)
+	return nil
+}
+
+// migrateLegacyBidLogs 把舊版單表改名後轉入分區表；user_id 不是數字的資料列無法對應 users.id，略過
+func migrateLegacyBidLogs(tx *gorm.DB) error {
+	start := time.Now()
+	err := execAll(tx, []string{
+		"ALTER TABLE bid_logs RENAME TO bid_logs_legacy",
+		"ALTER INDEX IF EXISTS bid_logs_pkey RENAME TO bid_logs_legacy_pkey",
+		"ALTER INDEX IF EXISTS idx_bid_logs_user_id RENAME TO idx_bid_logs_legacy_user_id",
+		"ALTER INDEX IF EXISTS idx_bid_logs_product_id RENAME TO idx_bid_logs_legacy_product_id",
+	})
+	if err != nil {
+		return err
+	}
+	if err := createBidLogs(tx); err != nil {
+		return err
+	}
+
+	res := tx.Exec(`
+		INSERT INTO bid_logs (id, user_id, product_id, price, score, created_at)
+		SELECT id, user_id::bigint, product_id, price, score, COALESCE(created_at, now())
+		FROM bid_logs_legacy
+		WHERE user_id ~ '^[0-9]+$' AND product_id IS NOT NULL`)
+	if res.Error != nil {
+		return res.Error
+	}
+	var legacyRows int64
+	if err := tx.Raw("SELECT count(*) FROM bid_logs_legacy").Scan(&legacyRows).Error; err != nil {
+		return err
+	}
+	// 沿用舊表的 id，序號從目前最大值之後繼續
+	if err := tx.Exec("SELECT setval(pg_get_serial_sequence('bid_logs', 'id'), COALESCE(max(id), 0) + 1, false) FROM bid_logs").Error; err != nil {
+		return err
+	}
+
+	log.Printf("bid_logs 已遷移為分區表: 轉入 %d / %d 筆 (略過 %d 筆非數字 user_id)，耗時 %s；舊資料保留在 bid_logs_legacy",
+		res.RowsAffected, legacyRows, legacyRows-res.RowsAffected, time.Since(start).Round(time.Millisecond))
+	return nil
+}
+
+// ensureLatestBids 建立 latest_bids 與維護它的 trigger；表是新建的時候從 bid_logs 回填
+func ensureLatestBids(tx *gorm.DB) error {
+	var existed bool
+	if err := tx.Raw("SELECT to_regclass('latest_bids') IS NOT NULL").Scan(&existed).Error; err != nil {
+		return err
+	}
+
+	err := execAll(tx, []string{`
+		CREATE TABLE IF NOT EXISTS latest_bids (
+			product_id varchar(64) NOT NULL,
+			user_id    bigint NOT NULL,
+			price      double precision NOT NULL,
+			score      double precision NOT NULL,
+			created_at timestamptz NOT NULL,
+			bid_log_id bigint NOT NULL,
+			PRIMARY KEY (product_id, user_id)
+		)`,
+		"CREATE INDEX IF NOT EXISTS idx_latest_bids_product_score ON latest_bids (product_id, score DESC)",
+		// 同一使用者的出價可能因異步寫入而亂序抵達，只保留 (created_at, id) 較新的一筆
+		`CREATE OR REPLACE FUNCTION bid_logs_upsert_latest() RETURNS trigger AS $$
+		BEGIN
+			INSERT INTO latest_bids AS lb (product_id, user_id, price, score, created_at, bid_log_id)
+			VALUES (NEW.product_id, NEW.user_id, NEW.price, NEW.score, NEW.created_at, NEW.id)
+			ON CONFLICT (product_id, user_id) DO UPDATE
+			SET price = EXCLUDED.price, score = EXCLUDED.score,
+				created_at = EXCLUDED.created_at, bid_log_id = EXCLUDED.bid_log_id
+			WHERE (EXCLUDED.created_at, EXCLUDED.bid_log_id) > (lb.created_at, lb.bid_log_id);
+			RETURN NULL;
+		END
+		$$ LANGUAGE plpgsql`,
+	})
+	if err != nil {
+		return err
+	}
+
+	if !existed {
+		res := tx.Exec(`
+			INSERT INTO latest_bids (product_id, user_id, price, score, created_at, bid_log_id)
+			SELECT DISTINCT ON (product_id, user_id) product_id, user_id, price, score, created_at, id
+			FROM bid_logs
+			ORDER BY product_id, user_id, created_at DESC, id DESC`)
+		if res.Error != nil {
+			return res.Error
+		}
+		log.Printf("已建立 latest_bids，從 bid_logs 回填 %d 筆", res.RowsAffected)
+	}
+
+	// 已存在時不重建，避免每次啟動都對 bid_logs 取得 ACCESS EXCLUSIVE 鎖
+	var hasTrigger bool
+	if err := tx.Raw("SELECT EXISTS (SELECT 1 FROM pg_trigger WHERE tgrelid = 'bid_logs'::regclass AND tgname = 'trg_bid_logs_latest')").
+		Scan(&hasTrigger).Error; err != nil {
+		return err
+	}
+	if hasTrigger {
+		return nil
+	}
+	return tx.Exec("CREATE TRIGGER trg_bid_logs_latest AFTER INSERT ON bid_logs FOR EACH ROW EXECUTE FUNCTION bid_logs_upsert_latest()").Error
+}
+
+// execAll 逐一執行 (pgx 的 extended protocol 不接受一次多個語句)
+func execAll(tx *gorm.DB, stmts []string) error {
+	for _, stmt := range stmts {
+		if err := tx.Exec(stmt).Error; err != nil {
+			return err
+		}
+	}
+	return nil
+}
@@ -12,18 +12,50 @@ import (
 	"gorm.io/gorm"
 )
 
-// BidLog 對應資料庫中的 bid_logs 資料表
-type BidLog struct {
-	ID        uint      `gorm:"primaryKey"`
-	UserID    string    `gorm:"index"`
-	ProductID string    `gorm:"index"`
-	Price     float64
-	Score     float64
-	CreatedAt time.Time
+// 排行榜封存原因
+const (
+	ArchiveReasonTrimmed = "trimmed" // 遠低於第 K 名門檻，被移出 Redis 排行榜
+	ArchiveReasonFinal   = "final"   // 活動結束後封存的最終排行榜
+)
+
+// RankingArchive 對應 ranking_archives 資料表：從 Redis 排行榜移出的出價明細
+type RankingArchive struct {
+	ID           uint   `gorm:"primaryKey"`
+	ProductID    string `gorm:"uniqueIndex:idx_ranking_archives_product_user;index:idx_ranking_archives_product_rank,priority:1"`
+	UserID       string `gorm:"uniqueIndex:idx_ranking_archives_product_user"`
+	Rank         int    `gorm:"index:idx_ranking_archives_product_rank,priority:2"` // 最終名次，被修剪的成員為 0
+	Score        float64
+	Price        float64
+	ReactionTime int64
+	Weight       float64
+	Reason       string
+	ArchivedAt   time.Time
+}
+
+// 封存工作狀態
+const (
+	ArchiveJobRunning = "running"
+	ArchiveJobDone    = "done"
+)
+
+// ArchiveJob 對應 archive_jobs 資料表：記錄每個商品的封存進度，讓封存工作可中斷後續跑
+type ArchiveJob struct {
+	ProductID string `gorm:"primaryKey;type:varchar(64)"`
+	Status    string `gorm:"index"`
+	Cursor    int64  // 已封存的排行榜名次數 (ZREVRANGE offset)
+	Total     int64  // 開始封存時排行榜的總人數
+	StartedAt time.Time
+	UpdatedAt time.Time
 }
 
-// InitDB 初始化資料庫連線
-func InitDB() *gorm.DB {
+// InitDB 初始化資料庫連線，回傳兩個獨立的連線池：
+// db 給一般查詢與低頻寫入，writeDB 給高頻寫入 (每筆出價的 bid_logs、排行榜封存)，
+// 尖峰時寫入排隊不會拖慢排行榜名稱查詢等讀取
+//
+//	DB_PORT            預設 5432 (PgBouncer 通常為 6432)
+//	DB_PGBOUNCER=true  使用 simple protocol，不建立伺服器端 prepared statement (PgBouncer transaction pooling)
+//	連線池大小見 poolConfigFromEnv
+func InitDB() (db *gorm.DB, writeDB *gorm.DB) {
 	host := os.Getenv("DB_HOST")
 	if host == "" {
 		host = "localhost"
@@ -38,37 +70,49 @@ func InitDB() *gorm.DB {
 	if password == "" {
 		password = "password123"
 	}
-	
-	dsn := fmt.Sprintf("host=%s user=%s password=%s dbname=auction_db port=5432 sslmode=require TimeZone=Asia/Taipei", host, user, password)
-	
-	db, err := gorm.Open(postgres.Open(dsn), &gorm.Config{})
-	if err != nil {
-		log.Fatal("無法連線到資料庫:", err)
+
+	port := os.Getenv("DB_PORT")
+	if port == "" {
+		port = "5432"
 	}
 
-	// 設定連線池參數
-	sqlDB, err := db.DB()
-	if err != nil {
-		log.Fatal("取得資料庫連線失敗:", err)
+	dsn := fmt.Sprintf("host=%s user=%s password=%s dbname=auction_db port=%s sslmode=require TimeZone=Asia/Taipei", host, user, password, port)
+	pgbouncer := os.Getenv("DB_PGBOUNCER") == "true"
+	if pgbouncer {
+		dsn += " default_query_exec_mode=simple_protocol"
 	}
 
-	// 限制最大連線數
-	// t3.micro 極限約 83，我們設 70 保留一點緩衝給系統用
-	sqlDB.SetMaxOpenConns(600)
+	cfg := poolConfigFromEnv(dsn)
+	db = openPool(dsn, PoolRead, cfg.readOpen, cfg.readIdle, cfg.waitTimeout)
+	writeDB = openPool(dsn, PoolWrite, cfg.writeOpen, cfg.writeIdle, cfg.waitTimeout)
+	log.Printf("資料庫連線池: 讀取 %d / 寫入 %d (來源: %s，等待上限 %s，PgBouncer 模式 %v)",
+		cfg.readOpen, cfg.writeOpen, cfg.source, cfg.waitTimeout, pgbouncer)
+
+	// 自動遷移 Schema (bid_logs 為分區表，另由 MigrateBidLogs 建立)
+	if err := writeDB.AutoMigrate(&RankingArchive{}, &ArchiveJob{}, &models.User{}, &models.Product{}); err != nil {
+		log.Fatal("資料庫遷移失敗:", err)
+	}
+	if err := MigrateBidLogs(writeDB); err != nil {
+		log.Fatal("bid_logs 遷移失敗:", err)
+	}
 
-	// 設定閒置連線數 (通常設為 Open 的一半或一樣)
-	sqlDB.SetMaxIdleConns(100)
+	return db, writeDB
+}
 
+// openPool 建立一個有上限的連線池，取得連線的等待時間受 waitTimeout 限制
+func openPool(dsn, name string, maxOpen, maxIdle int, waitTimeout time.Duration) *gorm.DB {
+	sqlDB, err := sql.Open("pgx", dsn)
+	if err != nil {
+		log.Fatal("無法連線到資料庫:", err)
+	}
+	sqlDB.SetMaxOpenConns(maxOpen)
+	sqlDB.SetMaxIdleConns(maxIdle)
 	// 設定連線生命週期 (避免連線過期導致的錯誤)
 	sqlDB.SetConnMaxLifetime(time.Hour)
 
-	// 確保 sql.DB 型別被使用（避免 unused import 錯誤）
-	var _ *sql.DB = sqlDB
-
-	// 自動遷移 Schema
-	if err := db.AutoMigrate(&BidLog{}, &models.User{}, &models.Product{}); err != nil {
-		log.Fatal("資料庫遷移失敗:", err)
+	db, err := gorm.Open(postgres.New(postgres.Config{Conn: newBoundedPool(sqlDB, name, waitTimeout)}), &gorm.Config{})
+	if err != nil {
+		log.Fatal("無法連線到資料庫:", err)
 	}
-
 	return db
-}
\ No newline at end of file
+}
@@ -0,0 +1,56 @@
+package database
+
+import (
+	"database/sql"
+	"log"
+
+	"rtb-backend/internal/metrics"
+
+	"github.com/redis/go-redis/v9"
+	"gorm.io/gorm"
+)
+
+// RegisterPoolMetrics 將 Redis 與 Postgres 讀取 / 寫入連線池狀態輸出到 /metrics
+func RegisterPoolMetrics(rdb redis.UniversalClient, db, writeDB *gorm.DB) {
+	redisStat := func(pick func(*redis.PoolStats) uint32) func() float64 {
+		return func() float64 { return float64(pick(rdb.PoolStats())) }
+	}
+	metrics.NewGaugeFunc("redis_pool_total_connections", "Redis 連線池的連線數",
+		redisStat(func(st *redis.PoolStats) uint32 { return st.TotalConns }))
+	metrics.NewGaugeFunc("redis_pool_idle_connections", "Redis 連線池的閒置連線數",
+		redisStat(func(st *redis.PoolStats) uint32 { return st.IdleConns }))
+	metrics.NewCounterFunc("redis_pool_hits_total", "從連線池取得既有連線的次數",
+		redisStat(func(st *redis.PoolStats) uint32 { return st.Hits }))
+	metrics.NewCounterFunc("redis_pool_misses_total", "連線池沒有可用連線、需新建的次數",
+		redisStat(func(st *redis.PoolStats) uint32 { return st.Misses }))
+	metrics.NewCounterFunc("redis_pool_timeouts_total", "等待連線池逾時的次數",
+		redisStat(func(st *redis.PoolStats) uint32 { return st.Timeouts }))
+
+	dbStats := map[string]func() sql.DBStats{}
+	for name, pool := range map[string]*gorm.DB{PoolRead: db, PoolWrite: writeDB} {
+		sqlDB, err := pool.DB()
+		if err != nil {
+			log.Printf("無法取得資料庫連線池 (%s)，略過連線池指標: %v", name, err)
+			continue
+		}
+		dbStats[name] = sqlDB.Stats
+	}
+
+	gauges := map[string]*metrics.FuncVec{
+		"max_open": metrics.NewGaugeFuncVec("db_pool_max_open_connections", "資料庫連線池上限", "pool"),
+		"open":     metrics.NewGaugeFuncVec("db_pool_open_connections", "資料庫連線數", "pool"),
+		"in_use":   metrics.NewGaugeFuncVec("db_pool_in_use_connections", "使用中的資料庫連線數", "pool"),
+		"idle":     metrics.NewGaugeFuncVec("db_pool_idle_connections", "閒置的資料庫連線數", "pool"),
+	}
+	waitCount := metrics.NewCounterFuncVec("db_pool_wait_count_total", "等待資料庫連線的次數", "pool")
+	waitSeconds := metrics.NewCounterFuncVec("db_pool_wait_seconds_total", "等待資料庫連線的累計秒數", "pool")
+	for name, stats := range dbStats {
+		stats := stats
+		gauges["max_open"].Bind(func() float64 { return float64(stats().MaxOpenConnections) }, name)
+		gauges["open"].Bind(func() float64 { return float64(stats().OpenConnections) }, name)
+		gauges["in_use"].Bind(func() float64 { return float64(stats().InUse) }, name)
+		gauges["idle"].Bind(func() float64 { return float64(stats().Idle) }, name)
+		waitCount.Bind(func() float64 { return float64(stats().WaitCount) }, name)
+		waitSeconds.Bind(func() float64 { return stats().WaitDuration.Seconds() }, name)
+	}
+}
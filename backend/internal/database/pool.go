@@ -0,0 +1,234 @@
+package database
+
+import (
+	"context"
+	"database/sql"
+	"errors"
+	"fmt"
+	"log"
+	"math"
+	"time"
+
+	"rtb-backend/internal/envconf"
+	"rtb-backend/internal/metrics"
+)
+
+// 連線池名稱 (metrics 的 pool label)
+const (
+	PoolRead  = "read"  // 一般查詢與低頻寫入 (使用者、商品、排行榜名稱)
+	PoolWrite = "write" // 高頻寫入 (bid_logs、排行榜封存)
+)
+
+// ErrPoolTimeout 在 DB_POOL_WAIT_TIMEOUT 內拿不到連線
+var ErrPoolTimeout = errors.New("等待資料庫連線逾時")
+
+var (
+	poolWaitBuckets = []float64{0.0001, 0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5}
+
+	dbPoolWait = metrics.NewHistogramVec("db_pool_acquire_wait_seconds",
+		"向資料庫連線池取得連線的等待時間", poolWaitBuckets, "pool")
+	dbPoolWaitTimeouts = metrics.NewCounterVec("db_pool_acquire_timeouts_total",
+		"等待資料庫連線超過 DB_POOL_WAIT_TIMEOUT 的次數", "pool")
+)
+
+// poolConfig 連線池大小與等待上限
+type poolConfig struct {
+	readOpen, readIdle   int
+	writeOpen, writeIdle int
+	waitTimeout          time.Duration
+	source               string // 大小的來源 (env 或 max_connections)
+}
+
+// poolConfigFromEnv 決定兩個連線池的大小
+//
+//	DB_MAX_OPEN_CONNS 有設定時直接作為總連線數；否則查詢 max_connections - superuser_reserved_connections，
+//	乘上 DB_POOL_SHARE (預設 0.8，保留給 migration、psql 與監控) 再除以 DB_INSTANCES (後端實例數，預設 1)。
+//	總數依 DB_WRITE_POOL_SHARE (預設 0.5) 分給寫入池，其餘給讀取池。
+func poolConfigFromEnv(dsn string) poolConfig {
+	cfg := poolConfig{waitTimeout: envconf.Duration("DB_POOL_WAIT_TIMEOUT", 2*time.Second)}
+
+	total := envconf.Int("DB_MAX_OPEN_CONNS", 0)
+	cfg.source = "DB_MAX_OPEN_CONNS"
+	if total <= 0 {
+		usable, err := queryUsableConnections(dsn)
+		if err != nil {
+			total = 20
+			cfg.source = "預設值"
+			log.Printf("無法查詢 max_connections，連線池使用預設 %d: %v", total, err)
+		} else {
+			share := envconf.Float("DB_POOL_SHARE", 0.8)
+			instances := envconf.Int("DB_INSTANCES", 1)
+			if instances < 1 {
+				instances = 1
+			}
+			total = int(math.Floor(float64(usable) * share / float64(instances)))
+			cfg.source = fmt.Sprintf("max_connections (可用 %d × %.2f / %d 個實例)", usable, share, instances)
+		}
+	}
+	if total < 2 {
+		total = 2
+	}
+
+	cfg.writeOpen = int(math.Round(float64(total) * envconf.Float("DB_WRITE_POOL_SHARE", 0.5)))
+	if cfg.writeOpen < 1 {
+		cfg.writeOpen = 1
+	}
+	if cfg.writeOpen >= total {
+		cfg.writeOpen = total - 1
+	}
+	cfg.readOpen = total - cfg.writeOpen
+
+	// 閒置連線預設與上限相同，避免尖峰時反覆建立連線；DB_MAX_IDLE_CONNS 為兩個池合計
+	cfg.readIdle, cfg.writeIdle = cfg.readOpen, cfg.writeOpen
+	if idle := envconf.Int("DB_MAX_IDLE_CONNS", 0); idle > 0 && idle < total {
+		cfg.writeIdle = idle * cfg.writeOpen / total
+		cfg.readIdle = idle - cfg.writeIdle
+	}
+	return cfg
+}
+
+// queryUsableConnections 查詢一般使用者可用的連線數
+func queryUsableConnections(dsn string) (int, error) {
+	probe, err := sql.Open("pgx", dsn)
+	if err != nil {
+		return 0, err
+	}
+	defer probe.Close()
+	probe.SetMaxOpenConns(1)
+
+	ctx, cancel := context.WithTimeout(context.Background(), 5*time.Second)
+	defer cancel()
+	var usable int
+	err = probe.QueryRowContext(ctx,
+		"SELECT current_setting('max_connections')::int - current_setting('superuser_reserved_connections')::int").
+		Scan(&usable)
+	return usable, err
+}
+
+// boundedPool 包裝 *sql.DB 作為 gorm 的 ConnPool：每個語句先在 waitTimeout 內向連線池取得連線
+// 並記錄等待時間，逾時回傳 ErrPoolTimeout，而不是在尖峰時無限期排隊
+type boundedPool struct {
+	db          *sql.DB
+	name        string
+	waitTimeout time.Duration
+	wait        *metrics.Histogram
+	timeouts    *metrics.Counter
+}
+
+func newBoundedPool(db *sql.DB, name string, waitTimeout time.Duration) *boundedPool {
+	return &boundedPool{
+		db:          db,
+		name:        name,
+		waitTimeout: waitTimeout,
+		wait:        dbPoolWait.WithLabelValues(name),
+		timeouts:    dbPoolWaitTimeouts.WithLabelValues(name),
+	}
+}
+
+func (p *boundedPool) acquire(ctx context.Context) (*sql.Conn, error) {
+	waitCtx, cancel := context.WithTimeout(ctx, p.waitTimeout)
+	defer cancel()
+
+	start := time.Now()
+	conn, err := p.db.Conn(waitCtx)
+	p.wait.ObserveSince(start)
+	if err != nil {
+		if errors.Is(err, context.DeadlineExceeded) && ctx.Err() == nil {
+			p.timeouts.Inc()
+			return nil, fmt.Errorf("%w (%s 連線池, %s)", ErrPoolTimeout, p.name, p.waitTimeout)
+		}
+		return nil, err
+	}
+	return conn, nil
+}
+
+// releaseLater 在 rows / tx 結束後才把連線還回連線池 (sql.Conn.Close 會等進行中的操作結束)
+func releaseLater(conn *sql.Conn) {
+	go conn.Close()
+}
+
+// PrepareContext 同樣先在 waitTimeout 內取得連線；prepared statement 會跨連線重用，
+// 不能綁在取得的連線上，確認有空閒連線後歸還並在 *sql.DB 上 prepare (通常拿到剛歸還的同一條)
+func (p *boundedPool) PrepareContext(ctx context.Context, query string) (*sql.Stmt, error) {
+	conn, err := p.acquire(ctx)
+	if err != nil {
+		return nil, err
+	}
+	conn.Close()
+	return p.db.PrepareContext(ctx, query)
+}
+
+func (p *boundedPool) ExecContext(ctx context.Context, query string, args ...interface{}) (sql.Result, error) {
+	conn, err := p.acquire(ctx)
+	if err != nil {
+		return nil, err
+	}
+	defer conn.Close()
+	return conn.ExecContext(ctx, query, args...)
+}
+
+func (p *boundedPool) QueryContext(ctx context.Context, query string, args ...interface{}) (*sql.Rows, error) {
+	conn, err := p.acquire(ctx)
+	if err != nil {
+		return nil, err
+	}
+	rows, err := conn.QueryContext(ctx, query, args...)
+	if err != nil {
+		conn.Close()
+		return nil, err
+	}
+	releaseLater(conn)
+	return rows, nil
+}
+
+func (p *boundedPool) QueryRowContext(ctx context.Context, query string, args ...interface{}) *sql.Row {
+	conn, err := p.acquire(ctx)
+	if err != nil {
+		// *sql.Row 無法直接帶入錯誤：改用已結束且 Err() 回傳此錯誤的 context，
+		// database/sql 取連線前檢查 ctx.Done() 並回傳 ctx.Err()，Scan 因此得到包裝 ErrPoolTimeout 的錯誤
+		failed, cancel := failedContext(ctx, err)
+		defer cancel()
+		return p.db.QueryRowContext(failed, query, args...)
+	}
+	row := conn.QueryRowContext(ctx, query, args...)
+	releaseLater(conn)
+	return row
+}
+
+// errContext 已結束、Err() 回傳指定錯誤的 context
+type errContext struct {
+	context.Context
+	err error
+}
+
+func (c errContext) Err() error { return c.err }
+
+func failedContext(parent context.Context, err error) (context.Context, context.CancelFunc) {
+	done, cancel := context.WithCancel(parent)
+	cancel()
+	return errContext{Context: done, err: err}, cancel
+}
+
+// BeginTx 交易期間持有同一條連線，只有取得連線的等待受 waitTimeout 限制
+func (p *boundedPool) BeginTx(ctx context.Context, opts *sql.TxOptions) (*sql.Tx, error) {
+	conn, err := p.acquire(ctx)
+	if err != nil {
+		return nil, err
+	}
+	tx, err := conn.BeginTx(ctx, opts)
+	if err != nil {
+		conn.Close()
+		return nil, err
+	}
+	releaseLater(conn)
+	return tx, nil
+}
+
+// GetDBConn 讓 gorm 的 db.DB() 取得底層 *sql.DB (連線池指標、SetMaxOpenConns)
+func (p *boundedPool) GetDBConn() (*sql.DB, error) {
+	return p.db, nil
+}
+
+func (p *boundedPool) Ping() error {
+	return p.db.Ping()
+}
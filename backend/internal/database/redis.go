@@ -0,0 +1,80 @@
+package database
+
+import (
+	"context"
+	"fmt"
+	"log"
+	"os"
+	"strings"
+
+	"github.com/redis/go-redis/v9"
+)
+
+// Redis Key：{productID} 為 hash tag，同一商品的所有 Key 會落在同一個 Cluster slot，
+// place_bid.lua 才能在 Cluster 模式下一次操作 config / rank / bids
+func ConfigKey(productID string) string {
+	return fmt.Sprintf("auction:{%s}:config", productID)
+}
+
+func RankKey(productID string) string {
+	return fmt.Sprintf("auction:{%s}:rank", productID)
+}
+
+func BidsKey(productID string) string {
+	return fmt.Sprintf("auction:{%s}:bids", productID)
+}
+
+func ArchiveLockKey(productID string) string {
+	return fmt.Sprintf("auction:{%s}:archive_lock", productID)
+}
+
+// InitRedis 初始化 Redis 連線
+//
+//	REDIS_CLUSTER=true 時使用 Cluster Client，REDIS_ADDRS 為逗號分隔的種子節點 (host:port)
+//	否則連線到單一節點 REDIS_ADDRS 或 REDIS_HOST:6379
+func InitRedis(ctx context.Context) redis.UniversalClient {
+	addrs := []string{}
+	for _, addr := range strings.Split(os.Getenv("REDIS_ADDRS"), ",") {
+		if addr = strings.TrimSpace(addr); addr != "" {
+			addrs = append(addrs, addr)
+		}
+	}
+	if len(addrs) == 0 {
+		host := os.Getenv("REDIS_HOST")
+		if host == "" {
+			host = "localhost"
+		}
+		addrs = []string{fmt.Sprintf("%s:6379", host)}
+	}
+
+	var rdb redis.UniversalClient
+	if os.Getenv("REDIS_CLUSTER") == "true" {
+		rdb = redis.NewClusterClient(&redis.ClusterOptions{
+			Addrs:    addrs,
+			Password: os.Getenv("REDIS_PASSWORD"),
+		})
+	} else {
+		rdb = redis.NewClient(&redis.Options{
+			Addr:     addrs[0],
+			Password: os.Getenv("REDIS_PASSWORD"),
+			DB:       0,
+		})
+	}
+
+	rdb.AddHook(latencyHook{target: "primary"})
+
+	if _, err := rdb.Ping(ctx).Result(); err != nil {
+		log.Fatal("Redis 連線失敗:", err)
+	}
+	return rdb
+}
+
+// LoadScript 將 Lua 腳本載入 Redis；Cluster 模式下會載入到每一個 master
+func LoadScript(ctx context.Context, rdb redis.UniversalClient, script *redis.Script) error {
+	if cluster, ok := rdb.(*redis.ClusterClient); ok {
+		return cluster.ForEachMaster(ctx, func(ctx context.Context, master *redis.Client) error {
+			return script.Load(ctx, master).Err()
+		})
+	}
+	return script.Load(ctx, rdb).Err()
+}
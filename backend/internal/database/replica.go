@@ -0,0 +1,291 @@
+package database
+
+import (
+	"context"
+	"log"
+	"os"
+	"strconv"
+	"strings"
+	"sync"
+	"sync/atomic"
+	"time"
+
+	"rtb-backend/internal/envconf"
+	"rtb-backend/internal/metrics"
+
+	"github.com/redis/go-redis/v9"
+)
+
+var (
+	redisCommandDuration = metrics.NewHistogramVec("redis_command_duration_seconds",
+		"Redis 指令 (或 pipeline) 延遲，依路由與目標節點分組", nil, "route", "target")
+	redisReplicaLag = metrics.NewGaugeVec("redis_replica_lag_seconds",
+		"replica 落後 primary 的時間上限 (無法連線時為 -1)", "replica")
+)
+
+// ---- 路由標籤 ----
+
+type routeKey struct{}
+
+// WithRoute 標記這次呼叫屬於哪一條路由 (rankings、current_price、bid…)，供延遲指標分組
+func WithRoute(ctx context.Context, route string) context.Context {
+	return context.WithValue(ctx, routeKey{}, route)
+}
+
+// Route 取得 ctx 上的路由標籤，未標記時回傳空字串
+func Route(ctx context.Context) string {
+	route, _ := ctx.Value(routeKey{}).(string)
+	return route
+}
+
+// latencyHook 記錄每個指令的延遲，target 為 primary 或 replica
+type latencyHook struct {
+	target string
+}
+
+func (h latencyHook) DialHook(next redis.DialHook) redis.DialHook {
+	return next
+}
+
+func (h latencyHook) ProcessHook(next redis.ProcessHook) redis.ProcessHook {
+	return func(ctx context.Context, cmd redis.Cmder) error {
+		start := time.Now()
+		err := next(ctx, cmd)
+		h.observe(ctx, start)
+		return err
+	}
+}
+
+func (h latencyHook) ProcessPipelineHook(next redis.ProcessPipelineHook) redis.ProcessPipelineHook {
+	return func(ctx context.Context, cmds []redis.Cmder) error {
+		start := time.Now()
+		err := next(ctx, cmds)
+		h.observe(ctx, start)
+		return err
+	}
+}
+
+func (h latencyHook) observe(ctx context.Context, start time.Time) {
+	route := Route(ctx)
+	if route == "" {
+		route = "other"
+	}
+	redisCommandDuration.WithLabelValues(route, h.target).ObserveSince(start)
+}
+
+// ---- 讀取路由 ----
+
+// ReadRouter 將讀多寫少的查詢 (排行榜、目前最高價) 導向 replica。
+// replica 落後 primary 超過 maxLag 或無法連線時自動退回 primary；
+// 出價 (Lua) 與出價前的設定讀取不經過這裡，一律走 primary。
+//
+//	單節點：REDIS_REPLICA_ADDRS 為逗號分隔的 replica (host:port)，輪流使用落後在範圍內的 replica
+//	Cluster：REDIS_READ_FROM_REPLICAS=true，另建 ReadOnly Client，所有 replica 都在範圍內才使用
+type ReadRouter struct {
+	primary  redis.UniversalClient
+	maxLag   time.Duration
+	interval time.Duration
+
+	replicas  []*replicaNode       // 單節點模式
+	cluster   *redis.ClusterClient // Cluster 模式的 ReadOnly Client
+	clusterOK atomic.Bool
+
+	next atomic.Uint64
+
+	mu      sync.Mutex
+	history map[string][]offsetSample // primary 位址 -> 最近的 replication offset 取樣
+}
+
+type replicaNode struct {
+	addr    string
+	client  *redis.Client
+	healthy atomic.Bool
+}
+
+type offsetSample struct {
+	at     time.Time
+	offset int64
+}
+
+// 每個 primary 保留的 offset 取樣數，需涵蓋 maxLag / interval 以上
+const maxOffsetSamples = 256
+
+// NewReadRouter 依環境變數建立讀取路由；未設定 replica 時所有讀取都走 primary
+func NewReadRouter(primary redis.UniversalClient) *ReadRouter {
+	r := &ReadRouter{
+		primary:  primary,
+		maxLag:   envconf.Duration("REDIS_REPLICA_MAX_LAG", 100*time.Millisecond),
+		interval: envconf.Duration("REDIS_REPLICA_CHECK_INTERVAL", 50*time.Millisecond),
+		history:  make(map[string][]offsetSample),
+	}
+
+	if cluster, ok := primary.(*redis.ClusterClient); ok {
+		if os.Getenv("REDIS_READ_FROM_REPLICAS") == "true" {
+			opt := *cluster.Options()
+			opt.ReadOnly = true
+			opt.RouteByLatency = true
+			r.cluster = redis.NewClusterClient(&opt)
+			r.cluster.AddHook(latencyHook{target: "replica"})
+		}
+		return r
+	}
+
+	for _, addr := range strings.Split(os.Getenv("REDIS_REPLICA_ADDRS"), ",") {
+		if addr = strings.TrimSpace(addr); addr == "" {
+			continue
+		}
+		client := redis.NewClient(&redis.Options{
+			Addr:     addr,
+			Password: os.Getenv("REDIS_PASSWORD"),
+		})
+		client.AddHook(latencyHook{target: "replica"})
+		r.replicas = append(r.replicas, &replicaNode{addr: addr, client: client})
+	}
+	return r
+}
+
+// Reader 回傳這次讀取應使用的 Client (落後在範圍內的 replica，否則為 primary)
+func (r *ReadRouter) Reader() redis.UniversalClient {
+	if r.cluster != nil {
+		if r.clusterOK.Load() {
+			return r.cluster
+		}
+		return r.primary
+	}
+
+	n := len(r.replicas)
+	if n == 0 {
+		return r.primary
+	}
+	start := r.next.Add(1)
+	for i := 0; i < n; i++ {
+		node := r.replicas[(start+uint64(i))%uint64(n)]
+		if node.healthy.Load() {
+			return node.client
+		}
+	}
+	return r.primary
+}
+
+// Run 定期檢查 replica 的落後程度，直到 ctx 結束
+func (r *ReadRouter) Run(ctx context.Context) {
+	if r.cluster == nil && len(r.replicas) == 0 {
+		return
+	}
+	log.Printf("Redis 讀取路由啟動: replicas=%d, cluster=%v, maxLag=%s", len(r.replicas), r.cluster != nil, r.maxLag)
+
+	ticker := time.NewTicker(r.interval)
+	defer ticker.Stop()
+	for {
+		select {
+		case <-ctx.Done():
+			return
+		case <-ticker.C:
+			checkCtx, cancel := context.WithTimeout(ctx, r.interval)
+			r.check(checkCtx)
+			cancel()
+		}
+	}
+}
+
+// check 先取樣 primary 的 offset，再比對各 replica 已套用的 offset
+func (r *ReadRouter) check(ctx context.Context) {
+	if r.cluster != nil {
+		r.cluster.ForEachMaster(ctx, func(ctx context.Context, master *redis.Client) error {
+			r.samplePrimary(ctx, master.Options().Addr, master)
+			return nil
+		})
+		allOK := true
+		var mu sync.Mutex
+		err := r.cluster.ForEachSlave(ctx, func(ctx context.Context, slave *redis.Client) error {
+			ok := r.checkReplica(ctx, slave.Options().Addr, slave, "")
+			mu.Lock()
+			allOK = allOK && ok
+			mu.Unlock()
+			return nil
+		})
+		r.clusterOK.Store(err == nil && allOK)
+		return
+	}
+
+	primaryAddr := "primary"
+	r.samplePrimary(ctx, primaryAddr, r.primary)
+	for _, node := range r.replicas {
+		node.healthy.Store(r.checkReplica(ctx, node.addr, node.client, primaryAddr))
+	}
+}
+
+func (r *ReadRouter) samplePrimary(ctx context.Context, addr string, client redis.Cmdable) {
+	// 取樣時間取在送出 INFO 之前：replica 追上這個 offset 就代表此時間點之前的寫入都已套用
+	at := time.Now()
+	info, err := replicationInfo(ctx, client)
+	if err != nil {
+		return
+	}
+	offset, err := strconv.ParseInt(info["master_repl_offset"], 10, 64)
+	if err != nil {
+		return
+	}
+
+	r.mu.Lock()
+	samples := append(r.history[addr], offsetSample{at: at, offset: offset})
+	if len(samples) > maxOffsetSamples {
+		samples = samples[len(samples)-maxOffsetSamples:]
+	}
+	r.history[addr] = samples
+	r.mu.Unlock()
+}
+
+// checkReplica 估算 replica 的資料落後時間並回傳是否在 maxLag 內。
+// replica 已套用到 offset R：最後一次 primary offset <= R 的取樣時間為 t，則資料最多落後 now - t
+// (估算值最多比實際多一個檢查間隔，因此偏向保守)。
+// primaryAddr 為空時依 replica 回報的 master_host:master_port 找對應的 primary (Cluster 模式)。
+func (r *ReadRouter) checkReplica(ctx context.Context, addr string, client redis.Cmdable, primaryAddr string) bool {
+	info, err := replicationInfo(ctx, client)
+	if err != nil || info["master_link_status"] != "up" {
+		redisReplicaLag.WithLabelValues(addr).Set(-1)
+		return false
+	}
+	offset, err := strconv.ParseInt(info["slave_repl_offset"], 10, 64)
+	if err != nil {
+		redisReplicaLag.WithLabelValues(addr).Set(-1)
+		return false
+	}
+	if primaryAddr == "" {
+		primaryAddr = info["master_host"] + ":" + info["master_port"]
+	}
+
+	r.mu.Lock()
+	samples := r.history[primaryAddr]
+	lag := time.Duration(-1)
+	for i := len(samples) - 1; i >= 0; i-- {
+		if samples[i].offset <= offset {
+			lag = time.Since(samples[i].at)
+			break
+		}
+	}
+	r.mu.Unlock()
+
+	if lag < 0 {
+		// 落後超過保留的取樣範圍
+		redisReplicaLag.WithLabelValues(addr).Set(-1)
+		return false
+	}
+	redisReplicaLag.WithLabelValues(addr).Set(lag.Seconds())
+	return lag <= r.maxLag
+}
+
+// replicationInfo 解析 INFO replication
+func replicationInfo(ctx context.Context, client redis.Cmdable) (map[string]string, error) {
+	raw, err := client.Info(ctx, "replication").Result()
+	if err != nil {
+		return nil, err
+	}
+	info := make(map[string]string)
+	for _, line := range strings.Split(raw, "\n") {
+		if k, v, ok := strings.Cut(strings.TrimSpace(line), ":"); ok {
+			info[k] = v
+		}
+	}
+	return info, nil
+}
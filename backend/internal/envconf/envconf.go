@@ -0,0 +1,32 @@
+// Package envconf 從環境變數讀取設定值，未設定或格式錯誤時回傳預設值。
+package envconf
+
+import (
+	"os"
+	"strconv"
+	"time"
+)
+
+// Int 讀取 int
+func Int(key string, defaultVal int) int {
+	if i, err := strconv.Atoi(os.Getenv(key)); err == nil {
+		return i
+	}
+	return defaultVal
+}
+
+// Float 讀取 float64
+func Float(key string, defaultVal float64) float64 {
+	if f, err := strconv.ParseFloat(os.Getenv(key), 64); err == nil {
+		return f
+	}
+	return defaultVal
+}
+
+// Duration 讀取 time.Duration (例如 "30s"、"5m")
+func Duration(key string, defaultVal time.Duration) time.Duration {
+	if d, err := time.ParseDuration(os.Getenv(key)); err == nil {
+		return d
+	}
+	return defaultVal
+}
@@ -0,0 +1,353 @@
+// Package metrics 提供 Prometheus 文字格式 (text/plain; version=0.0.4) 的指標與 /metrics 輸出。
+// 只實作本專案用到的 Histogram / Counter / Gauge，不引入額外的第三方套件。
+package metrics
+
+import (
+	"bufio"
+	"fmt"
+	"math"
+	"net/http"
+	"runtime"
+	"sort"
+	"strconv"
+	"strings"
+	"sync"
+	"sync/atomic"
+	"time"
+)
+
+// 延遲類指標的預設 bucket (秒)
+var DefaultBuckets = []float64{0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5}
+
+type collector interface {
+	write(w *bufio.Writer)
+}
+
+var (
+	registryMu sync.Mutex
+	registry   []collector
+)
+
+func init() {
+	NewGaugeFunc("go_goroutines", "目前的 goroutine 數量", func() float64 { return float64(runtime.NumGoroutine()) })
+}
+
+func register(c collector) {
+	registryMu.Lock()
+	registry = append(registry, c)
+	registryMu.Unlock()
+}
+
+// Handler 輸出所有已註冊的指標
+func Handler() http.Handler {
+	return http.HandlerFunc(func(rw http.ResponseWriter, r *http.Request) {
+		rw.Header().Set("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+		w := bufio.NewWriter(rw)
+		registryMu.Lock()
+		collectors := append([]collector(nil), registry...)
+		registryMu.Unlock()
+		for _, c := range collectors {
+			c.write(w)
+		}
+		w.Flush()
+	})
+}
+
+// ---- Histogram ----
+
+// Histogram 單一組 label 的直方圖
+type Histogram struct {
+	buckets []float64
+	counts  []atomic.Uint64 // 每個 bucket (非累積)，最後一格為 +Inf
+	sumBits atomic.Uint64
+	count   atomic.Uint64
+}
+
+func newHistogram(buckets []float64) *Histogram {
+	return &Histogram{buckets: buckets, counts: make([]atomic.Uint64, len(buckets)+1)}
+}
+
+// Observe 記錄一筆觀測值
+func (h *Histogram) Observe(v float64) {
+	i := sort.SearchFloat64s(h.buckets, v)
+	h.counts[i].Add(1)
+	h.count.Add(1)
+	for {
+		old := h.sumBits.Load()
+		if h.sumBits.CompareAndSwap(old, math.Float64bits(math.Float64frombits(old)+v)) {
+			return
+		}
+	}
+}
+
+// ObserveSince 記錄從 start 到現在經過的秒數
+func (h *Histogram) ObserveSince(start time.Time) {
+	h.Observe(time.Since(start).Seconds())
+}
+
+// HistogramVec 依 label 分組的直方圖
+type HistogramVec struct {
+	family
+	buckets []float64
+}
+
+// NewHistogramVec 建立並註冊直方圖，buckets 為 nil 時使用 DefaultBuckets
+func NewHistogramVec(name, help string, buckets []float64, labelNames ...string) *HistogramVec {
+	if buckets == nil {
+		buckets = DefaultBuckets
+	}
+	h := &HistogramVec{family: newFamily(name, help, "histogram", labelNames), buckets: buckets}
+	register(h)
+	return h
+}
+
+// WithLabelValues 取得 (或建立) 指定 label 的直方圖
+func (h *HistogramVec) WithLabelValues(values ...string) *Histogram {
+	return h.get(values, func() interface{} { return newHistogram(h.buckets) }).(*Histogram)
+}
+
+func (h *HistogramVec) write(w *bufio.Writer) {
+	h.writeHeader(w)
+	h.each(func(labels string, v interface{}) {
+		hist := v.(*Histogram)
+		var cumulative uint64
+		for i, bound := range hist.buckets {
+			cumulative += hist.counts[i].Load()
+			fmt.Fprintf(w, "%s_bucket%s %d\n", h.name, joinLabels(labels, `le="`+formatFloat(bound)+`"`), cumulative)
+		}
+		cumulative += hist.counts[len(hist.buckets)].Load()
+		fmt.Fprintf(w, "%s_bucket%s %d\n", h.name, joinLabels(labels, `le="+Inf"`), cumulative)
+		fmt.Fprintf(w, "%s_sum%s %s\n", h.name, wrapLabels(labels), formatFloat(math.Float64frombits(hist.sumBits.Load())))
+		fmt.Fprintf(w, "%s_count%s %d\n", h.name, wrapLabels(labels), cumulative)
+	})
+}
+
+// ---- Gauge ----
+
+// Gauge 可增可減的數值
+type Gauge struct {
+	bits atomic.Uint64
+}
+
+func (g *Gauge) Set(v float64) {
+	g.bits.Store(math.Float64bits(v))
+}
+
+func (g *Gauge) Add(delta float64) {
+	for {
+		old := g.bits.Load()
+		if g.bits.CompareAndSwap(old, math.Float64bits(math.Float64frombits(old)+delta)) {
+			return
+		}
+	}
+}
+
+func (g *Gauge) Value() float64 {
+	return math.Float64frombits(g.bits.Load())
+}
+
+// GaugeVec 依 label 分組的 Gauge
+type GaugeVec struct {
+	family
+}
+
+// NewGaugeVec 建立並註冊 Gauge
+func NewGaugeVec(name, help string, labelNames ...string) *GaugeVec {
+	g := &GaugeVec{family: newFamily(name, help, "gauge", labelNames)}
+	register(g)
+	return g
+}
+
+func (g *GaugeVec) WithLabelValues(values ...string) *Gauge {
+	return g.get(values, func() interface{} { return &Gauge{} }).(*Gauge)
+}
+
+func (g *GaugeVec) write(w *bufio.Writer) {
+	g.writeHeader(w)
+	g.each(func(labels string, v interface{}) {
+		fmt.Fprintf(w, "%s%s %s\n", g.name, wrapLabels(labels), formatFloat(v.(*Gauge).Value()))
+	})
+}
+
+// ---- Counter ----
+
+// Counter 只增不減的計數
+type Counter struct {
+	n atomic.Uint64
+}
+
+func (c *Counter) Inc() {
+	c.n.Add(1)
+}
+
+func (c *Counter) Add(n uint64) {
+	c.n.Add(n)
+}
+
+// CounterVec 依 label 分組的 Counter
+type CounterVec struct {
+	family
+}
+
+// NewCounterVec 建立並註冊 Counter
+func NewCounterVec(name, help string, labelNames ...string) *CounterVec {
+	c := &CounterVec{family: newFamily(name, help, "counter", labelNames)}
+	register(c)
+	return c
+}
+
+func (c *CounterVec) WithLabelValues(values ...string) *Counter {
+	return c.get(values, func() interface{} { return &Counter{} }).(*Counter)
+}
+
+func (c *CounterVec) write(w *bufio.Writer) {
+	c.writeHeader(w)
+	c.each(func(labels string, v interface{}) {
+		fmt.Fprintf(w, "%s%s %d\n", c.name, wrapLabels(labels), v.(*Counter).n.Load())
+	})
+}
+
+// ---- 輸出時才取值的指標 (連線池狀態等) ----
+
+type funcMetric struct {
+	name, help, kind string
+	fn               func() float64
+}
+
+// NewGaugeFunc 註冊一個在輸出時呼叫 fn 取值的 Gauge
+func NewGaugeFunc(name, help string, fn func() float64) {
+	register(&funcMetric{name: name, help: help, kind: "gauge", fn: fn})
+}
+
+// NewCounterFunc 同 NewGaugeFunc，fn 回傳的是累計值 (例如 sql.DBStats.WaitCount)
+func NewCounterFunc(name, help string, fn func() float64) {
+	register(&funcMetric{name: name, help: help, kind: "counter", fn: fn})
+}
+
+func (m *funcMetric) write(w *bufio.Writer) {
+	fmt.Fprintf(w, "# HELP %s %s\n# TYPE %s %s\n%s %s\n", m.name, m.help, m.name, m.kind, m.name, formatFloat(m.fn()))
+}
+
+// FuncVec 依 label 分組、輸出時才取值的指標 (例如每個連線池一組)
+type FuncVec struct {
+	family
+}
+
+// NewGaugeFuncVec 建立帶 label 的 GaugeFunc，再以 Bind 綁定每組 label 的取值函式
+func NewGaugeFuncVec(name, help string, labelNames ...string) *FuncVec {
+	v := &FuncVec{family: newFamily(name, help, "gauge", labelNames)}
+	register(v)
+	return v
+}
+
+// NewCounterFuncVec 同 NewGaugeFuncVec，fn 回傳的是累計值
+func NewCounterFuncVec(name, help string, labelNames ...string) *FuncVec {
+	v := &FuncVec{family: newFamily(name, help, "counter", labelNames)}
+	register(v)
+	return v
+}
+
+// Bind 設定該組 label 的取值函式
+func (v *FuncVec) Bind(fn func() float64, values ...string) {
+	v.get(values, func() interface{} { return fn })
+}
+
+func (v *FuncVec) write(w *bufio.Writer) {
+	v.writeHeader(w)
+	v.each(func(labels string, fn interface{}) {
+		fmt.Fprintf(w, "%s%s %s\n", v.name, wrapLabels(labels), formatFloat(fn.(func() float64)()))
+	})
+}
+
+// ---- 共用：指標家族與 label 處理 ----
+
+type family struct {
+	name       string
+	help       string
+	kind       string
+	labelNames []string
+
+	mu       sync.RWMutex
+	children map[string]interface{} // key 為格式化後的 label 字串
+}
+
+func newFamily(name, help, kind string, labelNames []string) family {
+	return family{name: name, help: help, kind: kind, labelNames: labelNames, children: make(map[string]interface{})}
+}
+
+func (f *family) get(values []string, create func() interface{}) interface{} {
+	if len(values) != len(f.labelNames) {
+		panic(fmt.Sprintf("metrics: %s 需要 %d 個 label，收到 %d 個", f.name, len(f.labelNames), len(values)))
+	}
+	key := formatLabels(f.labelNames, values)
+
+	f.mu.RLock()
+	child, ok := f.children[key]
+	f.mu.RUnlock()
+	if ok {
+		return child
+	}
+
+	f.mu.Lock()
+	defer f.mu.Unlock()
+	if child, ok = f.children[key]; !ok {
+		child = create()
+		f.children[key] = child
+	}
+	return child
+}
+
+func (f *family) each(fn func(labels string, v interface{})) {
+	f.mu.RLock()
+	keys := make([]string, 0, len(f.children))
+	for k := range f.children {
+		keys = append(keys, k)
+	}
+	f.mu.RUnlock()
+	sort.Strings(keys)
+
+	for _, k := range keys {
+		f.mu.RLock()
+		v := f.children[k]
+		f.mu.RUnlock()
+		fn(k, v)
+	}
+}
+
+func (f *family) writeHeader(w *bufio.Writer) {
+	fmt.Fprintf(w, "# HELP %s %s\n# TYPE %s %s\n", f.name, f.help, f.name, f.kind)
+}
+
+var labelEscaper = strings.NewReplacer(`\`, `\\`, `"`, `\"`, "\n", `\n`)
+
+func formatLabels(names, values []string) string {
+	parts := make([]string, len(names))
+	for i, name := range names {
+		parts[i] = name + `="` + labelEscaper.Replace(values[i]) + `"`
+	}
+	return strings.Join(parts, ",")
+}
+
+func wrapLabels(labels string) string {
+	if labels == "" {
+		return ""
+	}
+	return "{" + labels + "}"
+}
+
+func joinLabels(labels, extra string) string {
+	if labels == "" {
+		return "{" + extra + "}"
+	}
+	return "{" + labels + "," + extra + "}"
+}
+
+func formatFloat(v float64) string {
+	switch {
+	case math.IsInf(v, 1):
+		return "+Inf"
+	case math.IsInf(v, -1):
+		return "-Inf"
+	}
+	return strconv.FormatFloat(v, 'g', -1, 64)
+}
@@ -25,6 +25,9 @@ type Product struct {
 	// gorm:"-" 代表不存入 Postgres，只用於 JSON 回傳
     CurrentHighestPrice float64 `gorm:"-" json:"currentHighestPrice"`
 
+	// 活動封存時寫入的最終最高價 (Redis Key 清除後用來回填 CurrentHighestPrice)
+	FinalHighestPrice float64 `json:"-"`
+
 	// 動態權重參數
 	Alpha float64 `gorm:"default:1.0" json:"alpha"`
 	Beta  float64 `gorm:"default:0.5" json:"beta"`
@@ -32,4 +35,18 @@ type Product struct {
 	
 	CreatedAt time.Time `json:"-"`
 	UpdatedAt time.Time `json:"-"`
-}
\ No newline at end of file
+}
+
+// AuctionConfig 回傳寫入 Redis auction:{id}:config 的欄位 (供 Lua 腳本與出價流程使用)
+func (p *Product) AuctionConfig() map[string]interface{} {
+	return map[string]interface{}{
+		"startTime": p.StartTime,
+		"endTime":   p.EndTime,
+		"basePrice": p.BasePrice,
+		"k":         p.K,
+		"alpha":     p.Alpha,
+		"beta":      p.Beta,
+		"gamma":     p.Gamma,
+		"status":    string(p.Status),
+	}
+}
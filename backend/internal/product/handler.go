@@ -3,6 +3,7 @@ package product
 import (
 	"net/http"
 	"rtb-backend/internal/models"
+	"rtb-backend/internal/timing"
 
 	"github.com/gin-gonic/gin"
 )
@@ -48,7 +49,7 @@ func (h *Handler) Get(c *gin.Context) {
 		return
 	}
 
-	c.JSON(http.StatusOK, p)
+	timing.JSON(c, http.StatusOK, p)
 }
 
 // List 處理 GET /products
@@ -58,7 +59,7 @@ func (h *Handler) List(c *gin.Context) {
 		c.JSON(http.StatusInternalServerError, gin.H{"error": err.Error()})
 		return
 	}
-	c.JSON(http.StatusOK, gin.H{"products": products})
+	timing.JSON(c, http.StatusOK, gin.H{"products": products})
 }
 
 // Update 處理 PUT /admin/products/:id
@@ -3,7 +3,9 @@ package product
 import (
 	"context"
 	"fmt"
+	"rtb-backend/internal/database"
 	"rtb-backend/internal/models"
+	"rtb-backend/internal/timing"
 	"time"
 
 	"github.com/redis/go-redis/v9"
@@ -11,20 +13,27 @@ import (
 )
 
 type Service struct {
-	rdb *redis.Client
-	db  *gorm.DB
+	rdb   redis.UniversalClient
+	reads *database.ReadRouter // 目前最高價的讀取 (可導向 replica)
+	db    *gorm.DB
 }
 
-func NewService(rdb *redis.Client, db *gorm.DB) *Service {
-	return &Service{rdb: rdb, db: db}
+func NewService(rdb redis.UniversalClient, reads *database.ReadRouter, db *gorm.DB) *Service {
+	return &Service{rdb: rdb, reads: reads, db: db}
 }
 
 func (s *Service) fillCurrentPrice(ctx context.Context, p *models.Product) {
-    redisKey := fmt.Sprintf("auction:%s:config", p.ID)
-    // 從 Redis 讀取
-    val, err := s.rdb.HGet(ctx, redisKey, "currentHighestPrice").Float64()
+    redisKey := database.ConfigKey(p.ID)
+    // 從 Redis 讀取 (replica 落後在範圍內時讀 replica)
+    ctx = database.WithRoute(ctx, "current_price")
+    redisStart := time.Now()
+    val, err := s.reads.Reader().HGet(ctx, redisKey, "currentHighestPrice").Float64()
+    timing.Since(ctx, "redis", redisStart)
     if err == nil {
         p.CurrentHighestPrice = val
+    } else if p.FinalHighestPrice > 0 {
+        // 活動已封存、Redis Key 已清除，使用封存時保存的最終價格
+        p.CurrentHighestPrice = p.FinalHighestPrice
     } else {
         // 如果 Redis 讀不到 (可能過期或資料遺失)，就回傳底價
         p.CurrentHighestPrice = p.BasePrice
@@ -49,11 +58,15 @@ func (s *Service) checkAndUpdateStatus(ctx context.Context, p *models.Product) {
 		p.Status = newStatus
 		
 		// 更新 DB
+		dbStart := time.Now()
 		s.db.Model(p).Update("status", newStatus)
+		timing.Since(ctx, "db", dbStart)
 		
 		// 更新 Redis
-		redisKey := fmt.Sprintf("auction:%s:config", p.ID)
+		redisKey := database.ConfigKey(p.ID)
+		redisStart := time.Now()
 		s.rdb.HSet(ctx, redisKey, "status", string(newStatus))
+		timing.Since(ctx, "redis", redisStart)
 	}
 }
 
@@ -76,18 +89,10 @@ func (s *Service) CreateProduct(ctx context.Context, p *models.Product) error {
 	// 3. 寫入 Redis
 	// Key: auction:{id}:config
 	// 傳入 Lua 腳本需要的參數
-	redisKey := fmt.Sprintf("auction:%s:config", p.ID)
-	err := s.rdb.HSet(ctx, redisKey, map[string]interface{}{
-		"startTime": p.StartTime,
-		"endTime":   p.EndTime,
-		"basePrice": p.BasePrice,
-		"k":         p.K,
-		"alpha":     p.Alpha,
-		"beta":      p.Beta,
-		"gamma":     p.Gamma,
-		"status":    string(p.Status),
-		"currentHighestPrice": p.BasePrice,
-	}).Err()
+	redisKey := database.ConfigKey(p.ID)
+	config := p.AuctionConfig()
+	config["currentHighestPrice"] = p.BasePrice
+	err := s.rdb.HSet(ctx, redisKey, config).Err()
 
 	return err
 }
@@ -95,9 +100,11 @@ func (s *Service) CreateProduct(ctx context.Context, p *models.Product) error {
 // GetProduct 取得單一商品詳情
 func (s *Service) GetProduct(ctx context.Context, id string) (*models.Product, error) {
     var p models.Product
+    dbStart := time.Now()
     if err := s.db.Where("id = ?", id).First(&p).Error; err != nil {
         return nil, err
     }
+    timing.Since(ctx, "db", dbStart)
     
 	s.checkAndUpdateStatus(ctx, &p)
     s.fillCurrentPrice(ctx, &p)
@@ -108,9 +115,11 @@ func (s *Service) GetProduct(ctx context.Context, id string) (*models.Product, e
 // ListProducts 取得所有商品
 func (s *Service) ListProducts(ctx context.Context) ([]models.Product, error) { // 注意：這裡要加 ctx 參數
     var products []models.Product
+    dbStart := time.Now()
     if err := s.db.Order("created_at desc").Find(&products).Error; err != nil {
         return nil, err
     }
+    timing.Since(ctx, "db", dbStart)
 
     // 逐一填入最高價
     for i := range products {
@@ -130,7 +139,7 @@ func (s *Service) UpdateProduct(ctx context.Context, p *models.Product) error {
 
 	// 2. 同步更新 Redis Config
 	// 注意：我們只更新設定參數，不重置 currentHighestPrice (保留戰況)
-	redisKey := fmt.Sprintf("auction:%s:config", p.ID)
+	redisKey := database.ConfigKey(p.ID)
 	err := s.rdb.HSet(ctx, redisKey, map[string]interface{}{
 		"title":       p.Title,
 		"startTime":   p.StartTime,
@@ -154,6 +163,6 @@ func (s *Service) UpdateStatus(ctx context.Context, id string, status models.Pro
 	}
 
 	// 2. 更新 Redis
-	redisKey := fmt.Sprintf("auction:%s:config", id)
+	redisKey := database.ConfigKey(id)
 	return s.rdb.HSet(ctx, redisKey, "status", string(status)).Err()
 }
\ No newline at end of file
@@ -0,0 +1,54 @@
+// Package profiling 提供受管理員 token 保護的 pprof 端點，供壓測工具在各階段擷取 CPU / heap profile。
+package profiling
+
+import (
+	"crypto/subtle"
+	"log"
+	"net/http"
+	"net/http/pprof"
+	"os"
+
+	"github.com/gin-gonic/gin"
+)
+
+// Register 在 PPROF_TOKEN 有設定時註冊 /debug/pprof/*；未設定則不開放
+//
+//	curl -H "X-Admin-Token: $PPROF_TOKEN" "http://localhost:8000/debug/pprof/profile?seconds=10" > cpu.pb.gz
+//	go tool pprof "http://localhost:8000/debug/pprof/heap?token=$PPROF_TOKEN"
+func Register(r *gin.Engine) {
+	token := os.Getenv("PPROF_TOKEN")
+	if token == "" {
+		return
+	}
+
+	g := r.Group("/debug/pprof", requireToken(token))
+	{
+		g.GET("/", gin.WrapF(pprof.Index))
+		g.GET("/cmdline", gin.WrapF(pprof.Cmdline))
+		g.GET("/profile", gin.WrapF(pprof.Profile))
+		g.GET("/symbol", gin.WrapF(pprof.Symbol))
+		g.POST("/symbol", gin.WrapF(pprof.Symbol))
+		g.GET("/trace", gin.WrapF(pprof.Trace))
+		// heap、allocs、goroutine、block、mutex、threadcreate
+		g.GET("/:name", func(c *gin.Context) {
+			pprof.Handler(c.Param("name")).ServeHTTP(c.Writer, c.Request)
+		})
+	}
+	log.Println("pprof 端點已啟用: /debug/pprof (需 X-Admin-Token)")
+}
+
+// requireToken 以 X-Admin-Token header 或 token query 參數驗證
+func requireToken(token string) gin.HandlerFunc {
+	expected := []byte(token)
+	return func(c *gin.Context) {
+		got := c.GetHeader("X-Admin-Token")
+		if got == "" {
+			got = c.Query("token")
+		}
+		if subtle.ConstantTimeCompare([]byte(got), expected) != 1 {
+			c.AbortWithStatusJSON(http.StatusUnauthorized, gin.H{"error": "需要管理員 token"})
+			return
+		}
+		c.Next()
+	}
+}
@@ -0,0 +1,123 @@
+// Package timing 收集單一請求各階段的耗時，並以 Server-Timing header 回傳給呼叫端，
+// 讓壓測工具能把延遲拆成網路與伺服器各階段 (Redis、Postgres、JSON 編碼…)。
+package timing
+
+import (
+	"context"
+	"encoding/json"
+	"net/http"
+	"strconv"
+	"strings"
+	"sync"
+	"time"
+
+	"github.com/gin-gonic/gin"
+)
+
+// Timings 單一請求的階段耗時，同名階段會累加
+type Timings struct {
+	start time.Time
+
+	mu     sync.Mutex
+	names  []string
+	values map[string]time.Duration
+}
+
+type timingsKey struct{}
+
+// FromContext 取得 ctx 上的 Timings，沒有時回傳 nil (所有方法皆可在 nil 上呼叫)
+func FromContext(ctx context.Context) *Timings {
+	t, _ := ctx.Value(timingsKey{}).(*Timings)
+	return t
+}
+
+// Add 累加階段耗時
+func (t *Timings) Add(stage string, d time.Duration) {
+	if t == nil {
+		return
+	}
+	t.mu.Lock()
+	if _, ok := t.values[stage]; !ok {
+		t.names = append(t.names, stage)
+	}
+	t.values[stage] += d
+	t.mu.Unlock()
+}
+
+// Since 記錄從 start 到現在的耗時
+func Since(ctx context.Context, stage string, start time.Time) {
+	FromContext(ctx).Add(stage, time.Since(start))
+}
+
+// Header 格式化為 Server-Timing：stage;dur=毫秒, ..., total;dur=毫秒
+func (t *Timings) Header() string {
+	t.mu.Lock()
+	defer t.mu.Unlock()
+	parts := make([]string, 0, len(t.names)+1)
+	for _, name := range t.names {
+		parts = append(parts, entry(name, t.values[name]))
+	}
+	parts = append(parts, entry("total", time.Since(t.start)))
+	return strings.Join(parts, ", ")
+}
+
+func entry(name string, d time.Duration) string {
+	return name + ";dur=" + strconv.FormatFloat(float64(d.Microseconds())/1000, 'f', 3, 64)
+}
+
+// Middleware 為每個請求建立 Timings，並在寫出 header 前加上 Server-Timing
+func Middleware() gin.HandlerFunc {
+	return func(c *gin.Context) {
+		t := &Timings{start: time.Now(), values: make(map[string]time.Duration)}
+		c.Request = c.Request.WithContext(context.WithValue(c.Request.Context(), timingsKey{}, t))
+		c.Writer = &timingWriter{ResponseWriter: c.Writer, timings: t}
+		c.Next()
+	}
+}
+
+// timingWriter 在第一次寫出 header 時補上 Server-Timing (此時 handler 已完成，total 為伺服器處理時間)
+type timingWriter struct {
+	gin.ResponseWriter
+	timings *Timings
+	written bool
+}
+
+func (w *timingWriter) WriteHeader(code int) {
+	w.addHeader()
+	w.ResponseWriter.WriteHeader(code)
+}
+
+func (w *timingWriter) WriteHeaderNow() {
+	w.addHeader()
+	w.ResponseWriter.WriteHeaderNow()
+}
+
+func (w *timingWriter) Write(data []byte) (int, error) {
+	w.addHeader()
+	return w.ResponseWriter.Write(data)
+}
+
+func (w *timingWriter) WriteString(s string) (int, error) {
+	w.addHeader()
+	return w.ResponseWriter.WriteString(s)
+}
+
+func (w *timingWriter) addHeader() {
+	if w.written || w.ResponseWriter.Written() {
+		return
+	}
+	w.written = true
+	w.Header().Set("Server-Timing", w.timings.Header())
+}
+
+// JSON 與 c.JSON 相同，但另外記錄 JSON 編碼的耗時 (json 階段)
+func JSON(c *gin.Context, code int, obj interface{}) {
+	start := time.Now()
+	data, err := json.Marshal(obj)
+	Since(c.Request.Context(), "json", start)
+	if err != nil {
+		c.JSON(http.StatusInternalServerError, gin.H{"error": err.Error()})
+		return
+	}
+	c.Data(code, "application/json; charset=utf-8", data)
+}
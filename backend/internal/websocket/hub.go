@@ -3,6 +3,16 @@ package websocket
 import (
 	"log"
 	"sync"
+
+	"rtb-backend/internal/metrics"
+)
+
+var (
+	// 每次廣播實際送出的訂閱者數
+	broadcastFanout = metrics.NewHistogramVec("ws_broadcast_fanout", "每次廣播送出的訂閱者數",
+		[]float64{0, 1, 10, 50, 100, 500, 1000, 5000, 10000}).WithLabelValues()
+	broadcastDropped = metrics.NewCounterVec("ws_broadcast_dropped_total", "送出緩衝區已滿而被斷開的連線數").WithLabelValues()
+	wsConnections    = metrics.NewGaugeVec("ws_connections", "目前的 WebSocket 連線數").WithLabelValues()
 )
 
 // Hub 管理所有 WebSocket 连接
@@ -44,6 +54,7 @@ func (h *Hub) Run() {
 			}
 			h.productSubscribers[client.productID][client] = true
 			h.mu.Unlock()
+			wsConnections.Add(1)
 			log.Printf("客户端已连接: productID=%s, total=%d", client.productID, len(h.productSubscribers[client.productID]))
 
 		case client := <-h.unregister:
@@ -52,6 +63,7 @@ func (h *Hub) Run() {
 				if _, ok := subscribers[client]; ok {
 					delete(subscribers, client)
 					close(client.send)
+					wsConnections.Add(-1)
 					if len(subscribers) == 0 {
 						delete(h.productSubscribers, client.productID)
 					}
@@ -70,6 +82,8 @@ func (h *Hub) Run() {
 					default:
 						close(client.send)
 						delete(subscribers, client)
+						wsConnections.Add(-1)
+						broadcastDropped.Inc()
 					}
 				}
 			}
@@ -85,12 +99,15 @@ func (h *Hub) BroadcastToProduct(productID string, message []byte) {
 	h.mu.RUnlock()
 
 	if !ok {
+		broadcastFanout.Observe(0)
 		return
 	}
 
+	sent := 0
 	for client := range subscribers {
 		select {
 		case client.send <- message:
+			sent++
 		default:
 			close(client.send)
 			h.mu.Lock()
@@ -99,7 +116,10 @@ func (h *Hub) BroadcastToProduct(productID string, message []byte) {
 				delete(h.productSubscribers, productID)
 			}
 			h.mu.Unlock()
+			wsConnections.Add(-1)
+			broadcastDropped.Inc()
 		}
 	}
+	broadcastFanout.Observe(float64(sent))
 }
 
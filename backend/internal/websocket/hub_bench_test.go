@@ -0,0 +1,48 @@
+package websocket
+
+import (
+	"fmt"
+	"sync"
+	"testing"
+)
+
+// BenchmarkBroadcastToProduct 量測單一商品對 N 個訂閱者的廣播扇出
+// 每個訂閱者由一個 goroutine 消化 send channel，模擬 writePump
+func BenchmarkBroadcastToProduct(b *testing.B) {
+	for _, subscribers := range []int{10, 100, 1_000, 10_000} {
+		b.Run(fmt.Sprintf("subscribers=%d", subscribers), func(b *testing.B) {
+			const productID = "bench"
+			h := NewHub()
+			h.productSubscribers[productID] = make(map[*Client]bool, subscribers)
+
+			var wg sync.WaitGroup
+			for i := 0; i < subscribers; i++ {
+				c := &Client{hub: h, send: make(chan []byte, 256), productID: productID}
+				h.productSubscribers[productID][c] = true
+				wg.Add(1)
+				go func() {
+					defer wg.Done()
+					for range c.send {
+					}
+				}()
+			}
+
+			message := []byte(`{"type":"bid_notification","productId":"bench","data":{"price":1000,"score":1000.5}}`)
+			b.ReportAllocs()
+			b.ResetTimer()
+			for i := 0; i < b.N; i++ {
+				h.BroadcastToProduct(productID, message)
+			}
+			b.StopTimer()
+
+			dropped := subscribers - len(h.productSubscribers[productID])
+			if dropped > 0 {
+				b.ReportMetric(float64(dropped), "dropped")
+			}
+			for c := range h.productSubscribers[productID] {
+				close(c.send)
+			}
+			wg.Wait()
+		})
+	}
+}
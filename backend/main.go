@@ -2,42 +2,64 @@ package main
 
 import (
 	"context"
+	"flag"
 	"fmt"
 	"log"
 	"net/http"
 	"os"
+	"strings"
 	"time"
 
 	"github.com/gin-gonic/gin"
-	"github.com/redis/go-redis/v9"
 	"github.com/gin-contrib/cors"
 
 	"rtb-backend/internal/auth"
 	"rtb-backend/internal/bidding"
 	"rtb-backend/internal/database"
+	"rtb-backend/internal/metrics"
 	"rtb-backend/internal/product"
+	"rtb-backend/internal/profiling"
+	"rtb-backend/internal/timing"
 	"rtb-backend/internal/websocket"
 )
 
 var ctx = context.Background()
 
 func main() {
+	// 復原指令：go run main.go -rebuild [-products=id1,id2]
+	rebuildOnly := flag.Bool("rebuild", false, "從 Postgres 重建 Redis 競標狀態後結束")
+	rebuildProducts := flag.String("products", "", "要重建的商品 ID (逗號分隔)，預設為所有尚未封存的商品")
+	flag.Parse()
+
 	// 1. 基礎建設初始化
-	redisHost := os.Getenv("REDIS_HOST")
-	if redisHost == "" {
-		redisHost = "localhost"
+	rdb := database.InitRedis(ctx)
+	db, writeDB := database.InitDB()
+	database.RegisterPoolMetrics(rdb, db, writeDB)
+
+	// Redis 狀態復原
+	rebuilder := bidding.NewRebuilder(rdb, db)
+	if *rebuildOnly {
+		var ids []string
+		if *rebuildProducts != "" {
+			ids = strings.Split(*rebuildProducts, ",")
+		}
+		stats, err := rebuilder.Rebuild(ctx, ids)
+		if err != nil {
+			log.Fatal("重建 Redis 競標狀態失敗:", err)
+		}
+		fmt.Printf("重建完成: %s\n", stats)
+		return
 	}
-	
-	rdb := redis.NewClient(&redis.Options{
-		Addr:     fmt.Sprintf("%s:6379", redisHost),
-		Password: "",
-		DB:       0,
-	})
-	if _, err := rdb.Ping(ctx).Result(); err != nil {
-		log.Fatal("Redis 連線失敗:", err)
+	// 啟動時自動補回遺失的商品設定與排行榜 (Redis 被清空或主從切換)
+	if os.Getenv("REDIS_REBUILD_ON_START") != "false" {
+		if _, err := rebuilder.RebuildMissing(ctx); err != nil {
+			log.Printf("啟動時重建 Redis 競標狀態失敗: %v", err)
+		}
 	}
 
-	db := database.InitDB()
+	// 排行榜、最高價等讀取導向 replica (未設定 replica 時全部走 primary)
+	readRouter := database.NewReadRouter(rdb)
+	go readRouter.Run(ctx)
 
 	// 2. WebSocket Hub 初始化
 	wsHub := websocket.NewHub()
@@ -45,8 +67,12 @@ func main() {
 
 	// 3. 服務層初始化 (Service Layer)
 	authService := auth.NewService(db)
-	bidService := bidding.NewService(rdb, db, wsHub)
-	productService := product.NewService(rdb, db)
+	bidService := bidding.NewService(rdb, readRouter, db, writeDB, wsHub)
+	productService := product.NewService(rdb, readRouter, db)
+
+	// 活動結束後的封存與 Redis 清理
+	archiver := bidding.NewArchiver(rdb, writeDB)
+	go archiver.Run(ctx)
 
 	// 3. 處理層初始化 (Handler Layer)
 	authHandler := auth.NewHandler(authService)
@@ -60,6 +86,7 @@ func main() {
         AllowOrigins:     []string{"http://localhost:5173", "https://main.d1e4097u1k6mv4.amplifyapp.com"},
         AllowMethods:     []string{"GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"},
         AllowHeaders:     []string{"Origin", "Content-Type", "Authorization"},
+        ExposeHeaders:    []string{"Server-Timing"},
         AllowCredentials: true,
         MaxAge: 12 * time.Hour,
     }))
@@ -72,6 +99,12 @@ func main() {
 		})
 	})
 
+	// Prometheus 指標
+	r.GET("/metrics", gin.WrapH(metrics.Handler()))
+
+	// pprof (設定 PPROF_TOKEN 才開放)
+	profiling.Register(r)
+
 	// Auth Routes
 	authGroup := r.Group("/api/auth")
 	{
@@ -86,7 +119,8 @@ func main() {
 
 	// API Routes (受保護)
 	api := r.Group("/api")
-	api.Use(auth.AuthMiddleware())
+	// Server-Timing 放在驗證之前，total 包含 JWT 驗證
+	api.Use(timing.Middleware(), auth.AuthMiddleware())
 	{
 		// Bidding
 		api.POST("/products/:id/bids", bidHandler.PlaceBid)
@@ -7,6 +7,11 @@
 -- ARGV[4]: end_time
 -- ARGV[5]: bid_details
 -- ARGV[6]: price
+-- ARGV[7]: rank_cap (排行榜成員上限，0 代表不限制)
+--
+-- 回傳: { status, trimmed_user, trimmed_score, trimmed_details, ... }
+--   status = 1 成功, -1 活動已結束
+--   之後每三個元素為一位被移出排行榜的成員
 
 local rank_key = KEYS[1]
 local bids_key = KEYS[2]
@@ -17,17 +22,18 @@ local now_time = tonumber(ARGV[3])
 local end_time = tonumber(ARGV[4])
 local bid_details = ARGV[5]
 local price = tonumber(ARGV[6])
+local rank_cap = tonumber(ARGV[7] or 0)
 
 -- 檢查活動是否結束
 if now_time > end_time then
-    return -1
+    return { -1 }
 end
 
 -- 寫入排行榜
 redis.call("ZADD", rank_key, score, user_id)
 
 -- 寫入詳細資訊 (價格、時間、權重)
--- 逗號分隔的字串，省空間
+-- 固定長度的二進位編碼，省空間
 redis.call("HSET", bids_key, user_id, bid_details)
 
 -- 更新全域最高價
@@ -37,4 +43,27 @@ if price > current_highest then
     redis.call("HSET", config_key, "currentHighestPrice", price)
 end
 
-return 1
\ No newline at end of file
+local result = { 1 }
+
+-- 限制排行榜大小：移出最低分的成員，交由呼叫端封存
+-- 單次最多移出 max_trim 名，避免對既有的大型排行榜啟用上限時阻塞 Redis
+local max_trim = 128
+if rank_cap > 0 then
+    local excess = redis.call("ZCARD", rank_key) - rank_cap
+    if excess > max_trim then
+        excess = max_trim
+    end
+    if excess > 0 then
+        local popped = redis.call("ZPOPMIN", rank_key, excess)
+        for i = 1, #popped, 2 do
+            local member = popped[i]
+            local details = redis.call("HGET", bids_key, member) or ""
+            redis.call("HDEL", bids_key, member)
+            table.insert(result, member)
+            table.insert(result, popped[i + 1])
+            table.insert(result, details)
+        end
+    end
+end
+
+return result
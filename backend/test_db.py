@@ -56,18 +56,18 @@ def query_ended_products_rankings(conn):
         print(f"起標價: ${base_price:,.2f}")
         print("-" * 80)
         
-        # 2. 查詢該商品的出價排名（按 score 降序）
+        # 2. 查詢該商品的出價排名（每位使用者最新一筆，按 score 降序，走 idx_latest_bids_product_score）
         cursor.execute("""
             SELECT 
-                bl.user_id,
-                COALESCE(u.username, 'User_' || bl.user_id) as display_name,
-                bl.price,
-                bl.score,
-                bl.created_at
-            FROM bid_logs bl
-            LEFT JOIN users u ON u.id::text = bl.user_id
-            WHERE bl.product_id = %s
-            ORDER BY bl.score DESC
+                lb.user_id,
+                COALESCE(u.username, 'User_' || lb.user_id) as display_name,
+                lb.price,
+                lb.score,
+                lb.created_at
+            FROM latest_bids lb
+            LEFT JOIN users u ON u.id = lb.user_id
+            WHERE lb.product_id = %s
+            ORDER BY lb.score DESC
             LIMIT %s;
         """, (product_id, k))
         
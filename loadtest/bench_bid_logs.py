@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+bid_logs 基準測試：寫入吞吐量與活動結束後的排名查詢
+
+在後端建立的 schema 上 (分區 bid_logs + trigger 維護的 latest_bids，見
+backend/internal/database/bidlogs.go) 灌入大量出價，量測：
+1. 批次寫入：伺服器端 generate_series 以 INSERT ... SELECT 分批寫入的 rows/s (含 trigger 成本)
+2. 單筆寫入：多條連線各自逐筆 INSERT，對應後端每筆出價一個 INSERT 的寫法
+3. 排名查詢：隨機商品的前 K 名，分別查 bid_logs (product_id, score DESC) 與 latest_bids
+加上 --legacy 時另建一張舊版結構的表 (未分區、user_id 為字串、單欄索引) 灌入相同筆數作為對照。
+
+使用方式 (先啟動一次後端完成 migration)：
+python bench_bid_logs.py --dsn "host=localhost user=admin password=password123 dbname=auction_db" \\
+    --rows 50000000 --products 1000 --legacy
+
+注意：會寫入 product_id 以 bench-bl- 開頭的出價，結束後刪除 (--keep 保留)，請勿對正式環境執行。
+"""
+
+import argparse
+import random
+import threading
+import time
+
+import psycopg2
+
+from histogram import LatencyHistogram
+
+PRODUCT_PREFIX = "bench-bl-"
+LEGACY_TABLE = "bench_bid_logs_legacy"
+
+# 價格與分數大致對應後端 CalculateScore：alpha × price + beta / (t + 1) + gamma × weight
+SEED_SQL = """
+    INSERT INTO {table} (user_id, product_id, price, score, created_at)
+    SELECT {user_expr}, pid, p, p + 0.5 / (1 + t) + 0.3, now() - t * interval '1 second'
+    FROM (
+        SELECT (random() * %(users)s)::bigint + 1 AS u,
+               %(prefix)s || (g %% %(products)s) AS pid,
+               100 + random() * 10000 AS p,
+               random() * 3600 AS t
+        FROM generate_series(%(lo)s, %(hi)s - 1) AS g
+    ) s
+"""
+
+RANKING_SQL = {
+    "bid_logs": "SELECT user_id, price, score FROM bid_logs WHERE product_id = %s ORDER BY score DESC LIMIT %s",
+    "latest_bids": "SELECT user_id, price, score FROM latest_bids WHERE product_id = %s ORDER BY score DESC LIMIT %s",
+    "legacy": f"SELECT user_id, price, score FROM {LEGACY_TABLE} WHERE product_id = %s ORDER BY score DESC LIMIT %s",
+}
+
+
+def connect(dsn):
+    conn = psycopg2.connect(dsn)
+    conn.autocommit = True
+    return conn
+
+
+def check_schema(conn):
+    with conn.cursor() as cur:
+        cur.execute("SELECT relkind::text FROM pg_class WHERE oid = to_regclass('bid_logs')")
+        row = cur.fetchone()
+        cur.execute("SELECT to_regclass('latest_bids') IS NOT NULL")
+        has_latest = cur.fetchone()[0]
+    if not row or row[0] != "p" or not has_latest:
+        raise SystemExit("bid_logs 尚未遷移為分區表，請先啟動一次後端 (MigrateBidLogs)")
+
+
+def create_legacy(conn):
+    with conn.cursor() as cur:
+        cur.execute(f"DROP TABLE IF EXISTS {LEGACY_TABLE}")
+        cur.execute(f"""
+            CREATE TABLE {LEGACY_TABLE} (
+                id bigserial PRIMARY KEY,
+                user_id text,
+                product_id text,
+                price double precision,
+                score double precision,
+                created_at timestamptz
+            )""")
+        cur.execute(f"CREATE INDEX ON {LEGACY_TABLE} (user_id)")
+        cur.execute(f"CREATE INDEX ON {LEGACY_TABLE} (product_id)")
+
+
+def seed(conn, table, rows, products, users, batch):
+    """分批寫入，回傳 (筆數, 秒數)"""
+    user_expr = "u::text" if table == LEGACY_TABLE else "u"
+    sql = SEED_SQL.format(table=table, user_expr=user_expr)
+    start = time.time()
+    done = 0
+    with conn.cursor() as cur:
+        while done < rows:
+            n = min(batch, rows - done)
+            cur.execute(sql, {"users": users, "prefix": PRODUCT_PREFIX, "products": products,
+                              "lo": done, "hi": done + n})
+            done += n
+            elapsed = time.time() - start
+            print(f"  {table}: {done:>12,} / {rows:,}  {done / elapsed:>10,.0f} rows/s", flush=True)
+    with conn.cursor() as cur:
+        cur.execute(f"ANALYZE {table}")
+        if table == "bid_logs":
+            cur.execute("ANALYZE latest_bids")
+    return done, time.time() - start
+
+
+def run_threads(workers, target):
+    """各執行緒執行 target(i, hist)，回傳 (合併後的延遲直方圖, 秒數)"""
+    hists = [LatencyHistogram() for _ in range(workers)]
+    threads = [threading.Thread(target=target, args=(i, hists[i])) for i in range(workers)]
+    start = time.time()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.time() - start
+    total = LatencyHistogram()
+    for h in hists:
+        total.merge(h)
+    return total, elapsed
+
+
+def single_inserts(dsn, count, workers, products, users, seed_value):
+    """逐筆 INSERT 到 bid_logs (每筆自動 commit)"""
+    per_worker = count // workers
+
+    def worker(i, hist):
+        rng = random.Random(seed_value + i)
+        conn = connect(dsn)
+        try:
+            with conn.cursor() as cur:
+                for _ in range(per_worker):
+                    price = 100 + rng.random() * 10000
+                    t0 = time.perf_counter()
+                    cur.execute(
+                        "INSERT INTO bid_logs (user_id, product_id, price, score, created_at) "
+                        "VALUES (%s, %s, %s, %s, now())",
+                        (rng.randint(1, users), f"{PRODUCT_PREFIX}{rng.randrange(products)}", price, price + 0.3))
+                    hist.record((time.perf_counter() - t0) * 1000)
+        finally:
+            conn.close()
+
+    return run_threads(workers, worker)
+
+
+def ranking_queries(dsn, sql, queries, readers, products, k, seed_value):
+    per_reader = queries // readers
+
+    def reader(i, hist):
+        rng = random.Random(seed_value + i)
+        conn = connect(dsn)
+        try:
+            with conn.cursor() as cur:
+                for _ in range(per_reader):
+                    t0 = time.perf_counter()
+                    cur.execute(sql, (f"{PRODUCT_PREFIX}{rng.randrange(products)}", k))
+                    cur.fetchall()
+                    hist.record((time.perf_counter() - t0) * 1000)
+        finally:
+            conn.close()
+
+    return run_threads(readers, reader)
+
+
+def table_size(conn, table):
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT COALESCE(sum(pg_total_relation_size(c.oid)), 0)
+            FROM pg_class c
+            WHERE c.oid = to_regclass(%s)
+               OR c.oid IN (SELECT inhrelid FROM pg_inherits WHERE inhparent = to_regclass(%s))
+        """, (table, table))
+        return cur.fetchone()[0]
+
+
+def format_bytes(n):
+    for unit in ("B", "KB", "MB", "GB"):
+        if n < 1024:
+            return f"{n:8.1f} {unit}"
+        n /= 1024
+    return f"{n:8.1f} TB"
+
+
+def print_latency(label, hist, elapsed):
+    rate = hist.count / elapsed if elapsed else 0
+    print(f"{label:<28} {rate:>10,.0f}/s  p50 {hist.percentile(50):7.2f} ms  p99 {hist.percentile(99):7.2f} ms")
+
+
+def cleanup(conn, legacy):
+    print("清除測試資料...")
+    with conn.cursor() as cur:
+        cur.execute("DELETE FROM bid_logs WHERE product_id LIKE %s", (PRODUCT_PREFIX + "%",))
+        cur.execute("DELETE FROM latest_bids WHERE product_id LIKE %s", (PRODUCT_PREFIX + "%",))
+        if legacy:
+            cur.execute(f"DROP TABLE IF EXISTS {LEGACY_TABLE}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="bid_logs 寫入吞吐量與排名查詢基準測試")
+    parser.add_argument("--dsn", default="host=localhost user=admin password=password123 dbname=auction_db")
+    parser.add_argument("--rows", type=int, default=50_000_000)
+    parser.add_argument("--products", type=int, default=1000)
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--batch", type=int, default=1_000_000, help="每個 INSERT ... SELECT 的筆數")
+    parser.add_argument("--single", type=int, default=20_000, help="逐筆 INSERT 的總筆數，0 代表略過")
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--legacy", action="store_true", help="另建舊版結構的表作為對照")
+    parser.add_argument("--keep", action="store_true", help="測試結束後保留資料")
+    args = parser.parse_args()
+
+    conn = connect(args.dsn)
+    check_schema(conn)
+
+    print(f"出價: {args.rows:,}  商品: {args.products:,}  使用者: {args.users:,}  K: {args.k}")
+    print("=" * 80)
+    try:
+        tables = ["bid_logs"]
+        if args.legacy:
+            create_legacy(conn)
+            tables.append(LEGACY_TABLE)
+
+        print("批次寫入")
+        seeded = {}
+        for table in tables:
+            seeded[table] = seed(conn, table, args.rows, args.products, args.users, args.batch)
+
+        if args.single:
+            single_hist, single_elapsed = single_inserts(args.dsn, args.single, args.writers, args.products, args.users, args.seed)
+
+        queries = [("bid_logs", RANKING_SQL["bid_logs"]), ("latest_bids", RANKING_SQL["latest_bids"])]
+        if args.legacy:
+            queries.append((LEGACY_TABLE, RANKING_SQL["legacy"]))
+        results = [(label, *ranking_queries(args.dsn, sql, args.queries, args.readers, args.products, args.k, args.seed))
+                   for label, sql in queries]
+
+        print("=" * 80)
+        print(f"{'寫入':<28} {'rows/s':>12} {'耗時':>8} {'表 + 索引大小':>14}")
+        print("-" * 80)
+        for table, (rows, elapsed) in seeded.items():
+            print(f"{table:<28} {rows / elapsed:>12,.0f} {elapsed:7.1f}s {format_bytes(table_size(conn, table))}")
+        print(f"{'latest_bids':<28} {'(trigger)':>12} {'':>8} {format_bytes(table_size(conn, 'latest_bids'))}")
+        if args.single:
+            print_latency(f"逐筆 INSERT ×{args.writers}", single_hist, single_elapsed)
+
+        print("-" * 80)
+        print(f"排名查詢 (前 {args.k} 名，{args.readers} 條連線)")
+        for label, hist, elapsed in results:
+            print_latency(label, hist, elapsed)
+    finally:
+        if not args.keep:
+            cleanup(conn, args.legacy)
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Locust client 基準測試：HttpUser 與 FastHttpUser 的每核心吞吐量
+
+對本機 mock 後端 (mock_server.py) 依序執行 locustfile.py 的 HttpUser 類別與 locustfile_fast.py 的
+FastHttpUser 類別，每個階段都是單一 Locust process、相同的用戶數與時間，並以 USER_PACE_RPS 設定高於
+client 能送出的 task 速率，讓 Locust 本身成為瓶頸。每個階段重新啟動 mock (商品與最高價從頭開始)，
+以獨立的 RUN_ID 執行，請求數取自 runs/<run_id>/summary.json，CPU 時間為 Locust process 的 user + sys。
+
+輸出每個實作的 req/s、Locust CPU 使用率與每 CPU 秒的請求數 (每核心 RPS)，並列出 Fast 版本的倍數。
+FinalRushUser 只在商品結束前 2 秒出價，mock 以 --end-at 讓商品在 Locust 停止前到期 (啟動 Locust 前一刻加上
+階段秒數，Locust 的 -t 從載入完成後才計時)，讓最後 2 秒包含截止前出價。
+
+使用方式：
+python bench_http_clients.py --users 50 --duration 30
+python bench_http_clients.py --pair BiddingUser=FastBiddingUser --repeat 3 --mock-workers 4
+"""
+
+import argparse
+import json
+import os
+import resource
+import socket
+import subprocess
+import sys
+import time
+
+from runlog import RUNS_DIR, new_run_id
+
+LOADTEST_DIR = os.path.dirname(os.path.abspath(__file__))
+PAIRS = [
+    ("BiddingUser", "FastBiddingUser"),
+    ("ExponentialRampUpUser", "FastExponentialRampUpUser"),
+    ("FinalRushUser", "FastFinalRushUser"),
+]
+LOCUSTFILES = {"http": "locustfile.py", "fast": "locustfile_fast.py"}
+# 不連到 mock 以外的服務 (/ws 推播、Redis / Postgres 遙測、profile)
+DISABLED_ENV = {"PRICE_ORACLE_CONNECTIONS": "0"}
+CLEARED_ENV = ("REDIS_TELEMETRY_URL", "PG_TELEMETRY_DSN", "PROFILE_PHASES", "TRAFFIC_MODEL", "SCENARIO")
+
+
+def parse_pair(text):
+    http, _, fast = text.partition("=")
+    if not fast:
+        raise argparse.ArgumentTypeError("格式為 HttpUser類別=FastHttpUser類別")
+    return http, fast
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_port(port, timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.5).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise SystemExit(f"mock 在 {timeout}s 內沒有啟動 (port {port})")
+
+
+def cpu_seconds(usage):
+    return usage.ru_utime + usage.ru_stime
+
+
+def run_stage(args, bench_id, kind, user_class, round_no):
+    """啟動 mock，執行一個 Locust 階段並回傳 {req/s, CPU 秒, 每核心 RPS}"""
+    port = free_port()
+    run_time = args.ramp + args.duration
+    # mock 啟動後隨即啟動 Locust，結束時間不晚於 Locust 停止的時間
+    end_at = time.time() + run_time
+    mock = subprocess.Popen([sys.executable, "mock_server.py", "--port", str(port), "--products", str(args.products),
+                             "--end-at", f"{end_at:.3f}", "--workers", str(args.mock_workers)],
+                            cwd=LOADTEST_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_port(port)
+        run_id = f"{bench_id}-{user_class}-{round_no}"
+        run_dir = os.path.join(RUNS_DIR, run_id)
+        os.makedirs(run_dir, exist_ok=True)
+        cmd = ["locust", "-f", LOCUSTFILES[kind], "--headless", "--only-summary",
+               "-u", str(args.users), "-r", f"{max(args.users / max(args.ramp, 1), 1):.2f}",
+               "-t", f"{run_time}s", "--host", f"http://127.0.0.1:{port}", "--stop-timeout", "5", user_class]
+        env = dict(os.environ, RUN_ID=run_id, RUNS_DIR=RUNS_DIR, USER_PACE_RPS=str(args.pace), **DISABLED_ENV)
+        for key in CLEARED_ENV:
+            env.pop(key, None)
+
+        # mock 還沒結束，RUSAGE_CHILDREN 的差值只包含 Locust
+        before = cpu_seconds(resource.getrusage(resource.RUSAGE_CHILDREN))
+        with open(os.path.join(run_dir, "locust.log"), "w", encoding="utf-8") as log:
+            subprocess.run(cmd, cwd=LOADTEST_DIR, env=env, stdout=log, stderr=subprocess.STDOUT,
+                           timeout=run_time + 120)
+        cpu = cpu_seconds(resource.getrusage(resource.RUSAGE_CHILDREN)) - before
+    finally:
+        mock.terminate()
+        mock.wait()
+
+    path = os.path.join(run_dir, "summary.json")
+    if not os.path.exists(path):
+        raise SystemExit(f"{user_class} 沒有產生 summary.json，請查看 {os.path.join(run_dir, 'locust.log')}")
+    with open(path, encoding="utf-8") as f:
+        summary = json.load(f)
+    requests_total = sum(e["count"] for e in summary["endpoints"].values())
+    failures = sum(e["failures"] for e in summary["endpoints"].values())
+    return {
+        "run_id": run_id,
+        "user_class": user_class,
+        "requests": requests_total,
+        "rps": summary["throughput"],
+        "bid_rps": summary["bid_rps"],
+        "failure_ratio": failures / requests_total if requests_total else 0.0,
+        "cpu_seconds": cpu,
+        "cpu_util": cpu / summary["duration"],
+        "per_core_rps": requests_total / cpu if cpu > 0 else 0.0,
+    }
+
+
+def best(results):
+    """重複執行時取每核心 RPS 最高的一次 (排除其他 process 干擾造成的低估)"""
+    return max(results, key=lambda r: r["per_core_rps"])
+
+
+def print_row(r):
+    print(f"  {r['user_class']:<26} {r['rps']:9.1f} {r['bid_rps']:9.1f} {r['cpu_util'] * 100:7.0f}% "
+          f"{r['per_core_rps']:11.1f}   {r['failure_ratio'] * 100:5.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="比較 HttpUser 與 FastHttpUser 的每核心吞吐量")
+    parser.add_argument("--pair", type=parse_pair, action="append",
+                        help="HttpUser類別=FastHttpUser類別 (可重複，預設三組都跑)")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--ramp", type=int, default=5, help="爬升秒數 (計入結果)")
+    parser.add_argument("--duration", type=int, default=30, help="每個階段的秒數 (不含爬升)")
+    parser.add_argument("--pace", type=float, default=100, help="每個用戶每秒的 task 上限 (USER_PACE_RPS)")
+    parser.add_argument("--products", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=1, help="每個類別執行幾次，取最佳值")
+    parser.add_argument("--mock-workers", type=int, default=max((os.cpu_count() or 2) - 1, 1),
+                        help="mock 的 process 數 (預設 CPU 數 - 1)")
+    args = parser.parse_args()
+
+    bench_id = f"bench-http-{new_run_id()}"
+    pairs = args.pair or PAIRS
+    print(f"[bench] {args.users} 用戶 × {args.pace:g} task/s 上限，每階段 {args.ramp + args.duration}s，"
+          f"mock {args.mock_workers} process，輸出: {os.path.join(RUNS_DIR, bench_id)}-*")
+
+    report = []
+    for http_class, fast_class in pairs:
+        row = {}
+        for kind, user_class in (("http", http_class), ("fast", fast_class)):
+            results = []
+            for round_no in range(1, args.repeat + 1):
+                print(f"[bench] {user_class} 第 {round_no} 次 ...", flush=True)
+                results.append(run_stage(args, bench_id, kind, user_class, round_no))
+            row[kind] = best(results)
+        report.append(row)
+
+    print(f"\n  {'類別':<24} {'req/s':>9} {'出價/s':>8} {'CPU':>8} {'每核心 RPS':>10}   失敗")
+    for row in report:
+        print_row(row["http"])
+        print_row(row["fast"])
+        http_rate, fast_rate = row["http"]["per_core_rps"], row["fast"]["per_core_rps"]
+        ratio = f"{fast_rate / http_rate:.2f}x" if http_rate else "-"
+        print(f"  {'→ FastHttpUser 每核心 RPS':<26} {ratio}")
+
+    path = os.path.join(RUNS_DIR, f"{bench_id}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"bench_id": bench_id, "args": {k: v for k, v in vars(args).items() if k != "pair"},
+                   "pairs": report}, f, ensure_ascii=False, indent=2)
+    print(f"\n結果: {path}")
+
+
+if __name__ == "__main__":
+    main()
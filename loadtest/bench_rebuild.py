@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Redis 重建基準測試：從大量 bid_logs 重建競標狀態的速率
+
+以 seed_data.py 建立 --products 個已結束但未封存的商品與 --rows 筆出價 (預設 1000 萬，latest_bids 由回填產生)，
+再以後端的復原指令 (go run main.go -rebuild -products=...) 重建這些商品的 config / rank / bids，
+解析輸出的「重建完成: products=…, rows=…, elapsed=…, rate=… rows/s」。重複 --repeat 次取中位數。
+重建的筆數是 latest_bids (每位使用者在每個商品最新的一筆)，一併列出 bid_logs 的筆數對照。
+
+後端依自己的環境變數連線 (DB_HOST / DB_PORT / DB_USER / DB_PASSWORD、REDIS_ADDRS)，需與 --dsn 指向同一個 Postgres。
+
+使用方式 (先啟動一次後端完成 migration)：
+python bench_rebuild.py --dsn "host=localhost user=admin password=password123 dbname=auction_db" \\
+    --rows 10000000 --products 100 --repeat 3 --redis-url redis://localhost:6379
+
+注意：會寫入 id 以 bench-rb- 開頭的商品與 bench-rb-user_* 使用者，結束後刪除 (--keep 保留，--skip-seed 沿用上次保留的資料)；
+--redis-url 用來在結束後刪除重建出的 Redis Key。請勿對正式環境執行。
+"""
+
+import argparse
+import os
+import re
+import shlex
+import statistics
+import subprocess
+import sys
+import time
+
+import psycopg2
+
+from seed_data import clean
+
+LOADTEST_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.join(os.path.dirname(LOADTEST_DIR), "backend")
+PRODUCT_PREFIX = "bench-rb-"
+RESULT_RE = re.compile(r"重建完成: products=(\d+), rows=(\d+), elapsed=([^,]+), rate=(\d+) rows/s")
+
+
+def seed(args):
+    cmd = [sys.executable, "seed_data.py", "--dsn", args.dsn, "--clean", "--prefix", PRODUCT_PREFIX,
+           "--users", str(args.users), "--products", str(args.products), "--bids", str(args.rows),
+           "--k", str(args.k), "--seed", str(args.seed), "--no-archive-jobs", "--defer-latest"]
+    if args.workers:
+        cmd += ["--workers", str(args.workers)]
+    print(f"建立資料: {' '.join(cmd[2:])}")
+    subprocess.run(cmd, cwd=LOADTEST_DIR, check=True)
+
+
+def counts(conn):
+    """(商品 id, bid_logs 筆數, latest_bids 筆數)"""
+    like = PRODUCT_PREFIX + "%"
+    with conn.cursor() as cur:
+        cur.execute("SELECT id FROM products WHERE id LIKE %s ORDER BY id", (like,))
+        ids = [row[0] for row in cur.fetchall()]
+        cur.execute("SELECT count(*) FROM bid_logs WHERE product_id LIKE %s", (like,))
+        bid_logs = cur.fetchone()[0]
+        cur.execute("SELECT count(*) FROM latest_bids WHERE product_id LIKE %s", (like,))
+        latest = cur.fetchone()[0]
+    conn.commit()
+    return ids, bid_logs, latest
+
+
+def rebuild(args, ids):
+    """執行一次復原指令，回傳 {rows, elapsed (後端量測), rate, wall (含啟動與連線)}"""
+    cmd = shlex.split(args.rebuild_cmd) + [f"-products={','.join(ids)}"]
+    start = time.time()
+    res = subprocess.run(cmd, cwd=args.backend_dir, capture_output=True, text=True)
+    wall = time.time() - start
+    output = res.stdout + res.stderr
+    match = RESULT_RE.search(output)
+    if res.returncode != 0 or not match:
+        raise SystemExit(f"重建失敗 (exit {res.returncode}):\n{output[-2000:]}")
+    return {
+        "rows": int(match.group(2)),
+        "elapsed": match.group(3),
+        "rate": float(match.group(4)),
+        "wall": wall,
+    }
+
+
+def clean_redis(redis_url, ids):
+    import redis
+
+    client = redis.Redis.from_url(redis_url)
+    for pid in ids:
+        # 同一商品的 Key 在同一個 slot (hash tag)，Cluster 模式下也能一次刪除
+        client.unlink(*(f"auction:{{{pid}}}:{suffix}" for suffix in ("config", "rank", "bids")))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="從大量 bid_logs 重建 Redis 競標狀態的速率")
+    parser.add_argument("--dsn", default="host=localhost user=admin password=password123 dbname=auction_db")
+    parser.add_argument("--rows", type=int, default=10_000_000, help="bid_logs 筆數")
+    parser.add_argument("--products", type=int, default=100)
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--workers", type=int, default=0, help="seed_data.py 的 process 數 (預設 CPU 數)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--backend-dir", default=BACKEND_DIR)
+    parser.add_argument("--rebuild-cmd", default="go run main.go -rebuild",
+                        help="復原指令 (例如已編譯的 ./rtb-backend -rebuild)")
+    parser.add_argument("--redis-url", default="", help="結束後刪除重建出的 Redis Key")
+    parser.add_argument("--skip-seed", action="store_true", help="沿用先前以 --keep 保留的資料")
+    parser.add_argument("--keep", action="store_true", help="測試結束後保留資料")
+    args = parser.parse_args()
+
+    if not args.skip_seed:
+        seed(args)
+    conn = psycopg2.connect(args.dsn)
+    ids, bid_logs, latest = counts(conn)
+    if not ids:
+        raise SystemExit(f"找不到 {PRODUCT_PREFIX}* 商品")
+
+    print("=" * 80)
+    print(f"商品: {len(ids):,}  bid_logs: {bid_logs:,}  latest_bids (重建筆數): {latest:,}")
+    print(f"{'#':<4} {'筆數':>14} {'後端耗時':>12} {'rows/s':>12} {'含啟動':>10}")
+    print("-" * 80)
+    results = []
+    try:
+        for i in range(1, args.repeat + 1):
+            r = rebuild(args, ids)
+            results.append(r)
+            print(f"{i:<4} {r['rows']:>14,} {r['elapsed']:>12} {r['rate']:>12,.0f} {r['wall']:9.1f}s", flush=True)
+        print("-" * 80)
+        print(f"重建速率中位數: {statistics.median(r['rate'] for r in results):,.0f} rows/s "
+              f"(bid_logs {bid_logs:,} 筆 → {latest:,} 名出價者)")
+    finally:
+        if args.redis_url:
+            clean_redis(args.redis_url, ids)
+        if not args.keep:
+            clean(conn, PRODUCT_PREFIX)
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Redis Cluster 出價吞吐量基準測試
+
+在本機啟動 N 個 cluster-enabled 的 redis-server (N = 每個 shard 數)，
+將 16384 個 slot 平均分配後，以多個 process 對大量商品並發執行 place_bid.lua，
+比較不同 shard 數下的出價吞吐量 (bids/s)。
+
+Key 使用與後端相同的 hash tag：auction:{productId}:rank / bids / config，
+同一商品的 Key 落在同一個 slot，不同商品分散到不同 shard。
+
+使用方式：
+python bench_redis_cluster.py --shards 1,2,4 --products 200 --workers 8 --duration 20
+
+需求：PATH 中有 redis-server (>= 6.2)，以及 pip 安裝的 redis (>= 5.0)
+"""
+
+import argparse
+import multiprocessing
+import os
+import random
+import shutil
+import subprocess
+import tempfile
+import time
+
+import redis
+from redis.cluster import ClusterNode, RedisCluster
+
+from bench_redis_memory import encode_binary
+
+SCRIPT_PATH = os.path.join(os.path.dirname(__file__), "..", "backend", "scripts", "place_bid.lua")
+TOTAL_SLOTS = 16384
+BASE_PORT = 7100
+
+
+def config_key(product_id):
+    return f"auction:{{{product_id}}}:config"
+
+
+def rank_key(product_id):
+    return f"auction:{{{product_id}}}:rank"
+
+
+def bids_key(product_id):
+    return f"auction:{{{product_id}}}:bids"
+
+
+def cluster_state(node):
+    """讀取 CLUSTER INFO 中的 cluster_state (不同 redis-py 版本可能回傳 dict 或原始字串)"""
+    info = node.execute_command("CLUSTER INFO")
+    if isinstance(info, dict):
+        return info.get("cluster_state")
+    if isinstance(info, bytes):
+        info = info.decode()
+    for line in info.splitlines():
+        if line.startswith("cluster_state:"):
+            return line.split(":", 1)[1].strip()
+    return None
+
+
+class LocalCluster:
+    """在本機啟動 N 個節點並手動分配 slot (redis-cli --cluster create 至少需要 3 個 master)"""
+
+    def __init__(self, shards, base_port, redis_server):
+        self.shards = shards
+        self.ports = [base_port + i for i in range(shards)]
+        self.redis_server = redis_server
+        self.workdir = tempfile.mkdtemp(prefix="rtb-cluster-")
+        self.processes = []
+
+    def __enter__(self):
+        for port in self.ports:
+            node_dir = os.path.join(self.workdir, str(port))
+            os.makedirs(node_dir)
+            self.processes.append(subprocess.Popen(
+                [
+                    self.redis_server,
+                    "--port", str(port),
+                    "--cluster-enabled", "yes",
+                    "--cluster-config-file", "nodes.conf",
+                    "--appendonly", "no",
+                    "--save", "",
+                    "--dir", node_dir,
+                ],
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            ))
+
+        nodes = [redis.Redis(port=port) for port in self.ports]
+        for node in nodes:
+            self._wait(node.ping)
+
+        # 平均分配 slot 並讓所有節點互相認識
+        per_shard = TOTAL_SLOTS // self.shards
+        for i, node in enumerate(nodes):
+            start = i * per_shard
+            end = TOTAL_SLOTS if i == self.shards - 1 else start + per_shard
+            node.execute_command("CLUSTER ADDSLOTS", *range(start, end))
+        for node in nodes[1:]:
+            node.execute_command("CLUSTER MEET", "127.0.0.1", self.ports[0])
+
+        self._wait(lambda: all(cluster_state(node) == "ok" for node in nodes))
+        return self
+
+    def __exit__(self, *exc):
+        for process in self.processes:
+            process.terminate()
+        for process in self.processes:
+            process.wait(timeout=10)
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+    @staticmethod
+    def _wait(check, timeout=15):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            try:
+                if check():
+                    return
+            except redis.exceptions.ConnectionError:
+                pass
+            time.sleep(0.1)
+        raise TimeoutError("本機 Redis Cluster 啟動逾時")
+
+
+def connect(port):
+    return RedisCluster(startup_nodes=[ClusterNode("127.0.0.1", port)], decode_responses=False)
+
+
+def setup_products(port, num_products, script):
+    """建立商品設定並將腳本載入到每個 master"""
+    client = connect(port)
+    end_time = int(time.time() * 1000) + 3600_000
+    for i in range(num_products):
+        client.hset(config_key(f"bench_{i}"), mapping={
+            "endTime": end_time,
+            "k": 5,
+            "currentHighestPrice": 1000,
+        })
+    sha = None
+    for node in client.get_primaries():
+        sha = client.get_redis_connection(node).script_load(script)
+    client.close()
+    return sha
+
+
+def worker(port, sha, num_products, duration, pipeline_depth, seed, result_queue):
+    """持續對隨機商品出價，回傳成功筆數"""
+    rng = random.Random(seed)
+    client = connect(port)
+    end_time = int(time.time() * 1000) + 3600_000
+    prices = [1000.0] * num_products
+    done = 0
+    deadline = time.time() + duration
+
+    while time.time() < deadline:
+        pipe = client.pipeline()
+        for _ in range(pipeline_depth):
+            idx = rng.randrange(num_products)
+            product_id = f"bench_{idx}"
+            prices[idx] += rng.uniform(1, 10)
+            user_id = str(rng.randint(1, 1_000_000))
+            now = int(time.time() * 1000)
+            pipe.evalsha(
+                sha, 3,
+                rank_key(product_id), bids_key(product_id), config_key(product_id),
+                user_id, round(prices[idx] + 0.3, 4), now, end_time,
+                encode_binary(prices[idx], rng.randint(0, 60_000), 1.2), prices[idx], 0,
+            )
+        pipe.execute()
+        done += pipeline_depth
+
+    client.close()
+    result_queue.put(done)
+
+
+def run(shards, args, script):
+    with LocalCluster(shards, args.base_port, args.redis_server):
+        sha = setup_products(args.base_port, args.products, script)
+
+        result_queue = multiprocessing.Queue()
+        processes = [
+            multiprocessing.Process(
+                target=worker,
+                args=(args.base_port, sha, args.products, args.duration, args.pipeline, args.seed + i, result_queue),
+            )
+            for i in range(args.workers)
+        ]
+        start = time.time()
+        for p in processes:
+            p.start()
+        total = sum(result_queue.get() for _ in processes)
+        for p in processes:
+            p.join()
+        return total, time.time() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="比較不同 shard 數下 place_bid.lua 的吞吐量")
+    parser.add_argument("--shards", default="1,2,4", help="逗號分隔的 shard 數")
+    parser.add_argument("--products", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=max(2, multiprocessing.cpu_count() // 2))
+    parser.add_argument("--pipeline", type=int, default=16, help="每個 worker 的 pipeline 深度")
+    parser.add_argument("--duration", type=float, default=20, help="每個情境的秒數")
+    parser.add_argument("--base-port", type=int, default=BASE_PORT)
+    parser.add_argument("--redis-server", default=shutil.which("redis-server") or "redis-server")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    with open(SCRIPT_PATH, encoding="utf-8") as f:
+        script = f.read()
+
+    print(f"商品: {args.products}  workers: {args.workers}  pipeline: {args.pipeline}  每情境: {args.duration}s")
+    print("=" * 60)
+    print(f"{'shards':>6} {'bids':>12} {'bids/s':>12} {'相對 1 shard':>14}")
+    print("-" * 60)
+
+    baseline = None
+    for shards in [int(s) for s in args.shards.split(",")]:
+        total, elapsed = run(shards, args, script)
+        rate = total / elapsed
+        if baseline is None:
+            baseline = rate
+        print(f"{shards:>6} {total:>12,} {rate:>12,.0f} {rate / baseline:>13.2f}x")
+
+
+if __name__ == "__main__":
+    main()
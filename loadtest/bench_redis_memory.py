@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Redis 記憶體基準測試：auction:{id}:bids / :rank
+
+比較兩種儲存方式在大量出價者下的 MEMORY USAGE：
+1. 舊版：bids 存 "%f,%d,%f" 字串，rank 保留所有出價者
+2. 新版：bids 存固定長度二進位編碼 (與 backend/internal/bidding/codec.go 一致)，
+   rank 只保留 K × RANK_CAP_FACTOR 名
+
+使用方式：
+python bench_redis_memory.py --redis-url redis://localhost:6379/0 --bidders 1000000 --k 5 --cap-factor 20
+
+注意：會寫入 bench:* 開頭的 Key，結束後自動刪除，請勿對正式環境執行。
+"""
+
+import argparse
+import random
+import struct
+import time
+
+import redis
+
+BID_DETAILS_VERSION = 1
+WEIGHT_SCALE = 1_000_000
+BATCH_SIZE = 10_000
+
+
+def encode_legacy(price, reaction_time, weight):
+    """舊版格式：與 fmt.Sprintf("%f,%d,%f") 相同"""
+    return f"{price:f},{reaction_time:d},{weight:f}"
+
+
+def encode_binary(price, reaction_time, weight):
+    """新版格式：版本號 + float64 price + uint32 reactionTime + uint32 weight(×1e6)"""
+    reaction_time = max(0, min(reaction_time, 0xFFFFFFFF))
+    return struct.pack(
+        "<BdII",
+        BID_DETAILS_VERSION,
+        price,
+        reaction_time,
+        round(weight * WEIGHT_SCALE),
+    )
+
+
+def generate_bids(num_bidders, seed):
+    """產生模擬出價：價格隨出價順序上升，分數 = price + beta/(t+1) + gamma*weight"""
+    rng = random.Random(seed)
+    price = 1000.0
+    for i in range(num_bidders):
+        price += rng.uniform(0.01, 5.0)
+        reaction_time = i * 3 + rng.randint(0, 50)
+        weight = 1.0 + rng.random() * 0.5
+        score = round(price + 0.5 / (reaction_time + 1) + 0.3 * weight, 4)
+        yield str(100000 + i), price, reaction_time, weight, score
+
+
+def load(client, rank_key, bids_key, num_bidders, encoder, seed, rank_cap=0):
+    """以 pipeline 批次寫入，rank_cap > 0 時模擬 Lua 腳本的 ZPOPMIN 修剪"""
+    start = time.time()
+    pipe = client.pipeline(transaction=False)
+    pending = 0
+    for user_id, price, reaction_time, weight, score in generate_bids(num_bidders, seed):
+        pipe.zadd(rank_key, {user_id: score})
+        pipe.hset(bids_key, user_id, encoder(price, reaction_time, weight))
+        pending += 1
+        if pending >= BATCH_SIZE:
+            pipe.execute()
+            if rank_cap > 0:
+                trim(client, rank_key, bids_key, rank_cap)
+            pending = 0
+    if pending:
+        pipe.execute()
+    if rank_cap > 0:
+        trim(client, rank_key, bids_key, rank_cap)
+    return time.time() - start
+
+
+def trim(client, rank_key, bids_key, rank_cap):
+    """移除排名在 rank_cap 之外的成員 (與 place_bid.lua 一致)"""
+    excess = client.zcard(rank_key) - rank_cap
+    if excess <= 0:
+        return
+    popped = client.zpopmin(rank_key, excess)
+    members = [member for member, _ in popped]
+    for i in range(0, len(members), BATCH_SIZE):
+        client.hdel(bids_key, *members[i:i + BATCH_SIZE])
+
+
+def memory_usage(client, key):
+    """SAMPLES 0 代表完整掃描，取得精確值"""
+    return client.memory_usage(key, samples=0) or 0
+
+
+def format_bytes(n):
+    for unit in ["B", "KiB", "MiB", "GiB"]:
+        if n < 1024:
+            return f"{n:8.2f} {unit}"
+        n /= 1024
+    return f"{n:8.2f} TiB"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="比較出價詳情編碼與排行榜上限的 Redis 記憶體用量")
+    parser.add_argument("--redis-url", default="redis://localhost:6379/0")
+    parser.add_argument("--bidders", type=int, default=1_000_000)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--cap-factor", type=int, default=20, help="對應後端 RANK_CAP_FACTOR")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--keep", action="store_true", help="測試結束後保留 Key")
+    args = parser.parse_args()
+
+    client = redis.Redis.from_url(args.redis_url)
+    client.ping()
+
+    scenarios = [
+        ("舊版 (字串 + 不限制)", "bench:legacy", encode_legacy, 0),
+        ("二進位 (不限制)", "bench:binary", encode_binary, 0),
+        (f"二進位 + 上限 K×{args.cap_factor}", "bench:bounded", encode_binary, args.k * args.cap_factor),
+    ]
+
+    print(f"出價者: {args.bidders:,}  K: {args.k}  上限倍數: {args.cap_factor}")
+    print("=" * 80)
+    print(f"{'情境':<28} {'rank':>14} {'bids':>14} {'合計':>14} {'寫入耗時':>8}")
+    print("-" * 80)
+
+    baseline = None
+    try:
+        for label, prefix, encoder, rank_cap in scenarios:
+            rank_key, bids_key = f"{prefix}:rank", f"{prefix}:bids"
+            client.delete(rank_key, bids_key)
+            elapsed = load(client, rank_key, bids_key, args.bidders, encoder, args.seed, rank_cap)
+
+            rank_mem = memory_usage(client, rank_key)
+            bids_mem = memory_usage(client, bids_key)
+            total = rank_mem + bids_mem
+            if baseline is None:
+                baseline = total
+            ratio = total / baseline * 100 if baseline else 0
+            print(f"{label:<28} {format_bytes(rank_mem)} {format_bytes(bids_mem)} "
+                  f"{format_bytes(total)} {elapsed:7.1f}s  ({ratio:5.1f}%)")
+    finally:
+        if not args.keep:
+            for _, prefix, _, _ in scenarios:
+                client.delete(f"{prefix}:rank", f"{prefix}:bids")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Replica 讀取路由驗證
+
+對後端持續發送排行榜 / 商品查詢 (可同時出價製造寫入)，前後各擷取一次：
+- 後端 /metrics 的 redis_command_duration_seconds：每條路由落在 primary / replica 的次數與平均延遲
+- primary / replica 的 INFO cpu、INFO commandstats：讀取指令的 CPU 從 primary 移到 replica 的幅度
+
+使用方式 (先以 docker compose --profile replica 啟動 replica，並設定 REDIS_REPLICA_ADDRS)：
+python bench_replica_reads.py --host http://localhost:8000 --primary redis://localhost:6379 \\
+    --replica redis://localhost:6380 --duration 30 --readers 32 --bidders 4
+
+比較基準：不設定 REDIS_REPLICA_ADDRS 重跑一次，對照 primary 的 CPU 使用量
+"""
+
+import argparse
+import random
+import re
+import threading
+import time
+from collections import defaultdict
+
+import redis
+import requests
+
+READ_COMMANDS = ("hmget", "hget", "zrevrange", "info")
+METRIC_RE = re.compile(r'^redis_command_duration_seconds_(sum|count)\{route="([^"]*)",target="([^"]*)"\} (\S+)$')
+
+
+def parse_route_metrics(text):
+    """解析 /metrics，回傳 {(route, target): {"sum": 秒, "count": 次數}}"""
+    result = defaultdict(lambda: {"sum": 0.0, "count": 0.0})
+    for line in text.splitlines():
+        m = METRIC_RE.match(line)
+        if m:
+            kind, route, target, value = m.groups()
+            result[(route, target)][kind] = float(value)
+    return result
+
+
+def redis_snapshot(client):
+    """CPU 秒數與讀取指令的呼叫次數 / 耗時"""
+    cpu = client.info("cpu")
+    stats = client.info("commandstats")
+    commands = {}
+    for name in READ_COMMANDS:
+        entry = stats.get(f"cmdstat_{name}", {})
+        commands[name] = (entry.get("calls", 0), entry.get("usec", 0))
+    return {"cpu": cpu["used_cpu_user"] + cpu["used_cpu_sys"], "commands": commands}
+
+
+def login(host):
+    user = {"username": f"replica_bench_{random.randint(100000, 999999)}", "password": "test123456", "role": "member"}
+    res = requests.post(f"{host}/api/auth/register", json=user, timeout=10)
+    if res.status_code != 200:
+        res = requests.post(f"{host}/api/auth/login", json=user, timeout=10)
+    res.raise_for_status()
+    return {"Authorization": f"Bearer {res.json()['token']}"}
+
+
+def pick_product(host, headers, product_id):
+    if product_id:
+        return product_id
+    res = requests.get(f"{host}/api/products", headers=headers, timeout=10)
+    res.raise_for_status()
+    active = [p["id"] for p in res.json().get("products", []) if p.get("status") == "active"]
+    if not active:
+        raise SystemExit("找不到進行中的商品，請用 --product 指定")
+    return active[0]
+
+
+def reader(host, headers, product_id, deadline, counter):
+    session = requests.Session()
+    while time.time() < deadline:
+        if random.random() < 0.7:
+            session.get(f"{host}/api/products/{product_id}/rankings", headers=headers, timeout=10)
+        else:
+            session.get(f"{host}/api/products/{product_id}", headers=headers, timeout=10)
+        counter["reads"] += 1
+
+
+def bidder(host, product_id, deadline, counter):
+    session = requests.Session()
+    headers = login(host)
+    while time.time() < deadline:
+        current = session.get(f"{host}/api/products/{product_id}", headers=headers, timeout=10).json()
+        price = float(current.get("currentHighestPrice", 0)) + random.uniform(1, 10)
+        session.post(f"{host}/api/products/{product_id}/bids", json={"price": round(price, 2)}, headers=headers, timeout=10)
+        counter["bids"] += 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description="驗證排行榜 / 最高價讀取是否導向 replica")
+    parser.add_argument("--host", default="http://localhost:8000")
+    parser.add_argument("--primary", default="redis://localhost:6379")
+    parser.add_argument("--replica", default="redis://localhost:6380", help="留空則只觀察 primary")
+    parser.add_argument("--product", default="")
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--readers", type=int, default=32)
+    parser.add_argument("--bidders", type=int, default=4)
+    args = parser.parse_args()
+
+    nodes = {"primary": redis.Redis.from_url(args.primary, decode_responses=True)}
+    if args.replica:
+        nodes["replica"] = redis.Redis.from_url(args.replica, decode_responses=True)
+
+    headers = login(args.host)
+    product_id = pick_product(args.host, headers, args.product)
+
+    before_metrics = parse_route_metrics(requests.get(f"{args.host}/metrics", timeout=10).text)
+    before_redis = {name: redis_snapshot(client) for name, client in nodes.items()}
+
+    counter = defaultdict(int)
+    deadline = time.time() + args.duration
+    threads = [threading.Thread(target=reader, args=(args.host, headers, product_id, deadline, counter))
+               for _ in range(args.readers)]
+    threads += [threading.Thread(target=bidder, args=(args.host, product_id, deadline, counter))
+                for _ in range(args.bidders)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    after_metrics = parse_route_metrics(requests.get(f"{args.host}/metrics", timeout=10).text)
+    after_redis = {name: redis_snapshot(client) for name, client in nodes.items()}
+
+    print(f"商品: {product_id}  讀取: {counter['reads']:,}  出價: {counter['bids']:,}  時間: {args.duration:.0f}s")
+    print("=" * 60)
+    print(f"{'route':<20} {'target':<8} {'calls':>10} {'avg (ms)':>10}")
+    print("-" * 60)
+    for key in sorted(after_metrics):
+        calls = after_metrics[key]["count"] - before_metrics[key]["count"]
+        if calls <= 0:
+            continue
+        avg = (after_metrics[key]["sum"] - before_metrics[key]["sum"]) / calls * 1000
+        print(f"{key[0]:<20} {key[1]:<8} {calls:>10,.0f} {avg:>10.3f}")
+
+    print("\n" + "=" * 60)
+    print(f"{'node':<8} {'CPU 秒':>8} {'CPU %':>7}  讀取指令 calls (usec)")
+    print("-" * 60)
+    for name in nodes:
+        cpu = after_redis[name]["cpu"] - before_redis[name]["cpu"]
+        cmds = []
+        for cmd in READ_COMMANDS:
+            calls = after_redis[name]["commands"][cmd][0] - before_redis[name]["commands"][cmd][0]
+            usec = after_redis[name]["commands"][cmd][1] - before_redis[name]["commands"][cmd][1]
+            cmds.append(f"{cmd}={calls:,} ({usec:,})")
+        print(f"{name:<8} {cpu:>8.2f} {cpu / args.duration * 100:>6.1f}%  {'  '.join(cmds)}")
+
+
+if __name__ == "__main__":
+    main()
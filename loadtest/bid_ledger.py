@@ -0,0 +1,76 @@
+"""
+被接受出價的紀錄 (bid ledger)
+
+每筆成功的出價 (200 + {"bid": {...}}) 以一行 JSON 附加到 runs/<run_id>/accepted_bids.jsonl：
+    {"product": "p1", "user": "42", "price": 1234.5, "score": 1234.86, "server_ts": 1700000000123,
+     "client_ts": 1700000000.125, "seq": 17, "pid": 4321}
+
+server_ts 為後端回應中的 timestamp (毫秒)；同一個用戶的出價是依序送出的，
+(server_ts, pid, seq) 可以決定每位用戶在每個商品最後一筆出價。
+寫入在背景每秒批次附加，記憶體只保留尚未寫出的部分。活動結束後由 verify_rankings.py 重算前 K 名並與後端比對。
+
+使用方式 (Locust)：
+    bid_ledger = BidLedger(run_log)
+    # on_request 中 (出價請求且沒有例外): bid_ledger.record(kwargs.get("response"))
+    # on_test_stop 中: bid_ledger.close()
+"""
+
+import itertools
+import json
+import os
+import threading
+import time
+
+FILENAME = "accepted_bids.jsonl"
+
+
+class BidLedger:
+    def __init__(self, run_log, flush_interval=1.0):
+        self.path = run_log.path(FILENAME)
+        self.count = 0
+        self._pid = os.getpid()
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._pending = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(flush_interval,), daemon=True)
+        self._thread.start()
+
+    def record(self, response):
+        if response is None or getattr(response, "status_code", 0) != 200:
+            return False
+        try:
+            bid = response.json()["bid"]
+            row = {
+                "product": str(bid["productId"]),
+                "user": str(bid["userId"]),
+                "price": float(bid["price"]),
+                "score": float(bid["score"]),
+                "server_ts": int(bid["timestamp"]),
+            }
+        except (ValueError, KeyError, TypeError):
+            return False
+        row["client_ts"] = round(time.time(), 3)
+        row["seq"] = next(self._seq)
+        row["pid"] = self._pid
+        with self._lock:
+            self._pending.append(row)
+            self.count += 1
+        return True
+
+    def _run(self, interval):
+        while not self._stop.wait(interval):
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            rows, self._pending = self._pending, []
+        if not rows:
+            return
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write("\n".join(json.dumps(r, ensure_ascii=False) for r in rows) + "\n")
+
+    def close(self):
+        self._stop.set()
+        self._thread.join(timeout=2)
+        self.flush()
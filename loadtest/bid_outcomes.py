@@ -0,0 +1,135 @@
+"""
+出價結果分類與 goodput
+
+後端出價失敗時都回 500 + {"error": 訊息}，只看狀態碼或例外類型無法分辨「出價過低」與「Redis 故障」。
+這裡依回應內容把每筆出價分成：
+    accepted         出價成功
+    outbid_race      出價不高於目前最高價 (client 看到的最高價已過時，與其他人競爭)
+    too_early        活動尚未開始
+    ended            活動已結束
+    not_found        商品不存在或 Redis 中沒有設定
+    rate_limited     HTTP 429 (CDN / 閘道限流)
+    client_error     其他 4xx (參數錯誤、未授權…)
+    server_error     5xx 且不屬於上述業務拒絕 (Redis 執行錯誤、讀取設定失敗、閘道錯誤…)
+    transport_error  沒有收到 HTTP 回應 (連線失敗、逾時)
+
+goodput = accepted / 秒，是實際改變排行榜的出價量；其餘都是浪費的出價流量。
+RunSummary 對出價請求呼叫 BidOutcomes.record，分類結果寫入 summary.json 的 bid_outcomes，
+結束時輸出各出價請求的 req/s 與 goodput 對照。
+"""
+
+import time
+from collections import defaultdict
+
+ACCEPTED = "accepted"
+OUTCOMES = ("accepted", "outbid_race", "too_early", "ended", "not_found", "rate_limited",
+            "client_error", "server_error", "transport_error")
+
+# 後端 bidding.Service.PlaceBid 的錯誤訊息 → 分類
+MESSAGE_OUTCOMES = (
+    ("出價必須高於目前最高出價", "outbid_race"),
+    ("活動尚未開始", "too_early"),
+    ("活動已結束", "ended"),
+    ("商品不存在", "not_found"),
+)
+
+
+def error_message(response):
+    try:
+        body = response.json()
+    except (ValueError, AttributeError):
+        return getattr(response, "text", "") or ""
+    if isinstance(body, dict):
+        return str(body.get("error") or body.get("message") or "")
+    return ""
+
+
+def classify_bid(response, exception=None):
+    status = getattr(response, "status_code", None) or 0
+    if status == 0:
+        return "transport_error"
+    if 200 <= status < 300 and exception is None:
+        return ACCEPTED
+    if status == 429:
+        return "rate_limited"
+
+    message = error_message(response)
+    for text, outcome in MESSAGE_OUTCOMES:
+        if text in message:
+            return outcome
+    if 200 <= status < 300:
+        # catch_response 中標記為失敗的 2xx (例如回應內容不完整)
+        return "server_error"
+    if status < 500:
+        return "client_error"
+    return "server_error"
+
+
+class BidOutcomes:
+    """依出價請求名稱累計各分類次數"""
+
+    def __init__(self):
+        self.counts = defaultdict(lambda: defaultdict(int))  # {name: {outcome: 次數}}
+        self.first = None
+        self.last = None
+
+    def record(self, name, response, exception=None):
+        outcome = classify_bid(response, exception)
+        now = time.time()
+        if self.first is None:
+            self.first = now
+        self.last = now
+        self.counts[name][outcome] += 1
+        return outcome
+
+    @property
+    def duration(self):
+        if self.first is None:
+            return 0.0
+        return max(self.last - self.first, 1.0)
+
+    def totals(self):
+        result = defaultdict(int)
+        for outcomes in self.counts.values():
+            for outcome, n in outcomes.items():
+                result[outcome] += n
+        return dict(result)
+
+    def summary(self, duration=None):
+        """{"total", "accepted", "rps", "goodput", "wasted_ratio", "outcomes", "by_name"}"""
+        duration = duration or self.duration or 1.0
+        totals = self.totals()
+        total = sum(totals.values())
+        accepted = totals.get(ACCEPTED, 0)
+        return {
+            "total": total,
+            "accepted": accepted,
+            "rps": total / duration,
+            "goodput": accepted / duration,
+            "wasted_ratio": (total - accepted) / total if total else 0.0,
+            "outcomes": {o: totals[o] for o in OUTCOMES if o in totals},
+            "by_name": {name: dict(outcomes) for name, outcomes in self.counts.items()},
+        }
+
+    def print_report(self):
+        print("\n" + "=" * 70)
+        print("  出價結果分類 (goodput = accepted / 秒)")
+        print("=" * 70)
+        if not self.counts:
+            print("  無出價")
+            return
+
+        duration = self.duration
+        print(f"  {'請求':<16} {'req/s':>8} {'goodput':>8} {'浪費':>7}  分類")
+        for name, outcomes in sorted(self.counts.items()):
+            total = sum(outcomes.values())
+            accepted = outcomes.get(ACCEPTED, 0)
+            detail = ", ".join(f"{o} {outcomes[o]}" for o in OUTCOMES if outcomes.get(o))
+            print(f"  {name:<16} {total / duration:8.1f} {accepted / duration:8.1f} "
+                  f"{(total - accepted) / total * 100:6.1f}%  {detail}")
+
+        s = self.summary(duration)
+        print(f"  {'合計':<16} {s['rps']:8.1f} {s['goodput']:8.1f} {s['wasted_ratio'] * 100:6.1f}%")
+        wasted = sorted(((o, n) for o, n in s["outcomes"].items() if o != ACCEPTED), key=lambda kv: -kv[1])
+        if wasted:
+            print("  浪費的出價: " + ", ".join(f"{o} {n / s['total'] * 100:.1f}%" for o, n in wasted))
@@ -0,0 +1,239 @@
+"""
+出價策略
+
+後端的排名分數為 score = alpha * price + beta / (t + 1) + gamma * weight
+(t 為活動開始後的毫秒數，見 bidding.Service.CalculateScore)，前 K 名得標，第 K 名的分數即 thresholdScore。
+只在「可能過時的最高價」上加隨機增量，很多出價會被拒絕或遠高於門檻；真實用戶會看門檻、只出剛好能進前 K 名的價。
+
+BIDDER_STRATEGY 決定每個虛擬用戶的策略 (單一名稱，或以「名稱=權重」組合，例如 "sniper=50,random=30,last_second=20")：
+    random       目前最高價 + 隨機增量 (預設，與原本行為相同)
+    sniper       已在前 K 名就不出價，否則出剛好超過門檻的最低得標價 (threshold-sniper)
+    incremental  目前最高價 + 固定級距 BIDDER_STEP (預設 10)
+    last_second  只在結束前 BIDDER_LAST_SECOND 秒內 (預設 2) 出最低得標價
+
+最低得標價 = max(目前最高價 + 0.01, 讓分數超過 thresholdScore 的價格)，另加 0 ~ BIDDER_MARGIN (預設 1) 的隨機餘裕。
+
+使用方式 (Locust)：
+    bidder_mix = BidderMix.from_env()
+    bidder_stats = BidderStats()
+    self.bidder = bidder_mix.assign()                  # on_start
+    price = self.bidder.price(BidView(...))            # None 代表這次不出價
+    bidder_stats.record(self.bidder.name, view, price, response)
+"""
+
+import math
+import os
+import random
+import time
+from collections import defaultdict, namedtuple
+
+from bid_outcomes import ACCEPTED, classify_bid
+
+TICK = 0.01  # 出價必須嚴格高於目前最高價，以分為單位
+
+
+class ProductTerms(namedtuple("ProductTerms", "alpha beta gamma k start_time end_time")):
+    """商品的計分參數 (GET /api/products 的 alpha / beta / gamma / k / startTime / endTime)"""
+
+    @classmethod
+    def from_product(cls, product):
+        return cls(float(product.get("alpha", 1.0)), float(product.get("beta", 0.5)),
+                   float(product.get("gamma", 0.3)), int(product.get("k", 5)),
+                   int(product.get("startTime", 0)), int(product.get("endTime", 0)))
+
+
+DEFAULT_TERMS = ProductTerms(1.0, 0.5, 0.3, 5, 0, 0)
+
+# 一次出價決策需要的市場資訊；threshold 為 None 代表尚未得知門檻 (或排行榜未滿 K 名)
+BidView = namedtuple("BidView", "product_id highest threshold weight terms now_ms increment")
+
+
+def ceil_cents(price):
+    return math.ceil(round(price * 100, 6)) / 100
+
+
+def min_winning_price(view):
+    """同時高於目前最高價、且分數超過門檻的最低出價 (反解 bidding.Service.CalculateScore)"""
+    floor = view.highest + TICK
+    terms = view.terms
+    if not view.threshold or terms.alpha <= 0:
+        return ceil_cents(floor)
+    t = max(view.now_ms - terms.start_time, 0)
+    need = (view.threshold - terms.beta / (t + 1) - terms.gamma * view.weight) / terms.alpha + TICK
+    return ceil_cents(max(floor, need))
+
+
+class Bidder:
+    name = "base"
+
+    def __init__(self, margin=1.0, rng=random):
+        self.margin = margin
+        self.rng = rng
+        self.scores = {}  # {商品: 自己最後一次成功出價的分數}
+
+    def price(self, view):
+        raise NotImplementedError
+
+    def accepted(self, product_id, score):
+        if score is not None:
+            self.scores[product_id] = score
+
+    def in_top_k(self, view):
+        own = self.scores.get(view.product_id)
+        return own is not None and view.threshold is not None and own >= view.threshold
+
+    def winning_price(self, view):
+        return min_winning_price(view) + round(self.rng.uniform(0, self.margin), 2)
+
+
+class RandomBidder(Bidder):
+    name = "random"
+
+    def price(self, view):
+        return view.highest + view.increment
+
+
+class SniperBidder(Bidder):
+    name = "sniper"
+
+    def price(self, view):
+        if self.in_top_k(view):
+            return None
+        return self.winning_price(view)
+
+
+class IncrementalBidder(Bidder):
+    name = "incremental"
+
+    def __init__(self, step=10.0, **kwargs):
+        super().__init__(**kwargs)
+        self.step = step
+
+    def price(self, view):
+        return view.highest + self.step
+
+
+class LastSecondBidder(Bidder):
+    name = "last_second"
+
+    def __init__(self, window=2.0, **kwargs):
+        super().__init__(**kwargs)
+        self.window = window
+
+    def price(self, view):
+        end = view.terms.end_time
+        if end and (end - view.now_ms) / 1000 > self.window:
+            return None
+        if self.in_top_k(view):
+            return None
+        return self.winning_price(view)
+
+
+STRATEGIES = {cls.name: cls for cls in (RandomBidder, SniperBidder, IncrementalBidder, LastSecondBidder)}
+ALIASES = {"threshold_sniper": "sniper", "last-second": "last_second", "threshold-sniper": "sniper"}
+
+
+def parse_mix(text):
+    """"sniper" 或 "sniper=50,random=50" → {策略: 權重}"""
+    mix = {}
+    for item in (text or "random").split(","):
+        name, _, weight = item.strip().partition("=")
+        name = ALIASES.get(name.strip().lower(), name.strip().lower())
+        if not name:
+            continue
+        if name not in STRATEGIES:
+            raise ValueError(f"未知的 BIDDER_STRATEGY: {name} (可用: {', '.join(STRATEGIES)})")
+        mix[name] = float(weight) if weight else 1.0
+    return mix or {"random": 1.0}
+
+
+class BidderMix:
+    def __init__(self, mix, margin=1.0, step=10.0, window=2.0):
+        self.mix = mix
+        self.margin = margin
+        self.step = step
+        self.window = window
+
+    @classmethod
+    def from_env(cls):
+        return cls(parse_mix(os.getenv("BIDDER_STRATEGY")),
+                   margin=float(os.getenv("BIDDER_MARGIN", "1")),
+                   step=float(os.getenv("BIDDER_STEP", "10")),
+                   window=float(os.getenv("BIDDER_LAST_SECOND", "2")))
+
+    @property
+    def spec(self):
+        return ",".join(f"{name}={weight:g}" for name, weight in self.mix.items())
+
+    def assign(self, rng=random):
+        name = rng.choices(list(self.mix), weights=list(self.mix.values()))[0]
+        if name == "incremental":
+            return IncrementalBidder(step=self.step, margin=self.margin, rng=rng)
+        if name == "last_second":
+            return LastSecondBidder(window=self.window, margin=self.margin, rng=rng)
+        return STRATEGIES[name](margin=self.margin, rng=rng)
+
+
+def now_ms():
+    return int(time.time() * 1000)
+
+
+def bid_score(response):
+    """出價成功回應 {"bid": {"score": ...}} 中的分數"""
+    try:
+        return float(response.json()["bid"]["score"])
+    except (ValueError, KeyError, TypeError, AttributeError):
+        return None
+
+
+class BidderStats:
+    """依策略統計出價決策：略過次數、出價結果、高於最低得標價的溢價"""
+
+    def __init__(self):
+        self.skips = defaultdict(int)
+        self.outcomes = defaultdict(lambda: defaultdict(int))
+        self.overshoot = defaultdict(float)  # 被接受出價的 (出價 - 最低得標價) 總和
+        self.users = defaultdict(int)
+
+    def assigned(self, strategy):
+        self.users[strategy] += 1
+
+    def record(self, strategy, view, price, response=None, exception=None):
+        if price is None:
+            self.skips[strategy] += 1
+            return None
+        outcome = classify_bid(response, exception)
+        self.outcomes[strategy][outcome] += 1
+        if outcome == ACCEPTED:
+            self.overshoot[strategy] += max(price - min_winning_price(view), 0.0)
+        return outcome
+
+    def summary(self):
+        result = {}
+        for strategy in sorted(set(self.users) | set(self.skips) | set(self.outcomes)):
+            outcomes = self.outcomes[strategy]
+            bids = sum(outcomes.values())
+            accepted = outcomes.get(ACCEPTED, 0)
+            result[strategy] = {
+                "users": self.users[strategy],
+                "bids": bids,
+                "skipped": self.skips[strategy],
+                "accepted": accepted,
+                "accept_rate": accepted / bids if bids else 0.0,
+                "mean_overshoot": self.overshoot[strategy] / accepted if accepted else 0.0,
+                "outcomes": dict(outcomes),
+            }
+        return result
+
+    def print_report(self):
+        print("\n" + "=" * 70)
+        print("  出價策略 (溢價 = 被接受的出價高於最低得標價的平均金額)")
+        print("=" * 70)
+        summary = self.summary()
+        if not summary:
+            print("  無出價")
+            return
+        print(f"  {'策略':<12} {'用戶':>6} {'出價':>8} {'略過':>8} {'接受率':>7} {'平均溢價':>10}")
+        for strategy, s in summary.items():
+            print(f"  {strategy:<12} {s['users']:6d} {s['bids']:8d} {s['skipped']:8d} "
+                  f"{s['accept_rate'] * 100:6.1f}% {s['mean_overshoot']:10.2f}")
@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+"""
+容量搜尋：在 SLO 內可承受的最大出價吞吐量
+
+以多個短時間的 headless Locust 階段找出 SLO 邊界：先從 --min 開始倍增，直到出價請求的 p95 / p99
+或錯誤率超過 SLO (或到達 --max)，再於最後一個通過與第一個失敗的值之間二分，直到差距小於 --precision。
+每個階段以獨立的 RUN_ID 執行，量測時排除前 --ramp + --warmup 秒，只取穩定期的 client_latency.jsonl。
+錯誤率只計 bid_outcomes.py 的 server_error / transport_error；出價過低、活動已結束等業務拒絕
+後端同樣回 500，但屬於正常競爭，不計入 SLO (另外列出被接受出價的 goodput)。
+
+搜尋的變數 (--mode)：
+    users   同時在線的使用者數 (Locust 原本的封閉模型)
+    rate    目標 task 到達率：每個使用者固定每秒 --pace 個 task (USER_PACE_RPS，constant_throughput)，
+            使用者數 = rate / pace，較接近開放模型，排隊時不會自動降低送出速率
+
+每個情境 (--scenario 名稱=locustfile:使用者類別) 的結果附加到 runs/capacity_history.jsonl，
+記錄 commit、host 與 SLO；history 指令依 commit 列出各情境的最大出價 RPS，--fail-below 在
+相較前一個 commit 下降超過指定比例時回傳 1，用來在 CI 抓出容量退化。
+
+使用方式：
+python capacity_search.py search --host http://localhost:8000 --scenario bidding=locustfile.py:BiddingUser \\
+    --min 50 --max 4000 --duration 60 --p95 500 --p99 1000 --error-rate 0.01
+python capacity_search.py history --scenario bidding --fail-below 0.10
+"""
+
+import argparse
+import json
+import math
+import os
+import shutil
+import subprocess
+import sys
+import time
+
+from bid_outcomes import ACCEPTED
+from histogram import LatencyHistogram
+from runlog import RUNS_DIR, new_run_id, read_jsonl, run_start_ts
+
+LOADTEST_DIR = os.path.dirname(os.path.abspath(__file__))
+HISTORY_PATH = os.path.join(RUNS_DIR, "capacity_history.jsonl")
+DEFAULT_BID_NAMES = ("提交出價", "更新出價", "指數型出價", "截止前出價")
+SLO_ERRORS = ("server_error", "transport_error")  # 計入錯誤率 SLO 的出價分類
+
+
+def git(*args):
+    return subprocess.run(["git", *args], cwd=LOADTEST_DIR, capture_output=True, text=True, check=True).stdout.strip()
+
+
+def current_commit():
+    """目前的 commit；工作目錄有未提交的修改時加上 -dirty"""
+    try:
+        sha = git("rev-parse", "--short", "HEAD")
+        if git("status", "--porcelain", "--untracked-files=no"):
+            sha += "-dirty"
+        return sha
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def parse_scenario(text):
+    """名稱=locustfile[:使用者類別]"""
+    name, _, target = text.partition("=")
+    if not target:
+        name, target = os.path.splitext(os.path.basename(text.split(":")[0]))[0], text
+    locustfile, _, user_class = target.partition(":")
+    return {"name": name, "locustfile": locustfile, "user_class": user_class}
+
+
+def measure(run_dir, skip, names):
+    """彙總 run_dir 中 test_start + skip 秒之後的出價請求"""
+    t0 = run_start_ts(run_dir)
+    rows = read_jsonl(run_dir, "client_latency.jsonl")
+    if t0 is None and rows:
+        t0 = min(r["ts"] for r in rows)
+    hist = LatencyHistogram()
+    failures = 0
+    errors = 0
+    accepted = 0
+    seconds = set()
+    for row in rows:
+        if row["ts"] < t0 + skip:
+            continue
+        seconds.add(row["ts"])
+        if row["name"] not in names:
+            continue
+        hist.merge(LatencyHistogram.from_dict(row["hist"]))
+        failures += row["failures"]
+        outcomes = row.get("outcomes")
+        if outcomes is None:
+            # 沒有分類的舊紀錄：所有失敗都算錯誤，2xx 算被接受
+            errors += row["failures"]
+            accepted += row["count"]
+        else:
+            errors += sum(outcomes.get(kind, 0) for kind in SLO_ERRORS)
+            accepted += outcomes.get(ACCEPTED, 0)
+    span = (max(seconds) - min(seconds) + 1) if seconds else 0
+    total = hist.count + failures
+    return {
+        "seconds": span,
+        "bids": total,
+        "bid_rps": total / span if span else 0.0,
+        "goodput": accepted / span if span else 0.0,
+        "error_rate": errors / total if total else 0.0,
+        "rejected_rate": (total - accepted - errors) / total if total else 0.0,
+        "p50": hist.percentile(50),
+        "p95": hist.percentile(95),
+        "p99": hist.percentile(99),
+    }
+
+
+def check_slo(result, slo):
+    """回傳違反的 SLO 項目 (空 list 代表通過)"""
+    violations = []
+    if not result["bids"]:
+        violations.append("no_data")
+    if result["p95"] > slo["p95"]:
+        violations.append(f"p95 {result['p95']:.0f}ms > {slo['p95']:g}ms")
+    if result["p99"] > slo["p99"]:
+        violations.append(f"p99 {result['p99']:.0f}ms > {slo['p99']:g}ms")
+    if result["error_rate"] > slo["error_rate"]:
+        violations.append(f"錯誤率 {result['error_rate'] * 100:.1f}% > {slo['error_rate'] * 100:g}%")
+    return violations
+
+
+class StageRunner:
+    def __init__(self, args, scenario, search_id):
+        self.args = args
+        self.scenario = scenario
+        self.search_id = search_id
+        self.stage = 0
+        self.names = set(args.names.split(",")) if args.names else set(DEFAULT_BID_NAMES)
+        self.slo = {"p95": args.p95, "p99": args.p99, "error_rate": args.error_rate}
+
+    def users_for(self, value):
+        if self.args.mode == "rate":
+            return max(1, math.ceil(value / self.args.pace))
+        return int(value)
+
+    def run(self, value):
+        args = self.args
+        self.stage += 1
+        users = self.users_for(value)
+        run_id = f"{self.search_id}-{self.scenario['name']}-{self.stage:02d}"
+        run_time = int(args.ramp + args.warmup + args.duration)
+        cmd = ["locust", "-f", self.scenario["locustfile"], "--headless", "--only-summary",
+               "-u", str(users), "-r", f"{max(users / args.ramp, 1):.2f}", "-t", f"{run_time}s",
+               "--host", args.host, "--stop-timeout", "5"]
+        if self.scenario["user_class"]:
+            cmd.append(self.scenario["user_class"])
+        env = dict(os.environ, RUN_ID=run_id, RUNS_DIR=RUNS_DIR)
+        if args.mode == "rate":
+            env["USER_PACE_RPS"] = str(args.pace)
+
+        run_dir = os.path.join(RUNS_DIR, run_id)
+        os.makedirs(run_dir, exist_ok=True)
+        label = f"{value:g} task/s ({users} users)" if args.mode == "rate" else f"{users} users"
+        print(f"  [{self.stage:02d}] {label}，{run_time}s ...", end="", flush=True)
+        with open(os.path.join(run_dir, "locust.log"), "w", encoding="utf-8") as log:
+            # 有請求失敗時 Locust 以 1 結束，是否通過改由 SLO 判斷
+            subprocess.run(cmd, cwd=LOADTEST_DIR, env=env, stdout=log, stderr=subprocess.STDOUT,
+                           timeout=run_time + 120)
+
+        result = measure(run_dir, args.ramp + args.warmup, self.names)
+        violations = check_slo(result, self.slo)
+        result.update(value=value, users=users, run_id=run_id, passed=not violations, violations=violations)
+        status = "通過" if not violations else "未通過 (" + "；".join(violations) + ")"
+        print(f" 出價 {result['bid_rps']:.1f}/s  goodput {result['goodput']:.1f}/s  p95 {result['p95']:.0f}ms  "
+              f"p99 {result['p99']:.0f}ms  錯誤 {result['error_rate'] * 100:.1f}%  "
+              f"拒絕 {result['rejected_rate'] * 100:.1f}%  {status}")
+        return result
+
+
+def next_value(mode, lo, hi):
+    mid = (lo + hi) / 2
+    return round(mid) if mode == "users" else round(mid, 1)
+
+
+def search(runner, args):
+    """倍增找出第一個失敗的值，再二分；回傳 (最後通過的階段, 第一個失敗的階段, 所有階段)"""
+    stages = []
+    best = failed = None
+    value = args.min
+    while len(stages) < args.max_stages:
+        result = runner.run(value)
+        stages.append(result)
+        if not result["passed"]:
+            failed = result
+            break
+        best = result
+        if value >= args.max:
+            break
+        value = min(value * 2, args.max)
+
+    while best and failed and len(stages) < args.max_stages:
+        if (failed["value"] - best["value"]) / failed["value"] <= args.precision:
+            break
+        value = next_value(args.mode, best["value"], failed["value"])
+        if value in (best["value"], failed["value"]):
+            break
+        result = runner.run(value)
+        stages.append(result)
+        if result["passed"]:
+            best = result
+        else:
+            failed = result
+    return best, failed, stages
+
+
+def append_history(record):
+    os.makedirs(os.path.dirname(HISTORY_PATH), exist_ok=True)
+    with open(HISTORY_PATH, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def read_history():
+    if not os.path.exists(HISTORY_PATH):
+        return []
+    with open(HISTORY_PATH, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def cmd_search(args):
+    if not shutil.which("locust"):
+        raise SystemExit("找不到 locust，請先 pip install -r requirements.txt")
+    commit = current_commit()
+    search_id = f"capacity-{new_run_id()}"
+    scenarios = [parse_scenario(s) for s in args.scenario] or [parse_scenario("bidding=locustfile.py:BiddingUser")]
+    slo = {"p95": args.p95, "p99": args.p99, "error_rate": args.error_rate}
+    unit = "task/s" if args.mode == "rate" else "users"
+
+    print(f"容量搜尋 {search_id}  commit {commit}  host {args.host}")
+    print(f"SLO: 出價 p95 ≤ {args.p95:g}ms、p99 ≤ {args.p99:g}ms、錯誤率 (5xx 伺服器錯誤 / 連線失敗) ≤ "
+          f"{args.error_rate * 100:g}%；"
+          f"搜尋 {args.mode} {args.min:g} ~ {args.max:g}，每階段量測 {args.duration:g}s")
+
+    summary = []
+    for scenario in scenarios:
+        print("=" * 80)
+        print(f"情境 {scenario['name']} ({scenario['locustfile']} {scenario['user_class']})")
+        best, failed, stages = search(StageRunner(args, scenario, search_id), args)
+        record = {
+            "ts": round(time.time(), 3),
+            "search_id": search_id,
+            "commit": commit,
+            "host": args.host,
+            "scenario": scenario["name"],
+            "locustfile": scenario["locustfile"],
+            "user_class": scenario["user_class"],
+            "mode": args.mode,
+            "pace": args.pace if args.mode == "rate" else None,
+            "slo": slo,
+            "max_value": best["value"] if best else 0,
+            "max_users": best["users"] if best else 0,
+            "max_bid_rps": round(best["bid_rps"], 2) if best else 0.0,
+            "max_goodput": round(best["goodput"], 2) if best else 0.0,
+            "first_failure": failed["value"] if failed else None,
+            "stages": stages,
+        }
+        append_history(record)
+        summary.append(record)
+
+    print("=" * 80)
+    print(f"{'情境':<16} {'最大 ' + unit:>14} {'users':>7} {'出價 RPS':>10} {'goodput':>9} {'p95':>7} {'p99':>7} "
+          f"{'首個失敗':>10}")
+    print("-" * 80)
+    for record in summary:
+        best = next((s for s in reversed(record["stages"]) if s["value"] == record["max_value"] and s["passed"]), None)
+        p95 = f"{best['p95']:.0f}" if best else "-"
+        p99 = f"{best['p99']:.0f}" if best else "-"
+        first_failure = f"{record['first_failure']:g}" if record["first_failure"] is not None else "-"
+        print(f"{record['scenario']:<16} {record['max_value']:>14g} {record['max_users']:>7} "
+              f"{record['max_bid_rps']:>10.1f} {record['max_goodput']:>9.1f} {p95:>7} {p99:>7} {first_failure:>10}")
+    print(f"結果已附加到 {HISTORY_PATH}")
+
+
+def cmd_history(args):
+    """依 commit 列出各情境最大出價 RPS，與同情境、同 host 的前一筆比較"""
+    records = [r for r in read_history() if not args.scenario or r["scenario"] in args.scenario]
+    if args.host:
+        records = [r for r in records if r["host"] == args.host]
+    if not records:
+        print("沒有容量搜尋紀錄")
+        return 0
+
+    regressions = []
+    previous = {}
+    print(f"{'時間':<17} {'commit':<14} {'情境':<14} {'mode':<6} {'最大值':>9} {'出價 RPS':>10} {'變化':>8}")
+    print("-" * 84)
+    for r in sorted(records, key=lambda r: r["ts"]):
+        key = (r["scenario"], r["host"], r["mode"])
+        change = ""
+        prev = previous.get(key)
+        if prev and prev["max_bid_rps"]:
+            delta = (r["max_bid_rps"] - prev["max_bid_rps"]) / prev["max_bid_rps"]
+            change = f"{delta * 100:+.1f}%"
+            if args.fail_below is not None and delta < -args.fail_below:
+                regressions.append((r, prev, delta))
+        previous[key] = r
+        when = time.strftime("%Y-%m-%d %H:%M", time.localtime(r["ts"]))
+        print(f"{when:<17} {r['commit']:<14} {r['scenario']:<14} {r['mode']:<6} {r['max_value']:>9g} "
+              f"{r['max_bid_rps']:>10.1f} {change:>8}")
+
+    # 只看每個情境最新的一筆是否退化
+    latest = {}
+    for r, prev, delta in regressions:
+        latest[(r["scenario"], r["host"], r["mode"])] = (r, prev, delta)
+    failing = [v for k, v in latest.items() if previous[k] is v[0]]
+    for r, prev, delta in failing:
+        print(f"容量退化: {r['scenario']} {prev['commit']} → {r['commit']} 出價 RPS "
+              f"{prev['max_bid_rps']:.1f} → {r['max_bid_rps']:.1f} ({delta * 100:+.1f}%)")
+    return 1 if failing else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="以 headless Locust 二分搜尋 SLO 內的最大出價吞吐量")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("search", help="執行容量搜尋")
+    p.add_argument("--host", default=os.getenv("BASE_URL", "http://localhost:8000"))
+    p.add_argument("--scenario", action="append", default=[],
+                   help="名稱=locustfile[:使用者類別]，可重複 (預設 bidding=locustfile.py:BiddingUser)")
+    p.add_argument("--mode", choices=("users", "rate"), default="users")
+    p.add_argument("--pace", type=float, default=1.0, help="rate 模式下每個使用者每秒的 task 數")
+    p.add_argument("--min", type=float, default=50)
+    p.add_argument("--max", type=float, default=5000)
+    p.add_argument("--precision", type=float, default=0.1, help="通過與失敗的差距小於此比例時停止")
+    p.add_argument("--max-stages", type=int, default=12)
+    p.add_argument("--ramp", type=float, default=15, help="每個階段的 spawn 秒數")
+    p.add_argument("--warmup", type=float, default=5, help="spawn 完成後不列入量測的秒數")
+    p.add_argument("--duration", type=float, default=60, help="每個階段的量測秒數")
+    p.add_argument("--p95", type=float, default=500, help="出價 p95 上限 (ms)")
+    p.add_argument("--p99", type=float, default=1000, help="出價 p99 上限 (ms)")
+    p.add_argument("--error-rate", type=float, default=0.01, help="出價錯誤率上限 (只計 5xx 伺服器錯誤與連線失敗)")
+    p.add_argument("--names", default="", help="列入 SLO 的請求名稱 (逗號分隔，預設為各種出價)")
+
+    p = sub.add_parser("history", help="列出歷次容量搜尋結果")
+    p.add_argument("--scenario", action="append", default=[])
+    p.add_argument("--host", default="")
+    p.add_argument("--fail-below", type=float, default=None,
+                   help="最新一筆相較前一筆的出價 RPS 下降超過此比例時回傳 1")
+
+    args = parser.parse_args()
+    if args.command == "search":
+        cmd_search(args)
+        return 0
+    return cmd_history(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
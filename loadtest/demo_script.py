@@ -497,7 +497,7 @@ class DemoTest:
         
         print_info("此場景需要監控系統資源")
         print_info("運行命令", "python3 scalability_test.py")
-        print_info("或使用 Grafana 查看 Prometheus 指標")
+        print_info("Prometheus 指標", f"{self.base_url}/metrics (出價各階段、排行榜組裝、WebSocket 扇出、連線池)")
         print_warning("請在另一個終端運行監控腳本")
         
         return True
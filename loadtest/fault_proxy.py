@@ -0,0 +1,628 @@
+#!/usr/bin/env python3
+"""
+Redis / Postgres 故障注入代理 (fault-injection proxy)
+
+PlaceBid 在 Redis 慢 5ms、Postgres 卡住時的行為從來沒量過：bid_logs 是 fire-and-forget 寫入，
+廣播也在另開的 goroutine 裡，上游變慢時 goroutine 會堆積、寫入會失敗。
+本程式在後端與 Redis / Postgres 之間各開一個 TCP 代理，依排程切換故障設定 (profile)：
+    latency_ms      上游回應 (Redis / Postgres → 後端) 的額外延遲
+    jitter_ms       延遲的隨機變動 (±)，同一條連線仍依序送出
+    bandwidth_kbps  每條連線每個方向的頻寬上限 (KB/s)，0 代表不限
+    reset_every     每隔幾秒以 RST 斷開所有連線，0 代表不斷
+    reset_prob      每個轉送的封包以此機率 RST 斷開該連線
+
+每秒取樣寫入 runs/<run_id>/fault_proxy.jsonl：目前的 profile、各代理的連線數 / 流量 / 斷線次數，
+以及後端 /metrics 的 go_goroutines、bid_log_write_errors_total 等；切換 profile 時記錄 fault 事件。
+報表依 profile 分段列出出價延遲、goroutine 增長與出價遺失 (後端寫入失敗數；指定 --dsn 時另比對
+accepted_bids.jsonl 中被接受的出價是否出現在 bid_logs)。
+
+使用方式：
+1. 啟動代理 (預設等到同一個 run 的 test_start 事件才開始排程)：
+   python fault_proxy.py run --run-id fault-1 --schedule "0=none,30=redis_5ms,60=none,90=pg_stall,120=none"
+2. 讓後端連到代理，例如 docker compose 的 backend 設定
+   REDIS_ADDRS=host.docker.internal:16379 DB_HOST=host.docker.internal DB_PORT=15432
+3. 以相同的 RUN_ID 執行壓測：
+   RUN_ID=fault-1 locust -f locustfile_demo.py --headless --host http://localhost:8000
+4. 報表：
+   python fault_proxy.py report runs/fault-1 --dsn "host=localhost user=admin password=password123 dbname=auction_db"
+
+python fault_proxy.py profiles 列出內建 profile；--profiles 可用 JSON 檔 ({名稱: {"redis": {...}, "postgres": {...}}}) 增加或覆蓋。
+請勿在正式環境使用。
+"""
+
+import argparse
+import json
+import os
+import queue
+import random
+import re
+import socket
+import struct
+import threading
+import time
+from collections import defaultdict, namedtuple
+
+import requests
+
+from histogram import LatencyHistogram
+from run_summary import is_bid_request
+from runlog import RunLog, read_events, read_jsonl
+from timeline import client_windows, format_client, markers, run_origin, window_index
+
+FILENAME = "fault_proxy.jsonl"
+CHUNK = 65536
+METRICS_MAX_BACKOFF = 10.0  # 後端 /metrics 連續失敗時的最長重試間隔 (秒)
+METRIC_RE = re.compile(r'^(\w+)(?:\{([^}]*)\})? (\S+)$')
+# 後端 /metrics 中與故障影響相關的指標 (不同 label 加總)；bids_total 另取 result="ok" 為 bids_ok
+BACKEND_METRICS = ("go_goroutines", "bid_log_write_errors_total", "ws_broadcast_dropped_total",
+                   "db_pool_acquire_timeouts_total", "redis_pool_timeouts_total")
+TARGETS = ("redis", "postgres")
+
+
+class Fault(namedtuple("Fault", "latency_ms jitter_ms bandwidth_kbps reset_every reset_prob")):
+    @classmethod
+    def from_dict(cls, spec):
+        return cls(float(spec.get("latency_ms", 0)), float(spec.get("jitter_ms", 0)),
+                   float(spec.get("bandwidth_kbps", 0)), float(spec.get("reset_every", 0)),
+                   float(spec.get("reset_prob", 0)))
+
+    def describe(self):
+        parts = []
+        if self.latency_ms or self.jitter_ms:
+            parts.append(f"+{self.latency_ms:g}ms" + (f" ±{self.jitter_ms:g}ms" if self.jitter_ms else ""))
+        if self.bandwidth_kbps:
+            parts.append(f"{self.bandwidth_kbps:g}KB/s")
+        if self.reset_every:
+            parts.append(f"每 {self.reset_every:g}s 斷線")
+        if self.reset_prob:
+            parts.append(f"封包斷線率 {self.reset_prob:g}")
+        return " ".join(parts) or "正常"
+
+
+NO_FAULT = Fault(0.0, 0.0, 0.0, 0.0, 0.0)
+
+PROFILES = {
+    "none": {},
+    "redis_5ms": {"redis": {"latency_ms": 5}},
+    "redis_jitter": {"redis": {"latency_ms": 5, "jitter_ms": 5}},
+    "redis_slow_link": {"redis": {"bandwidth_kbps": 256}},
+    "redis_resets": {"redis": {"reset_every": 5}},
+    "pg_slow": {"postgres": {"latency_ms": 20, "jitter_ms": 10}},
+    "pg_stall": {"postgres": {"latency_ms": 2000}},
+    "pg_resets": {"postgres": {"reset_every": 10, "reset_prob": 0.001}},
+    "both_5ms": {"redis": {"latency_ms": 5}, "postgres": {"latency_ms": 5}},
+}
+DEFAULT_SCHEDULE = "0=none,30=redis_5ms,60=none,90=pg_stall,120=none,150=redis_resets,180=none"
+
+
+def parse_schedule(spec, profiles):
+    """'0=none,30=redis_5ms' → [(0.0, 'none'), (30.0, 'redis_5ms')] (依時間排序)"""
+    steps = []
+    for item in (spec or "").split(","):
+        at, _, name = item.partition("=")
+        if not name.strip():
+            continue
+        if name.strip() not in profiles:
+            raise ValueError(f"未知的 profile: {name.strip()} (可用: {', '.join(profiles)})")
+        steps.append((float(at), name.strip()))
+    return sorted(steps) or [(0.0, "none")]
+
+
+def parse_address(text, default_host="localhost"):
+    host, _, port = text.rpartition(":")
+    return host or default_host, int(port)
+
+
+def parse_metrics(text):
+    """後端 /metrics → {指標: 值}"""
+    values = defaultdict(float)
+    for line in text.splitlines():
+        m = METRIC_RE.match(line)
+        if not m:
+            continue
+        name, labels, value = m.groups()
+        if name in BACKEND_METRICS:
+            values[name] += float(value)
+        elif name == "bids_total" and labels == 'result="ok"':
+            values["bids_ok"] = float(value)
+    return dict(values)
+
+
+# ---------------------------------------------------------------------------
+# 代理
+# ---------------------------------------------------------------------------
+
+class Link:
+    """一條被代理的連線：每個方向一個讀取與一個送出執行緒，讀到的資料依 deliver_at 排程送出"""
+
+    def __init__(self, target, client, upstream):
+        self.target = target
+        self.sockets = (client, upstream)
+        self.closed = threading.Event()
+        self._finished = 0
+        self._lock = threading.Lock()
+
+    def start(self):
+        client, upstream = self.sockets
+        for src, dst, downstream in ((client, upstream, False), (upstream, client, True)):
+            pending = queue.Queue()
+            threading.Thread(target=self._read, args=(src, pending, downstream), daemon=True).start()
+            threading.Thread(target=self._write, args=(dst, pending), daemon=True).start()
+
+    def _read(self, src, pending, downstream):
+        rng = random.Random()
+        last = 0.0
+        try:
+            while not self.closed.is_set():
+                data = src.recv(CHUNK)
+                if not data:
+                    break
+                fault = self.target.fault
+                if fault.reset_prob and rng.random() < fault.reset_prob:
+                    self.reset()
+                    break
+                delay = 0.0
+                if downstream and (fault.latency_ms or fault.jitter_ms):
+                    delay = max(fault.latency_ms + rng.uniform(-fault.jitter_ms, fault.jitter_ms), 0.0) / 1000
+                # 抖動不能讓後讀到的資料先送出
+                last = max(time.time() + delay, last)
+                pending.put((last, data))
+                if downstream:
+                    self.target.bytes_down += len(data)
+                else:
+                    self.target.bytes_up += len(data)
+        except OSError:
+            pass
+        pending.put(None)
+
+    def _write(self, dst, pending):
+        next_free = 0.0
+        try:
+            while True:
+                item = pending.get()
+                if item is None:
+                    # 對方已關閉：轉送 FIN，另一個方向繼續
+                    dst.shutdown(socket.SHUT_WR)
+                    break
+                deliver_at, data = item
+                rate = self.target.fault.bandwidth_kbps * 1024
+                if rate:
+                    deliver_at = max(deliver_at, next_free)
+                    next_free = max(deliver_at, time.time()) + len(data) / rate
+                wait = deliver_at - time.time()
+                if wait > 0 and self.closed.wait(wait):
+                    break
+                dst.sendall(data)
+        except OSError:
+            pass
+        with self._lock:
+            self._finished += 1
+            done = self._finished == 2
+        if done:
+            self.close()
+
+    def reset(self):
+        """以 RST 斷開兩端 (SO_LINGER 0)"""
+        if self.closed.is_set():
+            return
+        self.closed.set()
+        self.target.resets += 1
+        for sock in self.sockets:
+            try:
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack("ii", 1, 0))
+                sock.shutdown(socket.SHUT_RD)  # 喚醒阻塞中的 recv
+            except OSError:
+                pass
+        self.close()
+
+    def close(self):
+        self.closed.set()
+        for sock in self.sockets:
+            try:
+                sock.close()
+            except OSError:
+                pass
+        self.target.discard(self)
+
+
+class ProxyTarget:
+    def __init__(self, name, listen, upstream):
+        self.name = name
+        self.listen = listen
+        self.upstream = upstream
+        self.fault = NO_FAULT
+        self.links = set()
+        self.accepted = 0
+        self.connect_errors = 0
+        self.resets = 0
+        self.bytes_up = 0
+        self.bytes_down = 0
+        self._next_reset = None
+        self._lock = threading.Lock()
+        self._server = None
+
+    def start(self):
+        self._server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._server.bind(self.listen)
+        self._server.listen(512)
+        threading.Thread(target=self._accept, daemon=True).start()
+        print(f"[故障注入] {self.name}: {self.listen[0]}:{self.listen[1]} → {self.upstream[0]}:{self.upstream[1]}")
+
+    def _accept(self):
+        while True:
+            try:
+                client, _ = self._server.accept()
+            except OSError:
+                break
+            try:
+                upstream = socket.create_connection(self.upstream, timeout=5)
+                upstream.settimeout(None)
+            except OSError:
+                self.connect_errors += 1
+                client.close()
+                continue
+            for sock in (client, upstream):
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            link = Link(self, client, upstream)
+            with self._lock:
+                self.links.add(link)
+                self.accepted += 1
+            link.start()
+
+    def discard(self, link):
+        with self._lock:
+            self.links.discard(link)
+
+    def set_fault(self, fault):
+        self.fault = fault
+        self._next_reset = time.time() + fault.reset_every if fault.reset_every else None
+
+    def tick(self, now):
+        if self._next_reset is not None and now >= self._next_reset:
+            self.reset_all()
+            self._next_reset = now + self.fault.reset_every
+
+    def reset_all(self):
+        with self._lock:
+            links = list(self.links)
+        for link in links:
+            link.reset()
+
+    def snapshot(self):
+        return {"connections": len(self.links), "accepted": self.accepted, "connect_errors": self.connect_errors,
+                "resets": self.resets, "bytes_up": self.bytes_up, "bytes_down": self.bytes_down}
+
+    def stop(self):
+        if self._server:
+            self._server.close()
+        self.set_fault(NO_FAULT)
+        with self._lock:
+            links = list(self.links)
+        for link in links:
+            link.close()
+
+
+def test_start_ts(run_dir):
+    """同一個 run 的 test_start 事件時間；還沒寫入時回傳 None (不以其他事件代替，代理自己的 fault 事件也會寫入 events.jsonl)"""
+    for event in read_events(run_dir):
+        if event.get("event") == "test_start":
+            return event["ts"]
+    return None
+
+
+class FaultProxy:
+    def __init__(self, run_log, targets, schedule, profiles, metrics_url=None, interval=1.0, wait_start=True):
+        self.run_log = run_log
+        self.path = run_log.path(FILENAME)
+        self.targets = targets
+        self.schedule = schedule
+        self.profiles = profiles
+        self.metrics_url = metrics_url
+        self.interval = interval
+        self.origin = None if wait_start else time.time()
+        self.profile = None
+        self._metrics_failures = 0
+        self._metrics_retry_at = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        for target in self.targets.values():
+            target.start()
+        self.apply("none")
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        steps = ", ".join(f"{at:g}s {name}" for at, name in self.schedule)
+        print(f"[故障注入] 排程: {steps}" + ("" if self.origin else " (等待 test_start)"))
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=self.interval + 5)
+        for target in self.targets.values():
+            target.stop()
+
+    @property
+    def finished(self):
+        """排程的最後一步已經套用"""
+        return self.origin is not None and time.time() - self.origin >= self.schedule[-1][0]
+
+    def _run(self):
+        next_tick = time.time()
+        while not self._stop.is_set():
+            now = time.time()
+            if self.origin is None:
+                self.origin = test_start_ts(self.run_log.dir)
+            if self.origin is not None:
+                elapsed = now - self.origin
+                name = [step for at, step in self.schedule if at <= elapsed][-1:] or ["none"]
+                if name[0] != self.profile:
+                    self.apply(name[0])
+            for target in self.targets.values():
+                target.tick(now)
+            self.sample(now)
+            next_tick += self.interval
+            self._stop.wait(max(next_tick - time.time(), 0))
+
+    def apply(self, name):
+        spec = self.profiles[name]
+        faults = {}
+        for target_name, target in self.targets.items():
+            fault = Fault.from_dict(spec.get(target_name, {}))
+            target.set_fault(fault)
+            faults[target_name] = fault._asdict()
+        self.profile = name
+        self.run_log.event("fault", name=name, faults=faults)
+        desc = "；".join(f"{t} {Fault(**f).describe()}" for t, f in faults.items())
+        print(f"[故障注入] 切換到 {name}: {desc}")
+
+    def sample(self, now):
+        record = {
+            "ts": round(now, 3),
+            "elapsed": round(now - self.run_log.started_at, 3),
+            "profile": self.profile,
+            "targets": {name: target.snapshot() for name, target in self.targets.items()},
+        }
+        backend = self._backend_metrics()
+        if backend is not None:
+            record["backend"] = backend
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def _backend_metrics(self):
+        """讀取失敗時以指數退避重試 (最多間隔 METRICS_MAX_BACKOFF 秒)，後端重啟後自動恢復"""
+        if not self.metrics_url or time.time() < self._metrics_retry_at:
+            return None
+        try:
+            res = requests.get(self.metrics_url, timeout=1)
+            res.raise_for_status()
+        except requests.RequestException:
+            self._metrics_failures += 1
+            if self._metrics_failures == 3:
+                print(f"[故障注入] 無法讀取 {self.metrics_url}，退避後持續重試")
+            if self._metrics_failures >= 3:
+                backoff = min(self.interval * 2 ** (self._metrics_failures - 3), METRICS_MAX_BACKOFF)
+                self._metrics_retry_at = time.time() + backoff
+            return None
+        if self._metrics_failures >= 3:
+            print(f"[故障注入] 已恢復讀取 {self.metrics_url}")
+        self._metrics_failures = 0
+        self._metrics_retry_at = 0.0
+        return parse_metrics(res.text)
+
+
+# ---------------------------------------------------------------------------
+# 報表
+# ---------------------------------------------------------------------------
+
+def counter_deltas(rows):
+    """每筆取樣相對前一筆的增量 (計數器、代理斷線數)；後端重啟造成的負值視為 0"""
+    prev = None
+    for r in rows:
+        backend = r.get("backend", {})
+        current = {
+            "write_errors": backend.get("bid_log_write_errors_total"),
+            "bids_ok": backend.get("bids_ok"),
+            "pool_timeouts": (None if "db_pool_acquire_timeouts_total" not in backend else
+                              backend["db_pool_acquire_timeouts_total"] + backend.get("redis_pool_timeouts_total", 0)),
+            "ws_dropped": backend.get("ws_broadcast_dropped_total"),
+            "resets": sum(t["resets"] for t in r["targets"].values()),
+        }
+        r["delta"] = {k: (max(v - prev[k], 0) if v is not None and prev and prev.get(k) is not None else 0)
+                      for k, v in current.items()}
+        prev = current
+
+
+def segments(rows):
+    """連續相同 profile 的取樣合併為 [(profile, [rows])]"""
+    result = []
+    for r in rows:
+        if result and result[-1][0] == r["profile"]:
+            result[-1][1].append(r)
+        else:
+            result.append((r["profile"], [r]))
+    return result
+
+
+def lost_bids(run_dir, dsn):
+    """accepted_bids.jsonl 中沒有出現在 bid_logs 的出價 client_ts 列表；沒有出價紀錄時回傳 None"""
+    bids = read_jsonl(run_dir, "accepted_bids.jsonl")
+    if not bids:
+        return None
+    import psycopg2  # 只有指定 --dsn 時需要
+
+    since = min(b["server_ts"] for b in bids) / 1000 - 60
+    products = sorted({b["product"] for b in bids})
+    logged = set()
+    conn = psycopg2.connect(dsn, connect_timeout=5, application_name="fault_proxy")
+    try:
+        with conn.cursor(name="fault_proxy") as cur:
+            cur.itersize = 50000
+            cur.execute("SELECT product_id, user_id::text, price FROM bid_logs "
+                        "WHERE product_id = ANY(%s) AND created_at >= to_timestamp(%s)", (products, since))
+            for product_id, user_id, price in cur:
+                logged.add((product_id, user_id, round(float(price), 2)))
+    finally:
+        conn.close()
+    return [b["client_ts"] for b in bids if (b["product"], b["user"], round(b["price"], 2)) not in logged]
+
+
+def bid_client_rows(run_dir):
+    return [r for r in read_jsonl(run_dir, "client_latency.jsonl") if is_bid_request(r["name"])]
+
+
+def report(run_dir, window=5.0, dsn=None):
+    rows = [r for r in read_jsonl(run_dir, FILENAME) if "targets" in r]
+    if not rows:
+        print(f"{run_dir} 沒有故障注入資料 ({FILENAME})")
+        return
+    counter_deltas(rows)
+    t0 = run_origin(run_dir, rows)
+    client = bid_client_rows(run_dir)
+    bid_names = {r["name"] for r in client}
+    accepted = [b["client_ts"] for b in read_jsonl(run_dir, "accepted_bids.jsonl")]
+    lost = lost_bids(run_dir, dsn) if dsn else None
+
+    print("\n" + "=" * 96)
+    print("  各故障 profile 的出價延遲、goroutine 增長與出價遺失")
+    print("  (寫入失敗 = 後端 bid_log_write_errors_total 增量；遺失 = 被接受但不在 bid_logs 的出價，需 --dsn)")
+    print("=" * 96)
+    print(f"  {'profile':<16} {'秒':>5} {'出價/s':>7} {'p50':>7} {'p95':>7} {'p99':>7} {'失敗%':>6} "
+          f"{'goroutines 起→迄 (峰值, /s)':>30} {'寫入失敗':>8} {'遺失':>12}")
+    for profile, seg in segments(rows):
+        start, end = seg[0]["ts"], seg[-1]["ts"] + 1
+        span = end - start
+        hist, failures = LatencyHistogram(), 0
+        for r in client:
+            if start <= r["ts"] < end:
+                hist.merge(LatencyHistogram.from_dict(r["hist"]))
+                failures += r["failures"]
+        total = hist.count + failures
+        goroutines = [r["backend"]["go_goroutines"] for r in seg if "go_goroutines" in r.get("backend", {})]
+        if goroutines:
+            g = (f"{goroutines[0]:.0f}→{goroutines[-1]:.0f} ({max(goroutines):.0f}, "
+                 f"{(goroutines[-1] - goroutines[0]) / span:+.1f})")
+        else:
+            g = "-"
+        write_errors = sum(r["delta"]["write_errors"] for r in seg)
+        n_accepted = sum(1 for ts in accepted if start <= ts < end)
+        if lost is None:
+            loss = "-"
+        else:
+            n_lost = sum(1 for ts in lost if start <= ts < end)
+            loss = f"{n_lost} ({n_lost / n_accepted * 100:.1f}%)" if n_accepted else "0"
+        if total:
+            latency = (f"{total / span:7.1f} {hist.percentile(50):7.1f} {hist.percentile(95):7.1f} "
+                       f"{hist.percentile(99):7.1f} {failures / total * 100:6.1f}")
+        else:
+            latency = f"{'-':>7} {'-':>7} {'-':>7} {'-':>7} {'-':>6}"
+        print(f"  {profile:<16} {span:5.0f} {latency} {g:>30} {write_errors:8.0f} {loss:>12}")
+
+    # 時間軸
+    windows = defaultdict(list)
+    for r in rows:
+        windows[window_index(r["ts"], t0, window)].append(r)
+    latency = client_windows(run_dir, t0, window, bid_names)
+    lost_windows = defaultdict(int)
+    for ts in lost or []:
+        lost_windows[window_index(ts, t0, window)] += 1
+    marks = markers(run_dir, t0, window)
+
+    print("\n" + "=" * 96)
+    print(f"  時間軸 (每 {window:g}s；出價請求；goroutines 為峰值；連線 r/p 為 Redis / Postgres 代理連線數)")
+    print("=" * 96)
+    print(f"  {'t(s)':>6} {'req/s':>7} {'p50':>7} {'p99':>7} {'profile':<16} {'gorout':>7} {'寫入失敗':>8} "
+          f"{'遺失':>5} {'池逾時':>6} {'斷線':>5} {'連線 r/p':>9}")
+    for idx in sorted(set(windows) | set(latency)):
+        line = f"  {idx * window:>6.0f} {format_client(latency.get(idx), window)}"
+        samples = windows.get(idx, [])
+        if samples:
+            goroutines = [r["backend"]["go_goroutines"] for r in samples if "go_goroutines" in r.get("backend", {})]
+            conns = "/".join(str(max(r["targets"][t]["connections"] for r in samples)) if t in samples[-1]["targets"]
+                             else "-" for t in TARGETS)
+            line += (f" {samples[-1]['profile'] or '-':<16} {max(goroutines) if goroutines else 0:>7.0f} "
+                     f"{sum(r['delta']['write_errors'] for r in samples):>8.0f} "
+                     f"{lost_windows.get(idx, 0) if lost is not None else '-':>5} "
+                     f"{sum(r['delta']['pool_timeouts'] for r in samples):>6.0f} "
+                     f"{sum(r['delta']['resets'] for r in samples):>5.0f} {conns:>9}")
+        if marks.get(idx):
+            line += "  ← " + ", ".join(marks[idx])
+        print(line)
+
+
+def load_profiles(path):
+    profiles = dict(PROFILES)
+    if path:
+        with open(path, encoding="utf-8") as f:
+            profiles.update(json.load(f))
+    return profiles
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Redis / Postgres 故障注入代理")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run = sub.add_parser("run", help="啟動代理並依排程切換故障 profile")
+    run.add_argument("--run-id", default=None, help="寫入的 run ID (預設 RUN_ID 環境變數或新建)")
+    run.add_argument("--redis", default="localhost:6379", help="Redis 位址")
+    run.add_argument("--redis-listen", type=int, default=16379, help="Redis 代理的 port (0 代表不代理)")
+    run.add_argument("--postgres", default="localhost:5432", help="Postgres 位址")
+    run.add_argument("--postgres-listen", type=int, default=15432, help="Postgres 代理的 port (0 代表不代理)")
+    run.add_argument("--listen-host", default="0.0.0.0")
+    run.add_argument("--schedule", default=DEFAULT_SCHEDULE, help="「秒=profile」以逗號分隔，從 test_start 起算")
+    run.add_argument("--profiles", help="自訂 profile 的 JSON 檔")
+    run.add_argument("--metrics-url", default=os.getenv("FAULT_METRICS_URL", "http://localhost:8000/metrics"),
+                     help="後端 /metrics (goroutine 數、bid_logs 寫入失敗)，空字串代表不擷取")
+    run.add_argument("--interval", type=float, default=1.0)
+    run.add_argument("--no-wait", dest="wait_start", action="store_false",
+                     help="不等待 test_start，啟動後立即開始排程")
+    run.add_argument("--duration", type=float, default=0,
+                     help="排程結束後再執行的秒數，0 代表直到 Ctrl-C")
+
+    rep = sub.add_parser("report", help="輸出報表")
+    rep.add_argument("run_dir")
+    rep.add_argument("--window", type=float, default=5.0, help="彙總視窗秒數")
+    rep.add_argument("--dsn", default=os.getenv("PG_TELEMETRY_DSN"),
+                     help="Postgres 連線字串，比對被接受的出價是否寫入 bid_logs")
+
+    prof = sub.add_parser("profiles", help="列出故障 profile")
+    prof.add_argument("--profiles", help="自訂 profile 的 JSON 檔")
+    args = parser.parse_args()
+
+    if args.command == "report":
+        report(args.run_dir, args.window, args.dsn)
+        return
+    if args.command == "profiles":
+        for name, spec in load_profiles(args.profiles).items():
+            desc = "；".join(f"{t} {Fault.from_dict(f).describe()}" for t, f in spec.items()) or "不注入故障"
+            print(f"  {name:<18} {desc}")
+        return
+
+    profiles = load_profiles(args.profiles)
+    targets = {}
+    if args.redis_listen:
+        targets["redis"] = ProxyTarget("redis", (args.listen_host, args.redis_listen), parse_address(args.redis))
+    if args.postgres_listen:
+        targets["postgres"] = ProxyTarget("postgres", (args.listen_host, args.postgres_listen),
+                                          parse_address(args.postgres))
+    run_log = RunLog(args.run_id)
+    proxy = FaultProxy(run_log, targets, parse_schedule(args.schedule, profiles), profiles,
+                       metrics_url=args.metrics_url or None, interval=args.interval,
+                       wait_start=args.wait_start).start()
+    print(f"[故障注入] run ID {run_log.run_id} → {proxy.path}")
+    try:
+        while not (args.duration and proxy.finished):
+            time.sleep(1)
+        time.sleep(args.duration)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        proxy.stop()
+        run_log.event("fault_proxy_stop")
+        print(f"[故障注入] 已停止，報表: python fault_proxy.py report {run_log.dir}")
+
+
+if __name__ == "__main__":
+    main()
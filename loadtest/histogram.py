@@ -0,0 +1,76 @@
+"""
+對數 bucket 延遲直方圖
+
+相對誤差約 1%，記憶體只與數值範圍有關、與樣本數無關，
+長時間壓測也不需要保留每一筆延遲。可合併 (merge) 與序列化 (to_dict / from_dict)。
+"""
+
+import math
+
+# 相鄰 bucket 的倍率 (1.02 → 誤差約 ±1%)
+GROWTH = 1.02
+_LOG_GROWTH = math.log(GROWTH)
+# 小於此值 (毫秒) 的樣本併入最小的 bucket
+MIN_VALUE = 0.001
+
+
+class LatencyHistogram:
+    def __init__(self):
+        self.buckets = {}
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def record(self, value):
+        value = max(float(value), 0.0)
+        idx = int(math.log(max(value, MIN_VALUE) / MIN_VALUE) / _LOG_GROWTH)
+        self.buckets[idx] = self.buckets.get(idx, 0) + 1
+        self.count += 1
+        self.total += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def merge(self, other):
+        for idx, n in other.buckets.items():
+            self.buckets[idx] = self.buckets.get(idx, 0) + n
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def percentile(self, p):
+        """p 為 0-100，回傳該 bucket 的中點 (毫秒)"""
+        if self.count == 0:
+            return 0.0
+        rank = max(1, math.ceil(self.count * p / 100))
+        seen = 0
+        for idx in sorted(self.buckets):
+            seen += self.buckets[idx]
+            if seen >= rank:
+                low = MIN_VALUE * GROWTH ** idx
+                return min(max(low * (1 + GROWTH) / 2, self.min), self.max)
+        return self.max
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def to_dict(self):
+        return {
+            "buckets": {str(k): v for k, v in self.buckets.items()},
+            "count": self.count,
+            "total": self.total,
+            "min": self.min if self.count else 0.0,
+            "max": self.max,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        h = cls()
+        h.buckets = {int(k): v for k, v in data.get("buckets", {}).items()}
+        h.count = data.get("count", 0)
+        h.total = data.get("total", 0.0)
+        h.min = data.get("min", 0.0) if h.count else math.inf
+        h.max = data.get("max", 0.0)
+        return h
@@ -0,0 +1,87 @@
+"""
+每秒 client 延遲時間序列
+
+依請求名稱把延遲累計到每秒一個 LatencyHistogram，秒數結束後寫入 runs/<run_id>/client_latency.jsonl，
+讓遙測側車 (redis_telemetry.py 等) 的每秒取樣可以用 Unix 秒對齊到 client 延遲曲線。
+
+每行格式：
+    {"ts": 1700000000, "elapsed": 12.0, "name": "出價", "count": 120, "failures": 2,
+     "mean": 35.1, "p50": 30.2, "p95": 80.4, "p99": 120.7, "hist": {...LatencyHistogram.to_dict()},
+     "outcomes": {"accepted": 90, "outbid_race": 30, ...}}
+outcomes 只有出價請求才有 (bid_outcomes.py 的分類)，capacity_search.py 用它區分業務拒絕與伺服器錯誤。
+
+使用方式 (Locust)：
+    client_series = LatencySeries(run_log)
+    # on_request 中: client_series.record(name, response_time, failed=exception is not None, outcome=outcome)
+    # on_test_stop 中: client_series.close()
+"""
+
+import json
+import threading
+import time
+from collections import defaultdict
+
+from histogram import LatencyHistogram
+
+
+class LatencySeries:
+    def __init__(self, run_log, filename="client_latency.jsonl", flush_interval=1.0):
+        self.run_log = run_log
+        self.path = run_log.path(filename)
+        self._lock = threading.Lock()
+        self._seconds = defaultdict(lambda: defaultdict(LatencyHistogram))  # {秒: {name: hist}}
+        self._failures = defaultdict(lambda: defaultdict(int))
+        self._outcomes = defaultdict(lambda: defaultdict(lambda: defaultdict(int)))  # {秒: {name: {分類: 次數}}}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(flush_interval,), daemon=True)
+        self._thread.start()
+
+    def record(self, name, response_time, failed=False, outcome=None):
+        second = int(time.time())
+        with self._lock:
+            if outcome is not None:
+                self._outcomes[second][name][outcome] += 1
+            if failed:
+                self._failures[second][name] += 1
+                self._seconds[second]  # 只有失敗的秒數也要輸出
+            elif response_time is not None:
+                self._seconds[second][name].record(response_time)
+
+    def _run(self, interval):
+        while not self._stop.wait(interval):
+            self.flush(before=int(time.time()))
+
+    def flush(self, before=None):
+        """寫出 before (Unix 秒) 之前已結束的秒數；None 代表全部"""
+        with self._lock:
+            done = sorted(s for s in self._seconds if before is None or s < before)
+            batches = [(s, self._seconds.pop(s), self._failures.pop(s, {}), self._outcomes.pop(s, {})) for s in done]
+        if not batches:
+            return
+
+        lines = []
+        for second, hists, failures, outcomes in batches:
+            for name in sorted(set(hists) | set(failures)):
+                h = hists.get(name) or LatencyHistogram()
+                row = {
+                    "ts": second,
+                    "elapsed": round(second - self.run_log.started_at, 3),
+                    "name": name,
+                    "count": h.count,
+                    "failures": failures.get(name, 0),
+                    "mean": round(h.mean, 3),
+                    "p50": round(h.percentile(50), 3),
+                    "p95": round(h.percentile(95), 3),
+                    "p99": round(h.percentile(99), 3),
+                    "hist": h.to_dict(),
+                }
+                if name in outcomes:
+                    row["outcomes"] = dict(outcomes[name])
+                lines.append(json.dumps(row, ensure_ascii=False))
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+
+    def close(self):
+        self._stop.set()
+        self._thread.join(timeout=2)
+        self.flush()
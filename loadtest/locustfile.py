@@ -7,12 +7,14 @@ Locust 壓力測試腳本（增強版）
 - 錯誤分類統計
 - 更新出價場景
 - 截止前瘋狂出價場景
+- 出價策略 (BIDDER_STRATEGY：random / sniper / incremental / last_second)
+- FastHttpUser 版本的用戶類別見 locustfile_fast.py (行為相同)
 
 預設使用遠端服務：https://d28wqj892frr80.cloudfront.net
 可通過環境變數 BASE_URL 或 --host 參數覆蓋
 """
 
-from locust import HttpUser, task, between, events
+from locust import HttpUser, User, task, between, constant_throughput, events
 import random
 import json
 import time
@@ -20,17 +22,46 @@ import statistics
 import os
 from collections import defaultdict
 
+from profiler import ProfileCapture, parse_phases
+from bid_ledger import BidLedger
+from bidder import DEFAULT_TERMS, BidderMix, BidderStats, BidView, ProductTerms, bid_score, now_ms
+from latency_series import LatencySeries
+from pg_telemetry import PgTelemetry, report as pg_report
+from popularity import ProductPicker, ProductStats
+from price_oracle import PriceOracle
+from redis_telemetry import RedisTelemetry, report as redis_report
+from run_summary import RunSummary, is_bid_request
+from runlog import RunLog
+from server_timing import ServerTimingStats
+
 # 全域變數儲存統計資訊
 response_times = defaultdict(list)
 error_counts = defaultdict(int)
+server_timing = ServerTimingStats()  # 依 Server-Timing 拆解網路與伺服器各階段時間
 product_ids = []  # 動態獲取的商品 ID
 current_highest_prices = {}  # 每個商品的當前最高價
+current_thresholds = {}  # 每個商品的門檻分數 (第 K 名)
+product_terms = {}  # 每個商品的計分參數 (alpha / beta / gamma / k / 開始與結束時間)
+run_log = None  # runs/<run_id>/ 執行紀錄
+profiler = None  # PROFILE_PHASES 有設定時擷取 profile
+client_series = None  # 每秒 client 延遲 (runs/<run_id>/client_latency.jsonl)
+bid_ledger = None  # 被接受的出價 (runs/<run_id>/accepted_bids.jsonl，供 verify_rankings.py 驗證)
+redis_telemetry = None  # REDIS_TELEMETRY_URL 有設定時每秒取樣 Redis
+pg_telemetry = None  # PG_TELEMETRY_DSN 有設定時每秒取樣 Postgres
+product_picker = ProductPicker.from_env()  # PRODUCT_POPULARITY：uniform / zipf / weighted
+product_stats = ProductStats()  # 依商品拆解出價與排行榜的吞吐量與延遲
+run_summary = RunSummary()  # 結束時寫入 runs/<run_id>/summary.json
+price_oracle = PriceOracle.from_env()  # /ws 推播的最高價 (PRICE_ORACLE_CONNECTIONS=0 時停用)
+bidder_mix = BidderMix.from_env()  # BIDDER_STRATEGY：每個用戶的出價策略
+bidder_stats = BidderStats()  # 依策略統計略過、接受率與溢價
+script_name = "locustfile.py"  # 寫入 meta.json 的 script (locustfile_fast.py 匯入後覆寫)
+user_pace_rps = float(os.getenv("USER_PACE_RPS") or 0)  # 容量搜尋 rate 模式：每個用戶每秒的 task 數
 
 
 @events.test_start.add_listener
 def on_test_start(environment, **kwargs):
     """測試開始時獲取商品列表"""
-    global product_ids, current_highest_prices
+    global product_ids, current_highest_prices, run_log, profiler, client_series, redis_telemetry, pg_telemetry, bid_ledger
     
     # 創建臨時客戶端獲取商品列表
     from locust.clients import HttpSession
@@ -38,6 +69,28 @@ def on_test_start(environment, **kwargs):
     # 優先使用環境變數，然後是命令行參數，最後是預設遠端 URL
     default_url = os.getenv("BASE_URL", "https://d28wqj892frr80.cloudfront.net")
     client = HttpSession(base_url=environment.host or default_url)
+
+    run_log = RunLog()
+    run_log.write_meta(script=script_name, host=environment.host or default_url,
+                       product_popularity=product_picker.spec,
+                       price_oracle_connections=price_oracle.connections if price_oracle else 0,
+                       bidder_strategy=bidder_mix.spec, traffic_model=os.getenv("TRAFFIC_MODEL"),
+                       user_classes=[cls.__name__ for cls in environment.user_classes])
+    run_log.event("test_start")
+    print(f"[Setup] Run ID: {run_log.run_id} ({run_log.dir})")
+    client_series = LatencySeries(run_log)
+    bid_ledger = BidLedger(run_log)
+    redis_telemetry = RedisTelemetry.from_env(run_log)
+    if redis_telemetry:
+        redis_telemetry.start()
+    pg_telemetry = PgTelemetry.from_env(run_log, environment.host or default_url)
+    if pg_telemetry:
+        pg_telemetry.start()
+    # 此腳本沒有固定的階段，只在 PROFILE_PHASES 指定時擷取 profile
+    phases = parse_phases(os.getenv("PROFILE_PHASES"))
+    if phases:
+        profiler = ProfileCapture(environment.host or default_url, run_log)
+        profiler.schedule(phases)
     
     # 先註冊一個測試用戶
     test_user = {
@@ -72,8 +125,10 @@ def on_test_start(environment, **kwargs):
             if product_res.status_code == 200:
                 product = product_res.json()
                 current_highest_prices[product_id] = product.get("currentHighestPrice", product.get("basePrice", 1000))
+                product_terms[product_id] = ProductTerms.from_product(product)
     
     print(f"[Setup] Found {len(product_ids)} active products: {product_ids}")
+    print(f"[Setup] 商品熱度: {product_picker.describe(product_ids)}")
     if not product_ids:
         print("[Warning] No active products found, using default 'prod_1'")
         product_ids = ["prod_1"]
@@ -87,8 +142,15 @@ def on_request(request_type, name, response_time, response_length, exception, **
         error_counts[type(exception).__name__] += 1
     elif response_time:
         response_times[name].append(response_time)
+        server_timing.record(name, response_time, kwargs.get("response"))
         if response_length == 0:
             error_counts["Empty Response"] += 1
+    outcome = run_summary.record(name, exception, kwargs)
+    if client_series:
+        client_series.record(name, response_time, failed=exception is not None, outcome=outcome)
+    product_stats.record(name, response_time, exception is not None, kwargs)
+    if bid_ledger and exception is None and is_bid_request(name):
+        bid_ledger.record(kwargs.get("response"))
 
 
 @events.test_stop.add_listener
@@ -114,12 +176,51 @@ def on_test_stop(environment, **kwargs):
     for error_type, count in error_counts.items():
         print(f"{error_type}: {count}")
 
+    run_summary.bids.print_report()
+    bidder_stats.print_report()
+    server_timing.print_report()
+    product_stats.print_report()
+
+    if price_oracle:
+        price_oracle.stop()
+        price_oracle.print_report()
+    if profiler:
+        profiler.cancel()
+    if client_series:
+        client_series.close()
+    if bid_ledger:
+        bid_ledger.close()
+    if run_log:
+        product_stats.save(run_log)
+    if redis_telemetry:
+        redis_telemetry.stop()
+        redis_report(run_log.dir)
+    if pg_telemetry:
+        pg_telemetry.stop()
+        pg_report(run_log.dir)
+    if run_log:
+        if price_oracle:
+            run_log.event("price_oracle", **price_oracle.summary())
+        run_log.event("bidders", strategies=bidder_stats.summary())
+        run_log.event("test_stop")
+        print(f"執行紀錄: {run_log.dir}")
+        print(f"被接受的出價 {bid_ledger.count} 筆，活動結束後執行 python verify_rankings.py {run_log.run_id} 驗證最終排行榜")
+        print(f"結果摘要: {run_summary.write(run_log, environment)}")
+
 
-class BiddingUser(HttpUser):
+class BiddingBehavior(User):
     """
     模擬競標用戶行為（增強版）
+    HTTP client 由子類別決定：BiddingUser 使用 HttpUser，locustfile_fast.py 使用 FastHttpUser
     """
+    abstract = True
     wait_time = between(1, 3)  # 用戶操作間隔 1-3 秒
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if user_pace_rps:
+            # 容量搜尋的到達率模式：所有行為 (含自訂 wait_time 的子類別) 都固定每秒執行 USER_PACE_RPS 個 task
+            cls.wait_time = constant_throughput(user_pace_rps)
     
     def on_start(self):
         """用戶登入"""
@@ -135,26 +236,31 @@ class BiddingUser(HttpUser):
             "role": "member"
         }
         
-        response = self.client.post("/api/auth/register", json=register_data, name="註冊用戶")
-        if response.status_code != 200:
-            # 如果註冊失敗，嘗試登入
-            login_data = {
-                "username": username,
-                "password": password
-            }
-            response = self.client.post("/api/auth/login", json=login_data, name="登入用戶")
+        self.client.post("/api/auth/register", json=register_data, name="註冊用戶")
+        # 註冊回應不含 token，無論註冊成功與否都要登入
+        login_data = {
+            "username": username,
+            "password": password
+        }
+        response = self.client.post("/api/auth/login", json=login_data, name="登入用戶")
         
         if response.status_code == 200:
             data = response.json()
             self.token = data.get("token")
             self.user_id = data.get("user", {}).get("id")
+            self.user_weight = float(data.get("user", {}).get("weight") or 1.0)
             self.headers = {"Authorization": f"Bearer {self.token}"}
         else:
             self.token = None
+            self.user_weight = 1.0
             self.headers = {}
+        self.bidder = bidder_mix.assign()
+        bidder_stats.assigned(self.bidder.name)
         
         # 獲取當前商品列表和最高價
         self.update_product_info()
+        if price_oracle:
+            price_oracle.start(self.host, self.token, product_ids, product_picker)
     
     def update_product_info(self):
         """更新商品資訊和當前最高價"""
@@ -172,29 +278,65 @@ class BiddingUser(HttpUser):
                 product_ids = [p["id"] for p in active_products]
                 for product in active_products:
                     current_highest_prices[product["id"]] = product.get("currentHighestPrice", product.get("basePrice", 1000))
+                    product_terms[product["id"]] = ProductTerms.from_product(product)
     
     def get_product_id(self):
         """獲取一個可用的商品 ID"""
         global product_ids
         if product_ids:
-            return random.choice(product_ids)
+            return product_picker.pick(product_ids)
         return "prod_1"  # 預設值
     
     def get_current_highest_price(self, product_id):
-        """獲取商品的當前最高價"""
+        """獲取商品的當前最高價 (有 /ws 推播時取兩者較高者)"""
         global current_highest_prices
-        return current_highest_prices.get(product_id, 1000.0)
+        price = current_highest_prices.get(product_id, 1000.0)
+        pushed = price_oracle.price(product_id) if price_oracle else None
+        if pushed is not None:
+            price = max(price, pushed)
+        return price
     
     def update_highest_price(self, product_id, new_price):
         """更新商品的當前最高價"""
         global current_highest_prices
         if new_price > current_highest_prices.get(product_id, 0):
             current_highest_prices[product_id] = new_price
-    
+
+    def bid_view(self, product_id, increment):
+        """出價決策需要的市場資訊 (門檻優先取 /ws 推播)"""
+        threshold = price_oracle.threshold(product_id) if price_oracle else None
+        if threshold is None:
+            threshold = current_thresholds.get(product_id)
+        return BidView(product_id, self.get_current_highest_price(product_id), threshold, self.user_weight,
+                       product_terms.get(product_id, DEFAULT_TERMS), now_ms(), increment)
+
+    def submit_bid(self, product_id, increment, name):
+        """依 BIDDER_STRATEGY 決定出價；策略決定不出價時回傳 None"""
+        view = self.bid_view(product_id, increment)
+        price = self.bidder.price(view)
+        if price is None:
+            bidder_stats.record(self.bidder.name, view, None)
+            return None
+
+        response = self.post_bid(product_id, price, name)
+        bidder_stats.record(self.bidder.name, view, price, response)
+        if response.status_code == 200:
+            self.update_highest_price(product_id, price)
+            self.bidder.accepted(product_id, bid_score(response))
+        return response
+
+    def post_bid(self, product_id, price, name):
+        """送出出價請求"""
+        return self.client.post(
+            f"/api/products/{product_id}/bids",
+            json={"price": price},
+            headers=self.headers,
+            name=name
+        )
+
     @task(3)
     def view_products(self):
-        """查看商品列表"""
-        self.client.get("/api/products", headers=self.headers, name="獲取商品列表")
+        """查看商品列表 (同一個請求順便更新商品與最高價)"""
         self.update_product_info()
     
     @task(2)
@@ -224,6 +366,7 @@ class BiddingUser(HttpUser):
         if response.status_code == 200:
             data = response.json()
             self.update_highest_price(product_id, data.get("currentHighestPrice", 1000))
+            current_thresholds[product_id] = data.get("thresholdScore")
     
     @task(10)
     def place_bid(self):
@@ -232,22 +375,8 @@ class BiddingUser(HttpUser):
             return
         
         product_id = self.get_product_id()
-        current_highest = self.get_current_highest_price(product_id)
-        
-        # 出價必須高於當前最高價，增加 10-100 的隨機增量
-        price = current_highest + random.uniform(10, 100)
-        
-        bid_data = {"price": price}
-        response = self.client.post(
-            f"/api/products/{product_id}/bids",
-            json=bid_data,
-            headers=self.headers,
-            name="提交出價"
-        )
-        
-        if response.status_code == 200:
-            # 更新當前最高價
-            self.update_highest_price(product_id, price)
+        # 出價必須高於當前最高價，random 策略增加 10-100 的隨機增量
+        self.submit_bid(product_id, random.uniform(10, 100), "提交出價")
     
     @task(5)
     def update_bid(self):
@@ -256,28 +385,16 @@ class BiddingUser(HttpUser):
             return
         
         product_id = self.get_product_id()
-        current_highest = self.get_current_highest_price(product_id)
-        
         # 出價必須高於當前最高價
-        price = current_highest + random.uniform(10, 50)
-        
-        bid_data = {"price": price}
-        response = self.client.post(
-            f"/api/products/{product_id}/bids",
-            json=bid_data,
-            headers=self.headers,
-            name="更新出價"
-        )
-        
-        if response.status_code == 200:
-            self.update_highest_price(product_id, price)
+        self.submit_bid(product_id, random.uniform(10, 50), "更新出價")
 
 
-class ExponentialRampUpUser(BiddingUser):
+class ExponentialRampUpBehavior(BiddingBehavior):
     """
     指數型成長頻率的用戶
     出價頻率隨時間指數增長
     """
+    abstract = True
     wait_time = between(0.5, 2)  # 更短的等待時間
     
     def place_bid(self):
@@ -296,26 +413,15 @@ class ExponentialRampUpUser(BiddingUser):
         # 根據頻率決定是否執行
         if random.random() < (current_rate / 10):
             product_id = self.get_product_id()
-            current_highest = self.get_current_highest_price(product_id)
-            price = current_highest + random.uniform(10, 100)
-            
-            bid_data = {"price": price}
-            response = self.client.post(
-                f"/api/products/{product_id}/bids",
-                json=bid_data,
-                headers=self.headers,
-                name="指數型出價"
-            )
-            
-            if response.status_code == 200:
-                self.update_highest_price(product_id, price)
+            self.submit_bid(product_id, random.uniform(10, 100), "指數型出價")
 
 
-class FinalRushUser(BiddingUser):
+class FinalRushBehavior(BiddingBehavior):
     """
     截止前瘋狂出價的用戶
     在活動結束前最後 2 秒大量出價
     """
+    abstract = True
     wait_time = between(0.1, 0.5)  # 非常短的等待時間
     
     def on_start(self):
@@ -346,16 +452,35 @@ class FinalRushUser(BiddingUser):
         
         if 0 < time_until_end <= 2:
             # 在最後 2 秒內，瘋狂出價
-            current_highest = self.get_current_highest_price(product_id)
-            price = current_highest + random.uniform(1, 50)
-            
-            bid_data = {"price": price}
-            response = self.client.post(
-                f"/api/products/{product_id}/bids",
-                json=bid_data,
-                headers=self.headers,
-                name="截止前出價"
-            )
-            
-            if response.status_code == 200:
-                self.update_highest_price(product_id, price)
+            self.submit_bid(product_id, random.uniform(1, 50), "截止前出價")
+
+
+class BiddingUser(BiddingBehavior, HttpUser):
+    pass
+
+
+class ExponentialRampUpUser(ExponentialRampUpBehavior, HttpUser):
+    pass
+
+
+class FinalRushUser(FinalRushBehavior, HttpUser):
+    pass
+
+
+# 流量模型的請求名稱 → 用戶方法
+TRACE_ENDPOINTS = {
+    "獲取商品列表": "view_products",
+    "獲取商品詳情": "view_product_detail",
+    "獲取排行榜": "view_rankings",
+    "提交出價": "place_bid",
+    "更新出價": "update_bid",
+    "指數型出價": "place_bid",
+    "截止前出價": "place_bid",
+}
+
+# TRAFFIC_MODEL 有設定時依錄製的流量模型重播 (traffic_model.py)：TraceShape 控制用戶數，TraceUser 依時段的 mix 挑選任務
+if os.getenv("TRAFFIC_MODEL"):
+    from traffic_model import TraceShape, trace_user
+
+    TraceUser = trace_user(BiddingUser, TRACE_ENDPOINTS)
+    TraceShape.user_classes = [TraceUser]
@@ -3,7 +3,7 @@ Locust 壓力測試腳本（Demo 視覺化增強版）
 專為 Demo 影片設計，提供清晰的視覺化輸出和實時統計
 
 功能：
-1. 自動創建多個商品（預設 3 個）
+1. 自動創建多個商品（預設 3 個，依情境設定）
 2. 分階段執行：先註冊所有用戶，然後開始競標（指數成長）
 3. 修復失敗率問題（增加出價增量，動態獲取最高價）
 4. 自動停止：測試會在指定時間後自動停止
@@ -14,6 +14,10 @@ locust -f locustfile_demo.py --host=https://d28wqj892frr80.cloudfront.net --run-
 或者使用 Web UI：
 locust -f locustfile_demo.py --host=https://d28wqj892frr80.cloudfront.net
 然後在 Web UI 中設置運行時間（例如 3 分鐘）
+
+情境 (商品數、K、計分參數、用戶組成、負載形狀、尖峰、亂數種子) 來自 scenarios.json：
+SCENARIO=flash_sale locust -f locustfile_demo.py --host=http://localhost:8000
+或以 python scenario.py run flash_sale --host http://localhost:8000 執行 headless 並收集所有產出
 """
 
 from locust import HttpUser, task, between, events, LoadTestShape
@@ -25,14 +29,36 @@ import os
 import threading
 import requests
 from collections import defaultdict
+
+from profiler import PROFILE_SECONDS, ProfileCapture, parse_phases
+from bid_ledger import BidLedger
+from bidder import DEFAULT_TERMS, BidderMix, BidderStats, BidView, ProductTerms, bid_score, now_ms
+from latency_series import LatencySeries
+from pg_telemetry import PgTelemetry, report as pg_report
+from popularity import ProductPicker, ProductStats
+from price_oracle import PriceOracle
+from redis_telemetry import RedisTelemetry, report as redis_report
+from run_summary import RunSummary, is_bid_request
+from runlog import RunLog
+from scenario import scenario_from_env, shape_users
+from server_timing import ServerTimingStats
 from datetime import datetime
 
+# SCENARIO：scenarios.json 中的壓測情境 (scenario.py)，未設定時為原本的預設值；需在讀取環境變數的初始化之前載入
+SCENARIO = scenario_from_env()
+if SCENARIO["seed"] is not None:
+    random.seed(SCENARIO["seed"])
+
 # 全域變數儲存統計資訊
 response_times = defaultdict(list)
 error_counts = defaultdict(int)
+server_timing = ServerTimingStats()  # 依 Server-Timing 拆解網路與伺服器各階段時間
 product_ids = []
 current_highest_prices = {}
 product_end_times = {}  # 儲存每個商品的結束時間（毫秒）
+current_thresholds = {}  # 每個商品的門檻分數 (第 K 名)
+product_terms = {}  # 每個商品的計分參數 (alpha / beta / gamma / k / 開始與結束時間)
+provisioned_ids = set()  # 本次測試建立的商品，商品列表只保留這些 (背景資料的商品不參與)
 bid_count = 0
 start_time = None
 bidding_start_time = None  # 競標開始時間
@@ -41,42 +67,39 @@ registration_complete = threading.Event()  # 註冊完成事件
 environment_ref = None  # 保存 environment 引用，用於停止測試
 init_done = False  # 確保 test_start 只執行一次
 init_lock = threading.Lock()  # 序列化初始化流程
+run_log = None  # runs/<run_id>/ 執行紀錄
+profiler = None  # 各階段的 CPU / heap profile 擷取
+client_series = None  # 每秒 client 延遲 (runs/<run_id>/client_latency.jsonl)
+bid_ledger = None  # 被接受的出價 (runs/<run_id>/accepted_bids.jsonl，供 verify_rankings.py 驗證)
+redis_telemetry = None  # REDIS_TELEMETRY_URL 有設定時每秒取樣 Redis
+pg_telemetry = None  # PG_TELEMETRY_DSN 有設定時每秒取樣 Postgres
+product_picker = ProductPicker.from_env()  # PRODUCT_POPULARITY：uniform / zipf / weighted
+product_stats = ProductStats()  # 依商品拆解出價與排行榜的吞吐量與延遲
+run_summary = RunSummary()  # 結束時寫入 runs/<run_id>/summary.json
+price_oracle = PriceOracle.from_env()  # /ws 推播的最高價 (PRICE_ORACLE_CONNECTIONS=0 時停用)
+bidder_mix = BidderMix.from_env()  # BIDDER_STRATEGY：每個用戶的出價策略
+bidder_stats = BidderStats()  # 依策略統計略過、接受率與溢價
 
 # Demo 模式：更詳細的輸出
 DEMO_MODE = os.getenv("DEMO_MODE", "true").lower() == "true"
 
-# 測試配置
-REGISTRATION_DURATION = 30  # 註冊階段持續時間（秒）
-BIDDING_DURATION = 120  # 競標階段持續時間（秒）
-NUM_PRODUCTS = 3  # 創建的商品數量
+# 測試配置 (來自情境)
+REGISTRATION_DURATION = SCENARIO["registration_duration"]  # 註冊階段持續時間（秒）
+BIDDING_DURATION = SCENARIO["bidding_duration"]  # 競標階段持續時間（秒）
+NUM_PRODUCTS = SCENARIO["products"]["count"]  # 創建的商品數量
+URGENCY = SCENARIO["urgency"]  # 指數型用戶的出價頻率 (base_rate × 2^(t / doubling)，上限 max_rate)
 
 
 class SmoothRampShape(LoadTestShape):
     """
     平滑用戶增長：
       - 線性從 0 漸進到目標用戶數，減少明顯的週期波動
-      - 可配置總用戶、爬升時間、保持時間
+      - 總用戶、爬升時間、保持時間與生成速率來自情境的 shape
+      - 情境的 bursts 在指定時段額外加入用戶 (瞬間湧入)
     """
-    max_users = 1400        # 目標用戶數
-    ramp_time = 180         # 爬升時間（秒），線性增加
-    hold_time = 60          # 保持時間（秒），達標後維持
-    spawn_rate = 50         # 生成速率（用戶/秒），平滑即可
 
     def tick(self):
-        run_time = self.get_run_time()
-
-        if run_time > self.ramp_time + self.hold_time:
-            return None
-
-        if run_time <= self.ramp_time:
-            # 線性增加用戶
-            users = int(self.max_users * (run_time / self.ramp_time))
-        else:
-            users = self.max_users
-
-        # 至少要有 1 個用戶，避免 0
-        users = max(users, 1)
-        return users, self.spawn_rate
+        return shape_users(SCENARIO, self.get_run_time())
 
 
 def print_demo_header(title):
@@ -99,7 +122,7 @@ def print_demo_info(message, value=None):
 @events.test_start.add_listener
 def on_test_start(environment, **kwargs):
     """測試開始時自動創建商品"""
-    global product_ids, current_highest_prices, product_end_times, start_time, environment_ref, init_done
+    global product_ids, current_highest_prices, product_end_times, start_time, environment_ref, init_done, run_log, profiler, client_series, redis_telemetry, pg_telemetry, bid_ledger
 
     # 防止重複初始化（Locust shape 更新或多 worker 場景）
     with init_lock:
@@ -120,6 +143,24 @@ def on_test_start(environment, **kwargs):
     base_url = environment.host or default_url
     
     print_demo_info("API 地址", base_url)
+
+    run_log = RunLog()
+    run_log.write_meta(script="locustfile_demo.py", host=base_url,
+                       registration_duration=REGISTRATION_DURATION, bidding_duration=BIDDING_DURATION,
+                       num_products=NUM_PRODUCTS, product_popularity=product_picker.spec,
+                       price_oracle_connections=price_oracle.connections if price_oracle else 0,
+                       bidder_strategy=bidder_mix.spec, traffic_model=os.getenv("TRAFFIC_MODEL"),
+                       scenario=SCENARIO["name"], seed=SCENARIO["seed"])
+    run_log.event("test_start")
+    print_demo_info("Run ID", f"{run_log.run_id} ({run_log.dir})")
+    client_series = LatencySeries(run_log)
+    bid_ledger = BidLedger(run_log)
+    redis_telemetry = RedisTelemetry.from_env(run_log)
+    if redis_telemetry:
+        redis_telemetry.start()
+    pg_telemetry = PgTelemetry.from_env(run_log, base_url)
+    if pg_telemetry:
+        pg_telemetry.start()
     
     # 1. 創建管理員並登入
     print_demo_info("正在創建管理員帳號...")
@@ -162,18 +203,19 @@ def on_test_start(environment, **kwargs):
         
         headers = {"Authorization": f"Bearer {admin_token}"}
         created_products = []
+        spec = SCENARIO["products"]
         
         for i in range(NUM_PRODUCTS):
             product_data = {
                 "title": f"Demo 壓力測試商品 {i+1}",
                 "description": f"自動創建的壓力測試商品 #{i+1}",
-                "basePrice": 1000.0 + (i * 100),
-                "k": 5,
+                "basePrice": float(spec["base_price"] + i * spec["price_step"]),
+                "k": spec["k"],
                 "startTime": start_time_ms,
                 "endTime": end_time_ms,
-                "alpha": 1.0,
-                "beta": 0.5,
-                "gamma": 0.3
+                "alpha": spec["alpha"],
+                "beta": spec["beta"],
+                "gamma": spec["gamma"]
             }
             
             create_res = requests.post(f"{base_url}/api/admin/products", json=product_data, headers=headers, timeout=10)
@@ -184,10 +226,12 @@ def on_test_start(environment, **kwargs):
                 created_products.append(product_id)
                 current_highest_prices[product_id] = product_data["basePrice"]
                 product_end_times[product_id] = end_time_ms
+                product_terms[product_id] = ProductTerms.from_product({**product_data, **product})
                 print_demo_info(f"商品 {i+1} 創建成功", f"ID: {product_id}, 底價: {product_data['basePrice']}")
         
         if created_products:
             product_ids = created_products
+            provisioned_ids.update(created_products)
             print_demo_info(f"共創建 {len(product_ids)} 個商品")
             print_demo_info("活動時間", f"開始: {datetime.fromtimestamp(start_time_ms/1000).strftime('%H:%M:%S')}, 結束: {datetime.fromtimestamp(end_time_ms/1000).strftime('%H:%M:%S')}")
             
@@ -278,9 +322,25 @@ def on_test_start(environment, **kwargs):
     print_demo_info("商品數量", f"{len(product_ids)} 個")
     if product_ids:
         print_demo_info("商品 ID", ", ".join(product_ids[:3]))  # 只顯示前 3 個
+        print_demo_info("商品熱度", product_picker.describe(product_ids))
     print("=" * 70)
     # 初始化只執行一次
     init_done = True
+    run_log.event("products_ready", product_ids=product_ids,
+                  end_times={pid: product_end_times.get(pid) for pid in product_ids})
+
+    # 在註冊、競標中段、最後 10 秒 (PROFILE_SECONDS) 擷取 profile
+    profiler = ProfileCapture(base_url, run_log)
+    elapsed = time.time() - start_time
+    phases = parse_phases(os.getenv("PROFILE_PHASES"))
+    if not phases:
+        last_end = max(product_end_times.values()) / 1000 - start_time if product_end_times else REGISTRATION_DURATION + BIDDING_DURATION
+        phases = {
+            "registration": (REGISTRATION_DURATION - PROFILE_SECONDS) / 2,
+            "mid_bidding": REGISTRATION_DURATION + (BIDDING_DURATION - PROFILE_SECONDS) / 2,
+            "final_rush": last_end - PROFILE_SECONDS,
+        }
+    profiler.schedule({label: at - elapsed for label, at in phases.items()})
     
     # 啟動監控線程，檢查商品結束時間並自動停止測試
     if product_end_times:
@@ -322,8 +382,15 @@ def on_request(request_type, name, response_time, response_length, exception, **
         error_counts[type(exception).__name__] += 1
     elif response_time:
         response_times[name].append(response_time)
+        server_timing.record(name, response_time, kwargs.get("response"))
         if response_length == 0:
             error_counts["Empty Response"] += 1
+    outcome = run_summary.record(name, exception, kwargs)
+    if client_series:
+        client_series.record(name, response_time, failed=exception is not None, outcome=outcome)
+    product_stats.record(name, response_time, exception is not None, kwargs)
+    if bid_ledger and exception is None and is_bid_request(name):
+        bid_ledger.record(kwargs.get("response"))
     
     # 如果是出價請求，更新計數
     if "出價" in name or "bid" in name.lower():
@@ -376,6 +443,37 @@ def on_test_stop(environment, **kwargs):
     else:
         print("  無錯誤")
 
+    run_summary.bids.print_report()
+    bidder_stats.print_report()
+    server_timing.print_report()
+    product_stats.print_report()
+
+    if price_oracle:
+        price_oracle.stop()
+        price_oracle.print_report()
+    if profiler:
+        profiler.cancel()
+    if client_series:
+        client_series.close()
+    if bid_ledger:
+        bid_ledger.close()
+    if run_log:
+        product_stats.save(run_log)
+    if redis_telemetry:
+        redis_telemetry.stop()
+        redis_report(run_log.dir)
+    if pg_telemetry:
+        pg_telemetry.stop()
+        pg_report(run_log.dir)
+    if run_log:
+        if price_oracle:
+            run_log.event("price_oracle", **price_oracle.summary())
+        run_log.event("bidders", strategies=bidder_stats.summary())
+        run_log.event("test_stop", bids=bid_count, run_time=round(elapsed, 3))
+        print_demo_info("執行紀錄", run_log.dir)
+        print_demo_info("被接受的出價", f"{bid_ledger.count} 筆，活動結束後執行 python verify_rankings.py {run_log.run_id} 驗證最終排行榜")
+        print_demo_info("結果摘要", run_summary.write(run_log, environment))
+
 
 class BiddingUser(HttpUser):
     """模擬競標用戶行為（改進版）"""
@@ -391,6 +489,9 @@ class BiddingUser(HttpUser):
         
         self.token = None
         self.headers = {}
+        self.user_weight = 1.0
+        self.bidder = bidder_mix.assign()
+        bidder_stats.assigned(self.bidder.name)
         
         # 嘗試註冊和登入（最多重試 3 次）
         for attempt in range(3):
@@ -416,6 +517,7 @@ class BiddingUser(HttpUser):
                     self.token = data.get("token")
                     if self.token:
                         self.user_id = data.get("user", {}).get("id")
+                        self.user_weight = float(data.get("user", {}).get("weight") or 1.0)
                         self.headers = {"Authorization": f"Bearer {self.token}"}
                         break  # 成功獲取 token，退出重試循環
                 except:
@@ -432,6 +534,8 @@ class BiddingUser(HttpUser):
         
         # 更新商品資訊
         self.update_product_info()
+        if price_oracle:
+            price_oracle.start(self.host, self.token, product_ids, product_picker)
         
         # 檢查是否進入競標階段
         global registration_phase, bidding_start_time
@@ -442,6 +546,8 @@ class BiddingUser(HttpUser):
                 registration_phase = False
                 bidding_start_time = time.time()
                 registration_complete.set()
+                if run_log:
+                    run_log.event("phase", name="bidding")
                 print_demo_header("進入競標階段")
                 print_demo_info("開始競標", "出價頻率將指數成長")
                 print("=" * 70)
@@ -458,11 +564,14 @@ class BiddingUser(HttpUser):
             products = response.json().get("products", [])
             # 不限制狀態，只要商品存在就可以（後端會自動更新狀態）
             # 這樣可以確保剛創建的商品也能被找到
+            if provisioned_ids:
+                products = [p for p in products if p["id"] in provisioned_ids]
             if products:
                 product_ids = [p["id"] for p in products]
                 for product in products:
                     product_id = product["id"]
                     current_highest_prices[product_id] = product.get("currentHighestPrice", product.get("basePrice", 1000))
+                    product_terms[product_id] = ProductTerms.from_product(product)
                     # 保存結束時間
                     if product_id not in product_end_times:
                         product_end_times[product_id] = product.get("endTime", 0)
@@ -471,30 +580,61 @@ class BiddingUser(HttpUser):
         """獲取商品 ID"""
         global product_ids
         if product_ids:
-            return random.choice(product_ids)
+            return product_picker.pick(product_ids)
         return "prod_1"
     
     def get_current_highest_price(self, product_id):
         """獲取當前最高價（參考 locustfile.py 的簡單實現）"""
         global current_highest_prices
         # 直接返回緩存的值，避免每次出價都查詢（提高性能）
-        # 最高價會在成功出價後更新，或在查看排行榜時更新
-        return current_highest_prices.get(product_id, 1000.0)
+        # 最高價會在成功出價、查看排行榜或收到 /ws 推播時更新
+        price = current_highest_prices.get(product_id, 1000.0)
+        pushed = price_oracle.price(product_id) if price_oracle else None
+        if pushed is not None:
+            price = max(price, pushed)
+        return price
     
     def update_highest_price(self, product_id, new_price):
         """更新最高價"""
         global current_highest_prices
         if new_price > current_highest_prices.get(product_id, 0):
             current_highest_prices[product_id] = new_price
-    
+
+    def bid_view(self, product_id, increment):
+        """出價決策需要的市場資訊 (門檻優先取 /ws 推播)"""
+        threshold = price_oracle.threshold(product_id) if price_oracle else None
+        if threshold is None:
+            threshold = current_thresholds.get(product_id)
+        return BidView(product_id, self.get_current_highest_price(product_id), threshold, self.user_weight,
+                       product_terms.get(product_id, DEFAULT_TERMS), now_ms(), increment)
+
+    def submit_bid(self, product_id, increment, name):
+        """依 BIDDER_STRATEGY 決定出價；策略決定不出價時回傳 None"""
+        view = self.bid_view(product_id, increment)
+        price = self.bidder.price(view)
+        if price is None:
+            bidder_stats.record(self.bidder.name, view, None)
+            return None
+
+        response = self.client.post(
+            f"/api/products/{product_id}/bids",
+            json={"price": price},
+            headers=self.headers,
+            name=name
+        )
+        bidder_stats.record(self.bidder.name, view, price, response)
+        if response.status_code == 200:
+            self.update_highest_price(product_id, price)
+            self.bidder.accepted(product_id, bid_score(response))
+        return response
+
     @task(3)
     def view_products(self):
         """查看商品列表（任何階段都可以查看）"""
         if not self.token:
             return
         
-        # 任何階段都可以查看商品列表，避免響應時間突然為 0
-        self.client.get("/api/products", headers=self.headers, name="獲取商品列表")
+        # 任何階段都可以查看商品列表，避免響應時間突然為 0 (同一個請求順便更新商品與最高價)
         self.update_product_info()
     
     @task(2)
@@ -532,6 +672,7 @@ class BiddingUser(HttpUser):
         if response.status_code == 200:
             data = response.json()
             self.update_highest_price(product_id, data.get("currentHighestPrice", 1000))
+            current_thresholds[product_id] = data.get("thresholdScore")
         
         # 如果商品已結束，嘗試獲取結果
         global product_end_times
@@ -588,10 +729,6 @@ class BiddingUser(HttpUser):
             if random.random() > (1.0 / urgency_factor):
                 return
         
-        # 動態獲取最新最高價（參考 locustfile.py，使用更簡單的方式）
-        # 先嘗試從排行榜獲取，如果失敗則使用緩存
-        current_highest = self.get_current_highest_price(product_id)
-        
         # 使用更大的增量範圍，避免並發時出價金額相同（參考 locustfile.py 但增加增量）
         # 接近結束時，增量更大（更積極）
         if time_until_end <= 10:
@@ -601,19 +738,11 @@ class BiddingUser(HttpUser):
         else:
             increment = random.uniform(100, 500)  # 正常情況（比 locustfile.py 的 10-100 更大）
         
-        price = current_highest + increment
-        
-        bid_data = {"price": price}
-        response = self.client.post(
-            f"/api/products/{product_id}/bids",
-            json=bid_data,
-            headers=self.headers,
-            name="提交出價"
-        )
-        
-        if response.status_code == 200:
-            self.update_highest_price(product_id, price)
-        elif response.status_code == 400:
+        # 出價金額由 BIDDER_STRATEGY 決定 (random 策略 = 最高價 + 上述增量)
+        response = self.submit_bid(product_id, increment, "提交出價")
+        if response is None:
+            return
+        if response.status_code == 400:
             # 出價太低，重新獲取最高價並重試一次
             try:
                 current_highest = self.get_current_highest_price(product_id)
@@ -664,10 +793,10 @@ class ExponentialRampUpUser(BiddingUser):
         # 指數型增長：基於運行時間（放慢前期，後期加速）
         elapsed_time = time.time() - (bidding_start_time if bidding_start_time else start_time)
 
-        # 前期慢：每 12 秒翻倍，基礎頻率較低
-        base_rate = 0.1
-        multiplier = 2 ** (elapsed_time / 12)  # 放慢增長
-        current_rate = min(base_rate * multiplier, 12.0)  # 前期上限較低
+        # 前期慢：預設每 12 秒翻倍，基礎頻率較低 (情境的 urgency)
+        base_rate = URGENCY["base_rate"]
+        multiplier = 2 ** (elapsed_time / URGENCY["doubling"])  # 放慢增長
+        current_rate = min(base_rate * multiplier, URGENCY["max_rate"])  # 前期上限較低
 
         # 接近結束時，頻率進一步指數上升
         if time_until_end <= 30:
@@ -682,9 +811,6 @@ class ExponentialRampUpUser(BiddingUser):
         # 根據當前頻率決定是否出價（簡化邏輯，讓指數成長更明顯）
         # 使用更高的概率，確保指數成長能被看到
         if random.random() < min(current_rate / 15.0, 0.95):  # 最高 95% 概率
-            # 動態獲取最新最高價
-            current_highest = self.get_current_highest_price(product_id)
-            
             # 使用更大的增量，接近結束時更積極
             if time_until_end <= 10:
                 increment = random.uniform(200, 800)  # 最後 10 秒，最積極
@@ -693,19 +819,10 @@ class ExponentialRampUpUser(BiddingUser):
             else:
                 increment = random.uniform(100, 500)  # 正常情況
             
-            price = current_highest + increment
-            
-            bid_data = {"price": price}
-            response = self.client.post(
-                f"/api/products/{product_id}/bids",
-                json=bid_data,
-                headers=self.headers,
-                name="指數型出價"
-            )
-            
+            response = self.submit_bid(product_id, increment, "指數型出價")
+            if response is None:
+                return
             if response.status_code == 200:
-                self.update_highest_price(product_id, price)
-                
                 # Demo 模式：每 20 次出價顯示一次頻率資訊（更頻繁）
                 global bid_count
                 if DEMO_MODE and bid_count % 20 == 0:
@@ -725,3 +842,27 @@ class ExponentialRampUpUser(BiddingUser):
                         self.update_highest_price(product_id, retry_price)
                 except:
                     pass
+
+
+# 情境的 users 決定各使用者類別的權重 (權重 0 的類別由 scenario.py 排除在命令列之外)
+for _user_class in (BiddingUser, ExponentialRampUpUser):
+    if SCENARIO["users"].get(_user_class.__name__, 0) > 0:
+        _user_class.weight = SCENARIO["users"][_user_class.__name__]
+
+
+# TRAFFIC_MODEL 有設定時依錄製的流量模型重播 (traffic_model.py)，取代 SmoothRampShape 與固定的指數成長公式
+if os.getenv("TRAFFIC_MODEL"):
+    from traffic_model import TraceShape, trace_user
+
+    del SmoothRampShape  # Locust 只能有一個 LoadTestShape
+    TraceUser = trace_user(BiddingUser, {
+        "獲取商品列表": "view_products",
+        "獲取商品詳情": "view_product_detail",
+        "獲取排行榜": "view_rankings",
+        "獲取競標結果": "view_rankings",
+        "提交出價": "place_bid",
+        "提交出價（重試）": "place_bid",
+        "指數型出價": "place_bid",
+        "指數型出價（重試）": "place_bid",
+    })
+    TraceShape.user_classes = [TraceUser]
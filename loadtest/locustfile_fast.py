@@ -0,0 +1,61 @@
+"""
+Locust 壓力測試腳本（FastHttpUser 版本）
+
+BiddingUser、ExponentialRampUpUser、FinalRushUser 的 FastHttpUser (geventhttpclient) 版本，
+任務、權重、出價策略與統計都沿用 locustfile.py，只有 HTTP client 不同；另外：
+- 授權標頭在登入後建立一次，之後的請求直接重用
+- 出價 body 直接格式化成 bytes，不經過 json= 的序列化 (內容與 json.dumps 相同)
+
+使用方式：
+locust -f locustfile_fast.py --host http://localhost:8000 FastBiddingUser
+兩種 client 的每核心吞吐量比較見 bench_http_clients.py
+"""
+
+import os
+from functools import lru_cache
+
+from locust import FastHttpUser
+
+import locustfile
+from locustfile import TRACE_ENDPOINTS, BiddingBehavior, ExponentialRampUpBehavior, FinalRushBehavior
+
+locustfile.script_name = "locustfile_fast.py"
+
+BID_BODY = '{"price": %r}'  # 與 json.dumps({"price": price}) 相同 (價格一定是有限的數字)
+
+
+@lru_cache(maxsize=None)
+def bid_path(product_id):
+    return f"/api/products/{product_id}/bids"
+
+
+class PreEncodedBids:
+    """出價請求使用預先建立的標頭與 bytes body"""
+
+    def on_start(self):
+        super().on_start()
+        self.bid_headers = {**self.headers, "Content-Type": "application/json"}
+
+    def post_bid(self, product_id, price, name):
+        return self.client.post(bid_path(product_id), data=(BID_BODY % price).encode(),
+                                headers=self.bid_headers, name=name)
+
+
+class FastBiddingUser(PreEncodedBids, BiddingBehavior, FastHttpUser):
+    pass
+
+
+class FastExponentialRampUpUser(PreEncodedBids, ExponentialRampUpBehavior, FastHttpUser):
+    pass
+
+
+class FastFinalRushUser(PreEncodedBids, FinalRushBehavior, FastHttpUser):
+    pass
+
+
+# 與 locustfile.py 相同，TRAFFIC_MODEL 有設定時以 FastBiddingUser 重播錄製的流量
+if os.getenv("TRAFFIC_MODEL"):
+    from traffic_model import TraceShape, trace_user
+
+    TraceUser = trace_user(FastBiddingUser, TRACE_ENDPOINTS)
+    TraceShape.user_classes = [TraceUser]
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+本機 mock 後端：只實作 Locust 腳本用到的 API，用來量測 client 端本身的成本
+
+以 asyncio 處理 HTTP/1.1 keep-alive 連線，回應格式與後端相同：
+    POST /api/auth/register, /api/auth/login
+    GET  /api/products, /api/products/{id}, /api/products/{id}/rankings
+    POST /api/products/{id}/bids   高於目前最高價時 200，否則 500 {"error": "出價必須高於目前最高出價"}
+商品在啟動時建立，--end-in 秒後結束 (或在 --end-at 指定的 Unix 時間結束)，結束後出價回傳「活動已結束」。
+--workers > 1 時以 SO_REUSEPORT 開多個 process，每個 process 各自保存最高價與排行榜，
+用途是讓 mock 不成為瓶頸，不保證跨連線的一致性。
+
+使用方式：
+python mock_server.py --port 8001 --products 3 --end-in 600 --workers 2
+"""
+
+import argparse
+import asyncio
+import heapq
+import itertools
+import json
+import multiprocessing
+import os
+import socket
+import time
+
+MAX_BODY = 1 << 20
+
+
+def now_ms():
+    return int(time.time() * 1000)
+
+
+class Store:
+    """商品、最高價與每位用戶最新的出價 (計分同後端 CalculateScore：alpha × price + beta / (反應毫秒 + 1) + gamma × weight)"""
+
+    def __init__(self, products, k, base_price, end_in, end_at=0):
+        start = now_ms()
+        end = int(end_at * 1000) if end_at else start + int(end_in * 1000)
+        self.users = itertools.count(os.getpid() * 1000000 + 1)  # 各 process 的用戶 id 不重複
+        self.products = {}
+        for i in range(products):
+            pid = f"mock_{i + 1}"
+            self.products[pid] = {
+                "id": pid, "title": f"Mock {i + 1}", "description": "", "basePrice": base_price + i * 100,
+                "k": k, "startTime": start, "endTime": end, "status": "active",
+                "currentHighestPrice": base_price + i * 100, "alpha": 1.0, "beta": 0.5, "gamma": 0.3,
+            }
+        self.bids = {pid: {} for pid in self.products}  # {商品: {user_id: (score, price, weight, 反應時間)}}
+
+    def login(self, username):
+        user_id = str(next(self.users))
+        token = f"mock-{user_id}"
+        return {"token": token, "user": {"id": user_id, "username": username, "weight": 1.0, "role": "member"}}
+
+    def product(self, pid):
+        product = self.products.get(pid)
+        if product and product["status"] == "active" and now_ms() >= product["endTime"]:
+            product["status"] = "ended"
+        return product
+
+    def bid(self, pid, token, price):
+        product = self.product(pid)
+        if product is None:
+            return 500, {"error": "商品不存在"}
+        if product["status"] != "active":
+            return 500, {"error": "活動已結束"}
+        if price <= product["currentHighestPrice"]:
+            return 500, {"error": "出價必須高於目前最高出價"}
+        user_id, weight = token.rpartition("-")[2], 1.0  # token 由 login 產生，其他 process 發的也能解析
+        now = now_ms()
+        reaction = max(now - product["startTime"], 0)
+        score = round(product["alpha"] * price + product["beta"] / (reaction + 1) + product["gamma"] * weight, 4)
+        product["currentHighestPrice"] = price
+        self.bids[pid][user_id] = (score, price, weight, reaction)
+        return 200, {"message": "出價成功", "bid": {
+            "id": f"bid_{now}_{user_id}", "productId": pid, "userId": user_id,
+            "price": price, "timestamp": now, "score": score}}
+
+    def rankings(self, pid):
+        product = self.product(pid)
+        if product is None:
+            return 500, {"error": "商品不存在"}
+        top = heapq.nlargest(product["k"], self.bids[pid].items(), key=lambda item: item[1][0])
+        rankings = [{"rank": i + 1, "userId": uid, "displayName": f"user{uid}", "price": price,
+                     "reactionTime": reaction, "weight": weight, "score": score}
+                    for i, (uid, (score, price, weight, reaction)) in enumerate(top)]
+        threshold = rankings[-1]["score"] if len(rankings) >= product["k"] else 0
+        return 200, {"rankings": rankings, "thresholdScore": threshold,
+                     "currentHighestPrice": product["currentHighestPrice"]}
+
+
+class MockServer:
+    def __init__(self, store):
+        self.store = store
+
+    def route(self, method, path, headers, body):
+        parts = path.split("?", 1)[0].strip("/").split("/")
+        store = self.store
+        if method == "POST" and parts[:2] == ["api", "auth"] and len(parts) == 3:
+            data = json.loads(body or b"{}")
+            if parts[2] == "register":
+                return 200, {"message": "註冊成功", "userId": 0, "weight": 1.0}
+            if parts[2] == "login":
+                return 200, store.login(data.get("username", ""))
+        if parts[:2] != ["api", "products"]:
+            return 404, {"error": "not found"}
+        if len(parts) == 2 and method == "GET":
+            return 200, {"products": [store.product(pid) for pid in store.products]}
+        pid = parts[2]
+        if len(parts) == 3 and method == "GET":
+            product = store.product(pid)
+            return (200, product) if product else (404, {"error": "商品不存在"})
+        if len(parts) == 4 and parts[3] == "rankings" and method == "GET":
+            return store.rankings(pid)
+        if len(parts) == 4 and parts[3] == "bids" and method == "POST":
+            auth = headers.get("authorization", "")
+            if not auth.startswith("Bearer "):
+                return 401, {"error": "需要登入"}
+            try:
+                price = float(json.loads(body)["price"])
+            except (ValueError, KeyError, TypeError):
+                return 400, {"error": "參數錯誤"}
+            return store.bid(pid, auth[7:], price)
+        return 404, {"error": "not found"}
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                method, path, _ = line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get("content-length") or 0)
+                body = await reader.readexactly(length) if 0 < length <= MAX_BODY else b""
+                status, payload = self.route(method, path, headers, body)
+                data = json.dumps(payload, ensure_ascii=False).encode()
+                close = headers.get("connection", "").lower() == "close"
+                writer.write(b"HTTP/1.1 %d %s\r\nContent-Type: application/json; charset=utf-8\r\n"
+                             b"Content-Length: %d\r\n%s\r\n" % (
+                                 status, b"OK" if status == 200 else b"Error", len(data),
+                                 b"Connection: close\r\n" if close else b"") + data)
+                await writer.drain()
+                if close:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+
+def listen(host, port, reuse_port):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if reuse_port:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind((host, port))
+    sock.listen(1024)
+    return sock
+
+
+def serve(args, sock=None):
+    store = Store(args.products, args.k, args.base_price, args.end_in, args.end_at)
+    server = MockServer(store)
+    sock = sock or listen(args.host, args.port, args.workers > 1)
+
+    async def main():
+        srv = await asyncio.start_server(server.handle, sock=sock, backlog=1024)
+        async with srv:
+            await srv.serve_forever()
+
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本機 mock 後端 (量測 Locust client 成本用)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--products", type=int, default=3)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--base-price", type=float, default=1000.0)
+    parser.add_argument("--end-in", type=float, default=3600, help="商品在幾秒後結束")
+    parser.add_argument("--end-at", type=float, default=0, help="商品結束的 Unix 時間 (秒)，設定時取代 --end-in")
+    parser.add_argument("--workers", type=int, default=1, help="process 數 (>1 時以 SO_REUSEPORT 分流)")
+    args = parser.parse_args()
+
+    ends = time.strftime("%H:%M:%S", time.localtime(args.end_at)) if args.end_at else f"{args.end_in:g}s 後"
+    print(f"[mock] http://{args.host}:{args.port}  {args.products} 個商品，{ends}結束，"
+          f"{args.workers} 個 process", flush=True)
+    if args.workers <= 1:
+        serve(args)
+        return
+    # 先在主 process 綁定一次，確認 port 可用
+    sock = listen(args.host, args.port, True)
+    workers = [multiprocessing.Process(target=serve, args=(args,), daemon=True) for _ in range(args.workers - 1)]
+    for w in workers:
+        w.start()
+    try:
+        serve(args, sock)
+    finally:
+        for w in workers:
+            w.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,432 @@
+#!/usr/bin/env python3
+"""
+Postgres 遙測側車
+
+後端每筆出價都由 goroutine 寫一筆 bid_logs，連線池 (SetMaxOpenConns) 若大於 Postgres 的 max_connections，
+高峰時會先耗盡伺服器連線。壓測期間每秒取樣：
+- pg_stat_activity：各狀態 / 等待類型的連線數，對照 max_connections
+- pg_locks：等待中的鎖與最長等待時間
+- pg_stat_statements：各語句的 calls / 耗時增量 (需安裝擴充套件，未安裝時略過)
+- pg_current_wal_lsn()：WAL 產生速率
+- pg_stat_user_tables：bid_logs 每秒插入筆數
+- 後端 /metrics 的 db_pool_*：Go 讀取 / 寫入連線池使用中、等待次數與等待逾時
+
+取樣寫入 runs/<run_id>/pg_telemetry.jsonl，以 Unix 秒與 client_latency.jsonl 對齊；
+伺服器連線數超過可用上限的 90% 或 Go 連線池出現等待時標記為連線耗盡，報表列出耗盡區間。
+
+Locust 腳本設定 PG_TELEMETRY_DSN 時會自動在背景啟動：
+    PG_TELEMETRY_DSN="host=localhost user=admin password=password123 dbname=auction_db" locust -f locustfile_demo.py ...
+
+獨立執行 / 報表：
+    python pg_telemetry.py collect --run-id <run_id> --dsn "..." --metrics-url http://localhost:8000/metrics
+    python pg_telemetry.py report runs/<run_id> --window 5
+
+pg_stat_statements 需在 postgresql.conf 設定 shared_preload_libraries = 'pg_stat_statements' 並
+CREATE EXTENSION pg_stat_statements。
+"""
+
+import argparse
+import json
+import os
+import re
+import threading
+import time
+from collections import defaultdict
+
+import psycopg2
+import requests
+
+from runlog import RunLog, read_jsonl
+from timeline import client_windows, format_client, markers, run_origin, window_index
+
+FILENAME = "pg_telemetry.jsonl"
+# 伺服器連線數達到可用上限的比例時視為耗盡
+SATURATION_RATIO = 0.9
+TOP_STATEMENTS = 10
+METRICS_MAX_BACKOFF = 10.0  # 後端 /metrics 連續失敗時的最長重試間隔 (秒)
+POOL_METRIC_RE = re.compile(r'^(db_pool_\w+)(?:\{pool="([^"]*)"\})? (\S+)$')
+
+ACTIVITY_SQL = """
+SELECT state, wait_event_type, count(*), max(extract(epoch FROM now() - state_change))
+FROM pg_stat_activity
+WHERE backend_type = 'client backend'
+GROUP BY 1, 2
+"""
+LOCK_SQL = """
+SELECT count(*), coalesce(max(extract(epoch FROM now() - a.state_change)), 0)
+FROM pg_locks l JOIN pg_stat_activity a ON a.pid = l.pid
+WHERE NOT l.granted
+"""
+# bid_logs 為分區表，插入數記在各分區 (bid_logs_p00…)，合併回 bid_logs
+TABLE_SQL = """
+    SELECT CASE WHEN relname ~ '^bid_logs_p[0-9]+$' THEN 'bid_logs' ELSE relname END, sum(n_tup_ins)::bigint
+    FROM pg_stat_user_tables
+    WHERE relname IN ('bid_logs', 'latest_bids', 'ranking_archives') OR relname ~ '^bid_logs_p[0-9]+$'
+    GROUP BY 1
+"""
+STATEMENTS_SQL = """
+SELECT queryid, calls, {total}, rows, query
+FROM pg_stat_statements
+WHERE dbid = (SELECT oid FROM pg_database WHERE datname = current_database())
+  AND query NOT ILIKE '%pg_stat%' AND query NOT ILIKE '%pg_locks%' AND query NOT ILIKE '%pg_current_wal%'
+"""
+
+
+class PgTelemetry:
+    def __init__(self, run_log, dsn, interval=1.0, metrics_url=None):
+        self.run_log = run_log
+        self.path = run_log.path(FILENAME)
+        self.dsn = dsn
+        self.interval = interval
+        self.metrics_url = metrics_url
+        self._metrics_failures = 0
+        self._metrics_retry_at = 0.0
+        self._conn = None
+        self._limits = None
+        self._has_statements = None
+        self._prev = None
+        self._queries_seen = set()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @classmethod
+    def from_env(cls, run_log, base_url=None):
+        """PG_TELEMETRY_DSN 未設定時回傳 None；PG_TELEMETRY_METRICS_URL 預設為 <base_url>/metrics"""
+        dsn = os.getenv("PG_TELEMETRY_DSN", "")
+        if not dsn:
+            return None
+        default_metrics = f"{base_url.rstrip('/')}/metrics" if base_url else ""
+        return cls(run_log, dsn,
+                   interval=float(os.getenv("PG_TELEMETRY_INTERVAL", "1")),
+                   metrics_url=os.getenv("PG_TELEMETRY_METRICS_URL", default_metrics) or None)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        self.run_log.event("pg_telemetry_start", interval=self.interval, metrics_url=self.metrics_url)
+        print(f"[PG 遙測] 每 {self.interval:g}s 取樣 → {self.path}")
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=self.interval + 5)
+        if self._conn:
+            self._conn.close()
+
+    def _run(self):
+        next_tick = time.time()
+        while not self._stop.is_set():
+            self.sample()
+            next_tick += self.interval
+            self._stop.wait(max(next_tick - time.time(), 0))
+
+    def _connect(self):
+        if self._conn is None or self._conn.closed:
+            self._conn = psycopg2.connect(self.dsn, connect_timeout=3, application_name="pg_telemetry")
+            self._conn.autocommit = True
+            with self._conn.cursor() as cur:
+                cur.execute("SELECT current_setting('max_connections')::int, "
+                            "current_setting('superuser_reserved_connections')::int, "
+                            "current_setting('server_version_num')::int")
+                max_conns, reserved, version = cur.fetchone()
+            self._limits = {"max_connections": max_conns, "reserved": reserved, "version": version}
+        return self._conn
+
+    def sample(self):
+        now = time.time()
+        try:
+            record = self._sample(now)
+        except psycopg2.Error as e:
+            if self._conn:
+                self._conn.close()
+            self._conn = None
+            record = {"error": str(e).strip()}
+        if record is None:
+            return
+        record = {"ts": round(now, 3), "elapsed": round(now - self.run_log.started_at, 3), **record}
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def _sample(self, now):
+        conn = self._connect()
+        with conn.cursor() as cur:
+            cur.execute(ACTIVITY_SQL)
+            activity = cur.fetchall()
+            cur.execute(LOCK_SQL)
+            lock_waits, lock_wait_max = cur.fetchone()
+            cur.execute("SELECT pg_wal_lsn_diff(pg_current_wal_lsn(), '0/0')")
+            wal = float(cur.fetchone()[0])
+            cur.execute(TABLE_SQL)
+            inserts = dict(cur.fetchall())
+            statements = self._statements(cur)
+
+        current = {"at": now, "wal": wal, "inserts": inserts, "statements": statements}
+        prev, self._prev = self._prev, current
+
+        states = defaultdict(int)
+        waits = defaultdict(int)
+        idle_in_tx_max = 0.0
+        for state, wait_type, count, oldest in activity:
+            states[state or "unknown"] += count
+            if wait_type and state == "active":
+                waits[wait_type] += count
+            if state == "idle in transaction":
+                idle_in_tx_max = max(idle_in_tx_max, float(oldest or 0))
+        total = sum(states.values())
+        usable = self._limits["max_connections"] - self._limits["reserved"]
+
+        record = {
+            "connections": total,
+            "usable_connections": usable,
+            "states": dict(states),
+            "waits": dict(waits),
+            "idle_in_tx_max_s": round(idle_in_tx_max, 3),
+            "lock_waits": lock_waits,
+            "lock_wait_max_s": round(float(lock_wait_max), 3),
+        }
+        pool = self._pool_metrics()
+        current["pool"] = pool
+        if pool:
+            record["pool"] = pool
+
+        if prev is None:
+            return None  # 第一次只建立增量基準
+
+        dt = max(now - prev["at"], 1e-6)
+        record["interval"] = round(dt, 3)
+        record["wal_bytes_per_sec"] = round((wal - prev["wal"]) / dt, 1)
+        record["inserts_per_sec"] = {
+            table: round((n - prev["inserts"].get(table, n)) / dt, 1) for table, n in inserts.items()
+        }
+        if statements is not None and prev["statements"] is not None:
+            record["statements"] = self._statement_deltas(prev["statements"], statements)
+
+        # 連線耗盡：伺服器端接近 max_connections，或 Go 連線池有請求在等待
+        reasons = []
+        if total >= usable * SATURATION_RATIO:
+            reasons.append("server_connections")
+        for name, stats in (pool or {}).items():
+            before = (prev.get("pool") or {}).get(name)
+            if before is None:
+                continue
+            if stats.get("db_pool_wait_count_total", 0) > before.get("db_pool_wait_count_total", 0):
+                reasons.append(f"{name}_pool_wait")
+            if stats.get("db_pool_acquire_timeouts_total", 0) > before.get("db_pool_acquire_timeouts_total", 0):
+                reasons.append(f"{name}_pool_timeout")
+            if stats.get("db_pool_max_open_connections") and \
+                    stats.get("db_pool_in_use_connections", 0) >= stats["db_pool_max_open_connections"]:
+                reasons.append(f"{name}_pool_full")
+        if reasons:
+            record["exhausted"] = reasons
+        return record
+
+    def _statements(self, cur):
+        """{queryid: (calls, total_ms, rows, query)}；未安裝 pg_stat_statements 時回傳 None"""
+        if self._has_statements is False:
+            return None
+        total = "total_exec_time" if self._limits["version"] >= 130000 else "total_time"
+        try:
+            cur.execute(STATEMENTS_SQL.format(total=total))
+        except psycopg2.Error:
+            self._has_statements = False
+            print("[PG 遙測] 無法讀取 pg_stat_statements，略過語句統計")
+            return None
+        self._has_statements = True
+        return {row[0]: row[1:] for row in cur.fetchall()}
+
+    def _statement_deltas(self, prev, current):
+        deltas = []
+        for queryid, (calls, total_ms, rows, _) in current.items():
+            p_calls, p_total, p_rows, _ = prev.get(queryid, (0, 0.0, 0, None))
+            d_calls = calls - p_calls
+            if d_calls <= 0:
+                continue
+            deltas.append({
+                "queryid": queryid,
+                "calls": d_calls,
+                "ms": round(total_ms - p_total, 3),
+                "rows": rows - p_rows,
+            })
+        deltas.sort(key=lambda e: -e["ms"])
+        deltas = deltas[:TOP_STATEMENTS]
+        for entry in deltas:
+            if entry["queryid"] not in self._queries_seen:
+                # 查詢文字只在第一次出現時記錄
+                self._queries_seen.add(entry["queryid"])
+                entry["query"] = " ".join(current[entry["queryid"]][3].split())[:300]
+        return deltas
+
+    def _pool_metrics(self):
+        """讀取失敗時以指數退避重試 (最多間隔 METRICS_MAX_BACKOFF 秒)，後端重啟後自動恢復"""
+        if not self.metrics_url or time.time() < self._metrics_retry_at:
+            return None
+        try:
+            res = requests.get(self.metrics_url, timeout=1)
+            res.raise_for_status()
+        except requests.RequestException:
+            self._metrics_failures += 1
+            if self._metrics_failures == 3:
+                print(f"[PG 遙測] 無法讀取 {self.metrics_url}，退避後持續重試 Go 連線池指標")
+            if self._metrics_failures >= 3:
+                backoff = min(self.interval * 2 ** (self._metrics_failures - 3), METRICS_MAX_BACKOFF)
+                self._metrics_retry_at = time.time() + backoff
+            return None
+        if self._metrics_failures >= 3:
+            print(f"[PG 遙測] 已恢復讀取 {self.metrics_url}")
+        self._metrics_failures = 0
+        self._metrics_retry_at = 0.0
+        # {連線池名稱: {指標: 值}}，舊版後端沒有 pool label 時名稱為 "db"
+        pools = defaultdict(dict)
+        for line in res.text.splitlines():
+            m = POOL_METRIC_RE.match(line)
+            if m:
+                pools[m.group(2) or "db"][m.group(1)] = float(m.group(3))
+        return dict(pools)
+
+
+# ---------------------------------------------------------------------------
+# 報表
+# ---------------------------------------------------------------------------
+
+def exhaustion_windows(rows, t0, gap=2.0):
+    """把標記耗盡的取樣合併成區間 [(開始秒, 結束秒, 原因集合, 最大連線數)]"""
+    spans = []
+    for r in rows:
+        if not r.get("exhausted"):
+            continue
+        at = r["ts"] - t0
+        if spans and at - spans[-1][1] <= gap:
+            start, _, reasons, peak = spans[-1]
+            spans[-1] = (start, at, reasons | set(r["exhausted"]), max(peak, r["connections"]))
+        else:
+            spans.append((at, at, set(r["exhausted"]), r["connections"]))
+    return spans
+
+
+def report(run_dir, window=5.0, names=None):
+    rows = [r for r in read_jsonl(run_dir, FILENAME) if "connections" in r]
+    if not rows:
+        print(f"{run_dir} 沒有 Postgres 遙測資料 ({FILENAME})")
+        return
+    t0 = run_origin(run_dir, rows)
+    usable = rows[-1]["usable_connections"]
+
+    # 語句統計 (整個壓測)
+    queries, totals = {}, defaultdict(lambda: {"calls": 0, "ms": 0.0, "rows": 0})
+    for r in rows:
+        for s in r.get("statements", []):
+            if "query" in s:
+                queries[s["queryid"]] = s["query"]
+            t = totals[s["queryid"]]
+            t["calls"] += s["calls"]
+            t["ms"] += s["ms"]
+            t["rows"] += s["rows"]
+    if totals:
+        print("\n" + "=" * 78)
+        print("  Postgres 語句耗時 (pg_stat_statements 增量)")
+        print("=" * 78)
+        print(f"  {'呼叫數':>10} {'總耗時 ms':>11} {'µs/call':>9}  語句")
+        for queryid, t in sorted(totals.items(), key=lambda item: -item[1]["ms"])[:10]:
+            query = queries.get(queryid, str(queryid))
+            print(f"  {t['calls']:>10} {t['ms']:>11.0f} {t['ms'] * 1000 / t['calls']:>9.1f}  {query[:60]}")
+
+    windows = defaultdict(list)
+    for r in rows:
+        windows[window_index(r["ts"], t0, window)].append(r)
+    client = client_windows(run_dir, t0, window, names)
+    marks = markers(run_dir, t0, window)
+
+    print("\n" + "=" * 78)
+    print(f"  時間軸 (每 {window:g}s；連線為峰值 / 可用 {usable}；WAL KB/s；bid_logs 插入/s)")
+    print("=" * 78)
+    print(f"  {'t(s)':>6} {'req/s':>7} {'p50':>7} {'p99':>7} {'conns':>6} {'active':>6} {'lockw':>6} "
+          f"{'WAL':>8} {'ins/s':>7} {'pool (使用/上限)':>17}")
+    for idx in sorted(set(windows) | set(client)):
+        line = f"  {idx * window:>6.0f} {format_client(client.get(idx), window)}"
+        samples = windows.get(idx, [])
+        if samples:
+            conns = max(r["connections"] for r in samples)
+            active = max(r["states"].get("active", 0) for r in samples)
+            lock_waits = max(r["lock_waits"] for r in samples)
+            deltas = [r for r in samples if "interval" in r]
+            wal = sum(r["wal_bytes_per_sec"] for r in deltas) / len(deltas) / 1024 if deltas else 0
+            ins = sum(r["inserts_per_sec"].get("bid_logs", 0) for r in deltas) / len(deltas) if deltas else 0
+            pools = [r["pool"] for r in samples if r.get("pool")]
+            pool = "-"
+            if pools:
+                # 各連線池使用中峰值 / 上限，例如 r 30/33 w 33/33
+                pool = " ".join(
+                    f"{name[0]} {max(p.get(name, {}).get('db_pool_in_use_connections', 0) for p in pools):.0f}/"
+                    f"{pools[-1][name].get('db_pool_max_open_connections', 0):.0f}"
+                    for name in sorted(pools[-1]))
+            line += f" {conns:>6} {active:>6} {lock_waits:>6} {wal:>8.1f} {ins:>7.0f} {pool:>17}"
+            if any(r.get("exhausted") for r in samples):
+                line += "  ⚠"
+        if marks.get(idx):
+            line += "  ← " + ", ".join(marks[idx])
+        print(line)
+
+    spans = exhaustion_windows(rows, t0)
+    print("\n" + "=" * 78)
+    print("  連線耗盡區間")
+    print("=" * 78)
+    if not spans:
+        print("  無")
+        return
+    latency = client_windows(run_dir, t0, 1, names)
+    for start, end, reasons, peak in spans:
+        hist = None
+        for sec in range(int(start), int(end) + 1):
+            w = latency.get(sec)
+            if w and w["count"]:
+                if hist is None:
+                    hist = w["hist"]
+                else:
+                    hist.merge(w["hist"])
+        p99 = f"{hist.percentile(99):.1f}ms" if hist else "-"
+        print(f"  {start:7.1f}s ~ {end:7.1f}s  ({end - start + 1:.0f}s)  峰值連線 {peak}/{usable}  "
+              f"client p99 {p99}  原因: {', '.join(sorted(reasons))}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Postgres 遙測側車")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    collect = sub.add_parser("collect", help="持續取樣直到 Ctrl-C 或 --duration 結束")
+    collect.add_argument("--run-id", default=None, help="寫入的 run ID (預設 RUN_ID 環境變數或新建)")
+    collect.add_argument("--dsn", default=os.getenv("PG_TELEMETRY_DSN",
+                                                    "host=localhost user=admin password=password123 dbname=auction_db"))
+    collect.add_argument("--metrics-url", default=os.getenv("PG_TELEMETRY_METRICS_URL"),
+                         help="後端 /metrics，用來讀取 Go 連線池指標")
+    collect.add_argument("--interval", type=float, default=1.0)
+    collect.add_argument("--duration", type=float, default=0, help="取樣秒數，0 代表直到 Ctrl-C")
+
+    rep = sub.add_parser("report", help="輸出報表")
+    rep.add_argument("run_dir")
+    rep.add_argument("--window", type=float, default=5.0, help="彙總視窗秒數")
+    rep.add_argument("--name", action="append", help="只計入指定名稱的 client 請求 (可重複)")
+    args = parser.parse_args()
+
+    if args.command == "report":
+        report(args.run_dir, args.window, args.name)
+        return
+
+    run_log = RunLog(args.run_id)
+    telemetry = PgTelemetry(run_log, args.dsn, interval=args.interval, metrics_url=args.metrics_url).start()
+    try:
+        if args.duration:
+            time.sleep(args.duration)
+        else:
+            while True:
+                time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        telemetry.stop()
+        run_log.event("pg_telemetry_stop")
+        print(f"[PG 遙測] 已停止，報表: python pg_telemetry.py report {run_log.dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+"""
+商品熱度模型與依商品的延遲拆解
+
+實際的搶購中一兩個商品就占了九成以上的出價，成為 Redis 上的單一熱點 Key (auction:{id}:rank)。
+PRODUCT_POPULARITY 決定 Locust 每次請求選哪個商品：
+    uniform     平均分配 (預設)
+    zipf[:s]    Zipf 分布：商品依 id 排序，第 i 個的權重為 1 / i^s (s 預設 1.2，也可用 PRODUCT_ZIPF_S)
+    weighted    依 PRODUCT_WEIGHTS：逗號分隔的「id=權重」、只有權重 ("90,5,5"，依排序後的商品順序套用)，
+                或 JSON 檔路徑 ({"id": 權重} 或 [權重, ...])；未列出的商品權重為 0，全部為 0 時平均分配
+
+ProductStats 依商品統計出價與排行榜請求的吞吐量、延遲與失敗數，結束時輸出熱門商品的拆解，
+並寫入 runs/<run_id>/product_stats.json。
+
+使用方式 (Locust)：
+    picker = ProductPicker.from_env()
+    product_stats = ProductStats()
+    product_id = picker.pick(product_ids)
+    # on_request 中: product_stats.record(name, response_time, exception is not None, kwargs)
+    # on_test_stop 中: product_stats.print_report(); product_stats.save(run_log)
+"""
+
+import json
+import os
+import random
+import re
+import statistics
+import time
+from collections import defaultdict
+
+from histogram import LatencyHistogram
+
+# 出價 / 排行榜 / 結果請求的 URL，擷取商品 id 與請求類型
+PRODUCT_URL_RE = re.compile(r"/api/products/([^/?#]+)/(bids|rankings|results)\b")
+KIND_LABELS = {"bids": "出價", "rankings": "排行榜", "results": "結果"}
+
+
+def parse_weights(text):
+    """PRODUCT_WEIGHTS → {id: 權重} 或 [權重, ...]"""
+    text = (text or "").strip()
+    if not text:
+        return {}
+    if os.path.isfile(text):
+        with open(text, encoding="utf-8") as f:
+            data = json.load(f)
+        if isinstance(data, dict):
+            return {str(k): float(v) for k, v in data.items()}
+        return [float(v) for v in data]
+    if "=" not in text:
+        return [float(v) for v in text.split(",") if v.strip()]
+    weights = {}
+    for item in text.split(","):
+        key, _, value = item.partition("=")
+        if key.strip():
+            weights[key.strip()] = float(value)
+    return weights
+
+
+class ProductPicker:
+    def __init__(self, mode="uniform", s=1.2, weights=None):
+        if mode not in ("uniform", "zipf", "weighted"):
+            raise ValueError(f"未知的 PRODUCT_POPULARITY: {mode}")
+        self.mode = mode
+        self.s = s
+        self.weights = weights or {}
+        self._src = None
+        self._table = ([], None)  # (排序後的商品 id, 累積權重；None 代表平均分配)
+
+    @classmethod
+    def from_env(cls):
+        spec = os.getenv("PRODUCT_POPULARITY", "uniform").strip().lower()
+        mode, _, arg = spec.partition(":")
+        s = float(arg or os.getenv("PRODUCT_ZIPF_S", "1.2"))
+        return cls(mode, s=s, weights=parse_weights(os.getenv("PRODUCT_WEIGHTS")))
+
+    @property
+    def spec(self):
+        if self.mode == "zipf":
+            return f"zipf:{self.s:g}"
+        return self.mode
+
+    def _build(self, product_ids):
+        ids = sorted(product_ids)
+        if self.mode == "zipf":
+            weights = [1.0 / (i + 1) ** self.s for i in range(len(ids))]
+        elif self.mode == "weighted" and isinstance(self.weights, dict):
+            weights = [self.weights.get(pid, 0.0) for pid in ids]
+        elif self.mode == "weighted":
+            weights = [self.weights[i] if i < len(self.weights) else 0.0 for i in range(len(ids))]
+        else:
+            return ids, None
+        if sum(weights) <= 0:
+            return ids, None
+        cum, total = [], 0.0
+        for w in weights:
+            total += w
+            cum.append(total)
+        return ids, cum
+
+    def _lookup(self, product_ids):
+        # locustfile 更新商品時會換成新的 list，以物件本身判斷是否需要重算
+        if product_ids is not self._src or len(product_ids) != len(self._table[0]):
+            self._table = self._build(product_ids)
+            self._src = product_ids
+        return self._table
+
+    def pick(self, product_ids, rng=random):
+        if not product_ids:
+            return None
+        ids, cum = self._lookup(product_ids)
+        if cum is None:
+            return rng.choice(ids)
+        return rng.choices(ids, cum_weights=cum)[0]
+
+    def shares(self, product_ids):
+        """{id: 預期占比}"""
+        ids, cum = self._lookup(product_ids)
+        if not ids:
+            return {}
+        if cum is None:
+            return {pid: 1 / len(ids) for pid in ids}
+        prev = 0.0
+        result = {}
+        for pid, c in zip(ids, cum):
+            result[pid] = (c - prev) / cum[-1]
+            prev = c
+        return result
+
+    def describe(self, product_ids, top=3):
+        shares = sorted(((pid, share) for pid, share in self.shares(product_ids).items() if share > 0),
+                        key=lambda kv: -kv[1])[:top]
+        hot = ", ".join(f"{pid} {share * 100:.1f}%" for pid, share in shares)
+        return f"{self.spec}（最熱門: {hot}）" if hot else self.spec
+
+
+class ProductStats:
+    """依 (商品, 請求類型) 累計延遲與失敗數"""
+
+    def __init__(self):
+        self.hists = defaultdict(LatencyHistogram)
+        self.failures = defaultdict(int)
+        self.first = None
+        self.last = None
+
+    def record(self, name, response_time, failed, request_kwargs):
+        url = request_kwargs.get("url") or getattr(request_kwargs.get("response"), "url", None) or name
+        m = PRODUCT_URL_RE.search(url or "")
+        if not m:
+            return
+        now = time.time()
+        if self.first is None:
+            self.first = now
+        self.last = now
+        key = (m.group(1), m.group(2))
+        if failed:
+            self.failures[key] += 1
+        elif response_time is not None:
+            self.hists[key].record(response_time)
+
+    @property
+    def duration(self):
+        if self.first is None:
+            return 0.0
+        return max(self.last - self.first, 1.0)
+
+    def summary(self):
+        """{商品: {類型: {"count", "failures", "rps", "share", "mean", "p50", "p95", "p99"}}}"""
+        keys = set(self.hists) | set(self.failures)
+        totals = defaultdict(int)
+        for key in keys:
+            totals[key[1]] += self.hists[key].count + self.failures[key]
+
+        result = defaultdict(dict)
+        for product, kind in keys:
+            h = self.hists[(product, kind)]
+            count = h.count + self.failures[(product, kind)]
+            result[product][kind] = {
+                "count": count,
+                "failures": self.failures[(product, kind)],
+                "rps": count / self.duration,
+                "share": count / totals[kind] if totals[kind] else 0.0,
+                "mean": h.mean,
+                "p50": h.percentile(50),
+                "p95": h.percentile(95),
+                "p99": h.percentile(99),
+            }
+        return dict(result)
+
+    def print_report(self, top=10):
+        print("\n" + "=" * 70)
+        print("  依商品拆解 (req/s、占比、p50 / p99 ms、失敗數)")
+        print("=" * 70)
+        summary = self.summary()
+        if not summary:
+            print("  無資料")
+            return
+
+        kinds = [k for k in KIND_LABELS if any(k in v for v in summary.values())]
+        products = sorted(summary, key=lambda p: -sum(d["count"] for d in summary[p].values()))
+        header = f"  {'商品':<24}" + "".join(f" | {KIND_LABELS[k]:^31}" for k in kinds)
+        print(header)
+        print(f"  {'':<24}" + f" | {'req/s':>6} {'占比':>5} {'p50':>6} {'p99':>7} {'失敗':>4}" * len(kinds))
+        for product in products[:top]:
+            line = f"  {product[:24]:<24}"
+            for kind in kinds:
+                d = summary[product].get(kind)
+                if not d:
+                    line += f" | {'-':^31}"
+                    continue
+                line += (f" | {d['rps']:6.1f} {d['share'] * 100:5.1f}% "
+                         f"{d['p50']:6.1f} {d['p99']:7.1f} {d['failures']:4d}")
+            print(line)
+        if len(products) > top:
+            print(f"  … 其餘 {len(products) - top} 個商品")
+
+        # 熱點：請求最多的商品與其餘商品的 p99 比較 (差距大代表單一 Key 已飽和)
+        for kind in kinds:
+            ranked = [p for p in products if kind in summary[p]]
+            if len(ranked) < 2:
+                continue
+            hot = summary[ranked[0]][kind]
+            others = [summary[p][kind]["p99"] for p in ranked[1:] if summary[p][kind]["count"]]
+            if not others or not hot["count"]:
+                continue
+            median = statistics.median(others)
+            ratio = hot["p99"] / median if median else 0
+            print(f"  {KIND_LABELS[kind]}熱點 {ranked[0]}：占 {hot['share'] * 100:.1f}%，"
+                  f"p99 {hot['p99']:.1f}ms，為其餘商品 p99 中位數的 {ratio:.1f} 倍")
+
+    def save(self, run_log):
+        path = run_log.path("product_stats.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"duration": self.duration, "products": self.summary()}, f, ensure_ascii=False, indent=2)
+        return path
@@ -0,0 +1,212 @@
+"""
+WebSocket 價格表 (price oracle)
+
+真實前端只在進入頁面時呼叫一次 REST，之後靠 /ws 推播的 product_update / rankings_update 更新最高價與門檻分數；
+壓測若靠反覆 GET /api/products、/rankings 來得知最高價，請求組成會與正式流量不同。
+
+每個 Locust 行程共用一個 PriceOracle：第一個登入的用戶以自己的 token 為最熱門的
+PRICE_ORACLE_CONNECTIONS 個商品 (預設 4，0 代表停用、改回輪詢) 各開一條 /ws 連線，
+推播內容寫入記憶體中的價格表，虛擬用戶出價前直接讀表。
+後端一條連線只能訂閱一個商品，未開連線的商品仍沿用 REST 回應中的價格。
+rankings_update 帶的前 K 名名單另計新進榜次數 (rank churn)，也就是 BroadcastRankingsUpdate 的成本來源。
+
+使用方式 (Locust)：
+    price_oracle = PriceOracle.from_env()
+    # on_start 登入後: price_oracle.start(self.host, self.token, product_ids, product_picker)
+    # 出價前: price_oracle.price(product_id)
+    # on_test_stop 中: price_oracle.stop(); price_oracle.print_report()
+"""
+
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from urllib.parse import quote
+
+import websocket  # websocket-client
+
+PRICE_FRAMES = ("product_update", "rankings_update")
+
+
+def ws_url(base_url, token):
+    """http(s)://host → ws(s)://host/ws?token=..."""
+    url = base_url.rstrip("/")
+    if url.startswith("https://"):
+        url = "wss://" + url[len("https://"):]
+    elif url.startswith("http://"):
+        url = "ws://" + url[len("http://"):]
+    return f"{url}/ws?token={quote(token)}"
+
+
+def format_value(value):
+    return f"{value:.2f}" if value is not None else "-"
+
+
+class PriceOracle:
+    def __init__(self, connections=4, reconnect_delay=1.0, max_reconnect_delay=30.0):
+        self.connections = connections
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.prices = {}      # {商品: currentHighestPrice}
+        self.thresholds = {}  # {商品: thresholdScore}
+        self.statuses = {}    # {商品: status}
+        self.updated = {}     # {商品: 最後一次推播的 Unix 秒}
+        self.frames = defaultdict(int)   # {訊息類型: 次數}
+        self.updates = defaultdict(int)  # {商品: 價格推播次數}
+        self.members = {}                # {商品: 前 K 名的 userId}
+        self.churn = defaultdict(int)    # {商品: 新進入前 K 名的次數}
+        self.reconnects = 0
+        self.subscribed = []
+        self._lock = threading.Lock()
+        self._started = False
+        self._stop = threading.Event()
+        self._sockets = {}
+        self._threads = []
+
+    @classmethod
+    def from_env(cls):
+        """PRICE_ORACLE_CONNECTIONS=0 時回傳 None"""
+        connections = int(os.getenv("PRICE_ORACLE_CONNECTIONS", "4"))
+        if connections <= 0:
+            return None
+        return cls(connections)
+
+    def start(self, base_url, token, product_ids, picker=None):
+        """只有第一次成功呼叫會開連線；依熱度挑選要訂閱的商品"""
+        if not token or not product_ids:
+            return False
+        with self._lock:
+            if self._started:
+                return False
+            self._started = True
+
+        ids = list(product_ids)
+        if picker is not None:
+            shares = picker.shares(ids)
+            ids.sort(key=lambda pid: -shares.get(pid, 0))
+        self.subscribed = ids[:self.connections]
+        url = ws_url(base_url, token)
+        for product_id in self.subscribed:
+            thread = threading.Thread(target=self._run, args=(url, product_id), daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        print(f"[價格表] 訂閱 {len(self.subscribed)}/{len(ids)} 個商品的 /ws 推播: {', '.join(self.subscribed)}")
+        return True
+
+    def stop(self):
+        self._stop.set()
+        for ws in list(self._sockets.values()):
+            try:
+                ws.close()
+            except (websocket.WebSocketException, OSError):
+                pass
+        for thread in self._threads:
+            thread.join(timeout=2)
+
+    def price(self, product_id):
+        """推播中的最高價，沒有訂閱或尚未收到時回傳 None"""
+        return self.prices.get(product_id)
+
+    def threshold(self, product_id):
+        return self.thresholds.get(product_id)
+
+    def status(self, product_id):
+        return self.statuses.get(product_id)
+
+    def _run(self, url, product_id):
+        delay = self.reconnect_delay
+        while not self._stop.is_set():
+            ws = None
+            try:
+                ws = websocket.create_connection(url, timeout=10)
+                self._sockets[product_id] = ws
+                # 與前端 websocketService.subscribe 相同
+                ws.send(json.dumps({"type": "subscribe", "productId": product_id}))
+                ws.send(json.dumps({"type": "subscribe_rankings", "productId": product_id}))
+                delay = self.reconnect_delay
+                while not self._stop.is_set():
+                    try:
+                        payload = ws.recv()
+                    except websocket.WebSocketTimeoutException:
+                        continue
+                    if not payload:
+                        break
+                    # writePump 會把佇列中的多則訊息以換行串在同一個 frame
+                    for line in payload.split("\n"):
+                        if line.strip():
+                            self._handle(line)
+            except (websocket.WebSocketException, OSError, ValueError) as e:
+                if not self._stop.is_set():
+                    print(f"[價格表] {product_id} 連線中斷: {e}")
+            finally:
+                self._sockets.pop(product_id, None)
+                if ws is not None:
+                    try:
+                        ws.close()
+                    except (websocket.WebSocketException, OSError):
+                        pass
+            if self._stop.wait(delay):
+                break
+            self.reconnects += 1
+            delay = min(delay * 2, self.max_reconnect_delay)
+
+    def _handle(self, line):
+        try:
+            message = json.loads(line)
+        except ValueError:
+            return
+        kind = message.get("type")
+        self.frames[kind] += 1
+        if kind not in PRICE_FRAMES:
+            return
+        data = message.get("data") or {}
+        product_id = message.get("productId") or data.get("id")
+        if not product_id:
+            return
+
+        price = data.get("currentHighestPrice")
+        if price is not None:
+            # 廣播是非同步的，較舊的推播可能晚到；最高價只會上升
+            self.prices[product_id] = max(float(price), self.prices.get(product_id, 0.0))
+            self.updates[product_id] += 1
+        if kind == "rankings_update" and data.get("thresholdScore") is not None:
+            self.thresholds[product_id] = float(data["thresholdScore"])
+        if kind == "rankings_update" and data.get("rankings") is not None:
+            members = {item.get("userId") for item in data["rankings"]}
+            previous = self.members.get(product_id)
+            if previous is not None:
+                self.churn[product_id] += len(members - previous)
+            self.members[product_id] = members
+        if kind == "product_update" and data.get("status"):
+            self.statuses[product_id] = data["status"]
+        self.updated[product_id] = time.time()
+
+    def summary(self):
+        return {
+            "subscribed": self.subscribed,
+            "frames": dict(self.frames),
+            "updates": dict(self.updates),
+            "reconnects": self.reconnects,
+            "prices": dict(self.prices),
+            "thresholds": dict(self.thresholds),
+            "churn": dict(self.churn),
+        }
+
+    def print_report(self):
+        print("\n" + "=" * 70)
+        print("  WebSocket 價格表")
+        print("=" * 70)
+        if not self.subscribed:
+            print("  未訂閱任何商品")
+            return
+        frames = ", ".join(f"{k} {v}" for k, v in sorted(self.frames.items(), key=lambda kv: -kv[1]))
+        print(f"  推播: {frames or '無'}  重新連線: {self.reconnects}")
+        now = time.time()
+        for product_id in self.subscribed:
+            last = self.updated.get(product_id)
+            age = f"{now - last:.1f}s 前" if last else "未收到"
+            print(f"  {product_id:<24} 更新 {self.updates.get(product_id, 0):6d} 次  "
+                  f"最高價 {format_value(self.prices.get(product_id)):>10}  "
+                  f"門檻 {format_value(self.thresholds.get(product_id)):>10}  "
+                  f"前 K 名異動 {self.churn.get(product_id, 0):5d}  最後更新 {age}")
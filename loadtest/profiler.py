@@ -0,0 +1,92 @@
+"""
+在壓測各階段自動擷取後端的 CPU / heap profile
+
+後端需設定 PPROF_TOKEN 才會開放 /debug/pprof；壓測端使用相同的 PPROF_TOKEN 環境變數。
+擷取結果存到 runs/<run_id>/profiles/<label>-cpu.pb.gz 與 <label>-heap.pb.gz，並在 events.jsonl 記錄時間點，
+之後可用 `go tool pprof -http=: runs/<run_id>/profiles/final_rush-cpu.pb.gz` 檢視火焰圖。
+
+PROFILE_PHASES 可覆蓋擷取時間點，格式為「名稱=秒數」逗號分隔，秒數從壓測開始起算：
+    PROFILE_PHASES="registration=10,mid_bidding=90,final_rush=140"
+PROFILE_SECONDS 為每次 CPU profile 的長度 (預設 10 秒)。
+"""
+
+import os
+import threading
+import time
+
+import requests
+
+PROFILE_SECONDS = int(os.getenv("PROFILE_SECONDS", "10"))
+
+
+def parse_phases(spec):
+    """'a=10,b=20' -> {'a': 10.0, 'b': 20.0}"""
+    phases = {}
+    for item in (spec or "").split(","):
+        name, _, seconds = item.partition("=")
+        if name.strip() and seconds.strip():
+            phases[name.strip()] = float(seconds)
+    return phases
+
+
+class ProfileCapture:
+    def __init__(self, base_url, run_log, token=None, cpu_seconds=PROFILE_SECONDS):
+        self.base_url = base_url.rstrip("/")
+        self.run_log = run_log
+        self.token = token if token is not None else os.getenv("PPROF_TOKEN", "")
+        self.cpu_seconds = cpu_seconds
+        self.timers = []
+
+    @property
+    def enabled(self):
+        return bool(self.token)
+
+    def schedule(self, phases):
+        """phases: {名稱: 距離現在的秒數}，到時間後在背景擷取"""
+        if not self.enabled:
+            print("[Profile] 未設定 PPROF_TOKEN，略過 profile 擷取")
+            return
+        for label, delay in sorted(phases.items(), key=lambda item: item[1]):
+            timer = threading.Timer(max(delay, 0), self.capture, args=(label,))
+            timer.daemon = True
+            timer.start()
+            self.timers.append(timer)
+        self.run_log.event("profile_scheduled", phases=phases, cpu_seconds=self.cpu_seconds)
+        print(f"[Profile] 已排程: {', '.join(f'{k}@{v:.0f}s' for k, v in phases.items())} → {self.run_log.dir}/profiles")
+
+    def cancel(self):
+        for timer in self.timers:
+            timer.cancel()
+
+    def capture(self, label):
+        """同時擷取 CPU (持續 cpu_seconds 秒) 與 heap profile"""
+        self.run_log.event("profile_start", label=label)
+        threads = [
+            threading.Thread(target=self._fetch, args=(label, "cpu", "profile", {"seconds": self.cpu_seconds}), daemon=True),
+            threading.Thread(target=self._fetch, args=(label, "heap", "heap", {"gc": 1}), daemon=True),
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+    def _fetch(self, label, kind, endpoint, params):
+        path = self.run_log.path("profiles", f"{label}-{kind}.pb.gz")
+        start = time.time()
+        try:
+            res = requests.get(
+                f"{self.base_url}/debug/pprof/{endpoint}",
+                params=params,
+                headers={"X-Admin-Token": self.token},
+                timeout=self.cpu_seconds + 30,
+            )
+            res.raise_for_status()
+        except requests.RequestException as e:
+            self.run_log.event("profile_error", label=label, kind=kind, error=str(e))
+            print(f"[Profile] {label} {kind} 擷取失敗: {e}")
+            return
+        with open(path, "wb") as f:
+            f.write(res.content)
+        self.run_log.event("profile_saved", label=label, kind=kind, path=os.path.relpath(path, self.run_log.dir),
+                           bytes=len(res.content), started=round(start, 3))
+        print(f"[Profile] {label} {kind} → {path}")
@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+"""
+Redis 遙測側車
+
+壓測期間每秒取樣 Redis：
+- INFO commandstats：各指令的 ops/s 與 µs/call (EVALSHA = place_bid.lua，HGETALL、ZREVRANGE…)
+- INFO cpu / memory / stats / clients：CPU 使用率、記憶體、連線數
+- SLOWLOG：新增的慢查詢
+- LATENCY LATEST：延遲事件 (需設定 latency-monitor-threshold)
+- MEMORY USAGE：每 10 秒掃描 auction:* 取最大的幾個 Key
+
+取樣寫入 runs/<run_id>/redis_telemetry.jsonl，以 Unix 秒與 Locust 的 client_latency.jsonl 對齊。
+
+Locust 腳本設定 REDIS_TELEMETRY_URL 時會自動在背景啟動 (逗號分隔多個節點)：
+    REDIS_TELEMETRY_URL=redis://localhost:6379 locust -f locustfile_demo.py ...
+
+也可以獨立執行，以相同的 RUN_ID 寫入同一個目錄：
+    python redis_telemetry.py collect --run-id <run_id> --url redis://localhost:6379
+
+報表 (各指令 ops/s、µs/call 與 client 延遲並排)：
+    python redis_telemetry.py report runs/<run_id> --window 5
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+
+import redis
+
+from runlog import RunLog, read_jsonl
+from timeline import client_windows, format_client, markers, run_origin, window_index
+
+FILENAME = "redis_telemetry.jsonl"
+INFO_SECTIONS = ("commandstats", "cpu", "memory", "stats", "clients")
+KEY_PATTERN = "auction:*"
+
+
+class RedisTelemetry:
+    def __init__(self, run_log, urls, interval=1.0, key_interval=10.0, hot_keys=20, scan_limit=5000):
+        self.run_log = run_log
+        self.path = run_log.path(FILENAME)
+        self.nodes = {self._label(url): redis.Redis.from_url(url, socket_timeout=2, decode_responses=True) for url in urls}
+        self.interval = interval
+        self.key_interval = key_interval
+        self.hot_keys = hot_keys
+        self.scan_limit = scan_limit
+        self._prev = {}
+        self._slowlog_id = {}
+        self._next_key_scan = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    @classmethod
+    def from_env(cls, run_log):
+        """REDIS_TELEMETRY_URL 未設定時回傳 None"""
+        urls = [u.strip() for u in os.getenv("REDIS_TELEMETRY_URL", "").split(",") if u.strip()]
+        if not urls:
+            return None
+        return cls(run_log, urls, interval=float(os.getenv("REDIS_TELEMETRY_INTERVAL", "1")))
+
+    @staticmethod
+    def _label(url):
+        return url.split("@")[-1].split("://")[-1].rstrip("/")
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        self.run_log.event("redis_telemetry_start", nodes=list(self.nodes), interval=self.interval)
+        print(f"[Redis 遙測] 每 {self.interval:g}s 取樣 {', '.join(self.nodes)} → {self.path}")
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=self.interval + 5)
+
+    def _run(self):
+        next_tick = time.time()
+        while not self._stop.is_set():
+            self.sample()
+            next_tick += self.interval
+            self._stop.wait(max(next_tick - time.time(), 0))
+
+    def sample(self):
+        now = time.time()
+        scan_keys = now >= self._next_key_scan
+        if scan_keys:
+            self._next_key_scan = now + self.key_interval
+
+        lines = []
+        for label, client in self.nodes.items():
+            try:
+                record = self._sample_node(label, client, now, scan_keys)
+            except redis.RedisError as e:
+                record = {"node": label, "error": str(e)}
+            if record is None:
+                continue
+            record = {"ts": round(now, 3), "elapsed": round(now - self.run_log.started_at, 3), **record}
+            lines.append(json.dumps(record, ensure_ascii=False))
+        if lines:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write("\n".join(lines) + "\n")
+
+    def _sample_node(self, label, client, now, scan_keys):
+        pipe = client.pipeline(transaction=False)
+        for section in INFO_SECTIONS:
+            pipe.info(section)
+        commandstats, cpu, memory, stats, clients = pipe.execute()
+
+        current = {
+            "at": now,
+            "cpu": cpu.get("used_cpu_sys", 0.0) + cpu.get("used_cpu_user", 0.0),
+            "commands": {
+                key[len("cmdstat_"):]: (entry.get("calls", 0), entry.get("usec", 0))
+                for key, entry in commandstats.items() if key.startswith("cmdstat_")
+            },
+        }
+        prev = self._prev.get(label)
+        self._prev[label] = current
+        if prev is None:
+            # 第一次只建立基準，順便跳過既有的 slowlog
+            self._new_slowlog(label, client)
+            return None
+
+        dt = max(now - prev["at"], 1e-6)
+        commands = {}
+        for name, (calls, usec) in current["commands"].items():
+            prev_calls, prev_usec = prev["commands"].get(name, (0, 0))
+            d_calls, d_usec = calls - prev_calls, usec - prev_usec
+            if d_calls <= 0:
+                continue
+            commands[name] = {
+                "calls": d_calls,
+                "ops": round(d_calls / dt, 1),
+                "usec": d_usec,
+                "usec_per_call": round(d_usec / d_calls, 2),
+            }
+
+        record = {
+            "node": label,
+            "interval": round(dt, 3),
+            "cpu_pct": round((current["cpu"] - prev["cpu"]) / dt * 100, 1),
+            "ops_per_sec": stats.get("instantaneous_ops_per_sec", 0),
+            "clients": clients.get("connected_clients", 0),
+            "blocked_clients": clients.get("blocked_clients", 0),
+            "used_memory": memory.get("used_memory", 0),
+            "used_memory_rss": memory.get("used_memory_rss", 0),
+            "fragmentation": memory.get("mem_fragmentation_ratio", 0),
+            "commands": commands,
+        }
+        slowlog = self._new_slowlog(label, client)
+        if slowlog:
+            record["slowlog"] = slowlog
+        latency = self._latency(client)
+        if latency:
+            record["latency"] = latency
+        if scan_keys:
+            record["keys"] = self._hot_keys(client)
+        return record
+
+    def _new_slowlog(self, label, client):
+        entries = client.slowlog_get(128)
+        last = self._slowlog_id.get(label)
+        self._slowlog_id[label] = max([e["id"] for e in entries] + [last if last is not None else -1])
+        if last is None:
+            return []
+        return [
+            {"id": e["id"], "start": e["start_time"], "usec": e["duration"], "command": _command_text(e["command"])[:200]}
+            for e in sorted(entries, key=lambda e: e["id"]) if e["id"] > last
+        ]
+
+    def _latency(self, client):
+        # [[event, 最近發生時間, 最近延遲 ms, 最大延遲 ms], ...]
+        try:
+            rows = client.execute_command("LATENCY", "LATEST")
+        except redis.ResponseError:
+            return []
+        return [{"event": r[0], "at": int(r[1]), "latest_ms": int(r[2]), "max_ms": int(r[3])} for r in rows or []]
+
+    def _hot_keys(self, client):
+        """SCAN auction:* (最多 scan_limit 個)，回傳 MEMORY USAGE 最大的 hot_keys 個 {key: bytes}"""
+        keys = []
+        for key in client.scan_iter(match=KEY_PATTERN, count=1000):
+            keys.append(key)
+            if len(keys) >= self.scan_limit:
+                break
+        if not keys:
+            return {}
+        pipe = client.pipeline(transaction=False)
+        for key in keys:
+            pipe.memory_usage(key, samples=5)
+        sizes = [(key, size or 0) for key, size in zip(keys, pipe.execute(raise_on_error=False))
+                 if not isinstance(size, Exception)]
+        sizes.sort(key=lambda item: -item[1])
+        return dict(sizes[:self.hot_keys])
+
+
+def _command_text(command):
+    if isinstance(command, (list, tuple)):
+        return " ".join(str(part) for part in command)
+    return str(command)
+
+
+# ---------------------------------------------------------------------------
+# 報表
+# ---------------------------------------------------------------------------
+
+def report(run_dir, window=5.0, top=4, names=None):
+    rows = [r for r in read_jsonl(run_dir, FILENAME) if "commands" in r]
+    if not rows:
+        print(f"{run_dir} 沒有 Redis 遙測資料 ({FILENAME})")
+        return
+    t0 = run_origin(run_dir, rows)
+
+    # 依總耗時挑出主要指令
+    totals = defaultdict(lambda: {"calls": 0, "usec": 0})
+    for r in rows:
+        for name, c in r["commands"].items():
+            totals[name]["calls"] += c["calls"]
+            totals[name]["usec"] += c["usec"]
+    total_usec = sum(t["usec"] for t in totals.values()) or 1
+    duration = max(rows[-1]["ts"] - rows[0]["ts"] + rows[0]["interval"], 1.0)
+    main_commands = sorted(totals, key=lambda n: -totals[n]["usec"])[:top]
+
+    print("\n" + "=" * 78)
+    print(f"  Redis 指令耗時 (整個壓測，{duration:.0f}s)")
+    print("=" * 78)
+    print(f"  {'指令':<16} {'呼叫數':>12} {'平均 ops/s':>11} {'µs/call':>9} {'耗時占比':>9}")
+    for name in sorted(totals, key=lambda n: -totals[n]["usec"])[:15]:
+        t = totals[name]
+        print(f"  {name:<16} {t['calls']:>12} {t['calls'] / duration:>11.0f} "
+              f"{t['usec'] / t['calls']:>9.1f} {t['usec'] / total_usec * 100:>8.1f}%")
+
+    # 依視窗彙總
+    windows = defaultdict(lambda: {"cpu": [], "memory": 0, "commands": defaultdict(lambda: [0, 0])})
+    for r in rows:
+        w = windows[window_index(r["ts"], t0, window)]
+        w["cpu"].append(r["cpu_pct"])
+        w["memory"] = max(w["memory"], r["used_memory"])
+        for name, c in r["commands"].items():
+            w["commands"][name][0] += c["calls"]
+            w["commands"][name][1] += c["usec"]
+    client = client_windows(run_dir, t0, window, names)
+    marks = markers(run_dir, t0, window)
+
+    print("\n" + "=" * 78)
+    print(f"  時間軸 (每 {window:g}s；client 為 req/s、p50/p99 ms；指令為 ops/s @ µs/call)")
+    print("=" * 78)
+    header = f"  {'t(s)':>6} {'req/s':>7} {'p50':>7} {'p99':>7} {'cpu%':>6} {'mem MB':>7}"
+    header += "".join(f" {name[:15]:>16}" for name in main_commands)
+    print(header)
+    for idx in sorted(set(windows) | set(client)):
+        w = windows.get(idx)
+        line = f"  {idx * window:>6.0f} {format_client(client.get(idx), window)}"
+        if w:
+            line += f" {max(w['cpu']):>6.1f} {w['memory'] / 1024 / 1024:>7.1f}"
+            for name in main_commands:
+                calls, usec = w["commands"].get(name, (0, 0))
+                cell = f"{calls / window:.0f}@{usec / calls:.0f}" if calls else "-"
+                line += f" {cell:>16}"
+        if marks.get(idx):
+            line += "  ← " + ", ".join(marks[idx])
+        print(line)
+
+    slow = [s for r in rows for s in r.get("slowlog", [])]
+    if slow:
+        print(f"\n  SLOWLOG (共 {len(slow)} 筆，最慢 5 筆)")
+        for s in sorted(slow, key=lambda s: -s["usec"])[:5]:
+            print(f"    {s['usec']:>8} µs  {s['command'][:80]}")
+
+    latency = {}
+    for r in rows:
+        for e in r.get("latency", []):
+            latency[e["event"]] = max(latency.get(e["event"], 0), e["max_ms"])
+    if latency:
+        print("\n  LATENCY 事件 (最大 ms): " + ", ".join(f"{k}={v}" for k, v in sorted(latency.items())))
+
+    key_rows = [r for r in rows if r.get("keys")]
+    if key_rows:
+        peak = {}
+        for r in key_rows:
+            for key, size in r["keys"].items():
+                peak[key] = max(peak.get(key, 0), size)
+        print("\n  最大的 Key (MEMORY USAGE 峰值)")
+        for key, size in sorted(peak.items(), key=lambda item: -item[1])[:10]:
+            print(f"    {size / 1024:>10.1f} KB  {key}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Redis 遙測側車")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    collect = sub.add_parser("collect", help="持續取樣直到 Ctrl-C 或 --duration 結束")
+    collect.add_argument("--run-id", default=None, help="寫入的 run ID (預設 RUN_ID 環境變數或新建)")
+    collect.add_argument("--url", default=os.getenv("REDIS_TELEMETRY_URL", "redis://localhost:6379"),
+                         help="Redis URL，逗號分隔多個節點")
+    collect.add_argument("--interval", type=float, default=1.0)
+    collect.add_argument("--duration", type=float, default=0, help="取樣秒數，0 代表直到 Ctrl-C")
+
+    rep = sub.add_parser("report", help="輸出報表")
+    rep.add_argument("run_dir")
+    rep.add_argument("--window", type=float, default=5.0, help="彙總視窗秒數")
+    rep.add_argument("--top", type=int, default=4, help="時間軸顯示的指令數")
+    rep.add_argument("--name", action="append", help="只計入指定名稱的 client 請求 (可重複)")
+    args = parser.parse_args()
+
+    if args.command == "report":
+        report(args.run_dir, args.window, args.top, args.name)
+        return
+
+    run_log = RunLog(args.run_id)
+    urls = [u.strip() for u in args.url.split(",") if u.strip()]
+    telemetry = RedisTelemetry(run_log, urls, interval=args.interval).start()
+    try:
+        if args.duration:
+            time.sleep(args.duration)
+        else:
+            while True:
+                time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        telemetry.stop()
+        run_log.event("redis_telemetry_stop")
+        print(f"[Redis 遙測] 已停止，報表: python redis_telemetry.py report {run_log.dir}")
+
+
+if __name__ == "__main__":
+    main()
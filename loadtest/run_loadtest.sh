@@ -4,16 +4,19 @@
 
 set -e
 
+HOST="${BASE_URL:-http://localhost:8000}"
+
 echo "=========================================="
 echo "压力测试运行脚本"
 echo "=========================================="
+echo "目标: $HOST (可用 BASE_URL 覆盖)"
 echo ""
 echo "请选择要运行的测试："
 echo "1. Locust 压力测试（Web UI 模式）"
 echo "2. Locust 压力测试（无头模式，1000用户，5分钟）"
-echo "3. K6 压力测试"
-echo "4. 一致性测试（防超卖）"
-echo "5. WebSocket 压力测试"
+echo "3. 运行情境（scenarios.json，自动建立商品并收集产出）"
+echo "4. 最终排行榜验证（防超卖 / 排名一致性）"
+echo "5. 容量搜寻（SLO 内的最大出价吞吐量）"
 echo "6. 更新出价场景测试"
 echo "7. 安装所有依赖"
 echo ""
@@ -25,27 +28,30 @@ case $choice in
     1)
         echo "启动 Locust Web UI..."
         echo "访问 http://localhost:8089 开始测试"
-        locust -f locustfile.py
+        locust -f locustfile.py --host="$HOST"
         ;;
     2)
         echo "运行 Locust 无头模式测试..."
-        locust -f locustfile.py --headless --users=1000 --spawn-rate=50 --run-time=5m
+        locust -f locustfile.py --host="$HOST" --headless --users=1000 --spawn-rate=50 --run-time=5m
         ;;
     3)
-        echo "运行 K6 压力测试..."
-        k6 run k6_script.js
+        python3 scenario.py list
+        echo ""
+        read -p "请输入情境名称 (默认 demo): " scenario
+        python3 scenario.py run "${scenario:-demo}" --host "$HOST"
         ;;
     4)
-        echo "运行一致性测试..."
-        python3 consistency_test.py
+        ls -t runs 2>/dev/null | head -5
+        read -p "请输入 run ID: " run_id
+        python3 verify_rankings.py "$run_id" --host "$HOST" --wait
         ;;
     5)
-        echo "运行 WebSocket 压力测试..."
-        python3 websocket_test.py
+        echo "运行容量搜寻..."
+        python3 capacity_search.py search --host "$HOST" --scenario bidding=locustfile.py:BiddingUser
         ;;
     6)
         echo "运行更新出价场景测试..."
-        locust -f locust_update_bid.py --headless --users=100 --spawn-rate=10 --run-time=2m
+        locust -f locustfile.py --host="$HOST" --headless --users=100 --spawn-rate=10 --run-time=2m BiddingUser
         ;;
     7)
         echo "安装依赖..."
@@ -57,4 +63,3 @@ case $choice in
         exit 1
         ;;
 esac
-
@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+"""
+壓測結果摘要與回歸比較
+
+每次 Locust 執行結束時寫入 runs/<run_id>/summary.json：
+- endpoints：每個請求名稱的請求數、失敗數、吞吐量 (req/s)、成功吞吐量、p50 / p95 / p99 與完整直方圖
+  (由 client_latency.jsonl 合併，與 timeline 報表同一份資料)
+- goodput：被接受的出價 / 秒；bid_outcomes 為出價結果的語意分類 (見 bid_outcomes.py)，
+  出價被拒 (outbid_race、ended…) 與伺服器錯誤分開計算
+- errors：依請求名稱的錯誤分類 (出價請求為結果分類，其餘為 HTTP 狀態碼或例外類型)
+- fingerprint：commit、Python / Locust 版本、機器、目標 host、使用者數與影響負載的環境變數，
+  比較時若兩次執行的負載條件不同會先列出差異
+
+比較兩次執行 (或與儲存的基準線比較)：
+- 分位數：以順序統計量的信賴區間 (z 預設 2.58，約 99%) 從直方圖取上下界，
+  目前的下界高於基準的上界、且增加超過 --tolerance 時才算退化，避免樣本少時的雜訊
+- 失敗率：兩比例 z 檢定顯著且增加超過 --error-tolerance (絕對值)
+- 吞吐量：goodput 與各請求的成功 req/s 下降超過 --tolerance
+有顯著退化時回傳 1。
+
+使用方式：
+python run_summary.py show runs/<run_id>
+python run_summary.py baseline <run_id> --name main          # 存成 runs/baselines/main.json
+python run_summary.py compare main <run_id> --tolerance 0.10  # 基準可為 run ID、目錄、檔案或基準線名稱
+"""
+
+import argparse
+import json
+import math
+import os
+import platform
+import socket
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+from bid_outcomes import ACCEPTED, BidOutcomes
+from histogram import LatencyHistogram
+from runlog import RUNS_DIR, read_events, read_jsonl, run_start_ts
+
+BASELINE_DIR = os.path.join(RUNS_DIR, "baselines")
+# 影響負載或後端行為、比較時需要一致的環境變數
+FINGERPRINT_ENV = ("BASE_URL", "PRODUCT_POPULARITY", "PRODUCT_ZIPF_S", "PRODUCT_WEIGHTS", "USER_PACE_RPS",
+                   "PROFILE_PHASES", "DEMO_MODE", "PRICE_ORACLE_CONNECTIONS", "BIDDER_STRATEGY",
+                   "TRAFFIC_MODEL", "SCENARIO")
+QUANTILES = (50, 95, 99)
+
+
+def is_bid_request(name):
+    return "出價" in name or "bid" in name.lower()
+
+
+def git_fingerprint():
+    cwd = os.path.dirname(os.path.abspath(__file__))
+
+    def git(*args):
+        return subprocess.run(["git", *args], cwd=cwd, capture_output=True, text=True, check=True).stdout.strip()
+
+    try:
+        return {"commit": git("rev-parse", "HEAD"),
+                "dirty": bool(git("status", "--porcelain", "--untracked-files=no"))}
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": None, "dirty": None}
+
+
+def environment_fingerprint(environment=None):
+    try:
+        import locust
+        locust_version = locust.__version__
+    except ImportError:
+        locust_version = None
+    fp = {
+        **git_fingerprint(),
+        "hostname": socket.gethostname(),
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "locust": locust_version,
+        "cpu_count": os.cpu_count(),
+        "env": {k: os.environ[k] for k in FINGERPRINT_ENV if k in os.environ},
+    }
+    if environment is not None:
+        fp["host"] = environment.host
+        fp["user_classes"] = sorted(c.__name__ for c in environment.user_classes)
+        opts = getattr(environment, "parsed_options", None)
+        if opts is not None:
+            fp["users"] = getattr(opts, "num_users", None)
+            fp["spawn_rate"] = getattr(opts, "spawn_rate", None)
+            fp["run_time"] = getattr(opts, "run_time", None)
+    return fp
+
+
+class RunSummary:
+    """收集請求的錯誤分類，結束時與 client_latency.jsonl 合併寫出 summary.json"""
+
+    def __init__(self):
+        self.errors = defaultdict(lambda: defaultdict(int))  # {name: {分類: 次數}}
+        self.bids = BidOutcomes()
+
+    def record(self, name, exception, request_kwargs):
+        """累計錯誤分類；出價請求回傳 bid_outcomes 的分類，其他請求回傳 None"""
+        response = request_kwargs.get("response")
+        if is_bid_request(name):
+            outcome = self.bids.record(name, response, exception)
+            if outcome != ACCEPTED:
+                self.errors[name][outcome] += 1
+            return outcome
+        status = getattr(response, "status_code", None)
+        if exception is None and (status is None or status < 400):
+            return
+        if status:
+            kind = f"HTTP {status}"
+        else:
+            kind = type(exception).__name__ if exception else "unknown"
+        self.errors[name][kind] += 1
+
+    def write(self, run_log, environment=None):
+        summary = build_summary(run_log.dir, self.errors, environment_fingerprint(environment),
+                                self.bids.summary()["by_name"])
+        path = run_log.path("summary.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+        return path
+
+
+def run_window(run_dir, rows):
+    """(開始, 結束) Unix 秒：test_start 到 test_stop，沒有事件時以 client 資料的範圍代替"""
+    start = run_start_ts(run_dir)
+    stop = None
+    for event in read_events(run_dir):
+        if event.get("event") == "test_stop":
+            stop = event["ts"]
+    stamps = [r["ts"] for r in rows]
+    if start is None:
+        start = min(stamps) if stamps else 0
+    if stop is None:
+        stop = (max(stamps) + 1) if stamps else start
+    return start, stop
+
+
+def build_summary(run_dir, errors=None, fingerprint=None, bid_outcomes=None):
+    rows = read_jsonl(run_dir, "client_latency.jsonl")
+    start, stop = run_window(run_dir, rows)
+    duration = max(stop - start, 1.0)
+
+    hists = defaultdict(LatencyHistogram)
+    failures = defaultdict(int)
+    for row in rows:
+        hists[row["name"]].merge(LatencyHistogram.from_dict(row["hist"]))
+        failures[row["name"]] += row["failures"]
+
+    endpoints = {}
+    for name in sorted(set(hists) | set(failures)):
+        h = hists[name]
+        total = h.count + failures[name]
+        endpoints[name] = {
+            "count": total,
+            "failures": failures[name],
+            "error_rate": failures[name] / total if total else 0.0,
+            "rps": total / duration,
+            "ok_rps": h.count / duration,
+            "mean": h.mean,
+            **{f"p{q}": h.percentile(q) for q in QUANTILES},
+            "max": h.max,
+            "hist": h.to_dict(),
+        }
+
+    meta = {}
+    meta_path = os.path.join(run_dir, "meta.json")
+    if os.path.exists(meta_path):
+        with open(meta_path, encoding="utf-8") as f:
+            meta = json.load(f)
+
+    bids = [e for name, e in endpoints.items() if is_bid_request(name)]
+    outcomes = defaultdict(int)
+    for counts in (bid_outcomes or {}).values():
+        for outcome, n in counts.items():
+            outcomes[outcome] += n
+    bid_total = sum(outcomes.values())
+    if bid_total:
+        goodput = outcomes[ACCEPTED] / duration
+    else:
+        # 舊的執行紀錄沒有結果分類，以 2xx 的出價代替
+        goodput = sum(e["ok_rps"] for e in bids)
+    return {
+        "run_id": os.path.basename(os.path.normpath(run_dir)),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "meta": meta,
+        "fingerprint": fingerprint or {},
+        "duration": duration,
+        "throughput": sum(e["rps"] for e in endpoints.values()),
+        "goodput": goodput,
+        "bid_rps": sum(e["rps"] for e in bids),
+        "wasted_bid_ratio": (bid_total - outcomes[ACCEPTED]) / bid_total if bid_total else None,
+        "bid_outcomes": {"total": dict(outcomes), "by_name": bid_outcomes or {}},
+        "endpoints": endpoints,
+        "errors": {name: dict(kinds) for name, kinds in (errors or {}).items()},
+    }
+
+
+def resolve(ref):
+    """run ID、run 目錄、summary 檔或基準線名稱 → summary dict"""
+    candidates = [ref, os.path.join(ref, "summary.json"), os.path.join(RUNS_DIR, ref, "summary.json"),
+                  os.path.join(BASELINE_DIR, f"{ref}.json")]
+    for path in candidates:
+        if os.path.isfile(path):
+            with open(path, encoding="utf-8") as f:
+                return json.load(f)
+    # 舊的執行紀錄沒有 summary.json 時，從 client_latency.jsonl 重建 (沒有錯誤分類與環境資訊)
+    for run_dir in (ref, os.path.join(RUNS_DIR, ref)):
+        if os.path.isfile(os.path.join(run_dir, "client_latency.jsonl")):
+            return build_summary(run_dir)
+    raise SystemExit(f"找不到執行紀錄或基準線: {ref}")
+
+
+def quantile_bounds(hist, q, z):
+    """第 q 百分位數的 (下界, 估計值, 上界)：樣本排名的常態近似信賴區間對應回直方圖"""
+    n = hist.count
+    p = q / 100
+    half = z * math.sqrt(n * p * (1 - p)) / n if n else 0
+    return (hist.percentile(max(p - half, 0) * 100), hist.percentile(q),
+            hist.percentile(min(p + half, 1) * 100))
+
+
+def proportion_z(f1, n1, f2, n2):
+    """兩比例 z 檢定 (第二組比第一組高時為正)"""
+    if not n1 or not n2:
+        return 0.0
+    pooled = (f1 + f2) / (n1 + n2)
+    se = math.sqrt(pooled * (1 - pooled) * (1 / n1 + 1 / n2))
+    return ((f2 / n2) - (f1 / n1)) / se if se else 0.0
+
+
+def compare(base, cur, tolerance, error_tolerance, z, min_count):
+    """回傳 (列出的比較列, 退化項目)"""
+    rows, regressions = [], []
+
+    def check_throughput(label, b, c):
+        change = (c - b) / b if b else 0.0
+        regressed = b > 0 and change < -tolerance
+        rows.append((label, "req/s", b, c, change, "退化" if regressed else ""))
+        if regressed:
+            regressions.append(f"{label} 吞吐量 {b:.1f} → {c:.1f} req/s ({change * 100:+.1f}%)")
+
+    check_throughput("goodput (accepted)", base.get("goodput", 0), cur.get("goodput", 0))
+
+    for name in sorted(set(base["endpoints"]) & set(cur["endpoints"])):
+        b, c = base["endpoints"][name], cur["endpoints"][name]
+        if b["count"] < min_count or c["count"] < min_count:
+            rows.append((name, "樣本不足", b["count"], c["count"], None, ""))
+            continue
+        bh, ch = LatencyHistogram.from_dict(b["hist"]), LatencyHistogram.from_dict(c["hist"])
+        for q in QUANTILES:
+            b_lo, b_val, b_hi = quantile_bounds(bh, q, z)
+            c_lo, c_val, c_hi = quantile_bounds(ch, q, z)
+            change = (c_val - b_val) / b_val if b_val else 0.0
+            verdict = ""
+            if c_lo > b_hi and change > tolerance:
+                verdict = "退化"
+                regressions.append(f"{name} p{q} {b_val:.1f} → {c_val:.1f} ms ({change * 100:+.1f}%)")
+            elif c_hi < b_lo and change < -tolerance:
+                verdict = "改善"
+            rows.append((name, f"p{q} ms", b_val, c_val, change, verdict))
+
+        score = proportion_z(b["failures"], b["count"], c["failures"], c["count"])
+        delta = c["error_rate"] - b["error_rate"]
+        verdict = ""
+        if score > z and delta > error_tolerance:
+            verdict = "退化"
+            regressions.append(f"{name} 失敗率 {b['error_rate'] * 100:.2f}% → {c['error_rate'] * 100:.2f}%")
+        rows.append((name, "失敗率 %", b["error_rate"] * 100, c["error_rate"] * 100, None, verdict))
+        check_throughput(name, b["ok_rps"], c["ok_rps"])
+
+    return rows, regressions
+
+
+def fingerprint_diff(base, cur):
+    keys = ("commit", "dirty", "host", "users", "spawn_rate", "run_time", "user_classes", "locust", "hostname", "env")
+    bf, cf = base.get("fingerprint", {}), cur.get("fingerprint", {})
+    return [(k, bf.get(k), cf.get(k)) for k in keys if bf.get(k) != cf.get(k)]
+
+
+def print_summary(summary):
+    fp = summary.get("fingerprint", {})
+    print(f"Run {summary['run_id']}  commit {str(fp.get('commit'))[:12]}{'-dirty' if fp.get('dirty') else ''}  "
+          f"host {fp.get('host')}  {summary['duration']:.0f}s")
+    print(f"吞吐量 {summary['throughput']:.1f} req/s  出價 {summary['bid_rps']:.1f} req/s  "
+          f"goodput {summary['goodput']:.1f} req/s")
+    outcomes = summary.get("bid_outcomes", {}).get("total", {})
+    bid_total = sum(outcomes.values())
+    if bid_total:
+        print("出價結果 " + ", ".join(f"{k} {v / bid_total * 100:.1f}%"
+                                  for k, v in sorted(outcomes.items(), key=lambda kv: -kv[1])))
+    print(f"{'請求':<20} {'數量':>8} {'req/s':>8} {'失敗率':>7} {'p50':>8} {'p95':>8} {'p99':>8}")
+    for name, e in summary["endpoints"].items():
+        print(f"{name:<20} {e['count']:>8} {e['rps']:>8.1f} {e['error_rate'] * 100:>6.1f}% "
+              f"{e['p50']:>8.1f} {e['p95']:>8.1f} {e['p99']:>8.1f}")
+    for name, kinds in summary.get("errors", {}).items():
+        print(f"  錯誤 {name}: " + ", ".join(f"{k} ×{v}" for k, v in sorted(kinds.items(), key=lambda kv: -kv[1])))
+
+
+def cmd_compare(args):
+    base, cur = resolve(args.baseline), resolve(args.current)
+    print(f"基準 {base['run_id']}  →  目前 {cur['run_id']}")
+    diffs = fingerprint_diff(base, cur)
+    if diffs:
+        print("執行條件不同 (結果可能不可比)：")
+        for key, b, c in diffs:
+            print(f"  {key}: {b} → {c}")
+
+    rows, regressions = compare(base, cur, args.tolerance, args.error_tolerance, args.z, args.min_count)
+    print("=" * 84)
+    print(f"{'請求':<22} {'指標':<10} {'基準':>10} {'目前':>10} {'變化':>9}  判定")
+    print("-" * 84)
+    for name, metric, b, c, change, verdict in rows:
+        if metric == "樣本不足":
+            print(f"{name:<22} {metric:<10} {b:>10} {c:>10} {'':>9}")
+            continue
+        change_text = f"{change * 100:+.1f}%" if change is not None else ""
+        print(f"{name:<22} {metric:<10} {b:>10.2f} {c:>10.2f} {change_text:>9}  {verdict}")
+
+    print("=" * 84)
+    if regressions:
+        print(f"顯著退化 {len(regressions)} 項：")
+        for r in regressions:
+            print(f"  - {r}")
+        return 1
+    print("沒有顯著退化")
+    return 0
+
+
+def cmd_baseline(args):
+    summary = resolve(args.run)
+    os.makedirs(BASELINE_DIR, exist_ok=True)
+    path = os.path.join(BASELINE_DIR, f"{args.name}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+    print(f"基準線 {args.name} ← {summary['run_id']} ({path})")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="壓測結果摘要與回歸比較")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("show", help="顯示一次執行的摘要")
+    p.add_argument("run")
+
+    p = sub.add_parser("baseline", help="把一次執行存成基準線")
+    p.add_argument("run")
+    p.add_argument("--name", default="main")
+
+    p = sub.add_parser("compare", help="比較兩次執行，有顯著退化時回傳 1")
+    p.add_argument("baseline", help="基準：run ID、目錄、summary 檔或基準線名稱")
+    p.add_argument("current")
+    p.add_argument("--tolerance", type=float, default=0.10, help="分位數與吞吐量的相對容許變化")
+    p.add_argument("--error-tolerance", type=float, default=0.005, help="失敗率的絕對容許增加")
+    p.add_argument("--z", type=float, default=2.58, help="信賴區間的 z 值")
+    p.add_argument("--min-count", type=int, default=100, help="樣本數少於此值的請求不比較")
+
+    args = parser.parse_args()
+    if args.command == "show":
+        print_summary(resolve(args.run))
+        return 0
+    if args.command == "baseline":
+        return cmd_baseline(args)
+    return cmd_compare(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
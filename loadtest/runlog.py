@@ -0,0 +1,97 @@
+"""
+壓測執行紀錄 (run log)
+
+每次壓測對應一個 run ID，所有產出 (事件紀錄、profile、遙測、結果摘要) 都放在 runs/<run_id>/ 之下，
+方便事後把同一次壓測的資料對在一起：
+
+    runs/<run_id>/
+        meta.json      # 開始時間、腳本、目標 host 等
+        events.jsonl   # 時間軸事件 (階段切換、profile 擷取…)，每行一筆 JSON
+        profiles/      # pprof CPU / heap profile
+        client_latency.jsonl   # 每秒的 client 延遲 (latency_series.py)
+        redis_telemetry.jsonl  # 每秒的 Redis 指令 / CPU / 記憶體取樣 (redis_telemetry.py)
+        pg_telemetry.jsonl     # 每秒的 Postgres 連線 / 鎖 / WAL / 語句取樣 (pg_telemetry.py)
+        product_stats.json     # 依商品的出價 / 排行榜吞吐量與延遲 (popularity.py)
+        summary.json           # 結果摘要：各請求直方圖、吞吐量、goodput、錯誤分類、環境資訊 (run_summary.py)
+        accepted_bids.jsonl    # 每筆被接受的出價 (bid_ledger.py)
+        ledger.sqlite / rankings_check.json  # 最終排行榜驗證的中間檔與結果 (verify_rankings.py)
+        fault_proxy.jsonl      # 每秒的故障注入 profile、代理連線與後端 goroutine / 寫入失敗 (fault_proxy.py)
+
+run ID 預設為「時間戳記-隨機碼」，可用環境變數 RUN_ID 指定，讓同時啟動的側車程式 (遙測收集等) 寫入同一個目錄。
+RUNS_DIR 可改變根目錄 (預設 loadtest/runs)。
+"""
+
+import json
+import os
+import random
+import string
+import threading
+import time
+from datetime import datetime
+
+RUNS_DIR = os.getenv("RUNS_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "runs"))
+
+
+def new_run_id():
+    suffix = "".join(random.choices(string.ascii_lowercase + string.digits, k=4))
+    return f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{suffix}"
+
+
+class RunLog:
+    def __init__(self, run_id=None, base_dir=None):
+        self.run_id = run_id or os.getenv("RUN_ID") or new_run_id()
+        self.dir = os.path.join(base_dir or RUNS_DIR, self.run_id)
+        os.makedirs(self.dir, exist_ok=True)
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+
+    def path(self, *parts):
+        """runs/<run_id>/ 之下的路徑，必要時建立上層目錄"""
+        full = os.path.join(self.dir, *parts)
+        os.makedirs(os.path.dirname(full), exist_ok=True)
+        return full
+
+    def event(self, kind, **fields):
+        """附加一筆事件到 events.jsonl (ts 為 Unix 秒，elapsed 為距離開始的秒數)"""
+        now = time.time()
+        record = {"ts": round(now, 3), "elapsed": round(now - self.started_at, 3), "event": kind, **fields}
+        line = json.dumps(record, ensure_ascii=False)
+        with self._lock, open(self.path("events.jsonl"), "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+        return record
+
+    def write_meta(self, **fields):
+        """寫入 (或更新) meta.json"""
+        meta_path = self.path("meta.json")
+        meta = {}
+        if os.path.exists(meta_path):
+            with open(meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+        meta.setdefault("run_id", self.run_id)
+        meta.setdefault("started_at", datetime.fromtimestamp(self.started_at).isoformat(timespec="seconds"))
+        meta.update(fields)
+        with open(meta_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+
+
+def read_jsonl(run_dir, name):
+    """讀取 runs/<run_id>/ 下的 JSONL 檔，不存在時回傳空 list"""
+    path = os.path.join(run_dir, name)
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def read_events(run_dir):
+    """讀取 events.jsonl"""
+    return read_jsonl(run_dir, "events.jsonl")
+
+
+def run_start_ts(run_dir):
+    """壓測開始的 Unix 秒 (test_start 事件)，各側車的取樣以此對齊時間軸"""
+    events = read_events(run_dir)
+    for event in events:
+        if event.get("event") == "test_start":
+            return event["ts"]
+    return events[0]["ts"] if events else None
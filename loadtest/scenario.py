@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+壓測情境目錄 (scenario catalog)
+
+scenarios.json 以名稱列出壓測情境，同一個情境每次產生相同的工作負載 (固定的商品、參數、用戶組成、
+負載形狀與亂數種子)，不同 commit 之間的效能比較才有意義。欄位 (未指定的沿用 DEFAULTS，
+也就是原本寫死在 locustfile_demo.py 的設定)：
+    seed                      亂數種子 (出價金額、商品挑選、策略分配)；null 代表不固定
+    registration_duration     註冊階段秒數
+    bidding_duration          競標階段秒數 (商品在 註冊 + 競標 + 10 秒後結束)
+    products                  count / base_price / price_step (第 i 個商品的底價 = base_price + i × price_step)
+                              / k / alpha / beta / gamma
+    popularity, bidders       對應 PRODUCT_POPULARITY、BIDDER_STRATEGY
+    users                     {使用者類別: 權重}，權重 0 的類別不執行
+    urgency                   ExponentialRampUpUser 的出價頻率：base_rate × 2^(t / doubling)，上限 max_rate
+    shape                     SmoothRampShape：max_users / ramp_time / hold_time / spawn_rate
+    bursts                    [{"at": 秒, "duration": 秒, "users": 額外用戶數, "spawn_rate": 選填}]
+    env                       其他環境變數 (例如 {"PRICE_ORACLE_CONNECTIONS": "0"})
+    seed_data                 選填，執行前以 seed_data.py 建立背景資料 (鍵為 seed_data.py 的參數，需 --dsn)
+
+locustfile_demo.py 依環境變數 SCENARIO (名稱) 與 SCENARIO_FILE (預設 loadtest/scenarios.json) 載入情境，
+未設定時使用 DEFAULTS，行為與原本相同。情境中的 popularity / bidders / env 只在環境變數未設定時套用。
+
+使用方式：
+python scenario.py list
+python scenario.py show flash_sale
+python scenario.py run flash_sale --host http://localhost:8000 [--run-id ...] [--dsn "..."] [--verify]
+
+run 以 headless Locust 執行 locustfile_demo.py (由它建立商品)，Locust 輸出寫入 runs/<run_id>/locust.log，
+展開後的情境寫入 runs/<run_id>/scenario.json，其餘產出與一般壓測相同；--verify 在結束後執行 verify_rankings.py。
+"""
+
+import argparse
+import copy
+import json
+import os
+import subprocess
+import sys
+
+from runlog import RUNS_DIR, new_run_id
+
+LOADTEST_DIR = os.path.dirname(os.path.abspath(__file__))
+SCENARIOS_PATH = os.path.join(LOADTEST_DIR, "scenarios.json")
+LOCUSTFILE = "locustfile_demo.py"
+PRODUCT_GRACE = 10  # 商品在競標階段結束後多留的秒數 (與 locustfile_demo.py 相同)
+
+DEFAULTS = {
+    "description": "",
+    "seed": None,
+    "registration_duration": 30,
+    "bidding_duration": 120,
+    "products": {"count": 3, "base_price": 1000.0, "price_step": 100.0, "k": 5,
+                 "alpha": 1.0, "beta": 0.5, "gamma": 0.3},
+    "popularity": None,
+    "bidders": None,
+    "users": {"BiddingUser": 1, "ExponentialRampUpUser": 1},
+    "urgency": {"base_rate": 0.1, "doubling": 12, "max_rate": 12.0},
+    "shape": {"max_users": 1400, "ramp_time": 180, "hold_time": 60, "spawn_rate": 50},
+    "bursts": [],
+    "env": {},
+    "seed_data": None,
+}
+
+# 情境欄位 → 既有的環境變數
+ENV_FIELDS = {"popularity": "PRODUCT_POPULARITY", "bidders": "BIDDER_STRATEGY"}
+
+
+def merge(base, override):
+    """遞迴合併 dict (override 優先)，list 與其他值整個取代"""
+    result = copy.deepcopy(base)
+    for key, value in (override or {}).items():
+        if isinstance(value, dict) and isinstance(result.get(key), dict):
+            result[key] = merge(result[key], value)
+        else:
+            result[key] = copy.deepcopy(value)
+    return result
+
+
+def load_catalog(path=None):
+    with open(path or SCENARIOS_PATH, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def load_scenario(name, path=None):
+    catalog = load_catalog(path)
+    if name not in catalog:
+        raise SystemExit(f"找不到情境 {name} (可用: {', '.join(catalog)})")
+    return merge(DEFAULTS, {**catalog[name], "name": name})
+
+
+def scenario_env(scenario):
+    """情境對應的環境變數"""
+    env = {var: str(scenario[field]) for field, var in ENV_FIELDS.items() if scenario.get(field)}
+    env.update({k: str(v) for k, v in scenario["env"].items()})
+    return env
+
+
+def scenario_from_env():
+    """
+    依 SCENARIO / SCENARIO_FILE 載入情境 (未設定時為 DEFAULTS)，並把情境的環境變數補進 os.environ
+    (已設定的不覆蓋)；需在 ProductPicker.from_env() 等讀取環境變數的初始化之前呼叫
+    """
+    name = os.getenv("SCENARIO")
+    if not name:
+        return merge(DEFAULTS, {"name": None})
+    scenario = load_scenario(name, os.getenv("SCENARIO_FILE"))
+    for key, value in scenario_env(scenario).items():
+        os.environ.setdefault(key, value)
+    return scenario
+
+
+def user_classes(scenario):
+    return [name for name, weight in scenario["users"].items() if weight > 0]
+
+
+def shape_users(scenario, run_time):
+    """SmoothRampShape 在 run_time 秒時的 (用戶數, 生成速率)；超過 ramp_time + hold_time 回傳 None"""
+    shape = scenario["shape"]
+    if run_time > shape["ramp_time"] + shape["hold_time"]:
+        return None
+    if run_time <= shape["ramp_time"]:
+        users = int(shape["max_users"] * (run_time / shape["ramp_time"]))
+    else:
+        users = shape["max_users"]
+    users = max(users, 1)
+    spawn_rate = shape["spawn_rate"]
+    for burst in scenario["bursts"]:
+        if burst["at"] <= run_time < burst["at"] + burst["duration"]:
+            users += burst["users"]
+            spawn_rate = max(spawn_rate, burst.get("spawn_rate", spawn_rate))
+    return users, spawn_rate
+
+
+def run_time(scenario):
+    """Locust --run-time 的上限：負載形狀與商品活動時間中較長者，再加 60 秒緩衝"""
+    shape = scenario["shape"]
+    products_end = scenario["registration_duration"] + scenario["bidding_duration"] + PRODUCT_GRACE
+    return int(max(shape["ramp_time"] + shape["hold_time"], products_end) + 60)
+
+
+def provision(scenario, dsn):
+    """依 seed_data 欄位建立背景資料 (先刪除同前綴的舊資料，亂數種子與情境相同)"""
+    options = dict(scenario["seed_data"])
+    options.setdefault("prefix", f"scn-{scenario['name']}-")
+    cmd = [sys.executable, "seed_data.py", "--dsn", dsn, "--clean"]
+    if scenario["seed"] is not None:
+        cmd += ["--seed", str(scenario["seed"])]
+    for key, value in options.items():
+        flag = "--" + key.replace("_", "-")
+        if value is True:
+            cmd.append(flag)
+        elif value not in (False, None):
+            cmd += [flag, str(value)]
+    print(f"[情境] 建立背景資料: {' '.join(cmd[2:])}")
+    subprocess.run(cmd, cwd=LOADTEST_DIR, check=True)
+
+
+def print_result(run_dir):
+    path = os.path.join(run_dir, "summary.json")
+    if not os.path.exists(path):
+        print(f"[情境] 沒有 summary.json，請查看 {os.path.join(run_dir, 'locust.log')}")
+        return
+    with open(path, encoding="utf-8") as f:
+        summary = json.load(f)
+    wasted = summary.get("wasted_bid_ratio")
+    print(f"[情境] {summary['duration']:.0f}s  吞吐量 {summary['throughput']:.1f} req/s  "
+          f"出價 {summary['bid_rps']:.1f}/s  goodput {summary['goodput']:.1f}/s  "
+          f"無效出價 {wasted * 100 if wasted is not None else 0:.1f}%")
+    for name, e in summary["endpoints"].items():
+        print(f"  {name:<16} {e['count']:8d}  p50 {e['p50']:7.0f}ms  p95 {e['p95']:7.0f}ms  "
+              f"p99 {e['p99']:7.0f}ms  失敗 {e['error_rate'] * 100:5.1f}%")
+
+
+def run(args):
+    scenario = load_scenario(args.name, args.file)
+    run_id = args.run_id or f"{args.name}-{new_run_id()}"
+    run_dir = os.path.join(RUNS_DIR, run_id)
+    os.makedirs(run_dir, exist_ok=True)
+    with open(os.path.join(run_dir, "scenario.json"), "w", encoding="utf-8") as f:
+        json.dump(scenario, f, ensure_ascii=False, indent=2)
+
+    if scenario["seed_data"]:
+        if args.dsn:
+            provision(scenario, args.dsn)
+        else:
+            print("[情境] 此情境需要背景資料，未指定 --dsn，略過 seed_data")
+
+    limit = run_time(scenario)
+    cmd = ["locust", "-f", LOCUSTFILE, "--headless", "--host", args.host, "-t", f"{limit}s",
+           "--stop-timeout", "5", *user_classes(scenario)]
+    env = dict(os.environ, SCENARIO=args.name, RUN_ID=run_id, RUNS_DIR=RUNS_DIR)
+    if args.file:
+        env["SCENARIO_FILE"] = os.path.abspath(args.file)
+    env.update(scenario_env(scenario))
+
+    print(f"[情境] {args.name}: {scenario['description']}")
+    print(f"[情境] run ID {run_id}，最長 {limit}s，Locust 輸出: {os.path.join(run_dir, 'locust.log')}")
+    with open(os.path.join(run_dir, "locust.log"), "w", encoding="utf-8") as log:
+        # 有請求失敗時 Locust 以 1 結束，結果以 summary.json 判斷
+        subprocess.run(cmd, cwd=LOADTEST_DIR, env=env, stdout=log, stderr=subprocess.STDOUT, timeout=limit + 120)
+    print_result(run_dir)
+
+    if args.verify:
+        code = subprocess.run([sys.executable, "verify_rankings.py", run_id, "--host", args.host, "--wait",
+                               *(["--dsn", args.dsn] if args.dsn else [])], cwd=LOADTEST_DIR).returncode
+        return code
+    print(f"[情境] 比較兩次執行: python run_summary.py compare <baseline> {run_id}")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="依情境目錄執行可重現的壓測")
+    parser.add_argument("--file", help="情境目錄 (預設 loadtest/scenarios.json)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("list", help="列出情境")
+    p = sub.add_parser("show", help="顯示展開預設值後的情境")
+    p.add_argument("name")
+    p = sub.add_parser("run", help="建立資料並以 headless 執行情境")
+    p.add_argument("name")
+    p.add_argument("--host", default=os.getenv("BASE_URL", "http://localhost:8000"))
+    p.add_argument("--run-id", help="預設為 <情境>-<時間戳記>-<隨機碼>")
+    p.add_argument("--dsn", default=os.getenv("PG_TELEMETRY_DSN", ""), help="Postgres 連線字串 (seed_data 與驗證用)")
+    p.add_argument("--verify", action="store_true", help="結束後執行 verify_rankings.py")
+    args = parser.parse_args()
+
+    if args.command == "list":
+        for name, spec in load_catalog(args.file).items():
+            print(f"{name:<24} {spec.get('description', '')}")
+    elif args.command == "show":
+        print(json.dumps(load_scenario(args.name, args.file), ensure_ascii=False, indent=2))
+    else:
+        sys.exit(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+"""
+大量合成資料產生器 (資料庫規模測試)
+
+以 COPY 平行寫入 users、products、bid_logs，用來建立千萬使用者、上億筆出價規模的資料：
+- 商品熱度：Zipf 分布 (--zipf，指數越大越集中在少數熱門商品)
+- 出價時間：--burst 比例的出價集中在結束前 --burst-window 秒 (越接近結束越密集)，其餘均勻分布
+- 出價金額隨活動進度上升；分數與後端 CalculateScore 相同 (alpha × price + beta / (反應毫秒 + 1) + gamma × weight)
+- 使用者權重由 id 決定 (user_weight)，出價與寫入 Redis 時不需再查 users
+
+已結束的商品會寫入 archive_jobs (status=done)，避免後端啟動時把它們重建回 Redis 或重新封存
+(--no-archive-jobs 關閉)。--redis-url 會把 latest_bids 中的出價以 pipeline 分批寫入對應的
+auction:{id}:config / rank / bids (--redis-top 只寫每個商品的前 N 名)。
+
+使用方式 (先啟動一次後端完成 migration)：
+python seed_data.py --dsn "host=localhost user=admin password=password123 dbname=auction_db" \\
+    --users 10000000 --products 10000 --bids 100000000 --workers 8 --defer-latest
+
+密碼沿用 --template-user 的雜湊 (預設 test_member_1，由 scripts/setup_test_data.sh 建立)，
+產生的使用者 <prefix>user_<id> (預設 seed-user_<id>) 可用相同密碼登入；找不到時寫入無法登入的雜湊。
+--clean 刪除先前以相同 --prefix 產生的商品、出價與使用者。請勿對正式環境執行。
+"""
+
+import argparse
+import bisect
+import io
+import multiprocessing
+import random
+import time
+from datetime import datetime, timezone
+
+import psycopg2
+
+# worker process 共用的設定 (由 init_worker 設定)
+_ctx = {}
+
+
+def user_weight(uid):
+    """與註冊時相同的範圍 (1.0 ~ 1.5)，由 id 決定"""
+    return 1.0 + (uid * 2654435761 % 1000) / 2000
+
+
+def user_prefix(prefix):
+    """使用者名稱前綴，與商品 id 共用 --prefix，--clean 只刪除同一批產生的使用者"""
+    return prefix + "user_"
+
+
+def zipf_cdf(n, s):
+    """第 i 名商品的累積機率 (i 從 0 開始，0 最熱門)"""
+    total = 0.0
+    cdf = []
+    for i in range(n):
+        total += 1.0 / (i + 1) ** s
+        cdf.append(total)
+    return [c / total for c in cdf]
+
+
+def iso(ms):
+    return datetime.fromtimestamp(ms / 1000, tz=timezone.utc).isoformat()
+
+
+def plan_products(args, now_ms):
+    """產生商品排程：--live 比例的商品目前進行中，其餘在過去 --days 天內已結束"""
+    rng = random.Random(args.seed)
+    duration = args.duration * 1000
+    products = []
+    for i in range(args.products):
+        if rng.random() < args.live:
+            start = now_ms - int(rng.random() * duration * 0.8)
+            status = "active"
+        else:
+            start = now_ms - duration - int(rng.random() * args.days * 86_400_000)
+            status = "ended"
+        products.append({
+            "id": f"{args.prefix}{i:07d}",
+            "base_price": float(rng.choice((100, 500, 1000, 5000))),
+            "k": args.k,
+            "start": start,
+            "end": start + duration,
+            "status": status,
+        })
+    return products
+
+
+def init_worker(dsn, products, cdf, options):
+    _ctx.update(dsn=dsn, products=products, cdf=cdf, **options)
+
+
+def copy_rows(sql, lines):
+    conn = psycopg2.connect(_ctx["dsn"])
+    try:
+        with conn.cursor() as cur:
+            cur.copy_expert(sql, io.StringIO("".join(lines)))
+        conn.commit()
+    finally:
+        conn.close()
+    return len(lines)
+
+
+def copy_users(task):
+    lo, hi = task
+    password, names = _ctx["password"], _ctx["user_prefix"]
+    created = iso(int(time.time() * 1000))
+    lines = [f"{uid}\t{names}{uid}\t{password}\tmember\t{user_weight(uid)}\t{created}\n"
+             for uid in range(lo, hi)]
+    return "users", copy_rows("COPY users (id, username, password, role, weight, created_at) FROM STDIN", lines)
+
+
+def copy_bids(task):
+    chunk, n = task
+    rng = random.Random(_ctx["seed"] * 1_000_003 + chunk)
+    products, cdf = _ctx["products"], _ctx["cdf"]
+    first_user, users = _ctx["first_user"], _ctx["users"]
+    burst, burst_window = _ctx["burst"], _ctx["burst_window"] * 1000
+    now_ms = _ctx["now_ms"]
+    random_, randint = rng.random, rng.randint
+
+    lines = []
+    for _ in range(n):
+        p = products[min(bisect.bisect_left(cdf, random_()), len(products) - 1)]
+        start, end = p["start"], min(p["end"], now_ms)
+        span = max(end - start, 1)
+        if random_() < burst:
+            # 平方讓時間越接近結束越密集
+            ts = end - int(min(burst_window, span) * random_() ** 2)
+        else:
+            ts = start + int(span * random_())
+        progress = (ts - start) / (p["end"] - start)
+        price = round(p["base_price"] * (1 + progress * progress + 0.05 * random_()), 2)
+        uid = randint(first_user, first_user + users - 1)
+        reaction = ts - start
+        score = round(price + 0.5 / (reaction + 1) + 0.3 * user_weight(uid), 4)
+        lines.append(f"{uid}\t{p['id']}\t{price}\t{score}\t{iso(ts)}\n")
+    return "bid_logs", copy_rows("COPY bid_logs (user_id, product_id, price, score, created_at) FROM STDIN", lines)
+
+
+def copy_products(conn, products, archive_jobs):
+    created = iso(int(time.time() * 1000))
+    lines = [
+        f"{p['id']}\tSeed product {p['id']}\t\t{p['base_price']}\t{p['k']}\t{p['start']}\t{p['end']}\t"
+        f"{p['status']}\t0\t1.0\t0.5\t0.3\t{created}\t{created}\n"
+        for p in products
+    ]
+    with conn.cursor() as cur:
+        cur.copy_expert(
+            "COPY products (id, title, description, base_price, k, start_time, end_time, status, "
+            "final_highest_price, alpha, beta, gamma, created_at, updated_at) FROM STDIN",
+            io.StringIO("".join(lines)))
+        if archive_jobs:
+            ended = [p["id"] for p in products if p["status"] == "ended"]
+            cur.execute("""
+                INSERT INTO archive_jobs (product_id, status, "cursor", total, started_at, updated_at)
+                SELECT id, 'done', 0, 0, now(), now() FROM unnest(%s::text[]) AS id
+                ON CONFLICT (product_id) DO NOTHING
+            """, (ended,))
+    conn.commit()
+    return len(lines)
+
+
+def user_password(conn, template):
+    with conn.cursor() as cur:
+        cur.execute("SELECT password FROM users WHERE username = %s", (template,))
+        row = cur.fetchone()
+    if row:
+        return row[0]
+    print(f"找不到使用者 {template}，產生的使用者將無法登入")
+    return "!"
+
+
+def clean(conn, prefix):
+    print(f"刪除 {prefix}* 商品與 {user_prefix(prefix)}* 使用者...")
+    like = prefix + "%"
+    with conn.cursor() as cur:
+        cur.execute("DELETE FROM bid_logs WHERE product_id LIKE %s", (like,))
+        cur.execute("DELETE FROM latest_bids WHERE product_id LIKE %s", (like,))
+        cur.execute("DELETE FROM archive_jobs WHERE product_id LIKE %s", (like,))
+        cur.execute("DELETE FROM products WHERE id LIKE %s", (like,))
+        cur.execute("DELETE FROM users WHERE username LIKE %s", (user_prefix(prefix) + "%",))
+    conn.commit()
+
+
+def set_latest_trigger(conn, enabled):
+    with conn.cursor() as cur:
+        cur.execute(f"ALTER TABLE bid_logs {'ENABLE' if enabled else 'DISABLE'} TRIGGER trg_bid_logs_latest")
+    conn.commit()
+
+
+def backfill_latest(conn, prefix):
+    """--defer-latest：COPY 完成後一次回填 latest_bids (與 trigger 相同的「較新者勝出」規則)"""
+    with conn.cursor() as cur:
+        cur.execute("""
+            INSERT INTO latest_bids AS lb (product_id, user_id, price, score, created_at, bid_log_id)
+            SELECT DISTINCT ON (product_id, user_id) product_id, user_id, price, score, created_at, id
+            FROM bid_logs
+            WHERE product_id LIKE %s
+            ORDER BY product_id, user_id, created_at DESC, id DESC
+            ON CONFLICT (product_id, user_id) DO UPDATE
+            SET price = EXCLUDED.price, score = EXCLUDED.score,
+                created_at = EXCLUDED.created_at, bid_log_id = EXCLUDED.bid_log_id
+            WHERE (EXCLUDED.created_at, EXCLUDED.bid_log_id) > (lb.created_at, lb.bid_log_id)
+        """, (prefix + "%",))
+        rows = cur.rowcount
+    conn.commit()
+    return rows
+
+
+def populate_redis(conn, redis_url, products, prefix, top, batch):
+    """把 latest_bids 寫入 Redis 的 config / rank / bids，回傳寫入的出價筆數"""
+    import redis
+
+    from bench_redis_cluster import bids_key, config_key, rank_key
+    from bench_redis_memory import encode_binary
+
+    client = redis.Redis.from_url(redis_url)
+    by_id = {p["id"]: p for p in products}
+    highest = {}
+
+    sql = "SELECT product_id, user_id, price, score, created_at FROM latest_bids WHERE product_id LIKE %s"
+    params = [prefix + "%"]
+    if top:
+        sql = f"""
+            SELECT product_id, user_id, price, score, created_at FROM (
+                SELECT *, row_number() OVER (PARTITION BY product_id ORDER BY score DESC) AS rn
+                FROM latest_bids WHERE product_id LIKE %s
+            ) t WHERE rn <= %s"""
+        params.append(top)
+
+    rows = 0
+    pipe = client.pipeline(transaction=False)
+    with conn.cursor(name="seed_redis") as cur:
+        cur.itersize = batch
+        cur.execute(sql, params)
+        for product_id, user_id, price, score, created_at in cur:
+            p = by_id[product_id]
+            member = str(user_id)
+            reaction = int(created_at.timestamp() * 1000) - p["start"]
+            pipe.zadd(rank_key(product_id), {member: score})
+            pipe.hset(bids_key(product_id), member, encode_binary(price, reaction, user_weight(user_id)))
+            highest[product_id] = max(highest.get(product_id, 0), price)
+            rows += 1
+            if rows % batch == 0:
+                pipe.execute()
+    pipe.execute()
+
+    for p in products:
+        pipe.hset(config_key(p["id"]), mapping={
+            "startTime": p["start"], "endTime": p["end"], "basePrice": p["base_price"], "k": p["k"],
+            "alpha": 1.0, "beta": 0.5, "gamma": 0.3, "status": p["status"],
+            "currentHighestPrice": max(highest.get(p["id"], 0), p["base_price"]),
+        })
+    pipe.execute()
+    conn.commit()
+    return rows
+
+
+def run_pool(args, products, cdf, options, tasks, totals):
+    """平行執行 COPY 任務並輸出進度"""
+    done = {table: 0 for table in totals}
+    start = time.time()
+    with multiprocessing.Pool(args.workers, initializer=init_worker,
+                              initargs=(args.dsn, products, cdf, options)) as pool:
+        for table, n in pool.imap_unordered(tasks[0], tasks[1]):
+            done[table] += n
+            elapsed = time.time() - start
+            print(f"  {table}: {done[table]:>13,} / {totals[table]:,}  {done[table] / elapsed:>10,.0f} rows/s", flush=True)
+    return sum(done.values()), time.time() - start
+
+
+def chunks(total, size, offset=0):
+    return [(offset + lo, offset + min(lo + size, total)) for lo in range(0, total, size)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="以 COPY 平行產生大量使用者、商品與出價")
+    parser.add_argument("--dsn", default="host=localhost user=admin password=password123 dbname=auction_db")
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--products", type=int, default=1000)
+    parser.add_argument("--bids", type=int, default=10_000_000)
+    parser.add_argument("--workers", type=int, default=multiprocessing.cpu_count())
+    parser.add_argument("--chunk", type=int, default=200_000, help="每個 COPY 的筆數")
+    parser.add_argument("--prefix", default="seed-", help="商品 id 與使用者名稱前綴")
+    parser.add_argument("--zipf", type=float, default=1.1, help="商品熱度的 Zipf 指數")
+    parser.add_argument("--burst", type=float, default=0.6, help="集中在結束前的出價比例")
+    parser.add_argument("--burst-window", type=float, default=60, help="結束前的尖峰秒數")
+    parser.add_argument("--duration", type=float, default=3600, help="每個活動的秒數")
+    parser.add_argument("--days", type=float, default=7, help="已結束商品分布的天數")
+    parser.add_argument("--live", type=float, default=0.0, help="目前進行中的商品比例")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--template-user", default="test_member_1", help="沿用此使用者的密碼雜湊")
+    parser.add_argument("--defer-latest", action="store_true",
+                        help="寫入期間停用 latest_bids trigger，完成後一次回填 (較快；寫入期間不可有真實出價)")
+    parser.add_argument("--no-archive-jobs", dest="archive_jobs", action="store_false",
+                        help="不為已結束商品寫入 archive_jobs")
+    parser.add_argument("--redis-url", default="", help="設定後把出價寫入 Redis")
+    parser.add_argument("--redis-top", type=int, default=0, help="每個商品只寫前 N 名，0 代表全部")
+    parser.add_argument("--redis-batch", type=int, default=10_000, help="每個 pipeline 的出價筆數")
+    parser.add_argument("--clean", action="store_true", help="先刪除相同前綴的商品、出價與使用者")
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(args.dsn)
+    if args.clean:
+        clean(conn, args.prefix)
+
+    now_ms = int(time.time() * 1000)
+    products = plan_products(args, now_ms)
+    cdf = zipf_cdf(len(products), args.zipf)
+    with conn.cursor() as cur:
+        cur.execute("SELECT COALESCE(max(id), 0) FROM users")
+        first_user = cur.fetchone()[0] + 1
+    options = {
+        "seed": args.seed, "now_ms": now_ms, "first_user": first_user, "users": args.users,
+        "user_prefix": user_prefix(args.prefix),
+        "burst": args.burst, "burst_window": args.burst_window,
+        "password": user_password(conn, args.template_user),
+    }
+
+    top = min(10, len(products))
+    print(f"使用者: {args.users:,} (id {first_user:,} 起)  商品: {len(products):,}  出價: {args.bids:,}  "
+          f"workers: {args.workers}")
+    print(f"Zipf {args.zipf}: 前 {top} 個商品占 {cdf[top - 1] * 100:.1f}% 出價；"
+          f"{args.burst * 100:.0f}% 出價集中在結束前 {args.burst_window:g}s")
+    print("=" * 80)
+
+    results = []
+    start = time.time()
+    n = copy_products(conn, products, args.archive_jobs)
+    results.append(("products", n, time.time() - start))
+
+    rows, elapsed = run_pool(args, products, cdf, options, (copy_users, chunks(args.users, args.chunk, first_user)),
+                             {"users": args.users})
+    results.append(("users", rows, elapsed))
+    with conn.cursor() as cur:
+        cur.execute("SELECT setval(pg_get_serial_sequence('users', 'id'), (SELECT max(id) FROM users))")
+    conn.commit()
+
+    if args.defer_latest:
+        set_latest_trigger(conn, False)
+    try:
+        bid_tasks = [(i, hi - lo) for i, (lo, hi) in enumerate(chunks(args.bids, args.chunk))]
+        rows, elapsed = run_pool(args, products, cdf, options, (copy_bids, bid_tasks), {"bid_logs": args.bids})
+        results.append(("bid_logs", rows, elapsed))
+    finally:
+        if args.defer_latest:
+            set_latest_trigger(conn, True)
+
+    if args.defer_latest:
+        start = time.time()
+        rows = backfill_latest(conn, args.prefix)
+        results.append(("latest_bids (回填)", rows, time.time() - start))
+
+    with conn.cursor() as cur:
+        for table in ("users", "products", "bid_logs", "latest_bids"):
+            cur.execute(f"ANALYZE {table}")
+    conn.commit()
+
+    if args.redis_url:
+        start = time.time()
+        rows = populate_redis(conn, args.redis_url, products, args.prefix, args.redis_top, args.redis_batch)
+        results.append(("Redis rank / bids", rows, time.time() - start))
+
+    print("=" * 80)
+    print(f"{'目標':<22} {'筆數':>14} {'耗時':>9} {'rows/s':>12}")
+    print("-" * 80)
+    for label, rows, elapsed in results:
+        rate = rows / elapsed if elapsed else 0
+        print(f"{label:<22} {rows:>14,} {elapsed:8.1f}s {rate:>12,.0f}")
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Server-Timing 延遲拆解
+
+後端在 /api 回應中加入 Server-Timing header，例如：
+    Server-Timing: config_read;dur=0.210, score;dur=0.003, lua_eval;dur=0.480, json;dur=0.020, total;dur=0.950
+
+total 為伺服器處理時間，client 觀察到的延遲減去 total 即為網路 (含 CloudFront、TLS、排隊) 時間。
+CloudFront 開啟 Server-Timing 時加入的 cdn-* 項目也會一併統計。
+
+使用方式 (Locust)：
+    from server_timing import ServerTimingStats
+    server_timing = ServerTimingStats()
+    # on_request 中: server_timing.record(name, response_time, kwargs.get("response"))
+    # on_test_stop 中: server_timing.print_report()
+"""
+
+from collections import defaultdict
+
+from histogram import LatencyHistogram
+
+
+def parse_server_timing(header):
+    """解析 Server-Timing header，回傳 {name: 毫秒}；同名項目累加，沒有 dur 的項目略過"""
+    result = {}
+    if not header:
+        return result
+    for item in header.split(","):
+        parts = [p.strip() for p in item.split(";")]
+        name = parts[0]
+        if not name:
+            continue
+        for param in parts[1:]:
+            key, _, value = param.partition("=")
+            if key.strip() == "dur":
+                try:
+                    result[name] = result.get(name, 0.0) + float(value.strip().strip('"'))
+                except ValueError:
+                    pass
+    return result
+
+
+class ServerTimingStats:
+    """依請求名稱累計 client 延遲、伺服器總時間、網路時間與各階段時間"""
+
+    def __init__(self):
+        self.client = defaultdict(LatencyHistogram)
+        self.network = defaultdict(LatencyHistogram)
+        self.stages = defaultdict(lambda: defaultdict(LatencyHistogram))
+        self.missing = defaultdict(int)
+
+    def record(self, name, response_time, response):
+        if response is None or response_time is None:
+            return
+        timings = parse_server_timing(response.headers.get("Server-Timing"))
+        self.client[name].record(response_time)
+        if "total" not in timings:
+            self.missing[name] += 1
+            return
+        self.network[name].record(max(response_time - timings["total"], 0.0))
+        for stage, dur in timings.items():
+            self.stages[name][stage].record(dur)
+
+    def summary(self):
+        """{name: {"client": {...}, "network": {...}, "stages": {stage: {...}}}}，各值為 mean/p50/p95/p99 (毫秒)"""
+        def describe(h):
+            return {"count": h.count, "mean": h.mean, "p50": h.percentile(50), "p95": h.percentile(95), "p99": h.percentile(99)}
+
+        return {
+            name: {
+                "client": describe(self.client[name]),
+                "network": describe(self.network[name]),
+                "stages": {stage: describe(h) for stage, h in self.stages[name].items()},
+                "missing_header": self.missing[name],
+            }
+            for name in self.client
+        }
+
+    def print_report(self):
+        print("\n" + "=" * 70)
+        print("  延遲拆解 (Server-Timing, ms)：client = network + server total")
+        print("=" * 70)
+        if not self.client:
+            print("  無資料")
+            return
+
+        for name, data in sorted(self.summary().items()):
+            print(f"\n  {name}  (請求數 {data['client']['count']}, 無 header {data['missing_header']})")
+            print(f"    {'':<14} {'平均':>9} {'p50':>9} {'p95':>9} {'p99':>9} {'占比':>7}")
+            client_mean = data["client"]["mean"] or 1.0
+            rows = [("client", data["client"]), ("network", data["network"])]
+            stages = data["stages"]
+            if "total" in stages:
+                rows.append(("server total", stages["total"]))
+            rows += [(f"  {stage}", stages[stage]) for stage in sorted(stages, key=lambda s: -stages[s]["mean"]) if stage != "total"]
+            for label, d in rows:
+                share = d["mean"] / client_mean * 100
+                print(f"    {label:<14} {d['mean']:9.2f} {d['p50']:9.2f} {d['p95']:9.2f} {d['p99']:9.2f} {share:6.1f}%")
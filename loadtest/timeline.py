@@ -0,0 +1,61 @@
+"""
+壓測時間軸對齊
+
+把 runs/<run_id>/ 下各來源的每秒資料 (client 延遲、Redis / Postgres 遙測) 以 Unix 秒對齊到
+壓測開始 (test_start 事件)，再依固定視窗 (預設 5 秒) 彙總，供各遙測報表並排顯示。
+"""
+
+from collections import defaultdict
+
+from histogram import LatencyHistogram
+from runlog import read_events, read_jsonl, run_start_ts
+
+# 報表上標示的事件
+MARKER_EVENTS = ("test_start", "products_ready", "phase", "profile_start", "fault", "test_stop")
+
+
+def run_origin(run_dir, *series):
+    """時間軸原點：test_start 事件，沒有時取各序列最早的 ts"""
+    t0 = run_start_ts(run_dir)
+    if t0 is None:
+        stamps = [row["ts"] for rows in series for row in rows if "ts" in row]
+        t0 = min(stamps) if stamps else 0
+    return t0
+
+
+def window_index(ts, t0, window):
+    # client 序列以整數秒記錄，開始那一秒可能略早於 t0，併入第一個視窗
+    return max(int((ts - t0) // window), 0)
+
+
+def client_windows(run_dir, t0, window, names=None):
+    """{視窗: {"count", "failures", "hist"}}，names 為 None 時合併所有請求"""
+    result = defaultdict(lambda: {"count": 0, "failures": 0, "hist": LatencyHistogram()})
+    for row in read_jsonl(run_dir, "client_latency.jsonl"):
+        if names and row["name"] not in names:
+            continue
+        w = result[window_index(row["ts"], t0, window)]
+        w["count"] += row["count"]
+        w["failures"] += row["failures"]
+        w["hist"].merge(LatencyHistogram.from_dict(row["hist"]))
+    return result
+
+
+def markers(run_dir, t0, window):
+    """{視窗: [事件標籤]}"""
+    result = defaultdict(list)
+    for event in read_events(run_dir):
+        kind = event.get("event")
+        if kind not in MARKER_EVENTS:
+            continue
+        label = event.get("name") or event.get("label") or kind
+        result[window_index(event["ts"], t0, window)].append(label)
+    return result
+
+
+def format_client(w, window):
+    """client 欄位：req/s、p50、p99 (毫秒)"""
+    if not w or not w["count"]:
+        return f"{'-':>7} {'-':>7} {'-':>7}"
+    h = w["hist"]
+    return f"{w['count'] / window:7.0f} {h.percentile(50):7.1f} {h.percentile(99):7.1f}"
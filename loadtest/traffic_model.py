@@ -0,0 +1,408 @@
+#!/usr/bin/env python3
+"""
+錄製流量模型與 trace-driven LoadTestShape
+
+從歷史資料擬合一次搶購的流量輪廓，讓壓測重現真實的負載形狀，而不是手調的線性爬升或 2 ** (t / 12)：
+- rate：到達率曲線 (依活動進度切成 --buckets 段，以尖峰正規化為 0~1，另存 peak_rps)
+- users：同時活躍的用戶數曲線 (正規化，另存 peak_users)
+- think_time：同一用戶兩次請求間隔的分位數表 (0, 5, …, 100 百分位)
+- mix：每段時間各請求的占比 (任務權重排程)
+
+資料來源：
+    --dsn       Postgres bid_logs (+ products 的 start_time / end_time)，以每個商品的活動期間對齊進度；
+                用戶活躍期間為第一筆到最後一筆出價，think_time 為同一用戶在同商品的出價間隔；
+                只有出價紀錄，mix 固定為 {"bid": 1}
+    --run       runs/<run_id>/ 的 client_latency.jsonl (到達率與 mix) 與 accepted_bids.jsonl (出價間隔)；
+                沒有用戶識別，活躍用戶數以 Little's law 估計 (到達率 × (think_time + 平均延遲))
+
+bid_logs 以 server 端 cursor 串流讀取，間隔以 reservoir sampling 保留最多 --samples 筆，記憶體與資料量無關。
+
+擬合：
+python traffic_model.py fit --dsn "host=localhost user=admin password=password123 dbname=auction_db" -o model.json
+python traffic_model.py fit --run runs/<run_id> -o model.json
+python traffic_model.py show model.json
+
+重播 (locustfile.py / locustfile_demo.py 在設定 TRAFFIC_MODEL 時改用 TraceShape 與 TraceUser)：
+    TRAFFIC_MODEL=model.json TRAFFIC_DURATION=300 TRAFFIC_PEAK_USERS=2000 locust -f locustfile.py --headless ...
+TraceShape 依 users 曲線調整用戶數，TraceUser 依 think_time 等待、依當下的 mix 挑選任務。
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from collections import defaultdict
+
+from locust import LoadTestShape, task
+
+from runlog import RUNS_DIR, read_jsonl, run_start_ts
+
+QUANTILES = [i * 5 for i in range(21)]
+SPARK = " ▁▂▃▄▅▆▇█"
+
+
+class Reservoir:
+    """固定大小的均勻抽樣"""
+
+    def __init__(self, size, rng=None):
+        self.size = size
+        self.items = []
+        self.seen = 0
+        self.rng = rng or random.Random(0)
+
+    def add(self, value):
+        self.seen += 1
+        if len(self.items) < self.size:
+            self.items.append(value)
+        else:
+            i = self.rng.randrange(self.seen)
+            if i < self.size:
+                self.items[i] = value
+
+
+def quantile_table(values):
+    if not values:
+        return [0.0] * len(QUANTILES)
+    values = sorted(values)
+    n = len(values)
+    return [round(values[min(int(q / 100 * (n - 1) + 0.5), n - 1)], 4) for q in QUANTILES]
+
+
+def normalize(values):
+    peak = max(values) if values else 0
+    return [round(v / peak, 4) if peak else 0.0 for v in values], peak
+
+
+class TrafficModel:
+    def __init__(self, data):
+        self.data = data
+        self.buckets = data["buckets"]
+        self.duration = float(data["duration"])
+        self.rate_curve = data["rate"]
+        self.users_curve = data["users"]
+        self.mix_curve = data.get("mix") or [{"bid": 1.0}]
+        self.think = data["think_time"]["quantiles"]
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def _at(self, curve, progress):
+        """progress 0~1 → 曲線值 (相鄰兩段線性內插)"""
+        if not curve:
+            return 0.0
+        x = min(max(progress, 0.0), 1.0) * len(curve) - 0.5
+        i = min(max(int(x), 0), len(curve) - 1)
+        j = min(i + 1, len(curve) - 1)
+        frac = min(max(x - i, 0.0), 1.0)
+        return curve[i] + (curve[j] - curve[i]) * frac
+
+    def rate(self, progress):
+        return self._at(self.rate_curve, progress)
+
+    def users(self, progress):
+        return self._at(self.users_curve, progress)
+
+    def mix(self, progress):
+        i = min(int(min(max(progress, 0.0), 1.0) * len(self.mix_curve)), len(self.mix_curve) - 1)
+        return self.mix_curve[i]
+
+    def think_time(self, rng=random):
+        """依分位數表反向抽樣 (相鄰分位數之間均勻)"""
+        u = rng.random() * (len(self.think) - 1)
+        i = int(u)
+        if i >= len(self.think) - 1:
+            return self.think[-1]
+        return self.think[i] + (self.think[i + 1] - self.think[i]) * (u - i)
+
+
+def fit_bid_logs(dsn, buckets, samples, max_gap, products=None, batch=50000):
+    import psycopg2  # 只有 --dsn 時需要
+
+    sql = """
+        SELECT b.product_id, b.user_id, (extract(epoch FROM b.created_at) * 1000)::bigint,
+               p.start_time, p.end_time
+        FROM bid_logs b LEFT JOIN products p ON p.id = b.product_id
+        {where}
+        ORDER BY b.product_id, b.user_id, b.created_at"""
+    params = []
+    where = ""
+    if products:
+        where = "WHERE b.product_id = ANY(%s)"
+        params.append(products)
+
+    arrivals = [0] * buckets
+    active = [0] * buckets
+    gaps = Reservoir(samples)
+    windows = {}
+    total = 0
+
+    def close_session(first, last):
+        for i in range(first, last + 1):
+            active[i] += 1
+
+    conn = psycopg2.connect(dsn, connect_timeout=5, application_name="traffic_model")
+    try:
+        # 商品沒有設定活動時間時，以出價的最早 / 最晚時間代替
+        with conn.cursor() as cur:
+            cur.execute("SELECT product_id, min(created_at), max(created_at) FROM bid_logs b "
+                        f"{where} GROUP BY product_id", params)
+            spans = {pid: (lo.timestamp() * 1000, hi.timestamp() * 1000) for pid, lo, hi in cur.fetchall()}
+
+        with conn.cursor(name="traffic_model") as cur:
+            cur.itersize = batch
+            cur.execute(sql.format(where=where), params)
+            key, prev_ts, first_bucket, last_bucket = None, None, None, None
+            for product_id, user_id, ts, start, end in cur:
+                if not start or not end or end <= start:
+                    start, end = spans.get(product_id, (ts, ts + 1))
+                    end = max(end, start + 1)
+                windows[product_id] = (end - start) / 1000
+                bucket = min(max(int((ts - start) / (end - start) * buckets), 0), buckets - 1)
+                arrivals[bucket] += 1
+                total += 1
+
+                # 換人或間隔超過 max_gap 時結束上一段活躍期間
+                if (product_id, user_id) != key or (ts - prev_ts) / 1000 > max_gap:
+                    if key is not None:
+                        close_session(first_bucket, last_bucket)
+                    key, first_bucket = (product_id, user_id), bucket
+                else:
+                    gaps.add((ts - prev_ts) / 1000)
+                last_bucket, prev_ts = bucket, ts
+            if key is not None:
+                close_session(first_bucket, last_bucket)
+    finally:
+        conn.close()
+
+    if not total:
+        raise SystemExit("bid_logs 沒有資料")
+    duration = statistics.median(windows.values())
+    # 多個商品疊加：每段的到達率以商品數平均，換算成單一商品在典型活動長度下的 req/s
+    bucket_seconds = duration / buckets
+    rate = [count / len(windows) / bucket_seconds for count in arrivals]
+    users = [count / len(windows) for count in active]
+    return {
+        "source": f"bid_logs ({len(windows)} 個商品, {total} 筆出價)",
+        "duration": duration,
+        "rate": rate,
+        "users": users,
+        "mix": [{"bid": 1.0}],
+        "gaps": gaps,
+    }
+
+
+def fit_run(run_dir, buckets, samples, max_gap):
+    rows = read_jsonl(run_dir, "client_latency.jsonl")
+    if not rows:
+        raise SystemExit(f"{run_dir} 沒有 client_latency.jsonl")
+    start = run_start_ts(run_dir) or min(r["ts"] for r in rows)
+    duration = max(r["ts"] for r in rows) + 1 - start
+    bucket_seconds = duration / buckets
+
+    counts = [0] * buckets
+    mix = [defaultdict(int) for _ in range(buckets)]
+    latency = []
+    for r in rows:
+        bucket = min(max(int((r["ts"] - start) / bucket_seconds), 0), buckets - 1)
+        n = r["count"] + r["failures"]
+        counts[bucket] += n
+        mix[bucket][r["name"]] += n
+        if r["count"]:
+            latency.append((r["mean"], r["count"]))
+
+    # 同一用戶的出價間隔 (Locust 用戶依序執行，間隔包含其他任務)，以出價占全部請求的比例換算成每個請求的間隔
+    gaps = Reservoir(samples)
+    last = {}
+    bid_share = None
+    for r in read_jsonl(run_dir, "accepted_bids.jsonl"):
+        key = (r.get("pid"), r["product"], r["user"])
+        if key in last and 0 <= r["client_ts"] - last[key] <= max_gap:
+            gaps.add(r["client_ts"] - last[key])
+        last[key] = r["client_ts"]
+    total = sum(counts)
+    bids = sum(n for m in mix for name, n in m.items() if "出價" in name or "bid" in name.lower())
+    if gaps.items and total and bids:
+        bid_share = bids / total
+        gaps.items = [g * bid_share for g in gaps.items]
+
+    mean_latency = (sum(m * n for m, n in latency) / sum(n for _, n in latency) / 1000) if latency else 0.0
+    think_mean = statistics.mean(gaps.items) if gaps.items else 2.0  # 沒有出價紀錄時假設 between(1, 3)
+    rate = [c / bucket_seconds for c in counts]
+    return {
+        "source": f"run {os.path.basename(os.path.normpath(run_dir))}",
+        "duration": duration,
+        "rate": rate,
+        "users": [r * (think_mean + mean_latency) for r in rate],
+        "mix": [{name: round(n / sum(m.values()), 4) for name, n in sorted(m.items())} if m else {} for m in mix],
+        "gaps": gaps,
+    }
+
+
+def build_model(fitted, buckets):
+    rate, peak_rps = normalize(fitted["rate"])
+    users, peak_users = normalize(fitted["users"])
+    gaps = fitted["gaps"]
+    mix = fitted["mix"]
+    # 沒有請求的時段沿用前一段的 mix
+    for i in range(1, len(mix)):
+        if not mix[i]:
+            mix[i] = mix[i - 1]
+    return {
+        "fitted_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "source": fitted["source"],
+        "buckets": buckets,
+        "duration": round(fitted["duration"], 3),
+        "peak_rps": round(peak_rps, 3),
+        "peak_users": round(peak_users, 1),
+        "rate": rate,
+        "users": users,
+        "mix": mix,
+        "think_time": {
+            "quantiles": quantile_table(gaps.items) if gaps.items else [1.0 + i / 10 for i in range(21)],
+            "mean": round(statistics.mean(gaps.items), 4) if gaps.items else 2.0,
+            "samples": gaps.seen,
+        },
+    }
+
+
+def sparkline(values, width=60):
+    if not values:
+        return ""
+    step = max(len(values) / width, 1)
+    picked = [values[min(int(i * step), len(values) - 1)] for i in range(min(width, len(values)))]
+    peak = max(picked) or 1
+    return "".join(SPARK[int(v / peak * (len(SPARK) - 1))] for v in picked)
+
+
+def show(model):
+    d = model.data
+    print(f"來源: {d['source']}  擬合時間: {d['fitted_at']}")
+    print(f"活動長度 {d['duration']:.0f}s  尖峰 {d['peak_rps']:.1f} req/s  尖峰活躍用戶 {d['peak_users']:.0f}")
+    print(f"到達率    {sparkline(d['rate'])}")
+    print(f"活躍用戶  {sparkline(d['users'])}")
+    q = d["think_time"]["quantiles"]
+    print(f"think time (s): p5 {q[1]:.2f}  p50 {q[10]:.2f}  p95 {q[19]:.2f}  平均 {d['think_time']['mean']:.2f}  "
+          f"({d['think_time']['samples']} 筆)")
+    names = sorted({name for m in model.mix_curve for name in m})
+    for name in names:
+        print(f"  {name:<16} {sparkline([m.get(name, 0) for m in model.mix_curve])}")
+
+
+_env_model = None
+
+
+def model_from_env():
+    """TRAFFIC_MODEL 指定的模型 (同一行程共用)"""
+    global _env_model
+    if _env_model is None:
+        _env_model = TrafficModel.load(os.environ["TRAFFIC_MODEL"])
+    return _env_model
+
+
+def replay_duration(model):
+    return float(os.getenv("TRAFFIC_DURATION") or model.duration)
+
+
+class TraceShape(LoadTestShape):
+    """
+    依 TRAFFIC_MODEL 的 users 曲線重播用戶數：
+      - TRAFFIC_DURATION 重播長度 (秒，預設為模型的活動長度)
+      - TRAFFIC_PEAK_USERS 尖峰用戶數 (預設為模型的 peak_users)
+      - TRAFFIC_SPAWN_RATE 每秒最多增減的用戶數 (預設為尖峰用戶數的 1/5)
+    user_classes 由 locustfile 指定為 TraceUser
+    """
+    user_classes = None
+
+    def __init__(self):
+        super().__init__()
+        self.model = model_from_env()
+        self.duration = replay_duration(self.model)
+        self.peak_users = int(os.getenv("TRAFFIC_PEAK_USERS") or max(round(self.model.data["peak_users"]), 1))
+        self.spawn_rate = float(os.getenv("TRAFFIC_SPAWN_RATE") or max(self.peak_users / 5, 1))
+
+    def tick(self):
+        run_time = self.get_run_time()
+        if run_time > self.duration:
+            return None
+        users = max(round(self.peak_users * self.model.users(run_time / self.duration)), 1)
+        if self.user_classes:
+            return users, self.spawn_rate, self.user_classes
+        return users, self.spawn_rate
+
+
+def trace_user(base, endpoints):
+    """
+    以 base 為基礎產生 TraceUser：think_time 依模型抽樣，每次依當下的 mix 挑選任務。
+    endpoints 為 {請求名稱: 方法名稱}，模型中沒有對應的請求 (註冊、登入…) 不列入。
+    """
+    model = model_from_env()
+    duration = replay_duration(model)
+    fallback = endpoints.get("提交出價") or next(iter(endpoints.values()))
+
+    first_seen = time.time()  # runner 沒有 start_time 時 (例如分散式 worker) 以此為起點
+
+    def wait_time(self):
+        return model.think_time()
+
+    @task
+    def replay(self):
+        started = getattr(self.environment.runner, "start_time", None) or first_seen
+        progress = (time.time() - started) / duration
+        mix = model.mix(progress)
+        methods = defaultdict(float)
+        for name, share in mix.items():
+            method = endpoints.get(name) or (fallback if name == "bid" else None)
+            if method:
+                methods[method] += share
+        if methods:
+            method = random.choices(list(methods), weights=list(methods.values()))[0]
+        else:
+            method = fallback
+        getattr(self, method)()
+
+    return type("TraceUser", (base,), {"wait_time": wait_time, "tasks": [replay], "__module__": base.__module__})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="擬合錄製流量模型")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("fit", help="從 bid_logs 或執行紀錄擬合模型")
+    source = p.add_mutually_exclusive_group(required=True)
+    source.add_argument("--dsn", help="Postgres 連線字串 (bid_logs)")
+    source.add_argument("--run", help="run ID 或 runs/<run_id> 目錄")
+    p.add_argument("--products", help="只使用這些商品的出價 (逗號分隔，--dsn)")
+    p.add_argument("--buckets", type=int, default=60, help="活動期間切成幾段")
+    p.add_argument("--samples", type=int, default=200000, help="think time 抽樣上限")
+    p.add_argument("--max-gap", type=float, default=120.0, help="超過此秒數的間隔視為新的工作階段")
+    p.add_argument("-o", "--output", default="traffic_model.json")
+
+    p = sub.add_parser("show", help="顯示模型")
+    p.add_argument("model")
+
+    args = parser.parse_args()
+    if args.command == "show":
+        show(TrafficModel.load(args.model))
+        return 0
+
+    if args.dsn:
+        products = args.products.split(",") if args.products else None
+        fitted = fit_bid_logs(args.dsn, args.buckets, args.samples, args.max_gap, products)
+    else:
+        run_dir = args.run if os.path.isdir(args.run) else os.path.join(RUNS_DIR, args.run)
+        fitted = fit_run(run_dir, args.buckets, args.samples, args.max_gap)
+    model = build_model(fitted, args.buckets)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(model, f, ensure_ascii=False, indent=2)
+    show(TrafficModel(model))
+    print(f"模型寫入 {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
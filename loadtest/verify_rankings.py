@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+最終排行榜的 client 端驗證 (oracle)
+
+壓測時 bid_ledger.py 把每筆被接受的出價寫入 runs/<run_id>/accepted_bids.jsonl。
+活動結束後，這裡依後端的規則重算預期的前 K 名，並與後端比對：
+- 每位用戶在排行榜中只保留最後一筆出價的分數 (place_bid.lua 的 ZADD 會覆蓋)
+- 依分數由高到低排序，同分時依 userId 字串由大到小 (ZREVRANGE 的順序)
+- 比對 GET /api/products/<id>/results，與 Postgres (--dsn) 的 latest_bids 前 K 名；
+  bid_logs 中缺少的被接受出價 (非同步寫入遺失) 也一併列出
+不一致時列出相關用戶最近的出價，並回傳 1。
+
+出價紀錄先串流匯入 runs/<run_id>/ledger.sqlite，排序與去重都在 SQLite 中完成，數百萬筆出價也只佔用固定的記憶體。
+若有其他 client 同時出價，後端結果中會出現紀錄之外的用戶，標示為 unknown_user。
+
+使用方式：
+python verify_rankings.py runs/<run_id> --host http://localhost:8000
+python verify_rankings.py <run_id> --host http://localhost:8000 --wait \\
+    --dsn "host=localhost user=admin password=password123 dbname=auction_db"
+"""
+
+import argparse
+import json
+import os
+import random
+import sqlite3
+import sys
+import time
+
+import requests
+
+from bid_ledger import FILENAME as LEDGER_FILE
+from runlog import RUNS_DIR
+
+DB_FILE = "ledger.sqlite"
+BATCH = 5000
+SCORE_EPSILON = 1e-3  # 後端分數四捨五入到小數點後 4 位
+CONTRIBUTING_BIDS = 5
+
+
+def resolve_run_dir(ref):
+    for path in (ref, os.path.join(RUNS_DIR, ref)):
+        if os.path.isfile(os.path.join(path, LEDGER_FILE)):
+            return path
+    raise SystemExit(f"找不到出價紀錄: {ref} (需要 {LEDGER_FILE})")
+
+
+def build_ledger_db(run_dir, rebuild=False):
+    """accepted_bids.jsonl → ledger.sqlite (bids 為全部出價，latest 為每位用戶在每個商品最後一筆)"""
+    source = os.path.join(run_dir, LEDGER_FILE)
+    path = os.path.join(run_dir, DB_FILE)
+    if os.path.exists(path) and not rebuild and os.path.getmtime(path) >= os.path.getmtime(source):
+        return sqlite3.connect(path)
+    if os.path.exists(path):
+        os.remove(path)
+
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode = OFF")
+    conn.execute("PRAGMA synchronous = OFF")
+    conn.execute("""CREATE TABLE bids (product TEXT, user TEXT, price REAL, score REAL,
+                                       server_ts INTEGER, pid INTEGER, seq INTEGER)""")
+    insert = "INSERT INTO bids VALUES (?, ?, ?, ?, ?, ?, ?)"
+    batch = []
+    with open(source, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            r = json.loads(line)
+            batch.append((r["product"], r["user"], r["price"], r["score"], r["server_ts"], r.get("pid", 0), r["seq"]))
+            if len(batch) >= BATCH:
+                conn.executemany(insert, batch)
+                batch = []
+    if batch:
+        conn.executemany(insert, batch)
+
+    conn.execute("CREATE INDEX bids_user ON bids (product, user, server_ts, seq)")
+    conn.execute("""
+        CREATE TABLE latest AS
+        SELECT product, user, price, score, server_ts FROM (
+            SELECT *, ROW_NUMBER() OVER (PARTITION BY product, user ORDER BY server_ts DESC, seq DESC) AS rn
+            FROM bids
+        ) WHERE rn = 1""")
+    conn.execute("CREATE INDEX latest_rank ON latest (product, score DESC, user DESC)")
+    conn.commit()
+    return conn
+
+
+def expected_top(conn, product_id, limit):
+    rows = conn.execute("SELECT user, price, score FROM latest WHERE product = ? "
+                        "ORDER BY score DESC, user DESC LIMIT ?", (product_id, limit)).fetchall()
+    return [{"rank": i + 1, "userId": u, "price": p, "score": s} for i, (u, p, s) in enumerate(rows)]
+
+
+def ledger_entry(conn, product_id, user_id):
+    row = conn.execute("SELECT price, score FROM latest WHERE product = ? AND user = ?",
+                       (product_id, user_id)).fetchone()
+    return {"price": row[0], "score": row[1]} if row else None
+
+
+def contributing_bids(conn, product_id, user_id):
+    rows = conn.execute("SELECT price, score, server_ts FROM bids WHERE product = ? AND user = ? "
+                        "ORDER BY server_ts DESC, seq DESC LIMIT ?",
+                        (product_id, user_id, CONTRIBUTING_BIDS)).fetchall()
+    return [{"price": p, "score": s, "server_ts": ts} for p, s, ts in rows]
+
+
+def diff_rankings(conn, product_id, expected, actual, k):
+    """expected / actual 為 [{"rank", "userId", "score", ...}]；回傳不一致清單"""
+    mismatches = []
+    expected = expected[:k]
+    cutoff = expected[-1]["score"] if len(expected) == k else None
+    expected_users = {e["userId"]: e for e in expected}
+    actual_users = {a["userId"]: a for a in actual}
+
+    for a in actual:
+        e = expected_users.get(a["userId"])
+        if e is None:
+            entry = ledger_entry(conn, product_id, a["userId"])
+            if entry is None:
+                kind = "unknown_user"
+            elif cutoff is not None and abs(entry["score"] - cutoff) <= SCORE_EPSILON:
+                kind = "tie"
+            else:
+                kind = "unexpected"
+            mismatches.append({"kind": kind, "userId": a["userId"], "rank": a["rank"],
+                               "actual_score": a["score"], "expected_score": entry and entry["score"]})
+        elif abs(e["score"] - a["score"]) > SCORE_EPSILON:
+            mismatches.append({"kind": "score", "userId": a["userId"], "rank": a["rank"],
+                               "actual_score": a["score"], "expected_score": e["score"]})
+        elif e["rank"] != a["rank"]:
+            mismatches.append({"kind": "order", "userId": a["userId"], "rank": a["rank"],
+                               "expected_rank": e["rank"], "actual_score": a["score"], "expected_score": e["score"]})
+
+    for e in expected:
+        if e["userId"] not in actual_users:
+            tie = len(actual) >= k and abs(e["score"] - actual[-1]["score"]) <= SCORE_EPSILON
+            mismatches.append({"kind": "tie" if tie else "missing", "userId": e["userId"],
+                               "expected_rank": e["rank"], "expected_score": e["score"]})
+
+    for m in mismatches:
+        m["bids"] = contributing_bids(conn, product_id, m["userId"])
+    return mismatches
+
+
+def login(session, host):
+    user = {"username": f"oracle_{random.randint(100000, 999999)}", "password": "test123456", "role": "member"}
+    session.post(f"{host}/api/auth/register", json=user, timeout=10)
+    res = session.post(f"{host}/api/auth/login", json={"username": user["username"], "password": user["password"]},
+                       timeout=10)
+    res.raise_for_status()
+    session.headers["Authorization"] = f"Bearer {res.json()['token']}"
+
+
+def fetch_results(session, host, product_id):
+    res = session.get(f"{host}/api/products/{product_id}/results", timeout=30)
+    if res.status_code != 200:
+        return None, f"HTTP {res.status_code} {res.text[:200]}"
+    items = res.json().get("results") or []
+    return [{"rank": r["rank"], "userId": str(r["userId"]), "price": r.get("finalPrice"),
+             "score": r.get("finalScore")} for r in items], None
+
+
+def postgres_checks(dsn, conn, products):
+    """{商品: {"latest_bids": [...], "bid_logs": 筆數, "ledger": 筆數, "lost": [...]}}"""
+    import psycopg2  # 只有指定 --dsn 時需要
+
+    result = {}
+    pg = psycopg2.connect(dsn, connect_timeout=5, application_name="verify_rankings")
+    try:
+        with pg.cursor() as cur:
+            for product_id, k in products.items():
+                cur.execute("SELECT user_id::text, price, score FROM latest_bids WHERE product_id = %s "
+                            "ORDER BY score DESC, user_id::text DESC LIMIT %s", (product_id, k))
+                top = [{"rank": i + 1, "userId": u, "price": p, "score": s} for i, (u, p, s) in enumerate(cur.fetchall())]
+                cur.execute("SELECT count(*) FROM bid_logs WHERE product_id = %s", (product_id,))
+                logged = cur.fetchone()[0]
+
+                # 預期前 K 名的最後一筆出價是否有寫入 bid_logs
+                lost = []
+                for e in expected_top(conn, product_id, k):
+                    cur.execute("SELECT 1 FROM bid_logs WHERE product_id = %s AND user_id = %s "
+                                "AND abs(score - %s) <= %s LIMIT 1",
+                                (product_id, int(e["userId"]), e["score"], SCORE_EPSILON))
+                    if cur.fetchone() is None:
+                        lost.append(e)
+                ledger = conn.execute("SELECT count(*) FROM bids WHERE product = ?", (product_id,)).fetchone()[0]
+                result[product_id] = {"latest_bids": top, "bid_logs": logged, "ledger": ledger, "lost": lost}
+    finally:
+        pg.close()
+    return result
+
+
+def print_mismatches(label, mismatches):
+    real = [m for m in mismatches if m["kind"] != "tie"]
+    ties = len(mismatches) - len(real)
+    if not real:
+        print(f"  {label}: 一致" + (f" (同分 {ties} 位，順序無法判定)" if ties else ""))
+        return
+    print(f"  {label}: {len(real)} 項不一致" + (f"，同分 {ties} 位" if ties else ""))
+    for m in real:
+        rank = m.get("rank", m.get("expected_rank"))
+        print(f"    [{m['kind']}] 第 {rank} 名 user {m['userId']}  預期分數 {m.get('expected_score')}  "
+              f"實際分數 {m.get('actual_score')}")
+        for b in m["bids"]:
+            print(f"        出價 {b['price']:.2f}  分數 {b['score']:.4f}  server_ts {b['server_ts']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="重算最終前 K 名並與後端 /results、Postgres 比對")
+    parser.add_argument("run", help="run ID 或 runs/<run_id> 目錄")
+    parser.add_argument("--host", default=os.getenv("BASE_URL", "http://localhost:8000"))
+    parser.add_argument("--dsn", default=os.getenv("PG_TELEMETRY_DSN"), help="Postgres 連線字串 (比對 latest_bids / bid_logs)")
+    parser.add_argument("--products", help="只驗證這些商品 (逗號分隔)")
+    parser.add_argument("--wait", action="store_true", help="活動尚未結束時等到 endTime 之後")
+    parser.add_argument("--grace", type=float, default=3.0, help="endTime 之後再等待的秒數")
+    parser.add_argument("--rebuild", action="store_true", help="重新建立 ledger.sqlite")
+    args = parser.parse_args()
+
+    run_dir = resolve_run_dir(args.run)
+    host = args.host.rstrip("/")
+    started = time.time()
+    conn = build_ledger_db(run_dir, args.rebuild)
+    total = conn.execute("SELECT count(*) FROM bids").fetchone()[0]
+    print(f"出價紀錄 {total} 筆 → {os.path.join(run_dir, DB_FILE)} ({time.time() - started:.1f}s)")
+
+    products = [r[0] for r in conn.execute("SELECT DISTINCT product FROM latest ORDER BY product")]
+    if args.products:
+        products = [p for p in products if p in args.products.split(",")]
+
+    session = requests.Session()
+    login(session, host)
+
+    report, ks, failed = {}, {}, False
+    for product_id in products:
+        res = session.get(f"{host}/api/products/{product_id}", timeout=10)
+        if res.status_code != 200:
+            print(f"商品 {product_id}: 讀取失敗 HTTP {res.status_code}，略過")
+            continue
+        product = res.json()
+        k, end_ms = int(product.get("k", 5)), int(product.get("endTime", 0))
+        remaining = end_ms / 1000 + args.grace - time.time()
+        if remaining > 0:
+            if not args.wait:
+                print(f"商品 {product_id}: 活動尚未結束 (還有 {remaining:.0f}s)，略過；可加 --wait")
+                continue
+            print(f"商品 {product_id}: 等待活動結束 {remaining:.0f}s")
+            time.sleep(remaining)
+
+        ks[product_id] = k
+        expected = expected_top(conn, product_id, k)
+        actual, error = fetch_results(session, host, product_id)
+        print(f"\n商品 {product_id} (K={k})")
+        entry = {"k": k, "expected": expected}
+        if actual is None:
+            print(f"  /results: {error}")
+            entry["results_error"] = error
+            failed = True
+        else:
+            mismatches = diff_rankings(conn, product_id, expected, actual, k)
+            print_mismatches("/results", mismatches)
+            entry.update(results=actual, results_mismatches=mismatches)
+            failed |= any(m["kind"] != "tie" for m in mismatches)
+        report[product_id] = entry
+
+    if args.dsn and ks:
+        print("\nPostgres")
+        for product_id, pg in postgres_checks(args.dsn, conn, ks).items():
+            mismatches = diff_rankings(conn, product_id, report[product_id]["expected"], pg["latest_bids"], ks[product_id])
+            print_mismatches(f"{product_id} latest_bids", mismatches)
+            print(f"    bid_logs {pg['bid_logs']} 筆 / 紀錄中被接受 {pg['ledger']} 筆"
+                  + (f"，前 K 名缺少 {len(pg['lost'])} 筆最後出價" if pg["lost"] else ""))
+            report[product_id].update(postgres=pg, postgres_mismatches=mismatches)
+            failed |= bool(pg["lost"]) or any(m["kind"] != "tie" for m in mismatches)
+
+    path = os.path.join(run_dir, "rankings_check.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"checked_at": time.strftime("%Y-%m-%dT%H:%M:%S"), "host": host, "ledger_bids": total,
+                   "products": report, "ok": not failed}, f, ensure_ascii=False, indent=2)
+    print(f"\n{'發現不一致' if failed else '全部一致'}，結果寫入 {path}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Go benchmark 基準線與回歸比較
+
+執行 backend 的 Go benchmark (或讀取已存的 `go test -bench` 輸出)，取多次執行的中位數，
+以 commit 為單位存成基準線，並與指定的基準線比較 ns/op、allocs/op：
+
+    # 在 main 上建立基準線 (存到 backend/.bench/<commit>.json)
+    python3 scripts/bench_compare.py --save
+
+    # 在功能分支上比較，ns/op 或 allocs/op 變差超過 10% 則 exit 1
+    python3 scripts/bench_compare.py --baseline main --threshold 0.10
+
+    # 只比較既有輸出
+    python3 scripts/bench_compare.py --input bench.txt --baseline backend/.bench/abc123.json
+
+--baseline 可以是 commit (branch / tag / sha，會解析成 sha 後到 backend/.bench/ 找) 或 JSON 檔路徑。
+"""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BACKEND_DIR = os.path.join(ROOT_DIR, "backend")
+BASELINE_DIR = os.path.join(BACKEND_DIR, ".bench")
+
+# BenchmarkPlaceBid/bidders=1000/cap=0-8   12345   98765 ns/op   1234 B/op   56 allocs/op
+LINE_RE = re.compile(r"^(Benchmark\S+?)(?:-\d+)?\s+(\d+)\s+(.*)$")
+
+# 比較的指標：(單位, 顯示名稱)
+COMPARED = [("ns/op", "ns/op"), ("allocs/op", "allocs/op")]
+
+
+def parse_bench_output(text, package=""):
+    """解析 go test -bench 輸出，回傳 {名稱: {單位: [多次量測值]}}；名稱前綴套件路徑避免撞名"""
+    results = {}
+    for line in text.splitlines():
+        line = line.strip()
+        if line.startswith("pkg:"):
+            package = line.split(":", 1)[1].strip()
+            continue
+        m = LINE_RE.match(line)
+        if not m:
+            continue
+        name = f"{package}.{m.group(1)}" if package else m.group(1)
+        fields = m.group(3).split()
+        metrics = results.setdefault(name, {})
+        for value, unit in zip(fields[0::2], fields[1::2]):
+            try:
+                metrics.setdefault(unit, []).append(float(value))
+            except ValueError:
+                pass
+    return results
+
+
+def summarize(results):
+    """多次量測取中位數"""
+    return {name: {unit: statistics.median(values) for unit, values in metrics.items()}
+            for name, metrics in results.items()}
+
+
+def run_benchmarks(bench, count, benchtime, packages):
+    cmd = ["go", "test", "-run", "^$", "-bench", bench, "-benchmem", "-count", str(count)]
+    if benchtime:
+        cmd += ["-benchtime", benchtime]
+    cmd += packages
+    print(f"[Bench] {' '.join(cmd)}  (cwd=backend)", file=sys.stderr)
+    proc = subprocess.run(cmd, cwd=BACKEND_DIR, capture_output=True, text=True)
+    sys.stderr.write(proc.stderr)
+    if proc.returncode != 0:
+        sys.stderr.write(proc.stdout)
+        sys.exit(f"go test 失敗 (exit {proc.returncode})")
+    return proc.stdout
+
+
+def git(*args):
+    return subprocess.run(["git", *args], cwd=ROOT_DIR, capture_output=True, text=True, check=True).stdout.strip()
+
+
+def current_commit():
+    sha = git("rev-parse", "HEAD")
+    if git("status", "--porcelain", "--untracked-files=no"):
+        sha += "-dirty"
+    return sha
+
+
+def baseline_path(ref):
+    if os.path.isfile(ref):
+        return ref
+    try:
+        sha = git("rev-parse", ref)
+    except subprocess.CalledProcessError:
+        sys.exit(f"找不到基準線: {ref} 不是檔案也不是 commit")
+    return os.path.join(BASELINE_DIR, f"{sha}.json")
+
+
+def save_baseline(summary, commit):
+    os.makedirs(BASELINE_DIR, exist_ok=True)
+    path = os.path.join(BASELINE_DIR, f"{commit}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"commit": commit, "benchmarks": summary}, f, indent=2, sort_keys=True)
+    print(f"[Bench] 基準線已存到 {os.path.relpath(path, ROOT_DIR)}")
+    return path
+
+
+def compare(baseline, current, threshold):
+    """回傳 (報表列, 回歸項目)；變化率 = (目前 - 基準) / 基準，正數代表變差"""
+    rows, regressions = [], []
+    for name in sorted(set(baseline) | set(current)):
+        old, new = baseline.get(name), current.get(name)
+        if old is None or new is None:
+            rows.append((name, "", None, None, None, "新增" if old is None else "移除"))
+            continue
+        for unit, label in COMPARED:
+            if unit not in old or unit not in new:
+                continue
+            before, after = old[unit], new[unit]
+            if before == 0:
+                delta = 0.0 if after == 0 else float("inf")
+            else:
+                delta = (after - before) / before
+            flag = ""
+            if delta > threshold:
+                flag = "回歸"
+                regressions.append((name, label, before, after, delta))
+            elif delta < -threshold:
+                flag = "改善"
+            rows.append((name, label, before, after, delta, flag))
+    return rows, regressions
+
+
+def print_report(rows, threshold):
+    print(f"\n{'benchmark':<72} {'指標':<10} {'基準':>14} {'目前':>14} {'變化':>8}")
+    print("-" * 122)
+    for name, label, before, after, delta, flag in rows:
+        if before is None:
+            print(f"{name:<72} {'':<10} {'':>14} {'':>14} {'':>8}  {flag}")
+            continue
+        change = "inf" if delta == float("inf") else f"{delta * 100:+.1f}%"
+        print(f"{name:<72} {label:<10} {before:>14.1f} {after:>14.1f} {change:>8}  {flag}")
+    print(f"\n門檻: ±{threshold * 100:.0f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Go benchmark 基準線與回歸比較")
+    parser.add_argument("--input", help="讀取既有的 go test -bench 輸出檔，而不是重新執行")
+    parser.add_argument("--bench", default=".", help="-bench 正規表示式 (預設 .)")
+    parser.add_argument("--count", type=int, default=5, help="每個 benchmark 執行次數，取中位數 (預設 5)")
+    parser.add_argument("--benchtime", default="", help="-benchtime，例如 1s 或 10000x")
+    parser.add_argument("--packages", nargs="+", default=["./internal/..."], help="要執行的套件 (預設 ./internal/...)")
+    parser.add_argument("--save", action="store_true", help="以目前 commit 存成基準線")
+    parser.add_argument("--baseline", help="要比較的基準線 (commit 或 JSON 檔)")
+    parser.add_argument("--threshold", type=float, default=0.10, help="回歸門檻比例 (預設 0.10 = 10%%)")
+    args = parser.parse_args()
+
+    if args.input:
+        with open(args.input, encoding="utf-8") as f:
+            output = f.read()
+    else:
+        output = run_benchmarks(args.bench, args.count, args.benchtime, args.packages)
+
+    current = summarize(parse_bench_output(output))
+    if not current:
+        sys.exit("沒有解析到任何 benchmark 結果")
+    print(f"[Bench] 解析到 {len(current)} 個 benchmark")
+
+    if args.save:
+        save_baseline(current, current_commit())
+
+    if not args.baseline:
+        return
+
+    path = baseline_path(args.baseline)
+    if not os.path.exists(path):
+        sys.exit(f"基準線不存在: {os.path.relpath(path, ROOT_DIR)} (請先在該 commit 執行 --save)")
+    with open(path, encoding="utf-8") as f:
+        baseline = json.load(f)["benchmarks"]
+
+    rows, regressions = compare(baseline, current, args.threshold)
+    print_report(rows, args.threshold)
+    if regressions:
+        print(f"\n✗ {len(regressions)} 項超過回歸門檻:")
+        for name, label, before, after, delta in regressions:
+            print(f"  {name} {label}: {before:.1f} → {after:.1f}")
+        sys.exit(1)
+    print("\n✓ 沒有超過門檻的回歸")
+
+
+if __name__ == "__main__":
+    main()
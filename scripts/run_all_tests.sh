@@ -29,6 +29,21 @@ else
 fi
 cd ..
 
+# Go benchmark (RUN_BENCH=1 时执行，BENCH_BASELINE 指定基准线 commit 时做回归比较)
+if [ "${RUN_BENCH:-0}" = "1" ]; then
+    echo -e "\n${YELLOW}[bench] 执行 Go benchmark${NC}"
+    BENCH_ARGS="--threshold ${BENCH_THRESHOLD:-0.10}"
+    if [ -n "$BENCH_BASELINE" ]; then
+        BENCH_ARGS="$BENCH_ARGS --baseline $BENCH_BASELINE"
+    fi
+    if python3 scripts/bench_compare.py --save $BENCH_ARGS; then
+        echo -e "${GREEN}✓ benchmark 完成${NC}"
+    else
+        echo -e "${RED}✗ benchmark 失败或超过回归门槛${NC}"
+        exit 1
+    fi
+fi
+
 # 2. Go 集成测试
 echo -e "\n${YELLOW}[2/6] 执行 Go 集成测试${NC}"
 cd backend